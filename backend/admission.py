@@ -0,0 +1,348 @@
+# Admission control and scheduling of agent queries: per-client token buckets, weighted fair queuing and priority lanes
+import asyncio
+import contextlib
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+
+# Priority lanes: interactive queries are always dispatched before batch queries
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+# Client of requests that carry neither an API key nor a client id
+ANONYMOUS_CLIENT = "anonymous"
+# Metric label of clients beyond the tracked ones, so label cardinality stays bounded
+OTHER_CLIENTS_LABEL = "other"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a query is not admitted: over its rate limit, queue full, or waited too long."""
+
+    def __init__(self, client: str, reason: str, retry_after: float):
+        super().__init__(f"Client {client} was not admitted ({reason.replace('_', ' ')}); retry in {retry_after:.1f}s")
+        self.client = client
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_identity(api_key: Optional[str], client_id: Optional[str]) -> str:
+    """Client a request is accounted to: a digest of its API key, else its client id, else anonymous."""
+    if api_key:
+        return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    if client_id:
+        return client_id.strip()[:64] or ANONYMOUS_CLIENT
+    return ANONYMOUS_CLIENT
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; a rate of 0 never limits."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def try_take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens and return 0, or return the seconds until they are available."""
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def full(self) -> bool:
+        """True once the bucket has refilled; a new bucket would then behave the same."""
+        return self.rate <= 0 or self.tokens + (self.clock() - self.updated) * self.rate >= self.burst
+
+
+@dataclass
+class ClientPolicy:
+    """Limits and share of one client."""
+
+    # Queries per second (0 = unlimited) and how many may be sent at once above that rate
+    rate: float = 0.0
+    burst: float = 10.0
+    # Share of the slots relative to other clients waiting in the same lane
+    weight: float = 1.0
+    # Lane every query of the client runs in, whatever the request asks for
+    lane: Optional[str] = None
+
+
+@dataclass
+class _Waiter:
+    start: float
+    finish: float
+    seq: int
+    client: str
+    lane: str
+    future: asyncio.Future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class FairScheduler:
+    """
+    Admits agent queries per client and hands out a fixed number of run slots.
+
+    A query first takes a token from its client's bucket. Interactive queries
+    over the rate are rejected; batch queries wait for the token. It then waits
+    for one of `max_concurrency` slots. Free slots go to the interactive lane
+    first; batch queries may hold at most `batch_share` of the slots, so some
+    are always left for interactive users while a long batch is running. Within
+    a lane, clients share slots by weight through weighted fair queuing: each
+    queued query gets a virtual finish time of max(lane clock, client's last
+    finish) + 1 / weight and the smallest is dispatched next, so a client with
+    hundreds of queued queries cannot delay another client's first one by more
+    than a slot turnover.
+
+    Buckets and finish times are kept for at most `max_clients` clients, least
+    recently seen first out. A bucket is only dropped once it has refilled, so
+    forgetting it changes nothing; while every kept bucket is still refilling,
+    further clients share one bucket, so rotating client ids neither grows
+    memory nor multiplies the rate limit. A dropped finish time only forgets a
+    client's past share, and only for clients with nothing queued.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        batch_share: float = 0.5,
+        max_queue_per_client: int = 100,
+        queue_timeout: float = 30.0,
+        default_policy: Optional[ClientPolicy] = None,
+        policies: Optional[Dict[str, ClientPolicy]] = None,
+        max_tracked_clients: int = 100,
+        max_clients: int = 10000,
+    ):
+        self.max_concurrency = max_concurrency
+        self.batch_slots = max(1, math.floor(max_concurrency * batch_share))
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.default_policy = default_policy or ClientPolicy()
+        self.policies = policies or {}
+        self.max_tracked_clients = max_tracked_clients
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._shared_bucket = TokenBucket(self.default_policy.rate, self.default_policy.burst)
+        self._queues: Dict[str, List[_Waiter]] = {lane: [] for lane in LANES}
+        self._virtual_time: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self._last_finish: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._queued: Dict[Tuple[str, str], int] = {}
+        self._active: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._labels: Dict[str, str] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> Optional["FairScheduler"]:
+        """
+        Scheduler configured by ADMISSION_* variables, or None when ADMISSION_MAX_CONCURRENCY is 0.
+
+        ADMISSION_CLIENTS is a JSON object of per-client policies, e.g.
+        {"nightly-sync": {"rate": 2, "burst": 20, "weight": 0.5, "lane": "batch"}}.
+        """
+        max_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "0"))
+        if max_concurrency <= 0:
+            return None
+        policies = {
+            client: ClientPolicy(**settings)
+            for client, settings in json.loads(os.getenv("ADMISSION_CLIENTS", "{}")).items()
+        }
+        return cls(
+            max_concurrency=max_concurrency,
+            batch_share=float(os.getenv("ADMISSION_BATCH_SHARE", "0.5")),
+            max_queue_per_client=int(os.getenv("ADMISSION_MAX_QUEUE_PER_CLIENT", "100")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30")),
+            max_clients=int(os.getenv("ADMISSION_MAX_CLIENTS", "10000")),
+            default_policy=ClientPolicy(
+                rate=float(os.getenv("ADMISSION_RATE_PER_SECOND", "0")),
+                burst=float(os.getenv("ADMISSION_BURST", "10")),
+            ),
+            policies=policies,
+        )
+
+    def policy(self, client: str) -> ClientPolicy:
+        return self.policies.get(client, self.default_policy)
+
+    def lane_for(self, client: str, requested: Optional[str]) -> str:
+        """The client's configured lane, else the requested one, else interactive."""
+        lane = self.policy(client).lane or requested
+        return lane if lane in LANES else LANE_INTERACTIVE
+
+    def queue_depth(self, client: str, lane: str) -> int:
+        return self._queued.get((client, lane), 0)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, client: str, lane: str = LANE_INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one run slot for the body; raises AdmissionRejected when the query is not admitted."""
+        label = self._label(client)
+        await self._take_token(client, lane, label)
+        started = time.monotonic()
+        await self._acquire(client, lane, label)
+        metrics.ADMISSION_WAIT.labels(client=label, lane=lane).observe(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def _bucket(self, client: str) -> TokenBucket:
+        """
+        The client's bucket; the shared one while `max_clients` buckets are all still
+        refilling. Clients with a configured policy always get their own.
+        """
+        bucket = self._buckets.get(client)
+        if bucket is not None:
+            self._buckets.move_to_end(client)
+            return bucket
+        if client not in self.policies and len(self._buckets) >= self.max_clients:
+            oldest = next(iter(self._buckets))
+            if not self._buckets[oldest].full():
+                return self._shared_bucket
+            del self._buckets[oldest]
+        policy = self.policy(client)
+        bucket = self._buckets[client] = TokenBucket(policy.rate, policy.burst)
+        return bucket
+
+    async def _take_token(self, client: str, lane: str, label: str) -> None:
+        bucket = self._bucket(client)
+        wait = bucket.try_take()
+        if wait > 0 and lane == LANE_INTERACTIVE:
+            self._reject(client, label, "rate_limited", wait)
+        while wait > 0:
+            # Batch queries are paced instead of rejected
+            await asyncio.sleep(wait)
+            wait = bucket.try_take()
+
+    def _can_dispatch(self, lane: str) -> bool:
+        if sum(self._active.values()) >= self.max_concurrency:
+            return False
+        if lane == LANE_BATCH:
+            return self._active[LANE_BATCH] < self.batch_slots and not self._queues[LANE_INTERACTIVE]
+        return True
+
+    async def _acquire(self, client: str, lane: str, label: str) -> None:
+        if not self._queues[lane] and self._can_dispatch(lane):
+            self._active[lane] += 1
+            metrics.ADMISSION_ACTIVE.labels(lane=lane).set(self._active[lane])
+            return
+        key = (client, lane)
+        if self._queued.get(key, 0) >= self.max_queue_per_client:
+            self._reject(client, label, "queue_full", self.queue_timeout)
+
+        start = max(self._virtual_time[lane], self._last_finish.get(key, 0.0))
+        finish = start + 1.0 / max(self.policy(client).weight, 1e-6)
+        self._last_finish[key] = finish
+        self._last_finish.move_to_end(key)
+        waiter = _Waiter(start, finish, next(self._seq), client, lane, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queues[lane], waiter)
+        self._set_queued(key, label, 1)
+        self._forget_finish_times()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter, key, label)
+            self._reject(client, label, "queue_timeout", self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter, key, label)
+            raise
+
+    def _forget_finish_times(self) -> None:
+        """Drop the least recently queued clients' finish times beyond `max_clients`, unless they have queries queued."""
+        while len(self._last_finish) > self.max_clients:
+            key = next(iter(self._last_finish))
+            if key in self._queued:
+                break
+            del self._last_finish[key]
+
+    def _abandon(self, waiter: _Waiter, key: Tuple[str, str], label: str) -> None:
+        """Forget a waiter that stopped waiting; a slot granted to it in the meantime is given back."""
+        if waiter.future.done():
+            self._release(waiter.lane)
+            return
+        waiter.future.cancel()
+        self._set_queued(key, label, -1)
+
+    def _release(self, lane: str) -> None:
+        self._active[lane] -= 1
+        metrics.ADMISSION_ACTIVE.labels(lane=lane).set(self._active[lane])
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._can_dispatch(lane):
+                waiter = heapq.heappop(queue)
+                if waiter.future.cancelled():
+                    continue
+                self._virtual_time[lane] = max(self._virtual_time[lane], waiter.start)
+                self._active[lane] += 1
+                metrics.ADMISSION_ACTIVE.labels(lane=lane).set(self._active[lane])
+                self._set_queued((waiter.client, lane), self._label(waiter.client), -1)
+                waiter.future.set_result(None)
+            # Cancelled waiters at the head are dropped even when no slot is free
+            while queue and queue[0].future.cancelled():
+                heapq.heappop(queue)
+
+    def _set_queued(self, key: Tuple[str, str], label: str, delta: int) -> None:
+        depth = self._queued.get(key, 0) + delta
+        if depth:
+            self._queued[key] = depth
+        else:
+            self._queued.pop(key, None)
+        metrics.ADMISSION_QUEUE_DEPTH.labels(client=label, lane=key[1]).inc(delta)
+
+    def _reject(self, client: str, label: str, reason: str, retry_after: float) -> None:
+        metrics.ADMISSION_REJECTIONS.labels(client=label, reason=reason).inc()
+        raise AdmissionRejected(client, reason, retry_after)
+
+    def _label(self, client: str) -> str:
+        label = self._labels.get(client)
+        if label is None:
+            tracked = client in self.policies or len(self._labels) < self.max_tracked_clients
+            label = client if tracked else OTHER_CLIENTS_LABEL
+            if tracked:
+                self._labels[client] = label
+        return label
+
+
+class AdmittedAgent:
+    """
+    IntakeAgent seen by one client: every query runs inside a scheduler slot.
+
+    A query that is not admitted returns status `rate_limited` with `retry_after`
+    instead of raising, like the agent's own `unavailable` results.
+    """
+
+    def __init__(self, agent, scheduler: FairScheduler, client: str, lane: str):
+        self.agent = agent
+        self.scheduler = scheduler
+        self.client = client
+        self.lane = lane
+
+    async def query(self, user_query: str, thread_id: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+        try:
+            async with self.scheduler.slot(self.client, self.lane):
+                return await self.agent.query(user_query, thread_id=thread_id, **kwargs)
+        except AdmissionRejected as e:
+            return {
+                "assistant_response": str(e),
+                "thread_id": thread_id,
+                "status": "rate_limited",
+                "retry_after": e.retry_after,
+            }
@@ -1,9 +1,19 @@
-from typing import Optional
-from fastapi import FastAPI, HTTPException
+from typing import Any, Callable, List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Response, WebSocket
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import logging
+import math
 
+from . import batch, metrics
+from .admission import LANE_BATCH, LANE_INTERACTIVE, AdmittedAgent, FairScheduler, client_identity
+from .catalog import SERVICE_LOOKUP_FIELDS, CatalogSnapshot, CatalogStore
+from .conversation_ws import ConversationSession
+from .diagrams import VARIANTS, DiagramNotFound, DiagramStore, DiagramUnavailable, etag_matches
+from .health import HealthProber
 from .intake_agent import IntakeAgent
+from .shared_state import SharedStateStore
+from .traffic_capture import TrafficCaptureMiddleware, TrafficRecorder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +24,29 @@ app = FastAPI(title="Software Architecture Recommender API", version="1.0.0")
 # Global agent instance - will be initialized on startup
 agent: Optional[IntakeAgent] = None
 
+# Background batch jobs, created with the agent
+batch_jobs: Optional[batch.BatchJobManager] = None
+
+# Background dependency probes answering /health/ready, started with the agent
+health: Optional[HealthProber] = None
+
+# Per-client admission control and fair scheduling of queries; None when ADMISSION_MAX_CONCURRENCY is 0
+admission: Optional[FairScheduler] = None
+
+# Architecture catalog snapshot written by the ingestion script
+catalog: CatalogStore = CatalogStore.from_env()
+
+# Disk cache of architecture diagrams served by /diagrams, created on startup
+diagrams: Optional[DiagramStore] = None
+
+# Anonymized /query traffic recorder for replay; None unless TRAFFIC_CAPTURE_PATH is set
+traffic_capture: Optional[TrafficRecorder] = None
+app.add_middleware(TrafficCaptureMiddleware, recorder=lambda: traffic_capture)
+
+# Optional factory for the project client used by the agent. Left unset in production;
+# the benchmarks point it at the local fake agents service.
+agent_client_factory: Optional[Callable[[], Any]] = None
+
 class QueryRequest(BaseModel):
     query: str
     thread_id: Optional[str] = None
@@ -23,13 +56,37 @@ class QueryResponse(BaseModel):
     thread_id: str
     status: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+    max_concurrency: Optional[int] = None
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    status_url: str
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the Azure AI Agent on application startup."""
-    global agent
+    global agent, batch_jobs, health, admission, diagrams, traffic_capture
+    if catalog.reload():
+        snapshot = catalog.current()
+        logger.info(f"Loaded architecture catalog {snapshot.version} with {len(snapshot)} architectures")
+    else:
+        logger.warning(f"No usable architecture catalog at {catalog.path}; /architectures is unavailable")
+    diagrams = DiagramStore.from_env()
+    traffic_capture = TrafficRecorder.from_env()
+    if traffic_capture:
+        logger.info(f"Capturing anonymized /query traffic to {traffic_capture.path}")
     try:
         logger.info("Initializing Azure AI Agent...")
-        agent = await IntakeAgent.create()
+        client = agent_client_factory() if agent_client_factory else None
+        agent = await IntakeAgent.create(client=client, state=SharedStateStore.from_env(), catalog=catalog)
+        batch_jobs = batch.BatchJobManager(agent, agent.state)
+        health = HealthProber.from_env(agent)
+        health.start()
+        admission = FairScheduler.from_env()
         logger.info("Azure AI Agent initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Azure AI Agent: {str(e)}")
@@ -39,6 +96,14 @@ async def startup_event():
 async def shutdown_event():
     """Clean up resources on application shutdown."""
     global agent
+    if health:
+        await health.stop()
+    if batch_jobs:
+        await batch_jobs.shutdown()
+    if diagrams:
+        await diagrams.close()
+    if traffic_capture:
+        traffic_capture.close()
     if agent:
         try:
             await agent.cleanup()
@@ -46,13 +111,27 @@ async def shutdown_event():
         except Exception as e:
             logger.error(f"Error during agent cleanup: {str(e)}")
 
+def _client_agent(api_key: Optional[str], client_id: Optional[str], lane: Optional[str]):
+    """The agent as one client sees it: its queries go through the admission scheduler when enabled."""
+    if admission is None:
+        return agent
+    client = client_identity(api_key, client_id)
+    return AdmittedAgent(agent, admission, client, admission.lane_for(client, lane))
+
 @app.post("/query", response_model=QueryResponse)
-async def query_agent(request: QueryRequest) -> QueryResponse:
+async def query_agent(
+    request: QueryRequest,
+    x_api_key: Optional[str] = Header(default=None),
+    x_client_id: Optional[str] = Header(default=None),
+    x_priority: Optional[str] = Header(default=None),
+) -> QueryResponse:
     """
     Query the software architecture recommendation agent.
     
     Args:
         request: The query request containing user question and optional thread ID
+        x_api_key, x_client_id: Identify the client for admission control
+        x_priority: `interactive` (default) or `batch` lane
         
     Returns:
         QueryResponse: The agent's response with thread information
@@ -63,13 +142,11 @@ async def query_agent(request: QueryRequest) -> QueryResponse:
     try:
         logger.info(f"Processing query: {request.query[:100]}...")
         
-        result = await agent.query(
+        result = await _client_agent(x_api_key, x_client_id, x_priority or LANE_INTERACTIVE).query(
             user_query=request.query,
             thread_id=request.thread_id
         )
         
-        return QueryResponse(**result)
-        
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(
@@ -77,14 +154,252 @@ async def query_agent(request: QueryRequest) -> QueryResponse:
             detail=f"Error processing query: {str(e)}"
         )
 
+    if result["status"] in ("unavailable", "rate_limited"):
+        # The circuit breaker is open or the client is over its limits: tell it when to come back
+        raise HTTPException(
+            status_code=503 if result["status"] == "unavailable" else 429,
+            detail=result["assistant_response"],
+            headers={"Retry-After": str(max(1, math.ceil(result["retry_after"])))}
+        )
+    if result["status"] == "error" and result.get("thread_id") is None:
+        # Failed before a thread existed, so there is no conversation to hand back
+        raise HTTPException(status_code=500, detail=f"Error processing query: {result['assistant_response']}")
+    return QueryResponse(**result)
+
+@app.websocket("/ws/conversation")
+async def conversation_socket(
+    websocket: WebSocket,
+    thread_id: Optional[str] = None,
+    x_api_key: Optional[str] = Header(default=None),
+    x_client_id: Optional[str] = Header(default=None),
+):
+    """
+    Hold a multi-turn conversation on one WebSocket.
+
+    Send `{"query": "..."}` per turn. The server pushes `ready`, then for each turn
+    `turn_started`, `run_status` and `tool_call` progress events, the answer as
+    `text_delta` events and `completed` with the thread_id (or `error`). Pass
+    `?thread_id=` to continue an existing conversation.
+    """
+    if not agent:
+        await websocket.close(code=1013, reason="Agent not initialized")
+        return
+    client_agent = _client_agent(x_api_key, x_client_id, LANE_INTERACTIVE)
+    await ConversationSession(client_agent, websocket, thread_id=thread_id).serve()
+
+def _batch_items(request: BatchQueryRequest) -> List[batch.BatchItem]:
+    """Validate a batch request and return its (query, thread_id) items."""
+    if not agent or not batch_jobs:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one query")
+    if len(request.queries) > batch.BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(request.queries)} queries; the limit is {batch.BATCH_MAX_QUERIES}"
+        )
+    return [(item.query, item.thread_id) for item in request.queries]
+
+@app.post("/query/batch")
+async def query_batch(
+    request: BatchQueryRequest,
+    x_api_key: Optional[str] = Header(default=None),
+    x_client_id: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    """
+    Run many queries and stream the results as NDJSON, one line per query as it finishes.
+
+    Identical queries are run once. Each result line carries the `index` of its
+    query in the request; a final `summary` line closes the stream. Queries run
+    in the batch lane of the admission scheduler.
+    """
+    items = _batch_items(request)
+    logger.info(f"Processing batch of {len(items)} queries")
+    client_agent = _client_agent(x_api_key, x_client_id, LANE_BATCH)
+    return StreamingResponse(
+        batch.stream_ndjson(client_agent, items, batch.resolve_concurrency(request.max_concurrency)),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/query/batch/jobs", response_model=BatchJobResponse, status_code=202)
+async def submit_batch_job(
+    request: BatchQueryRequest,
+    x_api_key: Optional[str] = Header(default=None),
+    x_client_id: Optional[str] = Header(default=None),
+) -> BatchJobResponse:
+    """Start a batch in the background; poll the returned status_url for results."""
+    if not batch_jobs:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+    items = _batch_items(request)
+    client_agent = _client_agent(x_api_key, x_client_id, LANE_BATCH)
+    job_id = await batch_jobs.submit(items, batch.resolve_concurrency(request.max_concurrency), agent=client_agent)
+    logger.info(f"Started batch job {job_id} with {len(items)} queries")
+    return BatchJobResponse(
+        job_id=job_id,
+        status="running",
+        total=len(items),
+        status_url=f"/query/batch/jobs/{job_id}"
+    )
+
+@app.get("/query/batch/jobs/{job_id}")
+def get_batch_job(job_id: str, offset: int = 0, limit: int = 1000):
+    """
+    Job status plus results in completion order starting at `offset`.
+
+    Pass the returned `next_offset` on the next poll to receive only new results.
+    """
+    if not batch_jobs:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+    job = batch_jobs.get(job_id, offset=max(0, offset), limit=max(1, min(limit, 1000)))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch job {job_id}")
+    return job
+
+def _current_catalog() -> CatalogSnapshot:
+    snapshot = catalog.current()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Architecture catalog not available; run the ingestion script")
+    return snapshot
+
+# Fields returned by the list endpoint; the lookup endpoint also returns the summary
+ARCHITECTURE_LIST_FIELDS = ("id", "name", "category", "azure_services", "non_azure_services", "architecture_url")
+
+def diagram_links(architecture_id: str) -> dict:
+    """/diagrams URLs of an architecture's diagram, one per size."""
+    return {variant: f"/diagrams/{architecture_id}?size={variant}" for variant in VARIANTS}
+
+@app.get("/architectures")
+def list_architectures(category: Optional[str] = None, q: Optional[str] = None, offset: int = 0, limit: int = 50):
+    """
+    List architectures from the in-memory catalog snapshot.
+
+    Optional filters: `category` (analytics or migration) and `q`, a case-insensitive
+    substring of the name.
+    """
+    snapshot = _current_catalog()
+    needle = q.lower() if q else None
+    matches = [
+        index for index in range(len(snapshot))
+        if (category is None or category in snapshot.categories(index))
+        and (needle is None or needle in snapshot.value(index, "name").lower())
+    ]
+    offset, limit = max(0, offset), max(1, min(limit, 500))
+    return {
+        "version": snapshot.version,
+        "total": len(matches),
+        "offset": offset,
+        "items": [
+            {**record, "diagrams": diagram_links(record["id"])}
+            for record in (snapshot.record(index, ARCHITECTURE_LIST_FIELDS) for index in matches[offset:offset + limit])
+        ],
+    }
+
+@app.get("/architectures/{architecture_id}")
+def get_architecture(architecture_id: str):
+    """Look up one architecture, including its summary, by id."""
+    snapshot = _current_catalog()
+    record = snapshot.get(architecture_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown architecture {architecture_id}")
+    return {"version": snapshot.version, **record, "diagrams": diagram_links(architecture_id)}
+
+@app.api_route("/diagrams/{architecture_id}", methods=["GET", "HEAD"])
+async def get_diagram(
+    architecture_id: str,
+    size: str = "full",
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    """
+    An architecture's diagram: `size` is `thumbnail` or `preview` (WebP) or `full` (the 300 DPI PNG).
+
+    Served from the local disk cache with a strong ETag and Cache-Control. A
+    matching If-None-Match returns 304; Range requests return the requested bytes.
+    """
+    if size not in VARIANTS:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(VARIANTS)}")
+    if diagrams is None:
+        raise HTTPException(status_code=503, detail="Diagram cache not initialized")
+    snapshot = _current_catalog()
+    index = snapshot.index_of(architecture_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"Unknown architecture {architecture_id}")
+    try:
+        diagram = await diagrams.get(snapshot.version, snapshot.value(index, "architecture_url"), size)
+    except DiagramNotFound:
+        raise HTTPException(status_code=404, detail=f"No {size} diagram for architecture {architecture_id}")
+    except DiagramUnavailable as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=502, detail="Diagram source unavailable")
+
+    headers = {"ETag": diagram.etag, "Cache-Control": diagrams.cache_control}
+    if etag_matches(if_none_match, diagram.etag):
+        metrics.DIAGRAM_NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=headers)
+    # Streams from the file, or hands the path to servers supporting the ASGI pathsend extension
+    return FileResponse(diagram.path, media_type=diagram.media_type, headers=headers)
+
+@app.get("/services")
+def list_services():
+    """Canonical service names in the catalog with the number of architectures using each."""
+    snapshot = _current_catalog()
+    return {"version": snapshot.version, "services": snapshot.service_index.service_counts()}
+
+@app.get("/services/architectures")
+def architectures_by_service(
+    all_of: List[str] = Query(default=[]),
+    any_of: List[str] = Query(default=[]),
+    offset: int = 0,
+    limit: int = 50,
+):
+    """
+    Architectures using every service in `all_of` and at least one in `any_of`.
+
+    Both parameters repeat (`?all_of=Event Hubs&all_of=Databricks`) and accept aliases
+    such as "ADLS Gen2" or "AKS". Names missing from the catalog are listed in
+    `unknown_services`.
+    """
+    if not all_of and not any_of:
+        raise HTTPException(status_code=400, detail="Give at least one service in all_of or any_of")
+    snapshot = _current_catalog()
+    return snapshot.find_by_services(
+        all_of, any_of, offset=max(0, offset), limit=max(1, min(limit, 500)), fields=SERVICE_LOOKUP_FIELDS
+    )
+
 @app.get("/health")
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; the status comes from the cached dependency probes."""
+    if not agent or not health:
+        status = "initializing"
+    else:
+        status = "healthy" if health.readiness()["ready"] else "degraded"
     return {
-        "status": "healthy" if agent else "initializing",
+        "status": status,
         "service": "Software Architecture Recommender API"
     }
 
+@app.get("/health/live")
+def liveness():
+    """Liveness: the worker's event loop is serving requests. Never checks dependencies."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """
+    Readiness from the cached results of the background dependency probes.
+
+    Returns 503 until the agent is initialized and while any probe (agents API,
+    search connection, credential) is failing or stale. Never calls Azure.
+    """
+    if not agent or not health:
+        return JSONResponse({"ready": False, "checks": {}, "detail": "Agent not initialized"}, status_code=503)
+    result = health.readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus metrics: request/error counts, in-flight gauge, per-stage latency and token usage."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 def root():
     """Root endpoint with API information."""
@@ -94,6 +409,15 @@ def root():
         "description": "Azure AI Agent for software architecture recommendations",
         "endpoints": {
             "query": "/query - POST - Submit architecture questions",
-            "health": "/health - GET - Service health status"
+            "conversation": "/ws/conversation - WebSocket - Multi-turn conversation with pushed progress events",
+            "batch": "/query/batch - POST - Submit many questions, results streamed as NDJSON",
+            "batch_jobs": "/query/batch/jobs - POST/GET - Run a batch in the background and poll for results",
+            "architectures": "/architectures - GET - List and look up architectures in the catalog snapshot",
+            "services": "/services/architectures - GET - Architectures that use the given services",
+            "diagrams": "/diagrams/{id}?size=thumbnail|preview|full - GET - Cached architecture diagram",
+            "health": "/health - GET - Service health status",
+            "liveness": "/health/live - GET - Liveness probe",
+            "readiness": "/health/ready - GET - Readiness from cached dependency probes",
+            "metrics": "/metrics - GET - Prometheus metrics"
         }
     }
@@ -0,0 +1,179 @@
+# Batch execution of many queries through one IntakeAgent: deduplication, bounded concurrency and async jobs
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from . import metrics
+from .shared_state import SharedStateStore
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds applied to every batch; a request may ask for less concurrency but not more
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# How long finished jobs and their results are kept for polling
+BATCH_JOB_RETENTION_SECONDS = float(os.getenv("BATCH_JOB_RETENTION_SECONDS", "3600"))
+
+# A batch item is (query, thread_id)
+BatchItem = Tuple[str, Optional[str]]
+
+
+def dedupe(items: Sequence[BatchItem]) -> Dict[BatchItem, List[int]]:
+    """
+    Group item indexes by identical query and thread_id.
+
+    Queries are compared after collapsing whitespace. Keys keep the text of the
+    first occurrence and follow first-occurrence order.
+    """
+    groups: Dict[BatchItem, List[int]] = {}
+    first_by_normalized: Dict[BatchItem, BatchItem] = {}
+    for index, (query, thread_id) in enumerate(items):
+        normalized = (" ".join(query.split()), thread_id)
+        key = first_by_normalized.setdefault(normalized, (query, thread_id))
+        groups.setdefault(key, []).append(index)
+    return groups
+
+
+def resolve_concurrency(requested: Optional[int]) -> int:
+    """Clamp a requested concurrency to [1, BATCH_MAX_CONCURRENCY]."""
+    if requested is None:
+        return BATCH_MAX_CONCURRENCY
+    return max(1, min(requested, BATCH_MAX_CONCURRENCY))
+
+
+async def run_batch(agent, items: Sequence[BatchItem], max_concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run every unique query and yield one result per input item as runs finish.
+
+    Duplicates receive the result of the first identical item, marked with
+    `duplicate_of`. Items for the same thread_id run one at a time in submission
+    order because a thread only accepts a new message once its run has finished.
+    A final `summary` record follows the results.
+    """
+    started = time.perf_counter()
+    groups = dedupe(items)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    thread_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    metrics.BATCH_ITEMS_EXECUTED.inc(len(groups))
+    metrics.BATCH_ITEMS_DEDUPLICATED.inc(len(items) - len(groups))
+
+    async def run_one(key: BatchItem) -> Tuple[BatchItem, Dict[str, Any]]:
+        query, thread_id = key
+        lock = thread_locks[thread_id] if thread_id else contextlib.nullcontext()
+        async with lock:
+            async with semaphore:
+                try:
+                    return key, await agent.query(user_query=query, thread_id=thread_id)
+                except Exception as e:
+                    logger.error(f"Batch query failed: {str(e)}")
+                    return key, {"assistant_response": f"Error: {str(e)}", "thread_id": thread_id, "status": "error"}
+
+    # Tasks start in submission order, so per-thread locks are acquired in that order too
+    tasks = [asyncio.create_task(run_one(key)) for key in groups]
+    succeeded = failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, result = await next_done
+            indexes = groups[key]
+            for index in indexes:
+                if result.get("status") == "success":
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield {
+                    "type": "result",
+                    "index": index,
+                    "query": items[index][0],
+                    "assistant_response": result.get("assistant_response"),
+                    "thread_id": result.get("thread_id"),
+                    "status": result.get("status"),
+                    "duplicate_of": indexes[0] if index != indexes[0] else None,
+                }
+    finally:
+        # The consumer went away (client disconnect, job cancelled): stop the remaining runs
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    yield {
+        "type": "summary",
+        "total": len(items),
+        "unique": len(groups),
+        "succeeded": succeeded,
+        "failed": failed,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def stream_ndjson(agent, items: Sequence[BatchItem], max_concurrency: int) -> AsyncIterator[bytes]:
+    """Encode `run_batch` records as newline-delimited JSON."""
+    async for record in run_batch(agent, items, max_concurrency):
+        yield (json.dumps(record) + "\n").encode("utf-8")
+
+
+class BatchJobManager:
+    """
+    Runs batches in the background and records their results in the shared state.
+
+    The job runs on the worker that accepted it, but results live in the shared
+    store so any worker can answer the polling requests. Writes to the store run
+    in a thread: they can wait for another worker's write lock, which must not
+    stall the event loop.
+    """
+
+    def __init__(self, agent, state: SharedStateStore):
+        self.agent = agent
+        self.state = state
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, items: Sequence[BatchItem], max_concurrency: int, agent=None) -> str:
+        """Start a job and return its id. `agent` replaces the manager's agent for this job."""
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.state.create_job, job_id, len(items), BATCH_JOB_RETENTION_SECONDS)
+        task = asyncio.create_task(self._run(job_id, list(items), max_concurrency, agent or self.agent))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        metrics.BATCH_JOBS_RUNNING.inc()
+        return job_id
+
+    async def _run(self, job_id: str, items: List[BatchItem], max_concurrency: int, agent) -> None:
+        seq = 0
+        try:
+            async for record in run_batch(agent, items, max_concurrency):
+                if record["type"] == "summary":
+                    await asyncio.to_thread(self.state.finish_job, job_id, "completed", summary=json.dumps(record))
+                else:
+                    await asyncio.to_thread(self.state.add_job_result, job_id, seq, json.dumps(record))
+                    seq += 1
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self.state.finish_job, job_id, "cancelled",
+                                    error="Job was interrupted before it finished")
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job_id} failed: {str(e)}")
+            await asyncio.to_thread(self.state.finish_job, job_id, "failed", error=str(e))
+        finally:
+            metrics.BATCH_JOBS_RUNNING.dec()
+
+    def get(self, job_id: str, offset: int = 0, limit: int = 1000) -> Optional[Dict[str, Any]]:
+        """Return the job status and the results stored from `offset` on, or None if unknown."""
+        job = self.state.get_job(job_id)
+        if job is None:
+            return None
+        job["summary"] = json.loads(job["summary"]) if job["summary"] else None
+        job["results"] = [json.loads(result) for result in self.state.job_results(job_id, offset, limit)]
+        job["next_offset"] = offset + len(job["results"])
+        return job
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs; they are recorded as cancelled."""
+        tasks: Set[asyncio.Task] = set(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
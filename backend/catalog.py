@@ -0,0 +1,259 @@
+# Versioned architecture catalog snapshot: written by the ingestion script, memory-mapped by the API
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .service_index import ServiceIndex
+
+logger = logging.getLogger(__name__)
+
+# File layout (little endian):
+#   header      struct HEADER: magic, format version, record count, embedding dim, field count,
+#               then offset/length of the metadata JSON, and offsets of the string table,
+#               the string heap and the embedding matrix
+#   metadata    JSON: snapshot version, creation time, field names and the service index
+#   strings     record count x field count pairs of uint32 (offset, length) into the heap
+#   heap        UTF-8 field values; list fields are JSON arrays
+#   embeddings  record count x dim float32, 16-byte aligned
+# Nothing is decoded at load time except the metadata and the ids; every other value is read
+# straight from the mapping when it is accessed.
+MAGIC = b"ARCHCAT\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQQQQ")
+FIELDS = ("id", "name", "category", "azure_services", "non_azure_services", "summary", "architecture_url", "source",
+          "categories")
+LIST_FIELDS = frozenset({"azure_services", "non_azure_services", "categories"})
+# Fields of each architecture returned by the service lookup (the /services endpoints and the agent's tool)
+SERVICE_LOOKUP_FIELDS = ("id", "name", "category", "architecture_url")
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent.parent / "data" / "architecture_catalog.bin"
+
+
+def split_services(services: Any) -> List[str]:
+    """Turn the extracted "A, B; C" service strings into a list; lists pass through."""
+    if isinstance(services, (list, tuple)):
+        return [str(service).strip() for service in services if str(service).strip()]
+    return [part.strip() for part in str(services or "").replace(";", ",").split(",") if part.strip()]
+
+
+def _align(offset: int, alignment: int = 16) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_catalog(
+    path: Path,
+    records: Sequence[Dict[str, Any]],
+    embeddings: Sequence[Sequence[float]],
+    metadata: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Write a snapshot atomically and return its version.
+
+    The version is a hash of the records and embeddings, so writing the same
+    contents again keeps the version and readers do not reload. Ingestion gives
+    documents ids derived from their source, but the embeddings of a new run may
+    differ slightly, so a re-run usually produces a new version. `metadata` holds
+    extra JSON sections such as the service index.
+    """
+    if len(records) != len(embeddings):
+        raise ValueError("Every record needs an embedding")
+    dim = len(embeddings[0]) if embeddings else 0
+
+    heap = bytearray()
+    table: List[int] = []
+    for record in records:
+        for name in FIELDS:
+            value = record.get(name, [] if name in LIST_FIELDS else "")
+            encoded = (json.dumps(list(value)) if name in LIST_FIELDS else str(value)).encode("utf-8")
+            table.extend((len(heap), len(encoded)))
+            heap.extend(encoded)
+    vectors = bytearray()
+    for embedding in embeddings:
+        if len(embedding) != dim:
+            raise ValueError("All embeddings must have the same dimension")
+        vectors.extend(struct.pack(f"<{dim}f", *embedding))
+    strings = struct.pack(f"<{len(table)}I", *table)
+    version = hashlib.sha256(bytes(heap) + bytes(vectors)).hexdigest()[:16]
+    metadata = json.dumps(
+        {**(metadata or {}), "version": version, "created_at": time.time(), "fields": list(FIELDS)}
+    ).encode("utf-8")
+
+    meta_offset = HEADER.size
+    strings_offset = _align(meta_offset + len(metadata))
+    heap_offset = _align(strings_offset + len(strings))
+    embeddings_offset = _align(heap_offset + len(heap))
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(records), dim, len(FIELDS),
+        meta_offset, len(metadata), strings_offset, heap_offset, embeddings_offset,
+    )
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for offset, chunk in (
+            (0, header), (meta_offset, metadata), (strings_offset, strings),
+            (heap_offset, bytes(heap)), (embeddings_offset, bytes(vectors)),
+        ):
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(chunk)
+    # Readers holding the old file keep their mapping; new readers see the complete new file
+    os.replace(tmp_path, path)
+    return version
+
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped view of one catalog file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        (magic, format_version, self.count, self.dim, field_count,
+         meta_offset, meta_len, strings_offset, heap_offset, embeddings_offset) = HEADER.unpack_from(buffer)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} architecture catalog")
+        metadata = json.loads(bytes(buffer[meta_offset:meta_offset + meta_len]))
+        self.metadata: Dict[str, Any] = metadata
+        self.version: str = metadata["version"]
+        self.created_at: float = metadata["created_at"]
+        self.fields: List[str] = metadata["fields"]
+        self._field_index = {name: index for index, name in enumerate(self.fields)}
+        self._strings = buffer[strings_offset:strings_offset + self.count * field_count * 8].cast("I")
+        self._heap = buffer[heap_offset:embeddings_offset]
+        # Zero-copy float32 matrix, one row per record
+        self._embeddings = buffer[embeddings_offset:embeddings_offset + self.count * self.dim * 4].cast("f")
+        self._by_id = {self.value(index, "id"): index for index in range(self.count)}
+        self._service_index: Optional[ServiceIndex] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def value(self, index: int, name: str) -> Any:
+        """Decode one field of one record."""
+        slot = (index * len(self.fields) + self._field_index[name]) * 2
+        offset, length = self._strings[slot], self._strings[slot + 1]
+        text = str(self._heap[offset:offset + length], "utf-8")
+        return json.loads(text) if name in LIST_FIELDS else text
+
+    def record(self, index: int, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        return {name: self.value(index, name) for name in (fields or self.fields)}
+
+    def categories(self, index: int) -> List[str]:
+        """Catalogs of a record and its merged duplicates; `category` alone for older snapshots."""
+        categories = self.value(index, "categories") if "categories" in self._field_index else []
+        if not categories:
+            category = self.value(index, "category")
+            categories = [category] if category else []
+        return categories
+
+    def index_of(self, architecture_id: str) -> Optional[int]:
+        return self._by_id.get(architecture_id)
+
+    def get(self, architecture_id: str) -> Optional[Dict[str, Any]]:
+        index = self._by_id.get(architecture_id)
+        return None if index is None else self.record(index)
+
+    def embedding(self, index: int) -> memoryview:
+        """The record's embedding as a float32 memoryview into the mapping (no copy)."""
+        return self._embeddings[index * self.dim:(index + 1) * self.dim]
+
+    def embedding_matrix(self):
+        """All embeddings as a (count, dim) numpy array sharing the mapping's memory."""
+        import numpy as np
+        return np.frombuffer(self._embeddings, dtype=np.float32).reshape(self.count, self.dim)
+
+    @property
+    def service_index(self) -> ServiceIndex:
+        """Service -> architectures index stored by ingestion, or built from the records for older snapshots."""
+        if self._service_index is None:
+            if "service_index" in self.metadata:
+                self._service_index = ServiceIndex.from_dict(self.metadata["service_index"])
+            else:
+                self._service_index = ServiceIndex.build(
+                    (self.value(index, "id"), self.value(index, "azure_services") + self.value(index, "non_azure_services"))
+                    for index in range(self.count)
+                )
+        return self._service_index
+
+    def find_by_services(
+        self,
+        all_of: Sequence[str] = (),
+        any_of: Sequence[str] = (),
+        offset: int = 0,
+        limit: int = 50,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """Service index query with one page of matching records instead of bare ids."""
+        result = self.service_index.query(all_of, any_of, offset=offset, limit=limit)
+        ids = result.pop("architecture_ids")
+        items = [self.record(index, fields) for index in map(self.index_of, ids) if index is not None]
+        return {"version": self.version, **result, "offset": offset, "items": items}
+
+    def iter_records(self, fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        for index in range(self.count):
+            yield self.record(index, fields)
+
+
+class CatalogStore:
+    """
+    Holds the current snapshot and swaps in a new one when the file changes.
+
+    The file is checked with a stat() call at most every `reload_interval` seconds
+    on access; a replaced file is only loaded when its version differs. Old
+    snapshots stay valid for requests that are still using them. A file that
+    cannot be loaded is logged once and skipped until it changes again, and the
+    previous snapshot keeps being served.
+    """
+
+    def __init__(self, path: Path, reload_interval: float = 5.0):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._file_key: Optional[tuple] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CatalogStore":
+        """Create the store configured by ARCHITECTURE_CATALOG_PATH and CATALOG_RELOAD_INTERVAL_SECONDS."""
+        return cls(
+            Path(os.getenv("ARCHITECTURE_CATALOG_PATH") or DEFAULT_CATALOG_PATH),
+            reload_interval=float(os.getenv("CATALOG_RELOAD_INTERVAL_SECONDS", "5")),
+        )
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """Return the latest snapshot, or None if no catalog has been written yet."""
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._snapshot
+
+    def reload(self) -> bool:
+        """Load the file if it changed since the last check; returns True when a new version was loaded."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return False
+            file_key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if file_key == self._file_key:
+                return False
+            self._file_key = file_key
+            try:
+                snapshot = CatalogSnapshot(self.path)
+            except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+                logger.error(f"Could not load architecture catalog {self.path}: {e}")
+                return False
+            if self._snapshot is not None and snapshot.version == self._snapshot.version:
+                return False
+            self._snapshot = snapshot
+            return True
@@ -0,0 +1,201 @@
+# WebSocket conversations: many turns on one socket, with run progress pushed through a bounded per-connection queue
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Events waiting to be written to one client. A full queue means the client reads too slowly.
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+# Turns a client may send ahead while a run is active; more are answered with a "busy" error
+WS_MAX_PENDING_TURNS = int(os.getenv("WS_MAX_PENDING_TURNS", "2"))
+# How long an answer or terminal event may wait for queue space before the connection is closed
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# Answers are pushed as text_delta events of about this many characters
+WS_TEXT_CHUNK_CHARS = int(os.getenv("WS_TEXT_CHUNK_CHARS", "256"))
+
+# Close codes: the client did not read its events / the server failed
+CLOSE_SLOW_CONSUMER = 1008
+CLOSE_INTERNAL_ERROR = 1011
+
+
+class SlowConsumerError(Exception):
+    """Raised when an event cannot be queued for a client within the send timeout."""
+
+
+def text_chunks(text: str, size: int) -> List[str]:
+    """Split `text` at spaces into pieces of at most about `size` characters; joined they give back `text`."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            space = text.rfind(" ", start + 1, end)
+            if space > start:
+                end = space + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+class ConversationSession:
+    """
+    One client's conversation over a WebSocket, bound to one agent thread.
+
+    The client sends `{"query": "..."}` messages. Turns run one at a time in
+    order; each is answered with `turn_started`, a `run_status` event per status
+    change, a `tool_call` event per function call, the answer as `text_delta`
+    events and `completed` (or `error`). Every event goes through the outbox,
+    a bounded queue drained by a sender task: progress events (run status and
+    tool calls) are dropped when it is full, all others wait for space and the
+    connection is closed when a client stops reading for the send timeout.
+    """
+
+    def __init__(
+        self,
+        agent,
+        websocket: WebSocket,
+        thread_id: Optional[str] = None,
+        queue_size: int = WS_SEND_QUEUE_SIZE,
+        max_pending_turns: int = WS_MAX_PENDING_TURNS,
+        send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+        text_chunk_chars: int = WS_TEXT_CHUNK_CHARS,
+    ):
+        self.agent = agent
+        self.websocket = websocket
+        self.thread_id = thread_id
+        self.send_timeout = send_timeout
+        self.text_chunk_chars = text_chunk_chars
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.turns: asyncio.Queue = asyncio.Queue(maxsize=max_pending_turns)
+        self.turn_count = 0
+        # Set once the client is gone; the turn in progress finishes without sending events
+        self.closed = False
+        self._in_turn = False
+
+    async def serve(self) -> None:
+        """Accept the connection and run it until the client disconnects or is closed."""
+        await self.websocket.accept()
+        metrics.WS_CONNECTIONS.inc()
+        receiver = asyncio.create_task(self._receive_loop())
+        sender = asyncio.create_task(self._send_loop())
+        worker = asyncio.create_task(self._turn_loop())
+        try:
+            await self._push({"type": "ready", "thread_id": self.thread_id})
+            done, _ = await asyncio.wait({receiver, sender, worker}, return_when=asyncio.FIRST_COMPLETED)
+            error = next((task.exception() for task in done if not task.cancelled() and task.exception()), None)
+            self.closed = True
+            if isinstance(error, SlowConsumerError):
+                metrics.WS_SLOW_CONSUMER_CLOSES.inc()
+                await self._close(CLOSE_SLOW_CONSUMER, "Client is not reading events")
+            elif error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.error(f"Conversation socket failed: {str(error)}")
+                await self._close(CLOSE_INTERNAL_ERROR, "Internal error")
+        finally:
+            self.closed = True
+            receiver.cancel()
+            sender.cancel()
+            # A run in progress is left to finish so the thread accepts the next message
+            # when the client reconnects with its thread_id; turns still queued are dropped
+            if not self._in_turn:
+                worker.cancel()
+            while not self.outbox.empty():
+                self.outbox.get_nowait()
+            try:
+                await asyncio.wait({receiver, sender, worker})
+            finally:
+                metrics.WS_CONNECTIONS.dec()
+
+    async def _receive_loop(self) -> None:
+        while True:
+            message = await self.websocket.receive_text()
+            try:
+                query = json.loads(message)["query"]
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError("empty query")
+            except (ValueError, KeyError, TypeError):
+                await self._push({"type": "error", "status": "invalid", "detail": 'Send turns as {"query": "..."}'})
+                continue
+            try:
+                self.turns.put_nowait(query)
+            except asyncio.QueueFull:
+                metrics.WS_TURNS.labels(status="busy").inc()
+                await self._push({
+                    "type": "error",
+                    "status": "busy",
+                    "detail": f"{self.turns.maxsize} turns are already waiting; send the next one after completed",
+                })
+
+    async def _send_loop(self) -> None:
+        while True:
+            event = await self.outbox.get()
+            await self.websocket.send_json(event)
+            metrics.WS_EVENTS.labels(type=event["type"]).inc()
+
+    async def _turn_loop(self) -> None:
+        while not self.closed:
+            query = await self.turns.get()
+            self._in_turn = True
+            try:
+                await self._run_turn(query)
+            finally:
+                self._in_turn = False
+
+    async def _run_turn(self, query: str) -> None:
+        self.turn_count += 1
+        await self._push({"type": "turn_started", "turn": self.turn_count})
+        result = await self.agent.query(query, thread_id=self.thread_id, on_event=self._push_progress)
+        metrics.WS_TURNS.labels(status=result["status"]).inc()
+        self.thread_id = result.get("thread_id") or self.thread_id
+        if result["status"] != "success":
+            event = {
+                "type": "error",
+                "status": result["status"],
+                "detail": result["assistant_response"],
+                "thread_id": self.thread_id,
+            }
+            if "retry_after" in result:
+                event["retry_after"] = result["retry_after"]
+            await self._push(event)
+            return
+        for chunk in text_chunks(result["assistant_response"], self.text_chunk_chars):
+            await self._push({"type": "text_delta", "delta": chunk})
+        await self._push({"type": "completed", "turn": self.turn_count, "thread_id": self.thread_id})
+
+    async def _push_progress(self, event: Dict[str, Any]) -> None:
+        """
+        Progress callback of the agent; never waits for the client and never raises.
+
+        It runs inside the agent's run loop, between executing function calls and
+        submitting their outputs. Raising there would leave the run waiting for
+        outputs and the thread locked, so a slow client loses progress events and
+        is closed by the next answer event instead.
+        """
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(event)
+        except asyncio.QueueFull:
+            metrics.WS_EVENTS_DROPPED.labels(type=event["type"]).inc()
+
+    async def _push(self, event: Dict[str, Any]) -> None:
+        """Queue an event, waiting up to the send timeout for the client to make room."""
+        if self.closed:
+            return
+        try:
+            await asyncio.wait_for(self.outbox.put(event), self.send_timeout)
+        except asyncio.TimeoutError:
+            raise SlowConsumerError(f"Event queue full for {self.send_timeout:.0f}s") from None
+
+    async def _close(self, code: int, reason: str) -> None:
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            # The transport may already be gone
+            pass
@@ -0,0 +1,247 @@
+# Architecture diagram delivery: WebP size variants, a size-capped LRU disk cache and conditional/range responses
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from . import metrics
+
+# Sizes written next to the full PNG by the ingestion script: variant -> maximum width in pixels.
+# "full" is the 300 DPI figure itself.
+VARIANT_WIDTHS = {"thumbnail": 320, "preview": 1024}
+VARIANTS = (*VARIANT_WIDTHS, "full")
+WEBP_QUALITY = 80
+
+MEDIA_TYPES = {".png": "image/png", ".webp": "image/webp"}
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "diagram_cache"
+DEFAULT_SOURCE_DIR = Path(__file__).resolve().parent.parent / "data" / "figures"
+
+
+class DiagramNotFound(Exception):
+    """The architecture has no diagram, or the requested variant does not exist at the source."""
+
+
+class DiagramUnavailable(Exception):
+    """The diagram source failed or timed out."""
+
+
+def variant_name(figure_name: str, variant: str) -> str:
+    """Blob/file name of a variant: "x_001.png" -> "x_001.thumbnail.webp"; "full" is the PNG itself."""
+    if variant == "full":
+        return figure_name
+    if variant not in VARIANT_WIDTHS:
+        raise ValueError(f"Unknown diagram variant {variant!r}; expected one of {', '.join(VARIANTS)}")
+    return f"{Path(figure_name).stem}.{variant}.webp"
+
+
+def variant_url(architecture_url: str, variant: str) -> str:
+    """URL of a variant stored next to the full image at `architecture_url`."""
+    parts = urlsplit(architecture_url)
+    directory, _, figure_name = parts.path.rpartition("/")
+    return urlunsplit(parts._replace(path=f"{directory}/{variant_name(figure_name, variant)}", query=""))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header lists `etag` (weak comparison, as RFC 9110 requires for it) or is *."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+@dataclass
+class CachedDiagram:
+    path: Path
+    size: int
+    etag: str
+    media_type: str
+
+
+Fetcher = Callable[[str], Awaitable[Optional[bytes]]]
+
+
+class DiagramCache:
+    """
+    Diagram bytes on local disk, evicted least recently used past `max_bytes`.
+
+    Entries are keyed by catalog version and variant URL, and the file name
+    carries a strong ETag (a hash of the bytes), so the index is rebuilt from the
+    directory after a restart. Files are written to a temporary name and renamed,
+    so workers sharing the directory never serve a partial file; each worker keeps
+    its own LRU order, and an entry another worker evicted is fetched again.
+    Concurrent misses for the same entry share one fetch.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, fetch: Fetcher):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: "OrderedDict[str, CachedDiagram]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.bytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        files = []
+        for path in self.directory.iterdir():
+            if path.name.endswith(".tmp"):
+                # Left over from a worker that stopped mid-write
+                path.unlink(missing_ok=True)
+                continue
+            key, _, rest = path.name.partition("-")
+            etag, _, suffix = rest.partition(".")
+            if path.is_file() and suffix:
+                stat = path.stat()
+                media_type = MEDIA_TYPES.get(f".{suffix}", "application/octet-stream")
+                files.append((stat.st_mtime, key, CachedDiagram(path, stat.st_size, f'"{etag}"', media_type)))
+        for _, key, entry in sorted(files, key=lambda item: item[0]):
+            self._entries[key] = entry
+            self.bytes += entry.size
+        self._evict()
+
+    @staticmethod
+    def key(version: str, url: str) -> str:
+        return hashlib.sha256(f"{version}:{url}".encode("utf-8")).hexdigest()[:32]
+
+    async def get(self, version: str, url: str) -> CachedDiagram:
+        """The cached diagram at `url`, fetched on a miss; raises DiagramNotFound or DiagramUnavailable."""
+        key = self.key(version, url)
+        entry = self._entries.get(key)
+        if entry is not None and entry.path.exists():
+            self._entries.move_to_end(key)
+            metrics.DIAGRAM_CACHE.labels(result="hit").inc()
+            return entry
+        if entry is not None:
+            self._forget(key)
+
+        task = self._inflight.get(key)
+        if task is None:
+            # The fetch runs as its own task, so it fills the cache even if the first client disconnects
+            task = self._inflight[key] = asyncio.ensure_future(self._fill(key, url))
+            task.add_done_callback(lambda done: self._fetched(key, done))
+        else:
+            metrics.DIAGRAM_CACHE.labels(result="shared").inc()
+        return await asyncio.shield(task)
+
+    def _fetched(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Retrieved here so a failure whose clients all disconnected is not logged as unhandled
+            task.exception()
+
+    async def _fill(self, key: str, url: str) -> CachedDiagram:
+        metrics.DIAGRAM_CACHE.labels(result="miss").inc()
+        started = time.perf_counter()
+        data = await self.fetch(url)
+        metrics.DIAGRAM_FETCH_DURATION.observe(time.perf_counter() - started)
+        if data is None:
+            raise DiagramNotFound(url)
+        suffix = Path(urlsplit(url).path).suffix
+        entry = await asyncio.to_thread(self._write, key, data, suffix)
+        self._entries[key] = entry
+        self.bytes += entry.size
+        self._evict(keep=key)
+        return entry
+
+    def _write(self, key: str, data: bytes, suffix: str) -> CachedDiagram:
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        path = self.directory / f"{key}-{etag}{suffix}"
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        return CachedDiagram(path, len(data), f'"{etag}"', MEDIA_TYPES.get(suffix, "application/octet-stream"))
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while self.bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                # A single diagram larger than the cap is still served once
+                break
+            entry = self._forget(key)
+            entry.path.unlink(missing_ok=True)
+            metrics.DIAGRAM_CACHE_EVICTIONS.inc()
+        metrics.DIAGRAM_CACHE_BYTES.set(self.bytes)
+
+    def _forget(self, key: str) -> CachedDiagram:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        return entry
+
+
+class DiagramStore:
+    """
+    Resolves an architecture's diagram variant through the disk cache.
+
+    A miss reads the variant from `source_dir` when ingestion ran on this host,
+    else downloads it from blob storage with the optional SAS token, so the
+    container does not need to be publicly readable.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = 256 * 1024 * 1024,
+        source_dir: Optional[Path] = DEFAULT_SOURCE_DIR,
+        sas_token: Optional[str] = None,
+        fetch_timeout: float = 10.0,
+        max_age: int = 86400,
+    ):
+        self.source_dir = Path(source_dir) if source_dir else None
+        self.sas_token = (sas_token or "").lstrip("?")
+        self.fetch_timeout = fetch_timeout
+        self.max_age = max_age
+        self.cache = DiagramCache(cache_dir, max_bytes, self._fetch)
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_env(cls) -> "DiagramStore":
+        """Create the store configured by the DIAGRAM_* environment variables."""
+        return cls(
+            cache_dir=Path(os.getenv("DIAGRAM_CACHE_DIR") or DEFAULT_CACHE_DIR),
+            max_bytes=int(os.getenv("DIAGRAM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+            source_dir=Path(os.getenv("DIAGRAM_SOURCE_DIR") or DEFAULT_SOURCE_DIR),
+            sas_token=os.getenv("DIAGRAM_BLOB_SAS_TOKEN"),
+            fetch_timeout=float(os.getenv("DIAGRAM_FETCH_TIMEOUT_SECONDS", "10")),
+            max_age=int(os.getenv("DIAGRAM_MAX_AGE_SECONDS", "86400")),
+        )
+
+    @property
+    def cache_control(self) -> str:
+        return f"public, max-age={self.max_age}"
+
+    async def get(self, version: str, architecture_url: str, variant: str) -> CachedDiagram:
+        if not architecture_url:
+            raise DiagramNotFound("The architecture has no diagram")
+        return await self.cache.get(version, variant_url(architecture_url, variant))
+
+    async def _fetch(self, url: str) -> Optional[bytes]:
+        name = urlsplit(url).path.rpartition("/")[2]
+        if self.source_dir is not None:
+            local_path = self.source_dir / name
+            if local_path.is_file():
+                return await asyncio.to_thread(local_path.read_bytes)
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=self.fetch_timeout)
+        try:
+            response = await self._http.get(f"{url}?{self.sas_token}" if self.sas_token else url)
+        except httpx.HTTPError as e:
+            raise DiagramUnavailable(f"Fetching {name} failed: {e}") from e
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise DiagramUnavailable(f"Fetching {name} returned HTTP {response.status_code}")
+        return response.content
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
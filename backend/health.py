@@ -0,0 +1,148 @@
+# Background dependency probes behind the readiness endpoint; requests only read cached results
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Token scope of the Azure AI Foundry agents API
+AGENTS_TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of the latest run of one probe."""
+
+    ok: bool
+    detail: str
+    checked_at: float
+    latency_seconds: float
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "detail": self.detail,
+            "age_seconds": round(now - self.checked_at, 3),
+            "latency_ms": round(self.latency_seconds * 1000, 1),
+        }
+
+
+class HealthProber:
+    """
+    Probes the agent's Azure dependencies on a timer and caches the results.
+
+    Each probe is a blocking call run on the agent's SDK thread pool with a
+    timeout. Results older than `ttl` count as failed, so a prober that stopped
+    making progress also takes the worker out of rotation. Readers never call
+    Azure; `readiness()` only looks at the cache.
+    """
+
+    DEPENDENCIES = ("agents_api", "search_connection", "credential")
+
+    def __init__(self, agent, interval: float = 15.0, timeout: float = 5.0, ttl: float = 45.0):
+        self.agent = agent
+        self.interval = interval
+        self.timeout = timeout
+        self.ttl = ttl
+        self.results: Dict[str, ProbeResult] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, agent) -> "HealthProber":
+        """Create the prober configured by the HEALTH_PROBE_* environment variables."""
+        return cls(
+            agent,
+            interval=float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "15")),
+            timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5")),
+            ttl=float(os.getenv("HEALTH_PROBE_TTL_SECONDS", "45")),
+        )
+
+    def probes(self) -> Dict[str, Callable[[], str]]:
+        """Blocking checks by dependency name; each returns a detail string or raises."""
+        agent = self.agent
+
+        def agents_api() -> str:
+            agent.client.agents.get_agent(agent.agent_id)
+            return f"agent {agent.agent_id} reachable"
+
+        def search_connection() -> str:
+            if not agent.search_connection_id:
+                return "not configured"
+            if not any(connection.id == agent.search_connection_id for connection in agent.client.connections.list()):
+                raise RuntimeError(f"connection {agent.search_connection_id} not found")
+            return "connection found"
+
+        def credential() -> str:
+            if agent.credential is None:
+                return "client provided without a credential"
+            token = agent.credential.get_token(AGENTS_TOKEN_SCOPE)
+            remaining = token.expires_on - time.time()
+            if remaining <= 0:
+                raise RuntimeError("token expired")
+            return f"token valid for {remaining:.0f}s"
+
+        return {"agents_api": agents_api, "search_connection": search_connection, "credential": credential}
+
+    async def probe_once(self) -> None:
+        """Run every probe concurrently and store the results."""
+        probes = self.probes()
+        outcomes = await asyncio.gather(*(self._run_probe(probe) for probe in probes.values()))
+        for name, result in zip(probes, outcomes):
+            if not result.ok and (name not in self.results or self.results[name].ok):
+                logger.warning(f"Dependency {name} is unhealthy: {result.detail}")
+            self.results[name] = result
+            metrics.DEPENDENCY_UP.labels(dependency=name).set(1 if result.ok else 0)
+
+    async def _run_probe(self, probe: Callable[[], str]) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            # Probes bypass the circuit breaker so readiness reflects the service itself
+            detail = await asyncio.wait_for(self.agent._call_unguarded(probe), timeout=self.timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            detail, ok = f"timed out after {self.timeout:.0f}s", False
+        except Exception as e:
+            detail, ok = f"{type(e).__name__}: {e}", False
+        return ProbeResult(ok=ok, detail=detail, checked_at=time.time(), latency_seconds=time.perf_counter() - started)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.probe_once()
+            except Exception as e:
+                logger.error(f"Health probes failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def readiness(self) -> Dict[str, Any]:
+        """Cached readiness: ready only when every probe has a fresh, successful result."""
+        now = time.time()
+        checks = {}
+        ready = bool(self.results)
+        for name in self.DEPENDENCIES:
+            result = self.results.get(name)
+            if result is None:
+                checks[name] = {"ok": False, "detail": "not probed yet"}
+                ready = False
+                continue
+            checks[name] = result.as_dict(now)
+            if now - result.checked_at > self.ttl:
+                checks[name].update(ok=False, detail=f"stale: {checks[name]['detail']}")
+            ready = ready and checks[name]["ok"]
+        return {"ready": ready, "checks": checks}
@@ -2,18 +2,31 @@
 
 # Azure AI Agent for software architecture recommendations using Azure AI Projects SDK
 import os
+import time
 import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
 from dotenv import load_dotenv
-from azure.ai.agents.models import AzureAISearchTool
+from azure.ai.agents.models import AzureAISearchTool, FunctionTool, ToolOutput
 from azure.ai.projects import AIProjectClient #, ConnectionType
 from azure.ai.projects.models import ConnectionType
 from azure.identity import DefaultAzureCredential
 from azure.core.exceptions import ResourceNotFoundError
 
+from . import metrics
+from .catalog import SERVICE_LOOKUP_FIELDS, CatalogStore
+from .model_router import ModelRouter, Route, requirement_dimensions
+from .requirements_parser import Requirements, parse_requirements
+from .resilience import CircuitBreaker, CircuitOpenError, hedged, retry
+from .shared_state import SharedStateStore
+from .thread_prewarm import ThreadPrewarmer
+
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
@@ -22,28 +35,124 @@ load_dotenv(env_path)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Run statuses that mean the run is still being processed by the service
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "cancelling")
+
+# Prompt of the run that condenses a long conversation before it moves to a fresh thread
+COMPACTION_PROMPT = """Summarize the conversation below as a compact requirements record for a software architecture recommendation.
+Use short bullet points under these headings: Workload, Scale and performance, Data stores, Constraints,
+Recommendations so far, Open questions. Keep every concrete number, service name and decision. Do not add new advice.
+
+Conversation:
+{transcript}"""
+
+# First message of a compacted thread, followed by the summary
+COMPACTION_SUMMARY_HEADER = "Summary of the earlier conversation (requirements record):\n"
+
+# Receives progress events of a query (run status changes and function calls) as they happen
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class RunTimeoutError(TimeoutError):
+    """Raised when an agent run does not finish before the per-request deadline."""
+
+class RunFailedError(RuntimeError):
+    """Raised when an agent run ends in a status other than completed."""
+
 class IntakeAgent:
     """Azure AI Agent for recommending software architectures based on user requirements."""
     
-    def __init__(self):
-        self.client: Optional[AIProjectClient] = None
+    def __init__(
+        self,
+        client: Optional[AIProjectClient] = None,
+        state: Optional[SharedStateStore] = None,
+        catalog: Optional[CatalogStore] = None,
+    ):
+        # An existing client (e.g. the local fake agents service used by the benchmarks) can be injected
+        self.client: Optional[AIProjectClient] = client
+        # Credential of the client created here; None when a client is injected
+        self.credential: Optional[DefaultAzureCredential] = None
         self.agent_id: Optional[str] = None
-        self.threads: Dict[str, str] = {}  # thread_id -> thread_id mapping
+        # Agent id, thread registry (client thread_id -> Azure thread id) and response cache.
+        # Shared between worker processes when SHARED_STATE_PATH points at a file.
+        self.state = state or SharedStateStore()
+        self._agent_key: Optional[str] = None
         self._initialized = False
+        # Architecture catalog snapshot; when given, the agent can look up architectures by service
+        self.catalog = catalog
+        self.service_lookup_tool = os.getenv("SERVICE_LOOKUP_TOOL", "true").lower() in ("1", "true", "yes")
+        self.service_lookup_max_results = int(os.getenv("SERVICE_LOOKUP_MAX_RESULTS", "10"))
+        self._functions: Optional[FunctionTool] = None
         
         # Azure configuration from environment
         self.azure_openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         self.project_connection_string = os.getenv("AZURE_AI_PROJECT_CONNECTION_STRING")
         self.model_deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
         self.search_index_name = os.getenv("AZURE_AI_SEARCH_INDEX_NAME", "software-architecture-index")
+        self._search_connection_id: Optional[str] = None
+        # Parse each question locally and restrict search to the matching pattern catalog. Results
+        # within one catalog are more relevant, so fewer of them are put into the prompt.
+        self.requirements_prefilter = os.getenv("REQUIREMENTS_PREFILTER", "true").lower() in ("1", "true", "yes")
+        self.filtered_search_top_k = int(os.getenv("REQUIREMENTS_FILTERED_TOP_K", "3"))
+        # Clarifying turns go to a smaller deployment without search when MODEL_ROUTING is on
+        self.router: Optional[ModelRouter] = ModelRouter.from_env()
+        # First-turn answers are reused for identical questions for this many seconds (0 disables)
+        self.response_cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "0"))
+        # Per-conversation state (remembered category and requirements, compaction backoff) is
+        # dropped after a conversation has been idle this long
+        self.thread_state_ttl = float(os.getenv("THREAD_STATE_TTL_SECONDS", "86400"))
+
+        # Run polling: a few fast polls catch short answers, then the interval backs off
+        # exponentially. Runs still active after the timeout are cancelled.
+        self.run_poll_initial_interval = float(os.getenv("RUN_POLL_INITIAL_INTERVAL_SECONDS", "0.1"))
+        self.run_poll_fast_polls = int(os.getenv("RUN_POLL_FAST_POLLS", "5"))
+        self.run_poll_backoff = float(os.getenv("RUN_POLL_BACKOFF", "1.25"))
+        self.run_poll_max_interval = float(os.getenv("RUN_POLL_MAX_INTERVAL_SECONDS", "1.0"))
+        self.run_timeout = float(os.getenv("RUN_TIMEOUT_SECONDS", "120"))
+
+        # Compaction: once a thread passes either budget (0 disables it), its turns are summarized
+        # into a fresh thread and the client's thread_id is pointed at that thread
+        self.compaction_max_turns = int(os.getenv("COMPACTION_MAX_TURNS", "20"))
+        self.compaction_max_prompt_tokens = int(os.getenv("COMPACTION_MAX_PROMPT_TOKENS", "16000"))
+        self.compaction_summary_max_tokens = int(os.getenv("COMPACTION_SUMMARY_MAX_TOKENS", "800"))
+        # A thread whose compaction failed or was skipped is not compacted again for this many turns
+        self.compaction_retry_turns = int(os.getenv("COMPACTION_RETRY_TURNS", "5"))
+        # Compactions running in the background, by client thread_id
+        self._compactions: Dict[str, asyncio.Task] = {}
+
+        # The SDK is synchronous; its calls run on this pool instead of blocking the event loop.
+        # The default asyncio executor is sized for CPU work (cpu_count + 4 threads), too small
+        # for many concurrent network-bound runs.
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("AGENT_SDK_MAX_THREADS", "64")), thread_name_prefix="agents-sdk"
+        )
+
+        # Resilience: SDK calls fail fast while the agents service keeps failing, idempotent
+        # calls are retried with jittered backoff and a slow message-list read can be hedged
+        self.breaker = CircuitBreaker(
+            "agents_api",
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+        )
+        self.retry_attempts = int(os.getenv("SDK_RETRY_ATTEMPTS", "3"))
+        self.retry_base_delay = float(os.getenv("SDK_RETRY_BASE_DELAY_SECONDS", "0.2"))
+        self.retry_max_delay = float(os.getenv("SDK_RETRY_MAX_DELAY_SECONDS", "2.0"))
+        self.message_list_hedge_delay = float(os.getenv("MESSAGE_LIST_HEDGE_SECONDS", "0"))
+
+        # Empty threads created in the background for new conversations (THREAD_POOL_SIZE > 0)
+        self.prewarmer: Optional[ThreadPrewarmer] = None
         
-        if not self.project_connection_string:
+        if not self.project_connection_string and client is None:
             raise ValueError("AZURE_AI_PROJECT_CONNECTION_STRING is required in environment variables")
 
     @classmethod
-    async def create(cls) -> "IntakeAgent":
+    async def create(
+        cls,
+        client: Optional[AIProjectClient] = None,
+        state: Optional[SharedStateStore] = None,
+        catalog: Optional[CatalogStore] = None,
+    ) -> "IntakeAgent":
         """Factory method to create and initialize an IntakeAgent instance."""
-        instance = cls()
+        instance = cls(client=client, state=state, catalog=catalog)
         await instance._async_init()
         return instance
     
@@ -53,47 +162,116 @@ class IntakeAgent:
             logger.info("Initializing Azure AI Agent...")
             
             # Create Azure AI Project client with managed identity
-            credential = DefaultAzureCredential()
-            self.client = AIProjectClient(
-                endpoint=self.project_connection_string,
-                credential=credential
-            )
+            if self.client is None:
+                self.credential = DefaultAzureCredential()
+                self.client = AIProjectClient(
+                    endpoint=self.project_connection_string,
+                    credential=self.credential
+                )
             
             # Find Azure AI Search connection
             ai_search_conn_id = self._find_search_connection()
+            self._search_connection_id = ai_search_conn_id
             
+            definition = {
+                "model": self.model_deployment_name,
+                "name": "Software Architecture Recommender",
+                "instructions": self._get_agent_instructions(),
+                "headers": {"x-ms-enable-preview": "true"},
+            }
             if not ai_search_conn_id:
                 logger.warning("No Azure AI Search connection found. Creating agent without search capabilities.")
-                # Create agent definition without tools
-                agent_definition = self.client.agents.create_agent(
-                    model=self.model_deployment_name,
-                    name="Software Architecture Recommender",
-                    instructions=self._get_agent_instructions(),
-                    headers={"x-ms-enable-preview": "true"},
-                )
             else:
                 logger.info(f"Found Azure AI Search connection: {ai_search_conn_id}")
                 
                 # Create agent definition with Azure AI Search tool and proper tool_resources
                 ai_search = AzureAISearchTool(index_connection_id=ai_search_conn_id, index_name=self.search_index_name)
+                definition["tools"] = ai_search.definitions
+                definition["tool_resources"] = ai_search.resources
 
-                agent_definition = self.client.agents.create_agent(
-                    model=self.model_deployment_name,
-                    name="Software Architecture Recommender",
-                    instructions=self._get_agent_instructions(),
-                    tools=ai_search.definitions,
-                    tool_resources=ai_search.resources,
-                    headers={"x-ms-enable-preview": "true"},
-                )
+            if self.catalog is not None and self.service_lookup_tool:
+                # Exact "which architectures use X" answers come from the catalog's service index
+                self._functions = FunctionTool({self.find_architectures_by_service})
+                definition["tools"] = definition.get("tools", []) + self._functions.definitions
 
-            self.agent_id = agent_definition.id
+            self.agent_id = await self._acquire_shared_agent(definition, search_connection_id=ai_search_conn_id)
             self._initialized = True
+
+            self.prewarmer = ThreadPrewarmer.from_env(self)
+            if self.prewarmer:
+                self.prewarmer.start()
             logger.info(f"Azure AI Agent initialized successfully with ID: {self.agent_id}")
             
         except Exception as e:
             logger.error(f"Failed to initialize Azure AI Agent: {str(e)}")
             raise
 
+    async def _acquire_shared_agent(self, definition: Dict[str, Any], search_connection_id: Optional[str]) -> str:
+        """
+        Reuse the agent definition registered by another worker, or create and register one.
+
+        Agents are keyed by a fingerprint of their definition, so a deployment with new
+        instructions or a different model gets its own agent. Workers hold a reference
+        count and the last one to shut down deletes the agent. A worker that crashes
+        never releases its reference, so the agent then outlives the last worker; the
+        next start reuses it, and deleting the state file resets the count.
+        """
+        fingerprint = hashlib.sha256(
+            "|".join([
+                definition["model"], definition["instructions"], self.search_index_name, search_connection_id or "",
+                ",".join(sorted(self._function_names())),
+            ]).encode("utf-8")
+        ).hexdigest()[:16]
+        self._agent_key = f"agent_id:{fingerprint}"
+
+        agent_id = await self._call_unguarded(self.state.get, self._agent_key)
+        if agent_id:
+            try:
+                self.client.agents.get_agent(agent_id)
+                logger.info(f"Reusing shared agent: {agent_id}")
+            except ResourceNotFoundError:
+                logger.warning(f"Shared agent {agent_id} no longer exists; creating a new one")
+                await self._call_unguarded(self.state.delete, self._agent_key)
+                agent_id = None
+
+        if not agent_id:
+            created_id = self.client.agents.create_agent(**definition).id
+            agent_id = await self._call_unguarded(self.state.set_if_absent, self._agent_key, created_id)
+            if agent_id != created_id:
+                # Another worker registered its agent first; use that one
+                self.client.agents.delete_agent(created_id)
+
+        await self._call_unguarded(self.state.increment, f"{self._agent_key}:refs")
+        return agent_id
+
+    @property
+    def search_connection_id(self) -> Optional[str]:
+        """Azure AI Search connection the agent was created with, if any."""
+        return self._search_connection_id
+
+    def _function_names(self) -> List[str]:
+        return [tool.function.name for tool in self._functions.definitions] if self._functions else []
+
+    def find_architectures_by_service(
+        self, all_of: Optional[List[str]] = None, any_of: Optional[List[str]] = None
+    ) -> str:
+        """
+        List the catalog architectures that use specific Azure or third-party services.
+
+        :param all_of: Services every returned architecture must use, e.g. ["Event Hubs", "Databricks"].
+        :param any_of: Services of which a returned architecture must use at least one.
+        :return: JSON with the resolved service names, the total number of matches and the first matches.
+        """
+        snapshot = self.catalog.current() if self.catalog is not None else None
+        if snapshot is None:
+            return json.dumps({"error": "The architecture catalog is not available."})
+        if not all_of and not any_of:
+            return json.dumps({"error": "Give at least one service in all_of or any_of."})
+        result = snapshot.find_by_services(
+            all_of or [], any_of or [], limit=self.service_lookup_max_results, fields=SERVICE_LOOKUP_FIELDS
+        )
+        return json.dumps({key: value for key, value in result.items() if key not in ("version", "offset")})
+
     def _find_search_connection(self) -> Optional[str]:
         """Find and return the Azure AI Search connection ID."""
         try:
@@ -125,13 +303,19 @@ class IntakeAgent:
 
         Be comprehensive but concise in your responses."""
 
-    async def query(self, user_query: str, thread_id: Optional[str] = None) -> Dict[str, Any]:
+    async def query(
+        self, user_query: str, thread_id: Optional[str] = None, on_event: Optional[EventCallback] = None
+    ) -> Dict[str, Any]:
         """
         Process a user query and return the agent's response.
         
         Args:
             user_query: The user's question or request
             thread_id: Optional thread ID for conversation continuity
+            on_event: Optional coroutine called with each run status change
+                ({"type": "run_status", "status": ...}) and function call
+                ({"type": "tool_call", "name": ..., "result": ...}) while the run is active;
+                it must not raise, since tool outputs are submitted after it returns
             
         Returns:
             Dictionary containing the response and metadata
@@ -139,79 +323,455 @@ class IntakeAgent:
         if not self._initialized:
             raise RuntimeError("Agent not initialized. Use IntakeAgent.create() to create an instance.")
         
+        metrics.QUERY_REQUESTS.inc()
+        metrics.QUERY_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        cache_key = self._response_cache_key(user_query) if thread_id is None and self.response_cache_ttl > 0 else None
+        route: Optional[Route] = None
         try:
-            # Get or create thread
-            thread_id = await self._get_or_create_thread(thread_id)
+            if cache_key:
+                cached = await self._call_unguarded(self.state.cache_get, cache_key)
+                metrics.RESPONSE_CACHE.labels(result="hit" if cached is not None else "miss").inc()
+                if cached is not None:
+                    return await self._answer_from_cache(user_query, cached)
+
+            # A compaction started by the previous turn must finish before the thread is resolved
+            if thread_id in self._compactions:
+                await asyncio.wait([self._compactions[thread_id]])
+
+            # Get or create thread. thread_id stays the id given to the client; azure_thread_id
+            # is the thread currently backing it, which changes when the thread is compacted.
+            with metrics.STAGE_GET_OR_CREATE_THREAD.time():
+                thread_id, azure_thread_id = await self._get_or_create_thread(thread_id)
             
             # Add user message to thread
-            self.client.agents.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=user_query
-            )
-            
-            # Create and poll run
-            run = self.client.agents.runs.create_and_process(
-                thread_id=thread_id,
-                agent_id=self.agent_id
-            )
-            # Get the assistant's messages from the thread
-            messages = self.client.agents.messages.list(thread_id=thread_id)
+            with metrics.STAGE_MESSAGE_CREATE.time():
+                await self._call(
+                    self.client.agents.messages.create,
+                    thread_id=azure_thread_id,
+                    role="user",
+                    content=user_query
+                )
             
-            assistant_response = "I'm sorry, I couldn't generate a response. Please try again."
-            # Convert ItemPaged to list and get the latest assistant message
-            messages_list = list(messages)
-            if messages_list:
-                # Messages are typically returned in reverse chronological order (newest first)
-                for message in messages_list:
-                    if message.role == "assistant":
-                        # Extract text content from the message
-                        for content in message.content:
-                            if hasattr(content, 'text') and hasattr(content.text, 'value'):
-                                assistant_response = content.text.value
-                                break
-                        break
+            # Create and poll run, with search narrowed to the requirements found in the question
+            # and the model and tools of the turn's route
+            requirements = parse_requirements(user_query) if self.requirements_prefilter or self.router else None
+            if self.router:
+                route = await self._route_turn(thread_id, user_query, requirements)
+            run_options = await self._requirements_run_options(thread_id, requirements)
+            if route:
+                run_options = self._apply_route(run_options, route)
+            with metrics.STAGE_RUN.time():
+                run = await self._run_until_complete(azure_thread_id, on_event=on_event, **run_options)
+            self._record_run(run)
+            if run.status != "completed":
+                raise RunFailedError(f"Run ended with status {run.status}: {getattr(run, 'last_error', None)}")
+
+            # Read the answer produced by this run
+            with metrics.STAGE_MESSAGE_LIST.time():
+                assistant_response = await self._latest_assistant_text(azure_thread_id, run_id=run.id)
+            if assistant_response is None:
+                assistant_response = "I'm sorry, I couldn't generate a response. Please try again."
             
+            if cache_key and getattr(run, "status", None) == "completed":
+                await self._call_unguarded(self.state.cache_set, cache_key, assistant_response, self.response_cache_ttl)
+
+            await self._track_turn(thread_id, azure_thread_id, run, user_query, assistant_response)
+
             return {
                 "assistant_response": assistant_response,
                 "thread_id": thread_id,
                 "status": "success"
             }
-            
+
+        except CircuitOpenError as e:
+            metrics.QUERY_ERRORS.inc()
+            return {
+                "assistant_response": f"The agents service is unavailable: {str(e)}",
+                "thread_id": thread_id,
+                "status": "unavailable",
+                "retry_after": e.retry_after
+            }
         except Exception as e:
+            metrics.QUERY_ERRORS.inc()
             logger.error(f"Error processing query: {str(e)}")
             return {
                 "assistant_response": f"An error occurred while processing your request: {str(e)}",
                 "thread_id": thread_id,
                 "status": "error"
             }
+        finally:
+            metrics.QUERY_IN_FLIGHT.dec()
+            metrics.QUERY_LATENCY.observe(time.perf_counter() - started)
+            if route:
+                metrics.ROUTE_LATENCY.labels(route=route.name).observe(time.perf_counter() - started)
 
-    async def _get_or_create_thread(self, thread_id: Optional[str] = None) -> str:
-        """Get existing thread or create a new one."""
-        if thread_id and thread_id in self.threads:
-            return self.threads[thread_id]
-        
-        # Create new thread
-        thread = self.client.agents.threads.create()
-        thread_id = thread.id
-        self.threads[thread_id] = thread_id
+    async def _call(self, func, *args, **kwargs) -> Any:
+        """
+        Run a blocking SDK call through the circuit breaker.
+
+        Raises CircuitOpenError without calling the service while the breaker is open.
+        """
+        return await self.breaker.call(lambda: self._call_unguarded(func, *args, **kwargs))
+
+    async def _call_unguarded(self, func, *args, **kwargs) -> Any:
+        """
+        Run a blocking call in a worker thread so the event loop keeps serving requests.
+
+        Used directly, without the breaker, for the shared state store: its SQLite writes
+        can wait on another worker's transaction for up to the store's busy timeout.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _call_idempotent(self, operation: str, func, *args, **kwargs) -> Any:
+        """`_call` retried with jittered backoff on transient errors; only for calls safe to repeat."""
+        return await self._retry(operation, lambda: self._call(func, *args, **kwargs))
+
+    async def _retry(self, operation: str, attempt) -> Any:
+        return await retry(
+            operation,
+            attempt,
+            attempts=self.retry_attempts,
+            base_delay=self.retry_base_delay,
+            max_delay=self.retry_max_delay,
+        )
+
+    async def _run_until_complete(self, thread_id: str, on_event: Optional[EventCallback] = None, **run_options: Any) -> Any:
+        """
+        Create a run and poll it until it leaves the active statuses.
+
+        Polls start at `run_poll_initial_interval`, stay there for `run_poll_fast_polls`
+        polls and then back off exponentially up to `run_poll_max_interval`. When the
+        run is still active at the deadline it is cancelled and RunTimeoutError raised.
+        `run_options` are passed on to `runs.create` (e.g. tool_choice). Function
+        calls the run asks for are executed and their outputs submitted in between.
+        `on_event` is called with every status the polls observe, once per change.
+        """
+        deadline = time.monotonic() + self.run_timeout
+        run = await self._call(
+            self.client.agents.runs.create, thread_id=thread_id, agent_id=self.agent_id, **run_options
+        )
+
+        polls = 0
+        interval = self.run_poll_initial_interval
+        reported_status = None
+        while True:
+            status = getattr(run.status, "value", run.status)
+            if on_event and status != reported_status:
+                reported_status = status
+                await on_event({"type": "run_status", "status": status})
+            if not (run.status in ACTIVE_RUN_STATUSES or run.status == "requires_action"):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.RUN_TIMEOUTS.inc()
+                await self._call(self.client.agents.runs.cancel, thread_id=thread_id, run_id=run.id)
+                raise RunTimeoutError(f"Run {run.id} did not finish within {self.run_timeout:.0f}s and was cancelled")
+            if run.status == "requires_action":
+                run = await self._submit_tool_outputs(thread_id, run, on_event)
+                continue
+            await asyncio.sleep(min(interval, remaining))
+            run = await self._call_idempotent("runs_get", self.client.agents.runs.get, thread_id=thread_id, run_id=run.id)
+            polls += 1
+            if polls >= self.run_poll_fast_polls:
+                interval = min(interval * self.run_poll_backoff, self.run_poll_max_interval)
+
+        metrics.RUN_POLLS.observe(polls)
+        completed_at = getattr(run, "completed_at", None)
+        if completed_at is not None and hasattr(completed_at, "timestamp"):
+            # Time the finished run sat waiting for the next poll tick
+            metrics.RUN_POLL_WASTED_WAIT.observe(max(0.0, time.time() - completed_at.timestamp()))
+        return run
+
+    async def _submit_tool_outputs(self, thread_id: str, run: Any, on_event: Optional[EventCallback] = None) -> Any:
+        """Execute the function calls a run is waiting for and hand their outputs back to it."""
+        outputs = []
+        for tool_call in run.required_action.submit_tool_outputs.tool_calls:
+            name = tool_call.function.name
+            if self._functions is None or name not in self._function_names():
+                output = json.dumps({"error": f"Unknown function {name}"})
+            else:
+                # FunctionTool reports exceptions as {"error": ...} so the model can correct the call
+                output = str(self._functions.execute(tool_call))
+            try:
+                failed = "error" in json.loads(output)
+            except (TypeError, ValueError):
+                failed = False
+            metrics.TOOL_CALLS.labels(function=name, result="error" if failed else "ok").inc()
+            if on_event:
+                await on_event({"type": "tool_call", "name": name, "result": "error" if failed else "ok"})
+            outputs.append(ToolOutput(tool_call_id=tool_call.id, output=output))
+        return await self._call(
+            self.client.agents.runs.submit_tool_outputs, thread_id=thread_id, run_id=run.id, tool_outputs=outputs
+        )
+
+    def _record_run(self, run: Any) -> None:
+        """Record the terminal status and token usage of an agent run."""
+        status = getattr(run, "status", None) or "unknown"
+        # RunStatus is a str enum; use its value so labels read "completed", not "RunStatus.COMPLETED"
+        metrics.RUNS.labels(status=getattr(status, "value", status)).inc()
+        usage = getattr(run, "usage", None)
+        if usage:
+            metrics.RUN_PROMPT_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0)
+            metrics.RUN_COMPLETION_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0)
+
+    async def _requirements_run_options(self, thread_id: str, requirements: Optional[Requirements]) -> Dict[str, Any]:
+        """
+        Per-run search filter and instructions derived from the requirements in the question.
+
+        A follow-up that names no category keeps the category of the conversation's
+        earlier turns. Returns no options when nothing is detected, so the agent's
+        unfiltered search is used.
+        """
+        if not self.requirements_prefilter or requirements is None:
+            return {}
+        if requirements.category:
+            await self._call_unguarded(
+                self.state.set_thread_value, thread_id, "requirements_category", requirements.category,
+                self.thread_state_ttl,
+            )
+        else:
+            requirements.category = await self._call_unguarded(
+                self.state.get_thread_value, thread_id, "requirements_category"
+            )
+        metrics.REQUIREMENTS_CATEGORY.labels(category=requirements.category or "none").inc()
+
+        options: Dict[str, Any] = {}
+        search_filter = requirements.search_filter()
+        if search_filter and self._search_connection_id:
+            options["tool_resources"] = AzureAISearchTool(
+                index_connection_id=self._search_connection_id,
+                index_name=self.search_index_name,
+                filter=search_filter,
+                top_k=self.filtered_search_top_k,
+            ).resources
+        if not requirements.is_empty():
+            options["additional_instructions"] = requirements.as_instructions()
+        return options
+
+    async def _route_turn(self, thread_id: str, user_query: str, requirements: Requirements) -> Route:
+        """Route of a turn, given the requirement dimensions the conversation has covered so far."""
+        stored = await self._call_unguarded(self.state.get_thread_value, thread_id, "requirements_dimensions")
+        known = set(filter(None, (stored or "").split(",")))
+        current = requirement_dimensions(requirements)
+        if not current <= known:
+            known |= current
+            await self._call_unguarded(
+                self.state.set_thread_value, thread_id, "requirements_dimensions", ",".join(sorted(known)),
+                self.thread_state_ttl,
+            )
+        return self.router.route(user_query, known)
+
+    @staticmethod
+    def _apply_route(run_options: Dict[str, Any], route: Route) -> Dict[str, Any]:
+        """Merge a route's overrides into the run options; a route without tools drops the search filter."""
+        options = dict(run_options)
+        overrides = route.run_options()
+        if not route.tools:
+            options.pop("tool_resources", None)
+        instructions = [options.get("additional_instructions"), overrides.pop("additional_instructions", None)]
+        options.update(overrides)
+        if any(instructions):
+            options["additional_instructions"] = "\n".join(filter(None, instructions))
+        return options
+
+    @staticmethod
+    def _message_text(message: Any) -> Optional[str]:
+        """Return the first text content of a thread message."""
+        for content in message.content:
+            if hasattr(content, 'text') and hasattr(content.text, 'value'):
+                return content.text.value
+        return None
+
+    async def _latest_assistant_text(self, thread_id: str, run_id: Optional[str] = None) -> Optional[str]:
+        """
+        Return the text of the newest assistant message, optionally limited to one run.
+
+        Messages are listed newest first and the pager is consumed lazily, so only the
+        first page is fetched instead of the whole conversation history. The read is
+        retried, and hedged after `message_list_hedge_delay` seconds when that is set.
+        """
+        def first_assistant_text() -> Optional[str]:
+            for message in self.client.agents.messages.list(thread_id=thread_id, run_id=run_id, order="desc"):
+                if message.role == "assistant":
+                    return self._message_text(message)
+            return None
+
+        return await self._retry(
+            "messages_list",
+            lambda: hedged("messages_list", lambda: self._call(first_assistant_text), self.message_list_hedge_delay),
+        )
+
+    async def _track_turn(
+        self, thread_id: str, azure_thread_id: str, run: Any, user_query: str, assistant_response: str
+    ) -> None:
+        """
+        Record a finished turn and start a background compaction when the thread is over budget.
+
+        After a compaction fails or is skipped, the thread waits `compaction_retry_turns`
+        turns before the next attempt instead of starting a summary run on every turn.
+        """
+        usage = getattr(run, "usage", None)
+        turns, prompt_tokens = await self._call_unguarded(
+            self.state.record_turn, thread_id, getattr(usage, "prompt_tokens", 0) or 0
+        )
+        over_turns = self.compaction_max_turns > 0 and turns >= self.compaction_max_turns
+        over_tokens = self.compaction_max_prompt_tokens > 0 and prompt_tokens >= self.compaction_max_prompt_tokens
+        if (over_turns or over_tokens) and thread_id not in self._compactions:
+            retry_at = await self._call_unguarded(self.state.get_thread_value, thread_id, "compaction_retry")
+            if retry_at is not None and turns < int(retry_at):
+                return
+            task = asyncio.create_task(
+                self._compact_thread(thread_id, azure_thread_id, turns, user_query, assistant_response)
+            )
+            self._compactions[thread_id] = task
+            task.add_done_callback(lambda _: self._compactions.pop(thread_id, None))
+
+    async def _compact_thread(
+        self, thread_id: str, old_thread_id: str, turns: int, last_query: str, last_answer: str
+    ) -> None:
+        """
+        Summarize a conversation into a requirements record and move it onto a fresh thread.
+
+        The new thread holds the summary followed by the last exchange verbatim. The
+        summary run uses a scratch thread, so the conversation's own thread keeps taking
+        turns from other workers meanwhile; if one lands, the swap is skipped. The old
+        thread is left in place since another worker may still be reading it.
+        """
+        started = time.perf_counter()
+        agents = self.client.agents
+        try:
+            history = await self._call_idempotent(
+                "messages_list", lambda: list(agents.messages.list(thread_id=old_thread_id, order="asc"))
+            )
+            transcript = "\n\n".join(
+                f"{str(getattr(message.role, 'value', message.role)).capitalize()}: {self._message_text(message) or ''}"
+                for message in history
+            )
+
+            scratch = await self._call_idempotent("threads_create", agents.threads.create)
+            try:
+                await self._call(
+                    agents.messages.create,
+                    thread_id=scratch.id,
+                    role="user",
+                    content=COMPACTION_PROMPT.format(transcript=transcript)
+                )
+                run = await self._run_until_complete(
+                    scratch.id, tool_choice="none", max_completion_tokens=self.compaction_summary_max_tokens
+                )
+                self._record_run(run)
+                if run.status != "completed":
+                    raise RunFailedError(f"Summary run ended with status {run.status}")
+                summary = await self._latest_assistant_text(scratch.id, run_id=run.id)
+            finally:
+                await self._call(agents.threads.delete, scratch.id)
+            if not summary:
+                raise RunFailedError("Summary run returned no text")
+
+            new_thread = await self._call_idempotent("threads_create", agents.threads.create)
+            for role, content in (
+                ("assistant", COMPACTION_SUMMARY_HEADER + summary),
+                ("user", last_query),
+                ("assistant", last_answer),
+            ):
+                await self._call(agents.messages.create, thread_id=new_thread.id, role=role, content=content)
+
+            if await self._call_unguarded(self.state.replace_thread, thread_id, old_thread_id, new_thread.id, turns):
+                metrics.COMPACTIONS.labels(result="compacted").inc()
+                await self._call_unguarded(self.state.delete_thread_value, thread_id, "compaction_retry")
+                logger.info(f"Compacted thread {thread_id} after {turns} turns onto {new_thread.id}")
+            else:
+                # A turn was added on another worker while summarizing; try again after a later turn
+                metrics.COMPACTIONS.labels(result="skipped").inc()
+                await self._defer_compaction(thread_id, turns)
+                await self._call(agents.threads.delete, new_thread.id)
+        except Exception as e:
+            metrics.COMPACTIONS.labels(result="failed").inc()
+            logger.error(f"Compaction of thread {thread_id} failed: {str(e)}")
+            await self._defer_compaction(thread_id, turns)
+        finally:
+            metrics.COMPACTION_LATENCY.observe(time.perf_counter() - started)
+
+    async def _defer_compaction(self, thread_id: str, turns: int) -> None:
+        """Hold off the next compaction of a thread for `compaction_retry_turns` turns, on every worker."""
+        await self._call_unguarded(
+            self.state.set_thread_value, thread_id, "compaction_retry", str(turns + self.compaction_retry_turns),
+            self.thread_state_ttl,
+        )
+
+    def _response_cache_key(self, user_query: str) -> str:
+        normalized = " ".join(user_query.lower().split())
+        return f"{self._agent_key}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+    async def _answer_from_cache(self, user_query: str, assistant_response: str) -> Dict[str, Any]:
+        """Start a thread that already holds the question and its cached answer, skipping the run."""
+        with metrics.STAGE_GET_OR_CREATE_THREAD.time():
+            thread_id, _ = await self._get_or_create_thread(None)
+        with metrics.STAGE_MESSAGE_CREATE.time():
+            await self._call(self.client.agents.messages.create, thread_id=thread_id, role="user", content=user_query)
+            await self._call(
+                self.client.agents.messages.create, thread_id=thread_id, role="assistant", content=assistant_response
+            )
+        await self._call_unguarded(self.state.record_turn, thread_id, 0)
+        return {
+            "assistant_response": assistant_response,
+            "thread_id": thread_id,
+            "status": "success"
+        }
+
+    async def _get_or_create_thread(self, thread_id: Optional[str] = None) -> Tuple[str, str]:
+        """Get existing thread or create a new one; returns (client thread_id, Azure thread id)."""
+        if thread_id:
+            existing = await self._call_unguarded(self.state.get_thread, thread_id)
+            if existing:
+                return thread_id, existing
         
-        logger.info(f"Created new thread: {thread_id}")
-        return thread_id
+        # Take a pre-warmed thread, or create one when the pool is empty or disabled
+        thread_id = self.prewarmer.take() if self.prewarmer else None
+        if thread_id:
+            logger.info(f"Using pre-warmed thread: {thread_id}")
+        else:
+            thread = await self._call_idempotent("threads_create", self.client.agents.threads.create)
+            thread_id = thread.id
+            logger.info(f"Created new thread: {thread_id}")
+        await self._call_unguarded(self.state.put_thread, thread_id, thread_id)
+        return thread_id, thread_id
 
     async def cleanup(self):
         """Clean up resources."""
         try:
-            if self.agent_id and self.client:
-                # Delete the agent
-                self.client.agents.delete_agent(self.agent_id)
-                logger.info("Agent deleted successfully")
-            
-            # Clear threads
-            self.threads.clear()
+            # Stop background compactions before the agent they run against goes away
+            pending = list(self._compactions.values())
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+            if self.prewarmer:
+                await self.prewarmer.stop()
+
+            if self.agent_id and self.client and self._agent_key:
+                # Release our reference exactly once, even if cleanup runs again from __del__
+                agent_key, self._agent_key = self._agent_key, None
+                remaining = await self._call_unguarded(self.state.increment, f"{agent_key}:refs", -1)
+                if remaining > 0:
+                    # Other workers still use the shared agent and threads
+                    logger.info(f"Agent still used by {remaining} other worker(s); not deleting it")
+                else:
+                    self.client.agents.delete_agent(self.agent_id)
+                    await self._call_unguarded(self.state.delete, agent_key)
+                    await self._call_unguarded(self.state.delete, f"{agent_key}:refs")
+                    logger.info("Agent deleted successfully")
+
+                    # Clear threads and their per-conversation state
+                    await self._call_unguarded(self.state.clear_threads)
             
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
+        finally:
+            self._initialized = False
+            self._executor.shutdown(wait=False)
 
     def __del__(self):
         """Destructor to ensure cleanup."""
@@ -0,0 +1,443 @@
+# Lightweight Prometheus-style metrics for the FastAPI service and IntakeAgent
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds, tuned for Azure agent round trips
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a label set as {a="x",b="y"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class holding the name, help text and labelled children of a metric."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, **labelvalues: str) -> "_Metric":
+        """
+        Return the child metric for a label set, creating it on first use.
+
+        Bind children once at import time for hot paths to avoid the dict lookup.
+        """
+        key = tuple(str(labelvalues[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._new_child()
+            # setdefault keeps the first child if two callers race on creation
+            child = self._children.setdefault(key, child)
+        return child
+
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.documentation)
+
+    def _samples(self) -> List[Tuple[Tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labelvalues, child in self._samples():
+            lines.extend(child._render_child(self.name, self.labelnames, labelvalues))
+        return lines
+
+    def _render_child(self, name: str, labelnames: Sequence[str], labelvalues: Sequence[str]) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _render_child(self, name, labelnames, labelvalues):
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. requests in flight."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def _render_child(self, name, labelnames, labelvalues):
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"]
+
+
+class _HistogramTimer:
+    """Context manager that observes the elapsed wall time into a histogram."""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "Histogram"):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self) -> "_HistogramTimer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    """
+    Pre-aggregated histogram with fixed bucket bounds.
+
+    Observations only bump a bucket counter, the sum and the count, so memory is
+    constant regardless of traffic and no per-sample list is kept.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # One extra slot for observations above the largest bound (+Inf)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _HistogramTimer:
+        """Time a block: `with histogram.time(): ...`."""
+        return _HistogramTimer(self)
+
+    def _render_child(self, name, labelnames, labelvalues):
+        lines = []
+        cumulative = 0
+        counts = list(self.counts)
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labelvalues, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, labelvalues)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together by the /metrics endpoint.
+
+    Metrics are only mutated from the event loop thread, so updates are plain
+    attribute increments with no locking on the request path.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render every registered metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Query level metrics
+QUERY_REQUESTS = REGISTRY.counter(
+    "intake_agent_query_requests_total", "Total number of queries processed by the IntakeAgent."
+)
+QUERY_ERRORS = REGISTRY.counter(
+    "intake_agent_query_errors_total", "Total number of queries that ended in an error."
+)
+QUERY_IN_FLIGHT = REGISTRY.gauge(
+    "intake_agent_query_in_flight", "Number of queries currently being processed."
+)
+QUERY_LATENCY = REGISTRY.histogram(
+    "intake_agent_query_duration_seconds", "End-to-end latency of IntakeAgent.query."
+)
+
+# Per-stage latency breakdown of IntakeAgent.query
+QUERY_STAGE_LATENCY = REGISTRY.histogram(
+    "intake_agent_query_stage_duration_seconds",
+    "Latency of each stage of IntakeAgent.query.",
+    labelnames=("stage",),
+)
+STAGE_GET_OR_CREATE_THREAD = QUERY_STAGE_LATENCY.labels(stage="get_or_create_thread")
+STAGE_MESSAGE_CREATE = QUERY_STAGE_LATENCY.labels(stage="messages_create")
+STAGE_RUN = QUERY_STAGE_LATENCY.labels(stage="run")
+STAGE_MESSAGE_LIST = QUERY_STAGE_LATENCY.labels(stage="messages_list")
+
+# Agent run outcomes and token usage
+RUNS = REGISTRY.counter(
+    "intake_agent_runs_total", "Agent runs by terminal status.", labelnames=("status",)
+)
+RUN_TOKENS = REGISTRY.counter(
+    "intake_agent_run_tokens_total", "Tokens consumed by agent runs.", labelnames=("kind",)
+)
+RUN_PROMPT_TOKENS = RUN_TOKENS.labels(kind="prompt")
+RUN_COMPLETION_TOKENS = RUN_TOKENS.labels(kind="completion")
+
+# Shared response cache for identical first-turn questions
+RESPONSE_CACHE = REGISTRY.counter(
+    "intake_agent_response_cache_total", "Response cache lookups by result.", labelnames=("result",)
+)
+
+# Run polling driven by IntakeAgent._run_until_complete
+RUN_POLLS = REGISTRY.histogram(
+    "intake_agent_run_polls",
+    "Number of status polls needed per agent run.",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+RUN_POLL_WASTED_WAIT = REGISTRY.histogram(
+    "intake_agent_run_poll_wasted_wait_seconds",
+    "Time between a run finishing and the poll that observed it.",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+RUN_TIMEOUTS = REGISTRY.counter(
+    "intake_agent_run_timeouts_total", "Agent runs cancelled because they passed the request deadline."
+)
+
+# Batch queries (/query/batch and batch jobs)
+BATCH_ITEMS = REGISTRY.counter(
+    "intake_agent_batch_items_total",
+    "Batch items by whether they ran or reused the result of an identical item.",
+    labelnames=("kind",),
+)
+BATCH_ITEMS_EXECUTED = BATCH_ITEMS.labels(kind="executed")
+BATCH_ITEMS_DEDUPLICATED = BATCH_ITEMS.labels(kind="deduplicated")
+BATCH_JOBS_RUNNING = REGISTRY.gauge(
+    "intake_agent_batch_jobs_running", "Batch jobs currently running on this worker."
+)
+
+# Conversation compaction of long threads
+COMPACTIONS = REGISTRY.counter(
+    "intake_agent_compactions_total",
+    "Thread compactions by result (compacted, or skipped when the thread changed meanwhile).",
+    labelnames=("result",),
+)
+COMPACTION_LATENCY = REGISTRY.histogram(
+    "intake_agent_compaction_duration_seconds", "Time to summarize a thread and start its replacement."
+)
+
+# Local requirements parsing that narrows search to one pattern catalog
+REQUIREMENTS_CATEGORY = REGISTRY.counter(
+    "intake_agent_requirements_category_total",
+    "Queries by the pattern catalog their search was restricted to (none = unfiltered).",
+    labelnames=("category",),
+)
+
+# Function tools executed for agent runs (e.g. the service -> architectures lookup)
+TOOL_CALLS = REGISTRY.counter(
+    "intake_agent_tool_calls_total",
+    "Function tool calls requested by agent runs, by function and result (ok or error).",
+    labelnames=("function", "result"),
+)
+
+# Dependency probes behind /health/ready
+DEPENDENCY_UP = REGISTRY.gauge(
+    "intake_agent_dependency_up",
+    "Result of the latest background probe of each dependency (1 = healthy).",
+    labelnames=("dependency",),
+)
+
+# Resilience of the Azure agents SDK calls
+CIRCUIT_STATE = REGISTRY.gauge(
+    "intake_agent_circuit_state",
+    "Circuit breaker state (0 = closed, 1 = half-open, 2 = open).",
+    labelnames=("breaker",),
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "intake_agent_circuit_rejections_total",
+    "Calls failed fast without reaching the service because the circuit was open.",
+    labelnames=("breaker",),
+)
+SDK_RETRIES = REGISTRY.counter(
+    "intake_agent_sdk_retries_total",
+    "Retries of idempotent SDK calls after transient errors, by operation.",
+    labelnames=("operation",),
+)
+HEDGED_REQUESTS = REGISTRY.counter(
+    "intake_agent_hedged_requests_total",
+    "Hedged reads by outcome (not_hedged, primary_won, hedge_won, failed).",
+    labelnames=("operation", "result"),
+)
+
+# Pre-warmed threads for new conversations
+THREAD_POOL_SIZE = REGISTRY.gauge(
+    "intake_agent_thread_pool_size", "Empty threads ready in this worker's pre-warm pool."
+)
+THREAD_POOL_TAKES = REGISTRY.counter(
+    "intake_agent_thread_pool_takes_total",
+    "New conversations by whether a pre-warmed thread was available (hit) or one was created (miss).",
+    labelnames=("result",),
+)
+THREAD_POOL_EXPIRED = REGISTRY.counter(
+    "intake_agent_thread_pool_expired_total", "Pooled threads deleted unused after their TTL."
+)
+
+# Routing of turns between the intake (small model, no search) and recommendation routes
+ROUTE_DECISIONS = REGISTRY.counter(
+    "intake_agent_route_decisions_total", "Turns by the route the router picked.", labelnames=("route",)
+)
+ROUTE_LATENCY = REGISTRY.histogram(
+    "intake_agent_route_query_duration_seconds",
+    "End-to-end query latency by route.",
+    labelnames=("route",),
+)
+ROUTER_DURATION = REGISTRY.histogram(
+    "intake_agent_router_duration_seconds",
+    "Time the local classifier takes to route a turn.",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025),
+)
+
+# WebSocket conversations
+WS_CONNECTIONS = REGISTRY.gauge(
+    "intake_agent_websocket_connections", "Open WebSocket conversations in this worker."
+)
+WS_TURNS = REGISTRY.counter(
+    "intake_agent_websocket_turns_total",
+    "Turns received over WebSocket conversations, by result (success, error, unavailable or busy).",
+    labelnames=("status",),
+)
+WS_EVENTS = REGISTRY.counter(
+    "intake_agent_websocket_events_total", "Events sent to WebSocket clients, by type.", labelnames=("type",)
+)
+WS_EVENTS_DROPPED = REGISTRY.counter(
+    "intake_agent_websocket_events_dropped_total",
+    "Progress events (run status, tool calls) dropped because the client's event queue was full.",
+    labelnames=("type",),
+)
+WS_SLOW_CONSUMER_CLOSES = REGISTRY.counter(
+    "intake_agent_websocket_slow_consumer_closes_total",
+    "Connections closed because the client stopped reading events.",
+)
+
+# Admission control and fair scheduling of queries per client
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "intake_agent_admission_queue_depth",
+    "Queries waiting for a run slot, by client and lane.",
+    labelnames=("client", "lane"),
+)
+ADMISSION_WAIT = REGISTRY.histogram(
+    "intake_agent_admission_wait_seconds",
+    "Time admitted queries waited for a run slot, by client and lane.",
+    labelnames=("client", "lane"),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "intake_agent_admission_rejections_total",
+    "Queries not admitted, by client and reason (rate_limited, queue_full or queue_timeout).",
+    labelnames=("client", "reason"),
+)
+ADMISSION_ACTIVE = REGISTRY.gauge(
+    "intake_agent_admission_active", "Run slots in use, by lane.", labelnames=("lane",)
+)
+
+# Architecture diagram delivery from the local disk cache
+DIAGRAM_CACHE = REGISTRY.counter(
+    "intake_agent_diagram_cache_total",
+    "Diagram lookups by cache result (hit, miss, or shared when joining a fetch already in progress).",
+    labelnames=("result",),
+)
+DIAGRAM_CACHE_BYTES = REGISTRY.gauge(
+    "intake_agent_diagram_cache_bytes", "Bytes of diagrams in this worker's disk cache."
+)
+DIAGRAM_CACHE_EVICTIONS = REGISTRY.counter(
+    "intake_agent_diagram_cache_evictions_total", "Diagrams evicted from the disk cache to stay under its size cap."
+)
+DIAGRAM_FETCH_DURATION = REGISTRY.histogram(
+    "intake_agent_diagram_fetch_duration_seconds",
+    "Time to fetch a diagram variant from its source on a cache miss.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+DIAGRAM_NOT_MODIFIED = REGISTRY.counter(
+    "intake_agent_diagram_not_modified_total", "Diagram requests answered 304 because the client's ETag matched."
+)
+
+# Anonymized /query traffic capture
+TRAFFIC_CAPTURE_RECORDS = REGISTRY.counter(
+    "intake_agent_traffic_capture_records_total",
+    "Captured /query requests by result (written, sampled_out or failed).",
+    labelnames=("result",),
+)
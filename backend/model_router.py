@@ -0,0 +1,112 @@
+# Local turn classifier that routes clarifying turns to a smaller deployment without search
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set
+
+from . import metrics
+from .requirements_parser import Requirements
+
+ROUTE_INTAKE = "intake"
+ROUTE_RECOMMEND = "recommend"
+
+# Requirement dimensions known for a conversation after which a turn gets the recommendation route
+RECOMMEND_MIN_DIMENSIONS = 3
+
+# Instructions added to intake runs, which have neither retrieval nor the large model
+INTAKE_INSTRUCTIONS = (
+    "This turn is part of requirements intake. Do not recommend an architecture yet. "
+    "Briefly acknowledge what is known and ask up to three concise clarifying questions about "
+    "what is still missing: workload type, data sources and stores, data volume or event rate, "
+    "latency, security and compliance constraints."
+)
+
+# Phrases asking for an answer rather than supplying requirements. Lowercase, word-bounded.
+_RECOMMEND_REQUEST = re.compile(
+    r"\b(?:recommend\w*|suggest\w*|propos\w*|advi[cs]e|design|blueprint|reference architectures?"
+    r"|which (?:architecture|pattern|services?|option|approach|one)|what (?:architecture|pattern|services?|should)"
+    r"|how (?:do|should|can|would) (?:i|we)|best (?:way|approach|option|practice)|compare|comparison"
+    r"|trade-?offs?|pros and cons|cost drivers?|estimate|diagram)\b"
+)
+
+
+def requirement_dimensions(requirements: Requirements) -> Set[str]:
+    """Requirement dimensions a parsed question says something about."""
+    dimensions = set()
+    if requirements.category:
+        dimensions.add("category")
+    if requirements.workloads:
+        dimensions.add("workload")
+    if requirements.data_stores:
+        dimensions.add("data_store")
+    if requirements.scale:
+        dimensions.add("scale")
+    return dimensions
+
+
+def classify_turn(text: str, known_dimensions: Iterable[str]) -> str:
+    """
+    ROUTE_RECOMMEND when the question asks for an answer or the conversation already
+    covers RECOMMEND_MIN_DIMENSIONS requirement dimensions, otherwise ROUTE_INTAKE.
+
+    `known_dimensions` includes the dimensions of `text` itself.
+    """
+    if _RECOMMEND_REQUEST.search(text.lower()):
+        return ROUTE_RECOMMEND
+    if len(set(known_dimensions)) >= RECOMMEND_MIN_DIMENSIONS:
+        return ROUTE_RECOMMEND
+    return ROUTE_INTAKE
+
+
+@dataclass
+class Route:
+    """How runs of one route differ from the agent definition."""
+
+    name: str
+    # Deployment for the run; None keeps the agent's model
+    model: Optional[str] = None
+    # False runs without tools: no search and no function calls
+    tools: bool = True
+    instructions: Optional[str] = None
+
+    def run_options(self) -> Dict[str, Any]:
+        """Overrides passed to `runs.create`."""
+        options: Dict[str, Any] = {}
+        if self.model:
+            options["model"] = self.model
+        if not self.tools:
+            options["tools"] = []
+            options["tool_choice"] = "none"
+        if self.instructions:
+            options["additional_instructions"] = self.instructions
+        return options
+
+
+class ModelRouter:
+    """Picks the route of each turn and records the decision."""
+
+    def __init__(self, routes: Dict[str, Route]):
+        self.routes = routes
+
+    @classmethod
+    def from_env(cls) -> Optional["ModelRouter"]:
+        """Router configured by MODEL_ROUTING and ROUTER_INTAKE_DEPLOYMENT, or None when disabled."""
+        if os.getenv("MODEL_ROUTING", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls({
+            ROUTE_INTAKE: Route(
+                ROUTE_INTAKE,
+                model=os.getenv("ROUTER_INTAKE_DEPLOYMENT", "gpt-4o-mini"),
+                tools=False,
+                instructions=INTAKE_INSTRUCTIONS,
+            ),
+            ROUTE_RECOMMEND: Route(ROUTE_RECOMMEND),
+        })
+
+    def route(self, text: str, known_dimensions: Iterable[str]) -> Route:
+        started = time.perf_counter()
+        route = self.routes[classify_turn(text, known_dimensions)]
+        metrics.ROUTER_DURATION.observe(time.perf_counter() - started)
+        metrics.ROUTE_DECISIONS.labels(route=route.name).inc()
+        return route
@@ -0,0 +1,192 @@
+# Circuit breaker, jittered retries and hedged reads around the Azure agents SDK calls
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from azure.core.exceptions import (
+    ClientAuthenticationError,
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ServiceRequestError,
+    ServiceResponseError,
+)
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Values of the intake_agent_circuit_state gauge
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable; circuit open for another {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether an error says the service is unhealthy rather than that the request was wrong.
+
+    Connection failures, timeouts, throttling, 5xx responses and HTTP errors without
+    a status are transient; other HTTP errors (404, 400, ...) are answers from a
+    working service.
+    """
+    if isinstance(error, (ServiceRequestError, ServiceResponseError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, (ClientAuthenticationError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError)):
+        return False
+    if isinstance(error, HttpResponseError):
+        status = error.status_code
+        return status is None or status in (408, 429) or status >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` transient failures in a row the circuit opens and
+    calls fail immediately with CircuitOpenError. Once `reset_timeout` seconds
+    have passed it is half-open: one trial call goes through, and its outcome
+    closes the circuit or opens it again for another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._set_state("closed")
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"Circuit {self.name} is {state.replace('_', '-')}")
+        self.state = state
+        metrics.CIRCUIT_STATE.labels(breaker=self.name).set(CIRCUIT_STATES[state])
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may be made now."""
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                metrics.CIRCUIT_REJECTIONS.labels(breaker=self.name).inc()
+                raise CircuitOpenError(self.name, remaining)
+            self._set_state("half_open")
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                metrics.CIRCUIT_REJECTIONS.labels(breaker=self.name).inc()
+                raise CircuitOpenError(self.name, 0)
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state("open")
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `func()` through the breaker; only transient errors count as failures."""
+        self.before_call()
+        try:
+            result = await func()
+        except BaseException as e:
+            if is_transient(e):
+                self.record_failure()
+            elif self.state == "half_open":
+                # The service answered (e.g. 404), or the call was cancelled: let the next caller try
+                if isinstance(e, Exception):
+                    self.record_success()
+                else:
+                    self._trial_in_flight = False
+            raise
+        self.record_success()
+        return result
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random = random) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def retry(
+    operation: str,
+    func: Callable[[], Awaitable[Any]],
+    attempts: int = 3,
+    base_delay: float = 0.2,
+    max_delay: float = 2.0,
+) -> Any:
+    """
+    Await `func()` up to `attempts` times, sleeping a jittered backoff between tries.
+
+    Only for idempotent calls. Retries transient errors only; CircuitOpenError and
+    errors from a working service are raised at once.
+    """
+    for attempt in range(attempts):
+        try:
+            return await func()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if attempt == attempts - 1 or not is_transient(e):
+                raise
+            metrics.SDK_RETRIES.labels(operation=operation).inc()
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.info(f"Retrying {operation} in {delay:.2f}s after {type(e).__name__}: {e}")
+            await asyncio.sleep(delay)
+
+
+async def hedged(operation: str, func: Callable[[], Awaitable[Any]], delay: Optional[float]) -> Any:
+    """
+    Await `func()`, starting a second identical call if the first is slower than `delay`.
+
+    The first successful result wins; the other call is left to finish in the
+    background (SDK calls on the thread pool cannot be interrupted). With no delay
+    (None or <= 0) this is a plain call. Only for idempotent reads.
+    """
+    if not delay or delay <= 0:
+        return await func()
+    primary = asyncio.ensure_future(func())
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        metrics.HEDGED_REQUESTS.labels(operation=operation, result="not_hedged").inc()
+        return primary.result()
+
+    hedge = asyncio.ensure_future(func())
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                metrics.HEDGED_REQUESTS.labels(
+                    operation=operation, result="hedge_won" if task is hedge else "primary_won"
+                ).inc()
+                for other in pending:
+                    other.add_done_callback(_discard_result)
+                return task.result()
+            error = task.exception()
+    metrics.HEDGED_REQUESTS.labels(operation=operation, result="failed").inc()
+    raise error
+
+
+def _discard_result(task: "asyncio.Future[Any]") -> None:
+    # Retrieve the loser's exception so asyncio does not log it as never retrieved
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,210 @@
+# Service name canonicalization and an inverted index from service to architectures using int bitsets
+import functools
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Canonical service name -> aliases seen in the pattern PDFs and in questions. Aliases are
+# compared after normalization (lowercase, "Azure"/"Microsoft" prefixes and punctuation removed),
+# so "Azure Event Hubs", "event-hubs" and "EventHub" all map to "Event Hubs".
+SERVICE_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "API Management": ("apim",),
+    "App Service": ("app services", "web apps", "web app"),
+    "Blob Storage": ("blob", "blobs", "storage account", "storage accounts"),
+    "Cosmos DB": ("cosmos", "cosmosdb", "documentdb"),
+    "Data Box": ("databox",),
+    "Data Explorer": ("adx", "kusto"),
+    "Data Factory": ("adf", "datafactory"),
+    "Data Lake Storage": ("adls", "adls gen2", "data lake storage gen2", "data lake", "datalake", "data lake store"),
+    "Database for MySQL": ("mysql", "mysql flexible server"),
+    "Database for PostgreSQL": ("postgresql", "postgres", "postgresql flexible server", "postgresql flexible"),
+    "Database Migration Service": ("dms",),
+    "Databricks": ("adb",),
+    "Event Grid": ("eventgrid",),
+    "Event Hubs": ("event hub", "eventhub", "eventhubs"),
+    "ExpressRoute": ("express route",),
+    "Fabric": ("onelake",),
+    "Functions": ("function app", "function apps", "functions app"),
+    "IoT Hub": ("iothub", "iot hubs"),
+    "Key Vault": ("keyvault", "akv"),
+    "Kubernetes Service": ("aks", "kubernetes"),
+    "Logic Apps": ("logic app",),
+    "Machine Learning": ("aml", "ml", "machine learning service", "machine learning studio"),
+    "Monitor": ("log analytics", "application insights", "app insights"),
+    "Power BI": ("powerbi", "pbi"),
+    "Purview": ("data catalog",),
+    "Service Bus": ("servicebus",),
+    "SQL Database": ("sql db", "sqldb", "sql"),
+    "SQL Managed Instance": ("sql mi", "sqlmi", "managed instance", "sql database managed instance"),
+    "Stream Analytics": ("asa",),
+    "Synapse Analytics": ("synapse", "sql data warehouse", "synapse workspace"),
+    "Virtual Machines": ("vm", "vms", "virtual machine"),
+}
+
+_PREFIX = re.compile(r"^(?:microsoft|azure)\s+")
+_SUFFIX = re.compile(r"\s*\([^()]*\)$")
+_PUNCTUATION = re.compile(r"[\s\-_./]+")
+
+
+def normalize_service(name: str) -> str:
+    """Lowercase, drop Azure/Microsoft prefixes and trailing "(Gen2)"/"(AKS)" notes, collapse punctuation."""
+    text = _SUFFIX.sub("", name.strip().lower())
+    while True:
+        stripped = _PREFIX.sub("", text)
+        if stripped == text:
+            break
+        text = stripped
+    return _PUNCTUATION.sub(" ", text).strip()
+
+
+# Built once: normalized alias or canonical name -> canonical name
+_CANONICAL: Dict[str, str] = {}
+for _canonical, _aliases in SERVICE_ALIASES.items():
+    for _alias in (_canonical,) + _aliases:
+        _CANONICAL[normalize_service(_alias)] = _canonical
+        _CANONICAL[normalize_service(_alias).replace(" ", "")] = _canonical
+
+
+@functools.lru_cache(maxsize=4096)
+def canonical_service(name: str) -> str:
+    """Canonical display name of a service; unknown services keep their name without the Azure prefix."""
+    normalized = normalize_service(name)
+    canonical = _CANONICAL.get(normalized) or _CANONICAL.get(normalized.replace(" ", ""))
+    if canonical:
+        return canonical
+    cleaned = _SUFFIX.sub("", name.strip())
+    while True:
+        stripped = re.sub(r"^(?:Microsoft|Azure)\s+", "", cleaned, flags=re.IGNORECASE)
+        if stripped == cleaned:
+            return cleaned
+        cleaned = stripped
+
+
+def canonical_services(names: Iterable[str]) -> List[str]:
+    """Canonicalize a list of services, dropping duplicates but keeping the order."""
+    seen: Dict[str, None] = {}
+    for name in names:
+        if name and name.strip():
+            seen.setdefault(canonical_service(name), None)
+    return list(seen)
+
+
+def _bitset(positions: Iterable[int], size: int) -> int:
+    """Int with the given bits set, built in one pass over a byte buffer."""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _set_bits(bitset: int) -> Iterator[int]:
+    """Positions of the set bits in increasing order, scanning 64-bit words and skipping empty ones."""
+    if bitset <= 0:
+        return
+    words = memoryview(bitset.to_bytes((bitset.bit_length() + 63) // 64 * 8, "little")).cast("Q")
+    for word_index, word in enumerate(words):
+        base = word_index * 64
+        while word:
+            low = word & -word
+            yield base + low.bit_length() - 1
+            word ^= low
+
+
+class ServiceIndex:
+    """
+    Inverted index from canonical service name to the architectures that use it.
+
+    Each service maps to a Python int used as a bitset over architecture positions,
+    so AND/OR queries are single big-integer operations.
+    """
+
+    def __init__(self, architecture_ids: Sequence[str], bitsets: Dict[str, int]):
+        self.architecture_ids = list(architecture_ids)
+        self.bitsets = bitsets
+        self._keys = {normalize_service(name): name for name in bitsets}
+
+    @classmethod
+    def build(cls, architectures: Iterable[Tuple[str, Iterable[str]]]) -> "ServiceIndex":
+        """Build from (architecture id, services) pairs; services are canonicalized here."""
+        ids: List[str] = []
+        positions: Dict[str, List[int]] = {}
+        for position, (architecture_id, services) in enumerate(architectures):
+            ids.append(architecture_id)
+            for service in canonical_services(services):
+                positions.setdefault(service, []).append(position)
+        # OR-ing one bit at a time into a growing int is quadratic in the catalog size
+        return cls(ids, {service: _bitset(bits, len(ids)) for service, bits in positions.items()})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form stored in the catalog snapshot; bitsets are hex strings."""
+        return {
+            "architecture_ids": self.architecture_ids,
+            "services": {name: format(bitset, "x") for name, bitset in self.bitsets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ServiceIndex":
+        return cls(data["architecture_ids"], {name: int(value, 16) for name, value in data["services"].items()})
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Indexed service name for a user-supplied name or alias, or None if unknown."""
+        canonical = canonical_service(name)
+        if canonical in self.bitsets:
+            return canonical
+        return self._keys.get(normalize_service(canonical))
+
+    def service_counts(self) -> Dict[str, int]:
+        return {name: bitset.bit_count() for name, bitset in sorted(self.bitsets.items())}
+
+    def query(
+        self,
+        all_of: Sequence[str] = (),
+        any_of: Sequence[str] = (),
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        """
+        Architectures using every service in `all_of` and at least one in `any_of`.
+
+        Returns the resolved service names, the names that are not in the index,
+        the total number of matches and one page of architecture ids.
+        """
+        unknown: List[str] = []
+        resolved_all: List[str] = []
+        resolved_any: List[str] = []
+        for names, resolved in ((all_of, resolved_all), (any_of, resolved_any)):
+            for name in names:
+                service = self.resolve(name)
+                if service is None:
+                    unknown.append(name)
+                elif service not in resolved:
+                    resolved.append(service)
+
+        everything = (1 << len(self.architecture_ids)) - 1
+        matches = everything if (resolved_all or resolved_any) else 0
+        for service in resolved_all:
+            matches &= self.bitsets[service]
+        if any_of:
+            union = 0
+            for service in resolved_any:
+                union |= self.bitsets[service]
+            matches &= union
+        if any(name in unknown for name in all_of):
+            # A required service no architecture uses
+            matches = 0
+
+        ids: List[str] = []
+        if limit > 0:
+            for position in _set_bits(matches):
+                if offset:
+                    offset -= 1
+                    continue
+                ids.append(self.architecture_ids[position])
+                if len(ids) >= limit:
+                    break
+        return {
+            "all_of": resolved_all,
+            "any_of": resolved_any,
+            "unknown_services": unknown,
+            "total": matches.bit_count(),
+            "architecture_ids": ids,
+        }
@@ -0,0 +1,283 @@
+# State shared by every worker process of the API: agent ids, the thread registry, the response cache and batch jobs
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS threads (
+    client_thread_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS thread_usage (
+    client_thread_id TEXT PRIMARY KEY,
+    turns INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS thread_state (
+    client_thread_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (client_thread_id, name)
+);
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    summary TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_results (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class SharedStateStore:
+    """
+    SQLite-backed key/value store shared by worker processes on the same host.
+
+    With the default ":memory:" path the state is private to the process, which
+    matches the single-worker development server. Point SHARED_STATE_PATH at a
+    file to share it between the workers started by serve.py. The database runs
+    in WAL mode so readers never block each other.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "SharedStateStore":
+        """Create the store configured by SHARED_STATE_PATH (in-memory when unset)."""
+        return cls(os.getenv("SHARED_STATE_PATH") or ":memory:")
+
+    # Key/value entries
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+
+    def set_if_absent(self, key: str, value: str) -> str:
+        """Store `value` unless the key exists; return whichever value is stored."""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO kv (key, value) VALUES (?, ?)", (key, value))
+            return self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def increment(self, key: str, amount: int = 1) -> int:
+        """Atomically add `amount` to an integer entry and return the new value."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+                value = (int(row[0]) if row else 0) + amount
+                self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, str(value)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    # Thread registry: the thread_id given to clients -> the Azure thread backing it
+    def get_thread(self, client_thread_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id FROM threads WHERE client_thread_id = ?", (client_thread_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_thread(self, client_thread_id: str, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (client_thread_id, thread_id, updated_at) VALUES (?, ?, ?)",
+                (client_thread_id, thread_id, time.time()),
+            )
+
+    def record_turn(self, client_thread_id: str, prompt_tokens: int) -> Tuple[int, int]:
+        """
+        Count a finished turn and store the prompt size of its run.
+
+        Returns (turns since the thread was started or last compacted, prompt tokens).
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO thread_usage (client_thread_id, turns, prompt_tokens) VALUES (?, 1, ?) "
+                "ON CONFLICT(client_thread_id) DO UPDATE SET turns = turns + 1, prompt_tokens = excluded.prompt_tokens",
+                (client_thread_id, prompt_tokens),
+            )
+            row = self._conn.execute(
+                "SELECT turns, prompt_tokens FROM thread_usage WHERE client_thread_id = ?", (client_thread_id,)
+            ).fetchone()
+        return row[0], row[1]
+
+    def replace_thread(self, client_thread_id: str, old_thread_id: str, new_thread_id: str, expected_turns: int) -> bool:
+        """
+        Point a client thread at a new Azure thread and reset its usage.
+
+        Only succeeds if the mapping is still `old_thread_id` and no turn was recorded
+        since `expected_turns`, so a turn that landed on another worker is never lost.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._conn.execute(
+                    "SELECT t.thread_id, COALESCE(u.turns, 0) FROM threads t "
+                    "LEFT JOIN thread_usage u ON u.client_thread_id = t.client_thread_id WHERE t.client_thread_id = ?",
+                    (client_thread_id,),
+                ).fetchone()
+                replaced = current is not None and tuple(current) == (old_thread_id, expected_turns)
+                if replaced:
+                    self._conn.execute(
+                        "UPDATE threads SET thread_id = ?, updated_at = ? WHERE client_thread_id = ?",
+                        (new_thread_id, time.time(), client_thread_id),
+                    )
+                    self._conn.execute("DELETE FROM thread_usage WHERE client_thread_id = ?", (client_thread_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return replaced
+
+    def thread_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def clear_threads(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM threads")
+            self._conn.execute("DELETE FROM thread_usage")
+            self._conn.execute("DELETE FROM thread_state")
+
+    # Per-conversation values (remembered requirements, compaction backoff) that expire when idle
+    def get_thread_value(self, client_thread_id: str, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM thread_state WHERE client_thread_id = ? AND name = ? AND expires_at > ?",
+                (client_thread_id, name, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_thread_value(self, client_thread_id: str, name: str, value: str, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thread_state (client_thread_id, name, value, expires_at) VALUES (?, ?, ?, ?)",
+                (client_thread_id, name, value, now + ttl_seconds),
+            )
+            self._conn.execute("DELETE FROM thread_state WHERE expires_at <= ?", (now,))
+
+    def delete_thread_value(self, client_thread_id: str, name: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM thread_state WHERE client_thread_id = ? AND name = ?", (client_thread_id, name)
+            )
+
+    # Response cache with per-entry expiry
+    def cache_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def cache_set(self, key: str, value: str, ttl_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_seconds),
+            )
+            # Opportunistic eviction keeps the table from growing without bound
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+
+    # Batch jobs: results are appended in completion order so clients can poll with an offset
+    def create_job(self, job_id: str, total: int, retention_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO batch_jobs (job_id, status, total, created_at, updated_at) VALUES (?, 'running', ?, ?, ?)",
+                (job_id, total, now, now),
+            )
+            # Drop finished jobs past their retention along with their results
+            expired = "SELECT job_id FROM batch_jobs WHERE status != 'running' AND updated_at <= ?"
+            self._conn.execute(f"DELETE FROM batch_results WHERE job_id IN ({expired})", (now - retention_seconds,))
+            self._conn.execute(f"DELETE FROM batch_jobs WHERE job_id IN ({expired})", (now - retention_seconds,))
+
+    def add_job_result(self, job_id: str, seq: int, result: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO batch_results (job_id, seq, result) VALUES (?, ?, ?)", (job_id, seq, result)
+            )
+
+    def finish_job(self, job_id: str, status: str, summary: Optional[str] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE batch_jobs SET status = ?, summary = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, summary, error, time.time(), job_id),
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job row plus the number of results stored so far, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, total, summary, error, created_at, updated_at FROM batch_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            completed = self._conn.execute(
+                "SELECT COUNT(*) FROM batch_results WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        status, total, summary, error, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "completed": completed,
+            "summary": summary,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def job_results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM batch_results WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, offset, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
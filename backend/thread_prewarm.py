@@ -0,0 +1,148 @@
+# Pool of empty agent threads created ahead of time so new conversations skip threads.create
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Set, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Shortest sleep of the refill loop between checks, so a tiny TTL cannot make it spin
+MIN_SLEEP_SECONDS = 1.0
+
+
+class ThreadPrewarmer:
+    """
+    Keeps up to `size` empty threads ready for new conversations.
+
+    `take()` hands out a pooled thread without calling the service and wakes the
+    background task, which refills the pool with at most `refill_concurrency`
+    concurrent creations. Pooled threads older than `ttl` are deleted instead of
+    handed out, so a quiet worker does not keep stale threads forever. Failed
+    refills back off for `retry_delay` seconds; requests meanwhile create their
+    own thread as before.
+    """
+
+    def __init__(self, agent, size: int = 8, ttl: float = 1800.0, refill_concurrency: int = 4,
+                 retry_delay: float = 5.0):
+        self.agent = agent
+        self.size = size
+        self.ttl = ttl
+        self.refill_concurrency = refill_concurrency
+        self.retry_delay = retry_delay
+        # (thread id, created at) oldest first
+        self._pool: Deque[Tuple[str, float]] = deque()
+        self._creating = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._deletions: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, agent) -> Optional["ThreadPrewarmer"]:
+        """The prewarmer configured by the THREAD_POOL_* environment variables, or None when disabled."""
+        size = int(os.getenv("THREAD_POOL_SIZE", "0"))
+        if size <= 0:
+            return None
+        return cls(
+            agent,
+            size=size,
+            ttl=float(os.getenv("THREAD_POOL_TTL_SECONDS", "1800")),
+            refill_concurrency=int(os.getenv("THREAD_POOL_REFILL_CONCURRENCY", "4")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def take(self) -> Optional[str]:
+        """A fresh pooled thread id, or None when the pool is empty."""
+        self._reap()
+        thread_id = self._pool.popleft()[0] if self._pool else None
+        metrics.THREAD_POOL_TAKES.labels(result="hit" if thread_id else "miss").inc()
+        metrics.THREAD_POOL_SIZE.set(len(self._pool))
+        self._wake.set()
+        return thread_id
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop refilling and delete the threads still in the pool."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        while self._pool:
+            self._delete(self._pool.popleft()[0])
+        metrics.THREAD_POOL_SIZE.set(0)
+        if self._deletions:
+            await asyncio.gather(*self._deletions, return_exceptions=True)
+
+    async def fill(self) -> None:
+        """Create threads until the pool (counting creations in flight) holds `size`."""
+        semaphore = asyncio.Semaphore(self.refill_concurrency)
+
+        async def create_one() -> None:
+            async with semaphore:
+                thread = await self.agent._call_idempotent("threads_create", self.agent.client.agents.threads.create)
+            self._pool.append((thread.id, time.monotonic()))
+            metrics.THREAD_POOL_SIZE.set(len(self._pool))
+
+        missing = self.size - len(self._pool) - self._creating
+        if missing <= 0:
+            return
+        self._creating += missing
+        try:
+            results = await asyncio.gather(*(create_one() for _ in range(missing)), return_exceptions=True)
+        finally:
+            self._creating -= missing
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    async def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            self._reap()
+            try:
+                await self.fill()
+                timeout = self._next_expiry()
+            except Exception as e:
+                logger.warning(f"Refilling the thread pool failed: {str(e)}")
+                timeout = self.retry_delay
+            # Sleep until a take() or the next expiry; asyncio.wait, unlike wait_for, never swallows a cancel
+            wake = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait({wake}, timeout=max(timeout, MIN_SLEEP_SECONDS))
+            finally:
+                wake.cancel()
+
+    def _next_expiry(self) -> float:
+        """Seconds until the oldest pooled thread expires (the pool is in creation order)."""
+        if not self._pool:
+            return self.ttl
+        return max(0.0, self._pool[0][1] + self.ttl - time.monotonic())
+
+    def _reap(self) -> None:
+        """Delete pooled threads older than the TTL."""
+        now = time.monotonic()
+        while self._pool and now - self._pool[0][1] >= self.ttl:
+            self._delete(self._pool.popleft()[0])
+            metrics.THREAD_POOL_EXPIRED.inc()
+        metrics.THREAD_POOL_SIZE.set(len(self._pool))
+
+    def _delete(self, thread_id: str) -> None:
+        task = asyncio.create_task(self._delete_thread(thread_id))
+        self._deletions.add(task)
+        task.add_done_callback(self._deletions.discard)
+
+    async def _delete_thread(self, thread_id: str) -> None:
+        try:
+            await self.agent._call(self.agent.client.agents.threads.delete, thread_id)
+        except Exception as e:
+            logger.warning(f"Deleting pooled thread {thread_id} failed: {str(e)}")
@@ -0,0 +1,153 @@
+# Opt-in capture of anonymized /query traffic (timing, thread reuse, sizes) for replay by benchmarks/traffic_replay.py
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import secrets
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_PATHS = ("/query",)
+
+# Request and response bodies larger than this are counted but not parsed
+MAX_PARSED_BODY_BYTES = 1024 * 1024
+
+
+class TrafficRecorder:
+    """
+    Appends one JSON line per captured request to `path`.
+
+    Nothing identifying is written: no query or answer text, no client
+    identity, and thread ids only as a keyed hash so turns of one conversation
+    can be grouped. Each record is a single O_APPEND write, so several workers
+    can share one file; they must share `salt` too (TRAFFIC_CAPTURE_SALT) for
+    a conversation spread over workers to keep one thread hash.
+    """
+
+    def __init__(self, path: Path, salt: bytes, sample_rate: float = 1.0):
+        self.path = path
+        self.salt = salt
+        self.sample_rate = sample_rate
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+    @classmethod
+    def from_env(cls) -> Optional["TrafficRecorder"]:
+        """The recorder configured by TRAFFIC_CAPTURE_*, or None when TRAFFIC_CAPTURE_PATH is unset."""
+        path = os.getenv("TRAFFIC_CAPTURE_PATH")
+        if not path:
+            return None
+        salt = os.getenv("TRAFFIC_CAPTURE_SALT")
+        if not salt:
+            logger.warning("TRAFFIC_CAPTURE_SALT is unset; thread hashes are only consistent within this worker")
+        return cls(
+            Path(path),
+            salt=salt.encode() if salt else secrets.token_bytes(16),
+            sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0")),
+        )
+
+    def thread_hash(self, thread_id: str) -> str:
+        return hmac.new(self.salt, thread_id.encode(), hashlib.sha256).hexdigest()[:16]
+
+    def sampled(self, thread: Optional[str]) -> bool:
+        """Whole conversations are kept or dropped together so replayed threads stay complete."""
+        if self.sample_rate >= 1.0:
+            return True
+        if thread is None:
+            return random.random() < self.sample_rate
+        return int(thread[:8], 16) / 0x100000000 < self.sample_rate
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        if not self.sampled(entry["thread"]):
+            metrics.TRAFFIC_CAPTURE_RECORDS.labels(result="sampled_out").inc()
+            return
+        try:
+            os.write(self._fd, (json.dumps(entry, separators=(",", ":")) + "\n").encode())
+        except OSError as e:
+            metrics.TRAFFIC_CAPTURE_RECORDS.labels(result="failed").inc()
+            logger.warning(f"Could not write traffic capture record: {e}")
+            return
+        metrics.TRAFFIC_CAPTURE_RECORDS.labels(result="written").inc()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _json_body(body: bytearray) -> Dict[str, Any]:
+    if not body or len(body) > MAX_PARSED_BODY_BYTES:
+        return {}
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware recording the metadata of every captured request while
+    `recorder()` returns a recorder.
+
+    It tees the request and response bodies as they pass through instead of
+    buffering them, so streaming and the endpoint's own body parsing are
+    unaffected; the record is written once the response has been sent.
+    """
+
+    def __init__(self, app, recorder: Callable[[], Optional[TrafficRecorder]]):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        recorder = self.recorder()
+        if recorder is None or scope["type"] != "http" or scope["path"] not in CAPTURED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        started = time.perf_counter()
+        request_body = bytearray()
+        response_body = bytearray()
+        response = {"status": 0, "bytes": 0}
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request" and len(request_body) <= MAX_PARSED_BODY_BYTES:
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response["bytes"] += len(chunk)
+                if len(response_body) <= MAX_PARSED_BODY_BYTES:
+                    response_body.extend(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, capturing_receive, capturing_send)
+        finally:
+            request = _json_body(request_body)
+            # Follow-ups name their thread; a first turn's thread is only known from the answer
+            thread_id = request.get("thread_id") or _json_body(response_body).get("thread_id")
+            query = request.get("query")
+            recorder.record({
+                "t": round(started_at, 3),
+                "path": scope["path"],
+                "thread": recorder.thread_hash(thread_id) if isinstance(thread_id, str) and thread_id else None,
+                "follow_up": bool(request.get("thread_id")),
+                "query_chars": len(query) if isinstance(query, str) else 0,
+                "status": response["status"],
+                "response_bytes": response["bytes"],
+                "latency_s": round(time.perf_counter() - started, 4),
+            })
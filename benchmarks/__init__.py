@@ -0,0 +1 @@
+"""Benchmarks and load-testing harness backed by local fakes of the Azure services."""
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Interactive latency while one client floods the agent, with and without admission control.
+
+A few interactive users send queries at random (Poisson) intervals while one
+noisy integration sends `--flood` queries at once. The fake agents service
+processes at most `--run-capacity` runs at a time, like a run quota; further
+runs wait in the service in creation order. Scenarios:
+
+- no_flood: interactive users alone, the reference latency;
+- fifo: the flood with every query sent straight to the agent (no scheduler);
+- fair: the flood through the FairScheduler, all clients in the interactive lane;
+  weighted fair queuing gives each client an equal share of the slots;
+- lanes: as fair, with the noisy client configured for the batch lane, which
+  may hold at most `--batch-share` of the slots.
+
+    python -m benchmarks.admission_benchmark --flood 300 --run-capacity 16
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.admission import LANE_BATCH, LANE_INTERACTIVE, AdmittedAgent, ClientPolicy, FairScheduler
+from backend.intake_agent import IntakeAgent
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.load_test import WORKLOADS
+
+SCENARIOS = ("no_flood", "fifo", "fair", "lanes")
+NOISY_CLIENT = "noisy-integration"
+
+
+async def measure(scenario: str, args: argparse.Namespace) -> Dict[str, Any]:
+    config = FakeServiceConfig(seed=args.seed, time_scale=args.time_scale, run_capacity=args.run_capacity)
+    agent = await IntakeAgent.create(client=FakeProjectClient(config))
+    scheduler = None
+    if scenario in ("fair", "lanes"):
+        policies = {NOISY_CLIENT: ClientPolicy(lane=LANE_BATCH)} if scenario == "lanes" else {}
+        scheduler = FairScheduler(
+            max_concurrency=args.run_capacity,
+            batch_share=args.batch_share,
+            max_queue_per_client=args.flood,
+            queue_timeout=args.timeout,
+            policies=policies,
+        )
+
+    def client_agent(client: str):
+        if scheduler is None:
+            return agent
+        return AdmittedAgent(agent, scheduler, client, scheduler.lane_for(client, LANE_INTERACTIVE))
+
+    interactive: List[float] = []
+    flood: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def one(client: str, text: str, latencies: List[float]) -> None:
+        started = time.perf_counter()
+        result = await client_agent(client).query(text)
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+        if result["status"] == "success":
+            latencies.append(time.perf_counter() - started)
+
+    async def user(index: int) -> None:
+        rng = random.Random(f"{args.seed}:user:{index}")
+        tasks = []
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(rng.expovariate(args.interactive_rate))
+            text = f"{WORKLOADS[rng.randrange(len(WORKLOADS))]} (user {index}, query {len(tasks)})"
+            tasks.append(asyncio.create_task(one(f"user-{index}", text, interactive)))
+        await asyncio.gather(*tasks)
+
+    async def noisy() -> float:
+        await asyncio.sleep(args.flood_at)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            one(NOISY_CLIENT, f"{WORKLOADS[index % len(WORKLOADS)]} (sync {index})", flood)
+            for index in range(args.flood)
+        ))
+        return time.perf_counter() - started
+
+    try:
+        workers = [user(index) for index in range(args.interactive_users)]
+        flood_task = asyncio.create_task(noisy()) if scenario != "no_flood" else None
+        await asyncio.gather(*workers)
+        flood_s = await flood_task if flood_task else 0.0
+    finally:
+        await agent.cleanup()
+
+    return {
+        "scenario": scenario,
+        "interactive_s": summarize_latencies(interactive),
+        "flood_s": summarize_latencies(flood),
+        "flood_duration_s": flood_s,
+        "statuses": statuses,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for scenario in args.scenarios:
+        result = await measure(scenario, args)
+        results.append(result)
+        interactive, flood = result["interactive_s"], result["flood_s"]
+        print(
+            f"{scenario:8s}  interactive n={interactive['count']:3d}  p50={format_ms(interactive['p50'])}  "
+            f"p95={format_ms(interactive['p95'])}  p99={format_ms(interactive['p99'])}  "
+            f"flood done in {result['flood_duration_s']:.1f}s (p50={format_ms(flood['p50'])})  {result['statuses']}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--interactive-users", type=int, default=4)
+    parser.add_argument("--interactive-rate", type=float, default=0.5, help="Queries per second per user")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds interactive users keep sending")
+    parser.add_argument("--flood", type=int, default=300, help="Queries sent at once by the noisy client")
+    parser.add_argument("--flood-at", type=float, default=2.0, help="Seconds into the run the flood starts")
+    parser.add_argument("--run-capacity", type=int, default=16, help="Runs the fake service processes at once")
+    parser.add_argument("--batch-share", type=float, default=0.5)
+    parser.add_argument("--time-scale", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Scheduler queue timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("admission", {"config": vars(args) | {"output": None}, "results": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Throughput of /query/batch and batch jobs versus one POST /query per workload.
+
+A portfolio of workload descriptions, some of them repeated, is assessed three
+ways against the in-process app backed by the fake agents service:
+
+  sequential   one POST /query after another, as the portfolio scripts do today
+  parallel     POST /query with the same client-side concurrency as the batch
+  batch        a single POST /query/batch, reading the NDJSON stream
+  job          POST /query/batch/jobs, then polling the job until it completes
+
+    python -m benchmarks.batch_benchmark --items 200 --duplicate-ratio 0.2 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import batch
+from backend.intake_agent import IntakeAgent
+from benchmarks.common import save_results
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.load_test import WORKLOADS
+
+MODES = ("sequential", "parallel", "batch", "job")
+
+
+def build_portfolio(items: int, duplicate_ratio: float, seed: int) -> List[str]:
+    """Workload descriptions where roughly `duplicate_ratio` of them repeat an earlier one."""
+    rng = random.Random(seed)
+    portfolio: List[str] = []
+    for index in range(items):
+        if portfolio and rng.random() < duplicate_ratio:
+            portfolio.append(rng.choice(portfolio))
+        else:
+            portfolio.append(f"{WORKLOADS[index % len(WORKLOADS)]} (portfolio item {index})")
+    return portfolio
+
+
+async def per_request(client: httpx.AsyncClient, portfolio: List[str], concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    successes = 0
+
+    async def one(query: str) -> None:
+        nonlocal successes
+        async with semaphore:
+            response = await client.post("/query", json={"query": query}, timeout=300)
+            successes += response.status_code == 200 and response.json()["status"] == "success"
+
+    await asyncio.gather(*(one(query) for query in portfolio))
+    return successes
+
+
+async def batch_stream(client: httpx.AsyncClient, portfolio: List[str], concurrency: int) -> int:
+    body = {"queries": [{"query": query} for query in portfolio], "max_concurrency": concurrency}
+    successes = 0
+    async with client.stream("POST", "/query/batch", json=body, timeout=None) as response:
+        async for line in response.aiter_lines():
+            record = json.loads(line)
+            successes += record["type"] == "result" and record["status"] == "success"
+    return successes
+
+
+async def batch_job(client: httpx.AsyncClient, portfolio: List[str], concurrency: int, poll_interval: float) -> int:
+    body = {"queries": [{"query": query} for query in portfolio], "max_concurrency": concurrency}
+    status_url = (await client.post("/query/batch/jobs", json=body)).json()["status_url"]
+    offset, successes = 0, 0
+    while True:
+        job = (await client.get(status_url, params={"offset": offset})).json()
+        successes += sum(result["status"] == "success" for result in job["results"])
+        offset = job["next_offset"]
+        if job["status"] != "running" and offset >= job["total"]:
+            return successes
+        await asyncio.sleep(poll_interval)
+
+
+async def measure(mode: str, portfolio: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeProjectClient(FakeServiceConfig(seed=args.seed, time_scale=args.time_scale))
+    agent = await IntakeAgent.create(client=fake)
+    backend_app.agent = agent
+    backend_app.batch_jobs = batch.BatchJobManager(agent, agent.state)
+    transport = httpx.ASGITransport(app=backend_app.app)
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+            if mode == "sequential":
+                successes = await per_request(client, portfolio, 1)
+            elif mode == "parallel":
+                successes = await per_request(client, portfolio, args.concurrency)
+            elif mode == "batch":
+                successes = await batch_stream(client, portfolio, args.concurrency)
+            else:
+                successes = await batch_job(client, portfolio, args.concurrency, args.poll_interval)
+        duration = time.perf_counter() - started
+    finally:
+        await backend_app.batch_jobs.shutdown()
+        await agent.cleanup()
+        backend_app.agent = backend_app.batch_jobs = None
+
+    return {
+        "mode": mode,
+        "items": len(portfolio),
+        "successes": successes,
+        "duration_s": duration,
+        "items_per_s": len(portfolio) / duration if duration else 0.0,
+        "agent_runs": fake.agents.stats["runs_created"],
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    portfolio = build_portfolio(args.items, args.duplicate_ratio, args.seed)
+    print(f"{len(portfolio)} items, {len(set(portfolio))} unique, concurrency {args.concurrency}")
+    results = []
+    for mode in args.modes:
+        result = await measure(mode, portfolio, args)
+        results.append(result)
+        print(
+            f"{mode:<10}  {result['duration_s']:7.2f}s  items/s={result['items_per_s']:6.2f}  "
+            f"runs={result['agent_runs']:4d}  ok={result['successes']}/{result['items']}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=batch.BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="seconds between job status polls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=0.25, help="multiplier for every fake service latency")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("batch", {"config": vars(args) | {"output": None}, "results": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Shared helpers for the benchmark scripts: latency statistics and result files
+import json
+import math
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(latencies: Sequence[float]) -> Dict[str, float]:
+    """Return count, mean and p50/p95/p99/max of a list of latencies in seconds."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+def git_commit() -> str:
+    """Short hash of the current commit, or "unknown" outside a git checkout."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name: str, payload: Dict[str, Any], output: Optional[Path] = None) -> Path:
+    """Write benchmark results as JSON tagged with the commit and a timestamp."""
+    commit = git_commit()
+    document = {"benchmark": name, "commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **payload}
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"{name}-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(document, indent=2))
+    return output
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f} ms"
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Per-turn latency and prompt tokens of long conversations with and without compaction.
+
+Each conversation opens with a workload description and continues with follow-up
+questions on the same thread_id. Conversations run one after another so the token
+counters can be attributed to a single turn; a compaction running in the
+background is charged to the turn that waits for it.
+
+    python -m benchmarks.compaction_benchmark --turns 50 --conversations 3 --max-turns 10
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from benchmarks.common import format_ms, save_results
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.load_test import FOLLOW_UPS, WORKLOADS
+
+REPORT_TURNS = (5, 20, 50)
+
+
+async def conversation(agent: IntakeAgent, index: int, turns: int) -> List[Dict[str, float]]:
+    """Run one conversation and return latency and tokens for every turn."""
+    per_turn = []
+    thread_id = None
+    for turn in range(1, turns + 1):
+        if turn == 1:
+            query = WORKLOADS[index % len(WORKLOADS)]
+        else:
+            query = f"{FOLLOW_UPS[turn % len(FOLLOW_UPS)]} (turn {turn})"
+        tokens_before = metrics.RUN_PROMPT_TOKENS.value
+        started = time.perf_counter()
+        result = await agent.query(query, thread_id=thread_id)
+        latency = time.perf_counter() - started
+        assert result["status"] == "success", result
+        assert thread_id in (None, result["thread_id"]), "thread_id changed during the conversation"
+        thread_id = result["thread_id"]
+        per_turn.append({"latency_s": latency, "prompt_tokens": metrics.RUN_PROMPT_TOKENS.value - tokens_before})
+    # Let a compaction started by the last turn finish so it does not leak into the next conversation
+    await asyncio.gather(*agent._compactions.values())
+    return per_turn
+
+
+async def measure(compaction: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    client = FakeProjectClient(FakeServiceConfig(seed=args.seed, time_scale=args.time_scale))
+    agent = await IntakeAgent.create(client=client)
+    agent.compaction_max_turns = args.max_turns if compaction else 0
+    agent.compaction_max_prompt_tokens = args.max_prompt_tokens if compaction else 0
+    compactions_before = metrics.COMPACTIONS.labels(result="compacted").value
+    try:
+        conversations = [await conversation(agent, index, args.turns) for index in range(args.conversations)]
+    finally:
+        await agent.cleanup()
+
+    def at(turn: int, key: str) -> float:
+        return sum(turns[turn - 1][key] for turns in conversations) / len(conversations)
+
+    report_turns = [turn for turn in REPORT_TURNS if turn <= args.turns]
+    all_turns = [turn for turns in conversations for turn in turns]
+    return {
+        "mode": "compaction" if compaction else "no_compaction",
+        "turns": {
+            turn: {"latency_s": at(turn, "latency_s"), "prompt_tokens": at(turn, "prompt_tokens")}
+            for turn in report_turns
+        },
+        "mean_latency_s": sum(turn["latency_s"] for turn in all_turns) / len(all_turns),
+        "prompt_tokens_total": sum(turn["prompt_tokens"] for turn in all_turns),
+        "compactions": metrics.COMPACTIONS.labels(result="compacted").value - compactions_before,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for compaction in (False, True):
+        result = await measure(compaction, args)
+        results.append(result)
+        turns = "  ".join(
+            f"turn {turn}: {format_ms(values['latency_s'])} / {values['prompt_tokens']:.0f} tok"
+            for turn, values in result["turns"].items()
+        )
+        print(
+            f"{result['mode']:<14} {turns}  mean={format_ms(result['mean_latency_s'])}  "
+            f"prompt_tokens={result['prompt_tokens_total']:.0f}  compactions={result['compactions']:.0f}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--max-turns", type=int, default=10, help="compaction turn budget")
+    parser.add_argument("--max-prompt-tokens", type=int, default=16000, help="compaction prompt token budget")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=0.5, help="multiplier for every fake service latency")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("compaction", {"config": vars(args) | {"output": None}, "results": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Bytes and latency of architecture diagrams served by /diagrams.
+
+Every page of the PDFs in data/ is rendered at 300 DPI as a stand-in for an
+extracted figure, and the ingestion's WebP variants are written next to it. A
+uvicorn worker serving `benchmarks.fake_app:app` then serves them from a fresh
+disk cache whose source is that directory (a local stand-in for blob storage).
+For each size the benchmark records the response size, the first (cache miss)
+request, `--requests` cache hits at `--concurrency`, revalidations answered 304,
+and the transfer time of one response on a `--mbps` client link.
+
+    python -m benchmarks.diagram_benchmark --requests 500 --concurrency 16 --mbps 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+import httpx
+
+# Add the project root and the scripts directory to the Python path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from backend.catalog import write_catalog
+from backend.diagrams import VARIANTS
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.worker_scaling import wait_until_healthy
+from diagram_variants import write_variants
+
+
+def build_figures(pdfs: List[Path], figures_dir: Path, catalog_path: Path, dpi: int) -> List[str]:
+    """Render every page as a figure with its variants and write a catalog pointing at them; returns the ids."""
+    records = []
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            for page in doc:
+                name = f"{pdf.stem.replace(' ', '_')}_{page.number:03}.png"
+                page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), alpha=False).save(figures_dir / name)
+                write_variants(figures_dir / name)
+                records.append({
+                    "id": f"arch-{len(records)}",
+                    "name": name,
+                    "architecture_url": f"https://example.blob.core.windows.net/figures/{name}",
+                })
+    write_catalog(catalog_path, records, [[0.0]] * len(records))
+    return [record["id"] for record in records]
+
+
+def start_server(port: int, tmp: Path) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        ARCHITECTURE_CATALOG_PATH=str(tmp / "catalog.bin"),
+        DIAGRAM_SOURCE_DIR=str(tmp / "figures"),
+        DIAGRAM_CACHE_DIR=str(tmp / "cache"),
+        FAKE_AGENTS_TIME_SCALE="0.01",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+async def timed_get(client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None):
+    started = time.perf_counter()
+    response = await client.get(url, headers=headers)
+    return time.perf_counter() - started, response
+
+
+async def measure_size(client: httpx.AsyncClient, ids: List[str], size: str, args: argparse.Namespace) -> Dict[str, Any]:
+    urls = [f"/diagrams/{architecture_id}?size={size}" for architecture_id in ids]
+    cold, etags, lengths = [], {}, []
+    for url in urls:
+        elapsed, response = await timed_get(client, url)
+        response.raise_for_status()
+        cold.append(elapsed)
+        etags[url] = response.headers["etag"]
+        lengths.append(len(response.content))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def repeat(index: int, conditional: bool):
+        url = urls[index % len(urls)]
+        async with semaphore:
+            return await timed_get(client, url, {"If-None-Match": etags[url]} if conditional else None)
+
+    warm = await asyncio.gather(*(repeat(index, False) for index in range(args.requests)))
+    revalidated = await asyncio.gather(*(repeat(index, True) for index in range(args.requests)))
+    assert all(response.status_code == 304 for _, response in revalidated)
+    mean_bytes = sum(lengths) / len(lengths)
+    return {
+        "size": size,
+        "mean_bytes": mean_bytes,
+        "transfer_s_at_link": mean_bytes * 8 / (args.mbps * 1_000_000),
+        "miss_s": summarize_latencies(cold),
+        "hit_s": summarize_latencies([elapsed for elapsed, _ in warm]),
+        "not_modified_s": summarize_latencies([elapsed for elapsed, _ in revalidated]),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "figures").mkdir()
+        ids = build_figures(sorted((ROOT / "data").glob("*.pdf")), tmp / "figures", tmp / "catalog.bin", args.dpi)
+        print(f"{len(ids)} figures rendered at {args.dpi} DPI")
+        server = start_server(args.port, tmp)
+        base_url = f"http://127.0.0.1:{args.port}"
+        results = []
+        try:
+            await wait_until_healthy(base_url)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                for size in args.sizes:
+                    result = await measure_size(client, ids, size, args)
+                    results.append(result)
+                    print(
+                        f"{size:9s}  {result['mean_bytes'] / 1024:8.1f} KB  "
+                        f"miss p50={format_ms(result['miss_s']['p50'])}  "
+                        f"hit p50={format_ms(result['hit_s']['p50'])} p95={format_ms(result['hit_s']['p95'])}  "
+                        f"304 p50={format_ms(result['not_modified_s']['p50'])}  "
+                        f"transfer at {args.mbps:g} Mbit/s={format_ms(result['transfer_s_at_link'])}"
+                    )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=VARIANTS, default=["full", "preview", "thumbnail"])
+    parser.add_argument("--requests", type=int, default=500, help="Cache hits and 304s measured per size")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mbps", type=float, default=20.0, help="Client link speed for the transfer estimate")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("diagrams", {"config": vars(args) | {"output": None}, "sizes": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
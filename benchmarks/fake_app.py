@@ -0,0 +1,26 @@
+"""
+`backend.app:app` wired to the local fake agents service.
+
+Run it like the real server when benchmarking over HTTP:
+
+    uvicorn benchmarks.fake_app:app --port 8000
+
+FAKE_AGENTS_TIME_SCALE and FAKE_AGENTS_SEED tune the fake service.
+"""
+
+import os
+
+from backend import app as backend_app
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+
+def _fake_client() -> FakeProjectClient:
+    config = FakeServiceConfig(
+        seed=int(os.getenv("FAKE_AGENTS_SEED", "0")),
+        time_scale=float(os.getenv("FAKE_AGENTS_TIME_SCALE", "1.0")),
+    )
+    return FakeProjectClient(config)
+
+
+backend_app.agent_client_factory = _fake_client
+app = backend_app.app
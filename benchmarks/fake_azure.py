@@ -0,0 +1,594 @@
+# Local stand-ins for the Azure AI Agents service and Azure AI Search used by the benchmarks
+import heapq
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from azure.ai.projects.models import ConnectionType
+from azure.core.exceptions import HttpResponseError
+
+TERMINAL_RUN_STATUSES = ("completed", "failed", "cancelled", "expired")
+
+# Questions the fake model answers with a call to the catalog's service lookup function
+SERVICE_LOOKUP_FUNCTION = "find_architectures_by_service"
+_SERVICE_QUESTION = re.compile(r"\b(?:use|uses|using|with)\s+(.+?)\s*(?:[?.!]|$)", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class LatencyProfile:
+    """Latency of one fake API operation: uniform in [mean - jitter, mean + jitter]."""
+
+    mean: float
+    jitter: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if not self.jitter:
+            return max(0.0, self.mean)
+        return max(0.0, rng.uniform(self.mean - self.jitter, self.mean + self.jitter))
+
+
+@dataclass
+class FakeServiceConfig:
+    """
+    Knobs for the fake agents service.
+
+    All latencies are in seconds and are multiplied by `time_scale`, so a whole
+    benchmark can be sped up without changing the relative cost of each call.
+    """
+
+    seed: int = 0
+    time_scale: float = 1.0
+    thread_create: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.08, 0.02))
+    thread_delete: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.05, 0.01))
+    message_create: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.06, 0.02))
+    message_list_page: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.06, 0.02))
+    run_create: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.07, 0.02))
+    run_get: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.04, 0.01))
+    # Model time: queueing + time to first token + decode speed + prompt processing
+    run_queue: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.15, 0.05))
+    run_per_output_token: float = 0.01
+    run_per_input_token: float = 0.00005
+    search_tool: LatencyProfile = field(default_factory=lambda: LatencyProfile(0.25, 0.08))
+    # Number of tokens in generated answers
+    min_response_tokens: int = 30
+    max_response_tokens: int = 400
+    # Messages per page returned by messages.list when no limit is given (service default)
+    page_size: int = 20
+    # Probability that any API call raises an HttpResponseError
+    error_rate: float = 0.0
+    # Probability that a run ends in the "failed" status
+    run_failure_rate: float = 0.0
+    # Model speed relative to the agent's deployment, by the `model` a run overrides it with
+    model_speed: Dict[str, float] = field(default_factory=dict)
+    # Runs the service processes at once (the run quota); later runs stay queued until one
+    # finishes, in creation order. 0 = unlimited.
+    run_capacity: int = 0
+
+    def sleep(self, profile: LatencyProfile, rng: random.Random) -> float:
+        delay = profile.sample(rng) * self.time_scale
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+@dataclass
+class FakeSearchDocument:
+    id: str
+    name: str
+    content: str
+    architecture_url: str = ""
+    category: str = ""
+
+
+class FakeSearchIndex:
+    """In-memory stand-in for an Azure AI Search index with simple term-overlap ranking."""
+
+    def __init__(self, documents: Optional[List[FakeSearchDocument]] = None):
+        self.documents: List[FakeSearchDocument] = list(documents or default_search_documents())
+        self._terms = [set(_tokenize(f"{doc.name} {doc.content}")) for doc in self.documents]
+
+    def search(self, search_text: str, top: int = 5, category: Optional[str] = None) -> List[FakeSearchDocument]:
+        query_terms = set(_tokenize(search_text))
+        scored = []
+        for position, (doc, terms) in enumerate(zip(self.documents, self._terms)):
+            if category and doc.category != category:
+                continue
+            score = len(query_terms & terms)
+            if score:
+                scored.append((-score, position, doc))
+        scored.sort()
+        return [doc for _, _, doc in scored[:top]]
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for token in "".join(c.lower() if c.isalnum() else " " for c in text).split() if len(token) > 2]
+
+
+def default_search_documents() -> List[FakeSearchDocument]:
+    """A small synthetic catalog resembling the analytics and migration pattern PDFs."""
+    patterns = [
+        ("Batch ingestion to a data lake", "analytics", "Data Factory, Data Lake Storage, Databricks, Synapse Analytics"),
+        ("Real-time streaming analytics", "analytics", "Event Hubs, Stream Analytics, Cosmos DB, Power BI"),
+        ("Lakehouse with medallion layers", "analytics", "Databricks, Data Lake Storage, Unity Catalog, Power BI"),
+        ("Enterprise data warehouse", "analytics", "Synapse Analytics, Data Factory, Purview, Power BI"),
+        ("IoT telemetry analytics", "analytics", "IoT Hub, Event Hubs, Data Explorer, Time Series Insights"),
+        ("Lift and shift of SQL Server", "migration", "SQL Managed Instance, Database Migration Service, ExpressRoute"),
+        ("Oracle to PostgreSQL migration", "migration", "Database for PostgreSQL, Database Migration Service"),
+        ("Hadoop to Databricks migration", "migration", "Databricks, Data Lake Storage, Data Factory"),
+        ("Mainframe batch offload", "migration", "Logic Apps, Service Bus, Kubernetes Service, SQL Database"),
+        ("File share migration", "migration", "Azure Files, File Sync, Data Box"),
+    ]
+    return [
+        FakeSearchDocument(
+            id=f"arch-{index:03}",
+            name=name,
+            category=category,
+            content=f"{name}. Azure services: {services}.",
+            architecture_url=f"https://example.blob.core.windows.net/figures/arch-{index:03}.png",
+        )
+        for index, (name, category, services) in enumerate(patterns)
+    ]
+
+
+class _FakeRun:
+    """Server-side state of a run; status is derived from the clock when it is read."""
+
+    def __init__(self, run_id: str, thread_id: str, agent_id: str, created: float, starts: float, completes: float,
+                 response_text: str, prompt_tokens: int, completion_tokens: int, fails: bool):
+        self.id = run_id
+        self.thread_id = thread_id
+        self.agent_id = agent_id
+        self.created = created
+        self.starts = starts
+        self.completes = completes
+        self.response_text = response_text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.fails = fails
+        self.cancelled_at: Optional[float] = None
+        # Function calls the run waits on from `completes` until their outputs are submitted
+        self.tool_calls: Optional[List[Any]] = None
+
+    def status(self, now: float) -> str:
+        if self.cancelled_at is not None:
+            return "cancelled"
+        if now < self.starts:
+            return "queued"
+        if self.tool_calls is not None and now >= self.completes:
+            return "requires_action"
+        if now < self.completes:
+            return "in_progress"
+        return "failed" if self.fails else "completed"
+
+
+class _FakeThreads:
+    def __init__(self, service: "FakeAgentsClient"):
+        self._service = service
+
+    def create(self, tool_resources: Any = None, messages: Any = None, metadata: Any = None, **kwargs) -> Any:
+        service = self._service
+        rng = service._rng("threads.create")
+        service._maybe_fail(rng)
+        service.config.sleep(service.config.thread_create, rng)
+        thread_id = f"thread_{uuid.uuid4().hex[:24]}"
+        with service._lock:
+            service._threads[thread_id] = []
+            service.stats["threads_created"] += 1
+        return SimpleNamespace(id=thread_id, tool_resources=tool_resources, metadata=metadata)
+
+    def get(self, thread_id: str, **kwargs) -> Any:
+        service = self._service
+        rng = service._rng("threads.get")
+        service._maybe_fail(rng)
+        service.config.sleep(service.config.run_get, rng)
+        return SimpleNamespace(id=thread_id)
+
+    def delete(self, thread_id: str, **kwargs) -> Any:
+        service = self._service
+        rng = service._rng("threads.delete")
+        service._maybe_fail(rng)
+        service.config.sleep(service.config.thread_delete, rng)
+        with service._lock:
+            service._threads.pop(thread_id, None)
+            service.stats["threads_deleted"] += 1
+        return SimpleNamespace(id=thread_id, deleted=True)
+
+
+class _FakeMessages:
+    def __init__(self, service: "FakeAgentsClient"):
+        self._service = service
+
+    def create(self, thread_id: str, role: str = "user", content: str = "", **kwargs) -> Any:
+        service = self._service
+        rng = service._rng("messages.create")
+        service._maybe_fail(rng)
+        service.config.sleep(service.config.message_create, rng)
+        return service._append_message(thread_id, str(getattr(role, "value", role)), content)
+
+    def list(self, thread_id: str, run_id: Optional[str] = None, limit: Optional[int] = None,
+             order: Any = "desc", **kwargs) -> Iterator[Any]:
+        """Lazily page through messages like `ItemPaged`: each page costs one round trip."""
+        service = self._service
+        page_size = limit or service.config.page_size
+        order_value = str(getattr(order, "value", order) or "desc")
+
+        def pages() -> Iterator[Any]:
+            rng = service._rng("messages.list")
+            with service._lock:
+                messages = list(service._thread_messages(thread_id))
+            if run_id is not None:
+                messages = [message for message in messages if message.run_id == run_id]
+            if order_value == "desc":
+                messages.reverse()
+            for start in range(0, max(len(messages), 1), page_size):
+                service._maybe_fail(rng)
+                service.config.sleep(service.config.message_list_page, rng)
+                with service._lock:
+                    service.stats["message_pages"] += 1
+                yield from messages[start:start + page_size]
+
+        return pages()
+
+
+class _FakeRuns:
+    def __init__(self, service: "FakeAgentsClient"):
+        self._service = service
+
+    def create(self, thread_id: str, agent_id: str = "", **kwargs) -> Any:
+        service = self._service
+        config = service.config
+        rng = service._rng("runs.create")
+        service._maybe_fail(rng)
+        config.sleep(config.run_create, rng)
+
+        with service._lock:
+            history = list(service._thread_messages(thread_id))
+            agent = service._agent(agent_id)
+        last_user = next((m for m in reversed(history) if m.role == "user"), None)
+        query = last_user.content[0].text.value if last_user else ""
+
+        # Deterministic per (query, turn) so results do not depend on scheduling order or ids
+        answer_rng = random.Random(f"{config.seed}:{query}:{len(history)}")
+        completion_tokens = answer_rng.randint(config.min_response_tokens, config.max_response_tokens)
+        if kwargs.get("max_completion_tokens"):
+            completion_tokens = min(completion_tokens, kwargs["max_completion_tokens"])
+        prompt_tokens = sum(estimate_tokens(m.content[0].text.value) for m in history)
+        if agent is not None:
+            prompt_tokens += estimate_tokens(agent.instructions or "")
+        prompt_tokens += estimate_tokens(kwargs.get("additional_instructions") or "")
+
+        model_time = config.run_queue.sample(answer_rng)
+        # tool_choice="none" (or an empty tools override) keeps the model from calling tools for this run
+        use_tools = str(getattr(kwargs.get("tool_choice"), "value", kwargs.get("tool_choice"))) != "none"
+        use_tools = use_tools and kwargs.get("tools") != []
+        tool_calls = _service_lookup_call(query, agent) if use_tools else None
+        if tool_calls:
+            # The model asks for the function instead of searching; the answer is composed on submit
+            matches = []
+        elif agent is not None and agent.tools and use_tools and service.search_index is not None:
+            model_time += config.search_tool.sample(answer_rng)
+            category, top = _search_overrides(kwargs.get("tool_resources"))
+            matches = service.search_index.search(query, top=top, category=category)
+            with service._lock:
+                service.stats["searches"] += 1
+                service.stats["searches_filtered"] += category is not None
+            # Retrieved documents are added to the model's context
+            prompt_tokens += sum(estimate_tokens(doc.content) for doc in matches)
+        else:
+            matches = []
+        queue_time = model_time * 0.25
+        speed = config.model_speed.get(kwargs.get("model"), 1.0)
+        model_time += (prompt_tokens * config.run_per_input_token + completion_tokens * config.run_per_output_token) / speed
+        if kwargs.get("model"):
+            with service._lock:
+                service.stats["runs_model_override"] += 1
+
+        now = time.monotonic()
+        begins = now
+        if config.run_capacity:
+            with service._lock:
+                # The run takes the capacity slot that frees up first
+                begins = max(now, heapq.heappop(service._run_slots))
+                heapq.heappush(service._run_slots, begins + model_time * config.time_scale)
+        run_id = f"run_{uuid.uuid4().hex[:24]}"
+        run = _FakeRun(
+            run_id=run_id,
+            thread_id=thread_id,
+            agent_id=agent_id,
+            created=now,
+            starts=begins + queue_time * config.time_scale,
+            completes=begins + model_time * config.time_scale,
+            response_text=_compose_answer(query, matches, completion_tokens),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            fails=answer_rng.random() < config.run_failure_rate,
+        )
+        run.tool_calls = tool_calls
+        with service._lock:
+            service._runs[run_id] = run
+            service._pending_runs.setdefault(thread_id, []).append(run)
+            service.stats["runs_created"] += 1
+        return service._snapshot(run)
+
+    def get(self, thread_id: str, run_id: str, **kwargs) -> Any:
+        service = self._service
+        rng = service._rng("runs.get")
+        service._maybe_fail(rng)
+        service.config.sleep(service.config.run_get, rng)
+        with service._lock:
+            run = service._runs[run_id]
+            service.stats["run_polls"] += 1
+        return service._snapshot(run)
+
+    def submit_tool_outputs(self, thread_id: str, run_id: str, tool_outputs: List[Any], **kwargs) -> Any:
+        """Resume a run waiting on function calls; it completes after reading the outputs."""
+        service = self._service
+        config = service.config
+        rng = service._rng("runs.submit_tool_outputs")
+        service._maybe_fail(rng)
+        config.sleep(config.run_create, rng)
+        with service._lock:
+            run = service._runs[run_id]
+            now = time.monotonic()
+            if run.status(now) != "requires_action":
+                raise HttpResponseError(message=f"Run {run_id} is not waiting for tool outputs")
+            outputs = [str(getattr(output, "output", None) or output["output"]) for output in tool_outputs]
+            input_tokens = sum(estimate_tokens(output) for output in outputs)
+            run.tool_calls = None
+            run.prompt_tokens += input_tokens
+            run.response_text = _compose_lookup_answer(outputs, run.completion_tokens)
+            model_time = (
+                config.run_queue.mean
+                + input_tokens * config.run_per_input_token
+                + run.completion_tokens * config.run_per_output_token
+            )
+            run.completes = now + model_time * config.time_scale
+            service.stats["tool_outputs_submitted"] += len(outputs)
+        return service._snapshot(run)
+
+    def cancel(self, thread_id: str, run_id: str, **kwargs) -> Any:
+        service = self._service
+        rng = service._rng("runs.cancel")
+        service._maybe_fail(rng)
+        service.config.sleep(service.config.run_get, rng)
+        with service._lock:
+            run = service._runs[run_id]
+            if run.status(time.monotonic()) not in TERMINAL_RUN_STATUSES:
+                run.cancelled_at = time.monotonic()
+                service.stats["runs_cancelled"] += 1
+        return service._snapshot(run)
+
+    def create_and_process(self, thread_id: str, agent_id: str = "", polling_interval: float = 1, **kwargs) -> Any:
+        """Mirror the SDK helper: create the run, then sleep `polling_interval` between polls."""
+        run = self.create(thread_id=thread_id, agent_id=agent_id, **kwargs)
+        while run.status not in TERMINAL_RUN_STATUSES:
+            time.sleep(polling_interval * self._service.config.time_scale)
+            run = self.get(thread_id=thread_id, run_id=run.id)
+        return run
+
+
+class _FakeConnections:
+    def __init__(self, service: "FakeAgentsClient"):
+        self._service = service
+
+    def list(self, **kwargs) -> List[Any]:
+        if self._service.search_index is None:
+            return []
+        return [SimpleNamespace(id="fake-search-connection", name="fake-search", type=ConnectionType.AZURE_AI_SEARCH)]
+
+
+class FakeAgentsClient:
+    """
+    In-process imitation of `AIProjectClient.agents` (threads, messages, runs).
+
+    Calls block with `time.sleep` like the synchronous SDK does. Runs progress
+    with the wall clock: queued -> in_progress -> completed, and the assistant
+    message is only visible once the run has completed.
+    """
+
+    def __init__(self, config: Optional[FakeServiceConfig] = None, search_index: Optional[FakeSearchIndex] = None):
+        self.config = config or FakeServiceConfig()
+        self.search_index = search_index
+        self.threads = _FakeThreads(self)
+        self.messages = _FakeMessages(self)
+        self.runs = _FakeRuns(self)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._agents: Dict[str, Any] = {}
+        self._threads: Dict[str, List[Any]] = {}
+        self._runs: Dict[str, _FakeRun] = {}
+        self._pending_runs: Dict[str, List[_FakeRun]] = {}
+        # Time at which each run capacity slot is free again (min-heap)
+        self._run_slots: List[float] = [0.0] * self.config.run_capacity
+        self.stats: Dict[str, int] = {
+            "threads_created": 0, "threads_deleted": 0, "messages_created": 0, "message_pages": 0,
+            "runs_created": 0, "run_polls": 0, "runs_cancelled": 0, "errors_injected": 0,
+            "searches": 0, "searches_filtered": 0, "tool_outputs_submitted": 0, "runs_model_override": 0,
+        }
+
+    def _rng(self, operation: str) -> random.Random:
+        # Each call gets its own generator so concurrent callers never share state
+        return random.Random(f"{self.config.seed}:{operation}:{next(self._counter)}")
+
+    def _maybe_fail(self, rng: random.Random) -> None:
+        if self.config.error_rate and rng.random() < self.config.error_rate:
+            with self._lock:
+                self.stats["errors_injected"] += 1
+            raise HttpResponseError(message="Injected failure from the fake agents service")
+
+    def _agent(self, agent_id: str) -> Any:
+        """Look up an agent definition (lock held); ids created by other processes are adopted."""
+        agent = self._agents.get(agent_id)
+        if agent is None:
+            agent = self._agents[agent_id] = SimpleNamespace(
+                id=agent_id, model="", name="", instructions="",
+                tools=[{"type": "azure_ai_search"}] if self.search_index is not None else [], tool_resources=None,
+            )
+        return agent
+
+    def _thread_messages(self, thread_id: str) -> List[Any]:
+        self._finalize_runs(thread_id)
+        # Unknown ids are created lazily so several worker processes can share thread ids
+        return self._threads.setdefault(thread_id, [])
+
+    def _finalize_runs(self, thread_id: str) -> None:
+        """Append the assistant message of every run that completed since the last read (lock held)."""
+        pending = self._pending_runs.get(thread_id)
+        if not pending:
+            return
+        now = time.monotonic()
+        for run in list(pending):
+            status = run.status(now)
+            if status in TERMINAL_RUN_STATUSES:
+                pending.remove(run)
+            if status == "completed":
+                self._threads.setdefault(thread_id, []).append(
+                    _make_message(thread_id, "assistant", run.response_text, run.id, run.completes)
+                )
+
+    def _append_message(self, thread_id: str, role: str, content: str) -> Any:
+        message = _make_message(thread_id, role, content, None, time.monotonic())
+        with self._lock:
+            self._thread_messages(thread_id).append(message)
+            self.stats["messages_created"] += 1
+        return message
+
+    def _snapshot(self, run: _FakeRun) -> Any:
+        now = time.monotonic()
+        status = run.status(now)
+        if status == "completed":
+            with self._lock:
+                self._finalize_runs(run.thread_id)
+        completed_at = None
+        if status in ("completed", "failed"):
+            completed_at = _wall_clock(run.completes)
+        usage = None
+        if status == "completed":
+            usage = SimpleNamespace(
+                prompt_tokens=run.prompt_tokens,
+                completion_tokens=run.completion_tokens,
+                total_tokens=run.prompt_tokens + run.completion_tokens,
+            )
+        return SimpleNamespace(
+            id=run.id,
+            thread_id=run.thread_id,
+            agent_id=run.agent_id,
+            status=status,
+            usage=usage,
+            completed_at=completed_at,
+            required_action=SimpleNamespace(
+                type="submit_tool_outputs", submit_tool_outputs=SimpleNamespace(tool_calls=list(run.tool_calls))
+            ) if status == "requires_action" else None,
+            last_error=SimpleNamespace(code="server_error", message="Injected run failure") if status == "failed" else None,
+        )
+
+    # Agent definitions
+    def create_agent(self, model: str = "", name: str = "", instructions: str = "", tools: Any = None,
+                     tool_resources: Any = None, **kwargs) -> Any:
+        agent = SimpleNamespace(
+            id=f"asst_{uuid.uuid4().hex[:24]}", model=model, name=name,
+            instructions=instructions, tools=tools or [], tool_resources=tool_resources,
+        )
+        with self._lock:
+            self._agents[agent.id] = agent
+        return agent
+
+    def get_agent(self, agent_id: str, **kwargs) -> Any:
+        rng = self._rng("agents.get")
+        self._maybe_fail(rng)
+        self.config.sleep(self.config.run_get, rng)
+        with self._lock:
+            return self._agent(agent_id)
+
+    def delete_agent(self, agent_id: str, **kwargs) -> None:
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+
+class FakeProjectClient:
+    """Stand-in for `AIProjectClient` exposing `.agents` and `.connections`."""
+
+    def __init__(self, config: Optional[FakeServiceConfig] = None, search_index: Optional[FakeSearchIndex] = None):
+        self.agents = FakeAgentsClient(config, search_index if search_index is not None else FakeSearchIndex())
+        self.connections = _FakeConnections(self.agents)
+
+
+def _search_overrides(tool_resources: Any) -> Tuple[Optional[str], int]:
+    """Category filter and top_k of a per-run Azure AI Search tool resource (defaults: none, 5 like the SDK)."""
+    search = getattr(tool_resources, "azure_ai_search", None) if tool_resources is not None else None
+    index_list = getattr(search, "index_list", None) or []
+    if not index_list:
+        return None, 5
+    resource = index_list[0]
+    match = re.search(r"categories/any\(c: c eq '([^']*)'\)", getattr(resource, "filter", None) or "")
+    return (match.group(1) if match else None), (getattr(resource, "top_k", None) or 5)
+
+
+def _service_lookup_call(query: str, agent: Any) -> Optional[List[Any]]:
+    """Function call for "which architectures use A and B" questions when the agent has the lookup tool."""
+    names = {getattr(getattr(tool, "function", None), "name", None) for tool in (getattr(agent, "tools", None) or [])}
+    match = _SERVICE_QUESTION.search(query)
+    if SERVICE_LOOKUP_FUNCTION not in names or not match:
+        return None
+    services = match.group(1)
+    key = "any_of" if re.search(r"\bor\b", services) else "all_of"
+    arguments = {key: [part.strip() for part in re.split(r",|\band\b|\bor\b", services) if part.strip()]}
+    return [SimpleNamespace(
+        id=f"call_{uuid.uuid4().hex[:24]}",
+        type="function",
+        function=SimpleNamespace(name=SERVICE_LOOKUP_FUNCTION, arguments=json.dumps(arguments)),
+    )]
+
+
+def _compose_lookup_answer(outputs: List[str], tokens: int) -> str:
+    """Answer built from the function outputs: the architectures the lookup returned."""
+    names = []
+    for output in outputs:
+        try:
+            names.extend(item["name"] for item in json.loads(output).get("items", []))
+        except (ValueError, AttributeError, KeyError, TypeError):
+            continue
+    if not names:
+        return "No architecture in the catalog uses that combination of services."
+    return ("Architectures in the catalog that use these services: " + "; ".join(names) + ".")[: max(tokens, 50) * 4]
+
+
+def _wall_clock(monotonic_ts: float) -> datetime:
+    return datetime.fromtimestamp(time.time() - (time.monotonic() - monotonic_ts), tz=timezone.utc)
+
+
+def _make_message(thread_id: str, role: str, text: str, run_id: Optional[str], created: float) -> Any:
+    return SimpleNamespace(
+        id=f"msg_{uuid.uuid4().hex[:24]}",
+        thread_id=thread_id,
+        role=role,
+        run_id=run_id,
+        created_at=_wall_clock(created),
+        content=[SimpleNamespace(type="text", text=SimpleNamespace(value=text, annotations=[]))],
+    )
+
+
+def _compose_answer(query: str, matches: List[FakeSearchDocument], tokens: int) -> str:
+    """Build a deterministic answer roughly `tokens` tokens long."""
+    if matches:
+        head = "Recommended architectures: " + "; ".join(doc.name for doc in matches) + ". "
+    else:
+        head = "Could you tell me more about your scale, data sources and latency requirements? "
+    filler = "This pattern balances scalability, cost and operational simplicity. "
+    text = head
+    while estimate_tokens(text) < tokens:
+        text += filler
+    return text[: tokens * 4]
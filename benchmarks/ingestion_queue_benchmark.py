@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Throughput of distributed ingestion workers on the SQLite job queue.
+
+`--pdfs` PDF jobs each fan out `--pages` page jobs, as in
+scripts/ingest_distributed.py. The handlers sleep instead of calling Azure:
+`--pdf-seconds` stands for OCR and extraction, `--page-seconds` for one vision
+call. The queue is drained by 1, 2, 4 and 8 worker processes. Two more runs
+measure the queue itself with handlers that do nothing, and recovery when one
+worker is killed mid-run, after which its jobs come back once their leases
+expire.
+
+    python -m benchmarks.ingestion_queue_benchmark --pdfs 50 --pages 20 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root and the scripts directory to the Python path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from benchmarks.common import save_results
+from ingestion_queue import JobQueue, NewJob, run_worker
+
+
+def _pdf(payload: Dict[str, Any]):
+    time.sleep(payload["pdf_seconds"])
+    return {"file_name": payload["path"]}, [
+        NewJob("page", f"{payload['path']}#{page}", {"page": page, "page_seconds": payload["page_seconds"]}, priority=1)
+        for page in range(payload["pages"])
+    ]
+
+
+def _page(payload: Dict[str, Any]):
+    time.sleep(payload["page_seconds"])
+    return {"page": payload["page"], "summaries": []}, []
+
+
+def _worker(path: str, lease_seconds: float) -> None:
+    run_worker(JobQueue(path), {"pdf": _pdf, "page": _page}, lease_seconds=lease_seconds,
+               poll_interval=0.05, exit_when_idle=True)
+
+
+def drain(args: argparse.Namespace, workers: int, pdf_seconds: float, page_seconds: float,
+          kill_after: Optional[float] = None, lease_seconds: float = 300.0) -> Dict[str, Any]:
+    """Enqueue the PDFs, start `workers` processes and time until every job is done or dead."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "queue.db")
+        queue = JobQueue(path)
+        queue.enqueue([
+            NewJob("pdf", f"doc-{index}.pdf", {"path": f"doc-{index}.pdf", "pages": args.pages,
+                                               "pdf_seconds": pdf_seconds, "page_seconds": page_seconds})
+            for index in range(args.pdfs)
+        ])
+        context = multiprocessing.get_context("fork")
+        started = time.perf_counter()
+        processes = [context.Process(target=_worker, args=(path, lease_seconds)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        if kill_after is not None:
+            time.sleep(kill_after)
+            os.kill(processes[0].pid, signal.SIGKILL)
+        for process in processes:
+            process.join()
+        duration = time.perf_counter() - started
+        stats = queue.stats()
+    jobs = stats["totals"]["done"]
+    return {
+        "workers": workers,
+        "jobs": jobs,
+        "dead": stats["totals"]["dead"],
+        "duration_s": duration,
+        "jobs_per_s": jobs / duration,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20, help="page jobs fanned out by each PDF job")
+    parser.add_argument("--pdf-seconds", type=float, default=0.5)
+    parser.add_argument("--page-seconds", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    total = args.pdfs * (1 + args.pages)
+    print(f"{args.pdfs} PDFs x {args.pages} pages = {total} jobs; "
+          f"{args.pdf_seconds * 1000:.0f} ms per PDF job, {args.page_seconds * 1000:.0f} ms per page job")
+    scaling = []
+    for workers in args.workers:
+        result = drain(args, workers, args.pdf_seconds, args.page_seconds)
+        scaling.append(result)
+        speedup = scaling[0]["duration_s"] / result["duration_s"]
+        print(f"workers={workers:3d}  {result['duration_s']:7.2f} s  {result['jobs_per_s']:8.1f} jobs/s  "
+              f"speedup x{speedup:.2f}")
+
+    overhead = drain(args, max(args.workers), 0.0, 0.0)
+    print(f"no-op handlers, {overhead['workers']} workers: {overhead['jobs_per_s']:.0f} jobs/s "
+          f"({overhead['duration_s'] / total * 1000:.2f} ms of queue time per job)")
+
+    killed = drain(args, max(args.workers), args.pdf_seconds, args.page_seconds, kill_after=1.0, lease_seconds=2.0)
+    print(f"one of {killed['workers']} workers killed after 1 s (2 s leases): {killed['jobs']} of {total} jobs done, "
+          f"{killed['dead']} dead, in {killed['duration_s']:.2f} s")
+
+    path = save_results("ingestion_queue", {"config": vars(args) | {"output": None}, "scaling": scaling,
+                                            "queue_overhead": overhead, "worker_killed": killed}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Async load generator for the /query endpoint.
+
+By default it drives `backend.app:app` in-process over ASGI with the agent backed
+by the local fake agents service, so results are deterministic and need no Azure
+resources. Pass --url to load an already running server instead.
+
+    python -m benchmarks.load_test --concurrency 1 4 16 --requests 100 --time-scale 0.2
+    python -m benchmarks.load_test --compare benchmarks/results/load_test-<commit>-<ts>.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend.intake_agent import IntakeAgent
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+WORKLOADS = [
+    "I need an architecture for a batch ingestion use case that loads CSV files into a data lake every night.",
+    "We want real-time streaming analytics over IoT telemetry with dashboards in Power BI.",
+    "How should we migrate an on-prem SQL Server data warehouse to Azure with minimal downtime?",
+    "Recommend a lakehouse design with Databricks for 50 TB of sales data.",
+    "We are moving a Hadoop cluster to the cloud. What target architecture do you suggest?",
+    "Our Oracle OLTP database must move to a managed PostgreSQL service.",
+]
+FOLLOW_UPS = [
+    "What specific Azure services would be best for this architecture?",
+    "How would this scale to ten times the data volume?",
+    "What are the main cost drivers?",
+]
+
+
+def build_requests(total: int, follow_up_ratio: float, seed: int) -> List[Dict[str, Any]]:
+    """Deterministic request plan: first turns and follow-ups referring to an earlier first turn."""
+    rng = random.Random(seed)
+    plan: List[Dict[str, Any]] = []
+    first_turns: List[int] = []
+    for index in range(total):
+        if first_turns and rng.random() < follow_up_ratio:
+            plan.append({"query": rng.choice(FOLLOW_UPS), "follow_up_of": rng.choice(first_turns)})
+        else:
+            first_turns.append(index)
+            plan.append({"query": rng.choice(WORKLOADS), "follow_up_of": None})
+    return plan
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, plan: List[Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    """Send every planned request with `concurrency` workers and collect latency and error stats."""
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for index in range(len(plan)):
+        queue.put_nowait(index)
+
+    thread_ids: Dict[int, str] = {}
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            item = plan[index]
+            # Follow-ups reuse the thread of their first turn when it has already finished
+            thread_id = thread_ids.get(item["follow_up_of"]) if item["follow_up_of"] is not None else None
+            started = time.perf_counter()
+            try:
+                response = await client.post("/query", json={"query": item["query"], "thread_id": thread_id}, timeout=timeout)
+                ok = response.status_code == 200 and response.json().get("status") == "success"
+                if ok and item["follow_up_of"] is None:
+                    thread_ids[index] = response.json()["thread_id"]
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(plan),
+        "duration_s": duration,
+        "rps": len(plan) / duration if duration else 0.0,
+        "errors": errors,
+        "error_rate": errors / len(plan) if plan else 0.0,
+        "latency_s": summarize_latencies(latencies),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    config = FakeServiceConfig(seed=args.seed, time_scale=args.time_scale, error_rate=args.error_rate)
+    agent: Optional[IntakeAgent] = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url)
+    else:
+        agent = await IntakeAgent.create(client=FakeProjectClient(config))
+        backend_app.agent = agent
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=backend_app.app), base_url="http://loadtest")
+
+    levels = []
+    try:
+        for concurrency in args.concurrency:
+            plan = build_requests(args.requests, args.follow_up_ratio, args.seed)
+            result = await run_level(client, concurrency, plan, args.timeout)
+            levels.append(result)
+            latency = result["latency_s"]
+            print(
+                f"concurrency={concurrency:4d}  rps={result['rps']:7.2f}  p50={format_ms(latency['p50'])}  "
+                f"p95={format_ms(latency['p95'])}  p99={format_ms(latency['p99'])}  errors={result['error_rate']:.1%}"
+            )
+    finally:
+        await client.aclose()
+        if agent is not None:
+            await agent.cleanup()
+            backend_app.agent = None
+
+    return {
+        "target": args.url or "in-process fake",
+        "config": {
+            "requests_per_level": args.requests,
+            "follow_up_ratio": args.follow_up_ratio,
+            "seed": args.seed,
+            "time_scale": args.time_scale,
+            "error_rate": args.error_rate,
+        },
+        "levels": levels,
+    }
+
+
+def compare(current: Dict[str, Any], baseline_path: Path) -> None:
+    """Print the change in RPS and latency percentiles against an earlier result file."""
+    baseline = json.loads(baseline_path.read_text())
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nComparison against {baseline.get('commit', '?')} ({baseline_path.name}):")
+    for level in current["levels"]:
+        before = previous.get(level["concurrency"])
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50", "p95", "p99"):
+            old, new = before["latency_s"][key], level["latency_s"][key]
+            deltas.append(f"{key} {(new - old) / old:+.1%}" if old else f"{key} n/a")
+        rps_delta = (level["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0.0
+        print(f"  concurrency={level['concurrency']:4d}  rps {rps_delta:+.1%}  " + "  ".join(deltas))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--follow-up-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplier for every fake service latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability that a fake API call fails")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--url", help="load a running server instead of the in-process fake")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Per-request INFO logs from httpx and the backend would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("load_test", results, args.output)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
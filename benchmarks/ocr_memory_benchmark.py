@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Peak memory of OCR result handling on a synthetic layout result.
+
+Builds Document Intelligence layout results (pages with words, paragraphs,
+section headings and figures) for a large synthetic PDF and processes them two
+ways, measuring the peak of Python allocations with tracemalloc. Results are the
+decoded JSON bodies; the SDK's AnalyzeResult models add their own overhead (and
+about 70 ms of deserialization per page) on top, in both modes alike.
+
+- in-memory: one layout result for the whole document, headings and figures
+  collected from it and `result.content` sent as one extraction prompt (the
+  default ingestion path);
+- streaming: one layout result per page range, flattened to per-page JSONL and
+  read back through generators for figures and extraction chunks.
+
+    python -m benchmarks.ocr_memory_benchmark --pages 1000
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the project root and the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from benchmarks.common import save_results
+from ocr_stream import iter_extraction_chunks, iter_figures, stream_layout_to_jsonl
+
+VOCABULARY = (
+    "data ingestion pipeline stream events hub lake storage warehouse analytics migration cluster "
+    "workload latency throughput replication database query dashboard gateway network identity"
+).split()
+
+
+def synthetic_layout(first_page: int, last_page: int, words_per_page: int, paragraphs_per_page: int) -> Dict[str, Any]:
+    """Layout result for pages first_page..last_page, shaped like the REST response."""
+    content: List[str] = []
+    offset = 0
+    pages, paragraphs, figures = [], [], []
+    for page_number in range(first_page, last_page + 1):
+        rng = random.Random(page_number)
+        words = []
+        page_offset = offset
+        per_paragraph = max(1, words_per_page // paragraphs_per_page)
+        for paragraph_index in range(paragraphs_per_page):
+            heading = paragraph_index == 0
+            texts = [rng.choice(VOCABULARY) for _ in range(3 if heading else per_paragraph)]
+            text = " ".join(texts)
+            paragraph_offset = offset
+            for word in texts:
+                x, y = rng.random() * 8, rng.random() * 10
+                words.append({
+                    "content": word,
+                    "polygon": [x, y, x + 0.5, y, x + 0.5, y + 0.2, x, y + 0.2],
+                    "confidence": 0.99,
+                    "span": {"offset": offset, "length": len(word)},
+                })
+                offset += len(word) + 1
+            paragraphs.append({
+                "role": "sectionHeading" if heading else None,
+                "content": text,
+                "spans": [{"offset": paragraph_offset, "length": len(text)}],
+                "boundingRegions": [{"pageNumber": page_number, "polygon": [0.5, 1, 8, 1, 8, 2, 0.5, 2]}],
+            })
+            content.append(text)
+        pages.append({
+            "pageNumber": page_number, "width": 8.5, "height": 11, "unit": "inch",
+            "spans": [{"offset": page_offset, "length": offset - page_offset}], "words": words,
+        })
+        figures.append({
+            "boundingRegions": [{"pageNumber": page_number, "polygon": [1, 3, 7.5, 3, 7.5, 8, 1, 8]}],
+            "caption": {"content": f"Figure {page_number}: reference architecture"},
+            "spans": [],
+        })
+    return {
+        "apiVersion": "2024-11-30", "modelId": "prebuilt-layout", "content": "\n".join(content),
+        "pages": pages, "paragraphs": paragraphs, "figures": figures,
+    }
+
+
+def in_memory(pages: int, words_per_page: int, paragraphs_per_page: int) -> Dict[str, Any]:
+    """What get_ocr_from_adi and the default main loop hold for one PDF."""
+    result = synthetic_layout(1, pages, words_per_page, paragraphs_per_page)
+    headings = [paragraph["content"] for paragraph in result["paragraphs"] if paragraph.get("role") == "sectionHeading"]
+    figure_boxes = [figure["boundingRegions"][0] for figure in result["figures"]]
+    headings += [figure["caption"]["content"] for figure in result["figures"] if figure.get("caption")]
+    prompt = f"Section Headings of PDF:\n{headings}\n\nFull OCR Content:\n{result['content']}"
+    return {"figures": len(figure_boxes), "extraction_calls": 1, "prompt_chars": len(prompt)}
+
+
+def streaming(pages: int, words_per_page: int, paragraphs_per_page: int, tmp: Path,
+              pages_per_request: int) -> Dict[str, Any]:
+    """The --streaming path: page ranges to JSONL, then generators over the file."""
+    pages_path = tmp / "synthetic.pages.jsonl"
+    stream_layout_to_jsonl(
+        lambda page_range: synthetic_layout(*map(int, page_range.split("-")), words_per_page, paragraphs_per_page),
+        pages, pages_path, pages_per_request,
+    )
+    figures = sum(1 for _ in iter_figures(pages_path))
+    calls = prompt_chars = 0
+    for content, headings in iter_extraction_chunks(pages_path):
+        prompt = "Section Headings of PDF:\n" + "\n".join(headings) + "\n\nFull OCR Content:\n" + content
+        calls += 1
+        prompt_chars += len(prompt)
+    return {"figures": figures, "extraction_calls": calls, "prompt_chars": prompt_chars,
+            "jsonl_bytes": pages_path.stat().st_size}
+
+
+def measure(func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        details = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_mb": peak / 1e6, "seconds": time.perf_counter() - started, **details}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--words-per-page", type=int, default=300)
+    parser.add_argument("--paragraphs-per-page", type=int, default=12)
+    parser.add_argument("--pages-per-request", type=int, default=50)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        rows["streaming"] = measure(lambda: streaming(
+            args.pages, args.words_per_page, args.paragraphs_per_page, Path(tmp), args.pages_per_request
+        ))
+        rows["in_memory"] = measure(lambda: in_memory(args.pages, args.words_per_page, args.paragraphs_per_page))
+    for mode, row in rows.items():
+        print(f"{mode:10s} peak={row['peak_mb']:8.1f} MB  time={row['seconds']:6.1f}s  "
+              f"figures={row['figures']}  extraction_calls={row['extraction_calls']}")
+    print(f"peak memory reduced {rows['in_memory']['peak_mb'] / rows['streaming']['peak_mb']:.1f}x")
+
+    path = save_results("ocr_memory", {"config": vars(args) | {"output": None}, "results": rows}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Vision calls skipped by page selection on the PDFs in data/.
+
+For each PDF, pages are selected the way the ingestion script does it (see
+scripts/page_select.py) and compared with sending every page to the vision
+model. Pages with embedded images stand in for the figures Document
+Intelligence would report; `--heuristic-only` ignores them so every page goes
+through the thumbnail heuristic. `--text-pages` appends that many text-only
+pages (considerations, appendix) to each document, the kind of page longer
+pattern documents carry.
+
+The time saved per skipped page is the measured 300 dpi render plus
+`--vision-call-seconds`, the assumed latency of one vision summary.
+
+    python -m benchmarks.page_selection_benchmark --text-pages 4
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+# Add the project root and the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from benchmarks.common import save_results
+from page_select import select_pages, selection_summary
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+TEXT = (
+    "Each pattern in this document assumes an Azure subscription with the required resource providers "
+    "registered. Review the pricing of every service, the regional availability of its SKUs and the "
+    "network requirements of private endpoints before you deploy. "
+)
+
+
+def append_text_pages(doc: "fitz.Document", count: int) -> None:
+    for index in range(count):
+        page = doc.new_page(width=doc[0].rect.width, height=doc[0].rect.height)
+        page.insert_text((72, 72), f"Appendix {index + 1}", fontsize=18)
+        page.insert_textbox(fitz.Rect(72, 100, page.rect.width - 72, page.rect.height - 72), TEXT * 8, fontsize=10)
+
+
+def image_pages(doc: "fitz.Document") -> List[int]:
+    """1-based pages with an embedded image, standing in for Document Intelligence figures."""
+    return [index + 1 for index in range(doc.page_count) if doc[index].get_images()]
+
+
+def render_seconds(page: "fitz.Page", dpi: int = 300) -> float:
+    zoom = dpi / 72.0
+    started = time.perf_counter()
+    page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+    return time.perf_counter() - started
+
+
+def measure(pdf_path: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    doc = fitz.open(pdf_path)
+    append_text_pages(doc, args.text_pages)
+    figure_pages = [] if args.heuristic_only else image_pages(doc)
+    started = time.perf_counter()
+    decisions = select_pages(doc, figure_pages)
+    selection_s = time.perf_counter() - started
+    summary = selection_summary(decisions)
+    render_saved_s = sum(render_seconds(doc[decision.page - 1]) for decision in decisions if not decision.selected)
+    return {
+        "pdf": pdf_path.name,
+        "pages": summary["pages"],
+        "vision_calls": summary["selected"],
+        "vision_calls_skipped": summary["skipped"],
+        "by_reason": summary["by_reason"],
+        "selection_ms": selection_s * 1000,
+        "render_saved_ms": render_saved_s * 1000,
+        "estimated_seconds_saved": render_saved_s + summary["skipped"] * args.vision_call_seconds,
+        "decisions": summary["decisions"],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--text-pages", type=int, default=0, help="Text-only pages appended to each PDF")
+    parser.add_argument("--heuristic-only", action="store_true", help="Ignore embedded images as figures")
+    parser.add_argument("--vision-call-seconds", type=float, default=8.0, help="Assumed latency of one vision call")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    results = [measure(pdf_path, args) for pdf_path in sorted(args.data_dir.glob("*.pdf"))]
+    for result in results:
+        print(
+            f"{result['pdf']}: {result['vision_calls']}/{result['pages']} pages to vision, "
+            f"{result['vision_calls_skipped']} skipped {result['by_reason']}  "
+            f"selection={result['selection_ms']:.1f}ms  saved~{result['estimated_seconds_saved']:.1f}s"
+        )
+    pages = sum(result["pages"] for result in results)
+    skipped = sum(result["vision_calls_skipped"] for result in results)
+    saved = sum(result["estimated_seconds_saved"] for result in results)
+    print(f"\ntotal: {skipped} of {pages} vision calls skipped, ~{saved:.1f}s of sequential summarization saved")
+
+    payload = {"config": vars(args) | {"data_dir": str(args.data_dir), "output": None}, "results": results}
+    path = save_results("page_selection", payload, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Query latency with the SDK's fixed 1s run polling versus IntakeAgent's adaptive polling.
+
+Short answers finish well inside the first second, so with fixed polling they
+wait for the next tick; adaptive polling notices them after a few fast polls.
+
+    python -m benchmarks.polling_benchmark --queries 40
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.intake_agent import IntakeAgent
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.load_test import WORKLOADS
+
+
+class SdkPollingAgent(IntakeAgent):
+    """Baseline: lets `runs.create_and_process` poll with the SDK default 1s interval."""
+
+    async def _run_until_complete(self, thread_id: str, on_event=None, **run_options: Any) -> Any:
+        return await self._call(
+            self.client.agents.runs.create_and_process, thread_id=thread_id, agent_id=self.agent_id, **run_options
+        )
+
+
+ANSWER_SIZES = {
+    "short": (15, 60),
+    "long": (300, 600),
+}
+
+
+async def measure(agent_class, answer_size: str, args: argparse.Namespace) -> Dict[str, Any]:
+    min_tokens, max_tokens = ANSWER_SIZES[answer_size]
+    config = FakeServiceConfig(seed=args.seed, min_response_tokens=min_tokens, max_response_tokens=max_tokens)
+    client = FakeProjectClient(config)
+    agent = await agent_class.create(client=client)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            result = await agent.query(f"{WORKLOADS[index % len(WORKLOADS)]} (request {index})")
+            latencies.append(time.perf_counter() - started)
+            assert result["status"] == "success", result
+
+    try:
+        await asyncio.gather(*(one(index) for index in range(args.queries)))
+    finally:
+        await agent.cleanup()
+
+    return {
+        "mode": "sdk_fixed_1s" if agent_class is SdkPollingAgent else "adaptive",
+        "answers": answer_size,
+        "latency_s": summarize_latencies(latencies),
+        "polls_per_run": client.agents.stats["run_polls"] / args.queries,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for answer_size in args.answers:
+        for agent_class in (SdkPollingAgent, IntakeAgent):
+            result = await measure(agent_class, answer_size, args)
+            results.append(result)
+            latency = result["latency_s"]
+            print(
+                f"{answer_size:>5} answers  {result['mode']:<13} p50={format_ms(latency['p50'])}  "
+                f"p95={format_ms(latency['p95'])}  polls/run={result['polls_per_run']:.1f}"
+            )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--answers", nargs="+", choices=sorted(ANSWER_SIZES), default=["short", "long"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("polling", {"config": {"queries": args.queries, "concurrency": args.concurrency}, "results": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
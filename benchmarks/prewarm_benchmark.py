@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+First-turn latency with and without the pre-warmed thread pool.
+
+New conversations arrive open-loop at `--rate` per second. Without the pool each
+one calls threads.create before posting its message; with it, the thread comes
+from the pool and the pool is refilled in the background. A pool smaller than
+the arrivals during one refill round trip runs dry, which shows up as misses.
+
+    python -m benchmarks.prewarm_benchmark --queries 60 --rate 10 --pool-sizes 0 4 16
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from backend.thread_prewarm import ThreadPrewarmer
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.load_test import WORKLOADS
+
+
+async def measure(pool_size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    client = FakeProjectClient(FakeServiceConfig(seed=args.seed, max_response_tokens=args.max_tokens))
+    agent = await IntakeAgent.create(client=client)
+    if pool_size:
+        agent.prewarmer = ThreadPrewarmer(agent, size=pool_size)
+        await agent.prewarmer.fill()
+        agent.prewarmer.start()
+    hits_before = metrics.THREAD_POOL_TAKES.labels(result="hit").value
+    latencies: List[float] = []
+    thread_stage: List[float] = []
+
+    async def one(index: int) -> None:
+        started = time.perf_counter()
+        thread_id, _ = await agent._get_or_create_thread(None)
+        thread_stage.append(time.perf_counter() - started)
+        await agent._call(client.agents.messages.create, thread_id=thread_id, role="user",
+                          content=f"{WORKLOADS[index % len(WORKLOADS)]} (request {index})")
+        run = await agent._run_until_complete(thread_id)
+        assert run.status == "completed", run.status
+        await agent._latest_assistant_text(thread_id, run_id=run.id)
+        latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    try:
+        for index in range(args.queries):
+            tasks.append(asyncio.create_task(one(index)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*tasks)
+    finally:
+        await agent.cleanup()
+
+    return {
+        "pool_size": pool_size,
+        "first_turn_latency_s": summarize_latencies(latencies),
+        "thread_stage_s": summarize_latencies(thread_stage),
+        "pool_hits": int(metrics.THREAD_POOL_TAKES.labels(result="hit").value - hits_before),
+        "threads_created": client.agents.stats["threads_created"],
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for pool_size in args.pool_sizes:
+        result = await measure(pool_size, args)
+        results.append(result)
+        latency, stage = result["first_turn_latency_s"], result["thread_stage_s"]
+        print(
+            f"pool={pool_size:<3} first turn p50={format_ms(latency['p50'])}  p95={format_ms(latency['p95'])}  "
+            f"thread p50={format_ms(stage['p50'])}  hits={result['pool_hits']}/{args.queries}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--rate", type=float, default=10.0, help="New conversations per second")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--max-tokens", type=int, default=60, help="Longest answer; short answers make the saving visible")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+    config = {"queries": args.queries, "rate": args.rate, "max_tokens": args.max_tokens}
+    path = save_results("prewarm", {"config": config, "results": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Offline recommendation quality and latency regression suite.
+
+Runs the golden requirement queries in benchmarks/golden/queries.json against a
+backend and scores the architectures each answer recommends against the
+expected ones, which are the patterns of the PDFs in data/ listed in
+benchmarks/golden/architectures.json. An answer's ranking is the order in which
+it first mentions each golden architecture by name or alias. Reports recall@k,
+MRR, end-to-end latency and prompt/completion tokens per query.
+
+Backends:
+
+- fake: IntakeAgent on the local fake agents service, whose search index holds
+  the golden architectures (the same text ingestion embeds);
+- replay: answers, latencies and tokens recorded earlier with `--record`, so a
+  live run can be scored again offline;
+- live: IntakeAgent on the Azure project configured in .env.
+
+The run fails (exit code 1) when a metric crosses the floors and ceilings in
+`--thresholds`, or regresses against a `--baseline` result by more than the
+allowed tolerances.
+
+    python -m benchmarks.recommendation_eval --backend fake
+    python -m benchmarks.recommendation_eval --backend live --record benchmarks/golden/live.jsonl
+    python -m benchmarks.recommendation_eval --backend replay --recording benchmarks/golden/live.jsonl
+    python -m benchmarks.recommendation_eval --backend fake --baseline benchmarks/results/eval-<commit>.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from benchmarks.common import save_results, summarize_latencies
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+K_VALUES = (1, 3, 5)
+BACKENDS = ("fake", "replay", "live")
+
+# Quality metrics are higher-is-better; the others lower-is-better
+QUALITY_METRICS = ("recall@1", "recall@3", "recall@5", "mrr")
+
+
+@dataclass
+class GoldenArchitecture:
+    id: str
+    name: str
+    category: str
+    azure_services: List[str]
+    non_azure_services: List[str]
+    summary: str
+    aliases: List[str] = field(default_factory=list)
+
+    def document_text(self) -> str:
+        """The text ingestion embeds and uploads for an architecture."""
+        return (
+            f"{self.name}. Azure services: {', '.join(self.azure_services)}. "
+            f"Non-Azure services: {', '.join(self.non_azure_services)}. AI Summary: {self.summary}"
+        )
+
+
+@dataclass
+class GoldenQuery:
+    id: str
+    query: str
+    expected: List[str]
+
+
+@dataclass
+class Answer:
+    text: str
+    latency_s: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    status: str = "success"
+
+
+def load_golden(directory: Path = GOLDEN_DIR):
+    """Golden architectures and queries; every expected id must be a golden architecture."""
+    architectures = [GoldenArchitecture(**item) for item in json.loads((directory / "architectures.json").read_text("utf-8"))]
+    queries = [GoldenQuery(**item) for item in json.loads((directory / "queries.json").read_text("utf-8"))]
+    known = {architecture.id for architecture in architectures}
+    for query in queries:
+        unknown = set(query.expected) - known
+        if unknown:
+            raise ValueError(f"Golden query {query.id} expects unknown architectures {sorted(unknown)}")
+    return architectures, queries
+
+
+def _name_pattern(name: str) -> "re.Pattern[str]":
+    # Case-insensitive, any run of whitespace or hyphens matches any other
+    words = [re.escape(word) for word in re.split(r"[\s\-]+", name.strip()) if word]
+    return re.compile(r"[\s\-]+".join(words), re.IGNORECASE)
+
+
+def ranked_architectures(text: str, architectures: Sequence[GoldenArchitecture]) -> List[str]:
+    """Ids of the golden architectures an answer mentions, in order of first mention."""
+    positions = []
+    for architecture in architectures:
+        found = [
+            match.start()
+            for match in (_name_pattern(name).search(text) for name in [architecture.name, *architecture.aliases])
+            if match
+        ]
+        if found:
+            positions.append((min(found), architecture.id))
+    return [architecture_id for _, architecture_id in sorted(positions)]
+
+
+def recall_at_k(ranked: Sequence[str], expected: Sequence[str], k: int) -> float:
+    return len(set(ranked[:k]) & set(expected)) / len(expected) if expected else 0.0
+
+
+def reciprocal_rank(ranked: Sequence[str], expected: Sequence[str]) -> float:
+    for position, architecture_id in enumerate(ranked, start=1):
+        if architecture_id in expected:
+            return 1.0 / position
+    return 0.0
+
+
+class AgentBackend:
+    """Answers from an IntakeAgent; tokens are the run token counters' increase over the query."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    async def answer(self, query: GoldenQuery) -> Answer:
+        prompt_before, completion_before = metrics.RUN_PROMPT_TOKENS.value, metrics.RUN_COMPLETION_TOKENS.value
+        started = time.perf_counter()
+        result = await self.agent.query(query.query)
+        return Answer(
+            text=result["assistant_response"],
+            latency_s=time.perf_counter() - started,
+            prompt_tokens=int(metrics.RUN_PROMPT_TOKENS.value - prompt_before),
+            completion_tokens=int(metrics.RUN_COMPLETION_TOKENS.value - completion_before),
+            status=result["status"],
+        )
+
+    async def close(self) -> None:
+        await self.agent.cleanup()
+
+
+class ReplayBackend:
+    """Answers recorded by an earlier run, looked up by query text."""
+
+    def __init__(self, recording: Path):
+        self.answers: Dict[str, Answer] = {}
+        with open(recording, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    query = record.pop("query")
+                    record.pop("id", None)
+                    self.answers[query] = Answer(**record)
+
+    async def answer(self, query: GoldenQuery) -> Answer:
+        recorded = self.answers.get(query.query)
+        if recorded is None:
+            return Answer(text="", latency_s=0.0, status="not_recorded")
+        return recorded
+
+    async def close(self) -> None:
+        pass
+
+
+async def create_backend(args: argparse.Namespace, architectures: Sequence[GoldenArchitecture]):
+    if args.backend == "replay":
+        if not args.recording:
+            raise SystemExit("--backend replay needs --recording")
+        return ReplayBackend(args.recording)
+
+    from backend.intake_agent import IntakeAgent
+    if args.backend == "live":
+        return AgentBackend(await IntakeAgent.create())
+
+    from benchmarks.fake_azure import FakeProjectClient, FakeSearchDocument, FakeSearchIndex, FakeServiceConfig
+    index = FakeSearchIndex([
+        FakeSearchDocument(id=architecture.id, name=architecture.name, content=architecture.document_text(),
+                           category=architecture.category)
+        for architecture in architectures
+    ])
+    client = FakeProjectClient(FakeServiceConfig(seed=args.seed, time_scale=args.time_scale), search_index=index)
+    return AgentBackend(await IntakeAgent.create(client=client))
+
+
+async def run_eval(backend, architectures: Sequence[GoldenArchitecture], queries: Sequence[GoldenQuery],
+                   record: Optional[Path] = None) -> Dict[str, Any]:
+    """Ask every golden query in order and score the answers."""
+    rows = []
+    recorded = []
+    for query in queries:
+        answer = await backend.answer(query)
+        ranked = ranked_architectures(answer.text, architectures) if answer.status == "success" else []
+        rows.append({
+            "id": query.id,
+            "status": answer.status,
+            "expected": query.expected,
+            "ranked": ranked,
+            **{f"recall@{k}": recall_at_k(ranked, query.expected, k) for k in K_VALUES},
+            "rr": reciprocal_rank(ranked, query.expected),
+            "latency_s": answer.latency_s,
+            "prompt_tokens": answer.prompt_tokens,
+            "completion_tokens": answer.completion_tokens,
+        })
+        recorded.append({"id": query.id, "query": query.query, **asdict(answer)})
+    if record is not None:
+        record.parent.mkdir(parents=True, exist_ok=True)
+        record.write_text("".join(json.dumps(item) + "\n" for item in recorded), encoding="utf-8")
+    return {"summary": summarize(rows), "queries": rows}
+
+
+def summarize(rows: Sequence[Dict[str, Any]]) -> Dict[str, float]:
+    count = len(rows) or 1
+    latency = summarize_latencies([row["latency_s"] for row in rows if row["status"] == "success"])
+    return {
+        **{f"recall@{k}": sum(row[f"recall@{k}"] for row in rows) / count for k in K_VALUES},
+        "mrr": sum(row["rr"] for row in rows) / count,
+        "latency_p50_s": latency["p50"],
+        "latency_p95_s": latency["p95"],
+        "prompt_tokens_mean": sum(row["prompt_tokens"] for row in rows) / count,
+        "completion_tokens_mean": sum(row["completion_tokens"] for row in rows) / count,
+        "errors": sum(row["status"] != "success" for row in rows),
+    }
+
+
+def check_thresholds(summary: Dict[str, float], thresholds: Dict[str, Dict[str, float]]) -> List[str]:
+    """Failures against absolute `min` floors and `max` ceilings."""
+    failures = []
+    for name, floor in thresholds.get("min", {}).items():
+        if summary[name] < floor:
+            failures.append(f"{name} {summary[name]:.3f} is below the floor {floor:.3f}")
+    for name, ceiling in thresholds.get("max", {}).items():
+        if summary[name] > ceiling:
+            failures.append(f"{name} {summary[name]:.3f} is above the ceiling {ceiling:.3f}")
+    return failures
+
+
+def check_baseline(summary: Dict[str, float], baseline: Dict[str, float], max_quality_drop: float,
+                   max_latency_increase: float, max_token_increase: float) -> List[str]:
+    """
+    Failures against an earlier run: quality may drop by at most `max_quality_drop`
+    (absolute), latency and tokens may grow by at most the given fractions.
+    """
+    failures = []
+    for name in QUALITY_METRICS:
+        if summary[name] < baseline[name] - max_quality_drop:
+            failures.append(f"{name} dropped from {baseline[name]:.3f} to {summary[name]:.3f}")
+    for names, allowed in ((("latency_p50_s", "latency_p95_s"), max_latency_increase),
+                           (("prompt_tokens_mean", "completion_tokens_mean"), max_token_increase)):
+        for name in names:
+            if baseline[name] and summary[name] > baseline[name] * (1 + allowed):
+                failures.append(
+                    f"{name} grew {summary[name] / baseline[name] - 1:+.0%} "
+                    f"({baseline[name]:.3f} -> {summary[name]:.3f}, allowed +{allowed:.0%})"
+                )
+    if summary["errors"] > baseline["errors"]:
+        failures.append(f"errors grew from {baseline['errors']} to {summary['errors']}")
+    return failures
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for row in report["queries"]:
+        mark = "ok  " if row["rr"] else "MISS"
+        print(f"{mark} {row['id']}  rr={row['rr']:.2f}  {row['latency_s'] * 1000:7.1f} ms  "
+              f"expected={','.join(row['expected'])}  got={','.join(row['ranked'][:3]) or '-'}")
+    summary = report["summary"]
+    print(
+        f"\nrecall@1={summary['recall@1']:.3f}  recall@3={summary['recall@3']:.3f}  recall@5={summary['recall@5']:.3f}  "
+        f"MRR={summary['mrr']:.3f}  latency p50={summary['latency_p50_s'] * 1000:.1f} ms p95={summary['latency_p95_s'] * 1000:.1f} ms  "
+        f"tokens prompt={summary['prompt_tokens_mean']:.0f} completion={summary['completion_tokens_mean']:.0f}  "
+        f"errors={summary['errors']}"
+    )
+
+
+async def evaluate(args: argparse.Namespace) -> Dict[str, Any]:
+    architectures, queries = load_golden(args.golden)
+    backend = await create_backend(args, architectures)
+    try:
+        return await run_eval(backend, architectures, queries, record=args.record)
+    finally:
+        await backend.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default="fake")
+    parser.add_argument("--golden", type=Path, default=GOLDEN_DIR, help="Directory with architectures.json and queries.json")
+    parser.add_argument("--recording", type=Path, help="JSONL answers replayed by --backend replay")
+    parser.add_argument("--record", type=Path, help="Write this run's answers as JSONL for later replay")
+    parser.add_argument("--thresholds", type=Path, default=GOLDEN_DIR / "thresholds.json",
+                        help="JSON with `min` floors and `max` ceilings of summary metrics")
+    parser.add_argument("--baseline", type=Path, help="Earlier result of this script to compare against")
+    parser.add_argument("--max-quality-drop", type=float, default=0.05, help="Allowed absolute drop of recall/MRR")
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="Allowed relative latency growth")
+    parser.add_argument("--max-token-increase", type=float, default=0.10, help="Allowed relative token growth")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Fake service latency multiplier")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    report = asyncio.run(evaluate(args))
+    print_report(report)
+
+    failures = []
+    if args.thresholds and args.thresholds.exists():
+        thresholds = json.loads(args.thresholds.read_text("utf-8"))
+        # Ceilings describe the fake service at the file's time scale; other runs get the quality floors only
+        if args.backend != "fake" or args.time_scale != thresholds.get("time_scale", args.time_scale):
+            thresholds = {"min": thresholds.get("min", {})}
+        failures += check_thresholds(report["summary"], thresholds)
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text("utf-8"))["summary"]
+        failures += check_baseline(report["summary"], baseline, args.max_quality_drop,
+                                   args.max_latency_increase, args.max_token_increase)
+
+    config = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+    path = save_results("eval", {"config": config | {"output": None}, **report, "failures": failures}, args.output)
+    print(f"\nResults written to {path}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Cost of the local requirements parser and what its search pre-filter saves.
+
+Reports microseconds per parse_requirements call, the share of the catalog the
+category filter leaves to search, and the prompt tokens of agent runs against the
+fake service with the pre-filter on and off.
+
+    python -m benchmarks.requirements_benchmark --iterations 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from backend.requirements_parser import parse_requirements
+from benchmarks.common import percentile, save_results
+from benchmarks.fake_azure import FakeProjectClient, FakeSearchIndex, FakeServiceConfig
+from benchmarks.load_test import FOLLOW_UPS, WORKLOADS
+
+EXTRA_QUERIES = [
+    "Migrate the Teradata data warehouse (300 TB) to a lakehouse with nightly ETL and Power BI dashboards.",
+    "Ingest 20k events per second from IoT devices and serve 2 million users with real-time KPIs.",
+    "Lift and shift our on-prem file servers and a MongoDB cluster to Azure.",
+]
+
+
+def time_parser(queries: List[str], iterations: int) -> Dict[str, Any]:
+    """Time every call individually; returns microseconds per query."""
+    timings: List[float] = []
+    for index in range(iterations):
+        text = queries[index % len(queries)]
+        started = time.perf_counter_ns()
+        parse_requirements(text)
+        timings.append((time.perf_counter_ns() - started) / 1000)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "mean_us": sum(timings) / len(timings),
+        "p50_us": percentile(timings, 50),
+        "p99_us": percentile(timings, 99),
+    }
+
+
+def candidate_sets(queries: List[str]) -> List[Dict[str, Any]]:
+    """Documents left to search per query with the category filter, out of the whole catalog."""
+    index = FakeSearchIndex()
+    rows = []
+    for query in queries:
+        category = parse_requirements(query).category
+        candidates = sum(1 for doc in index.documents if not category or doc.category == category)
+        rows.append({"query": query, "category": category, "candidates": candidates, "catalog": len(index.documents)})
+    return rows
+
+
+async def prompt_tokens(queries: List[str], prefilter: bool, seed: int) -> Dict[str, Any]:
+    client = FakeProjectClient(FakeServiceConfig(seed=seed, time_scale=0.01))
+    agent = await IntakeAgent.create(client=client)
+    agent.requirements_prefilter = prefilter
+    before = metrics.RUN_PROMPT_TOKENS.value
+    try:
+        for query in queries:
+            result = await agent.query(query)
+            assert result["status"] == "success", result
+    finally:
+        await agent.cleanup()
+    return {
+        "prefilter": prefilter,
+        "prompt_tokens": metrics.RUN_PROMPT_TOKENS.value - before,
+        "filtered_searches": client.agents.stats["searches_filtered"],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    queries = WORKLOADS + FOLLOW_UPS + EXTRA_QUERIES
+    timing = time_parser(queries, args.iterations)
+    print(f"parse_requirements: mean={timing['mean_us']:.1f}us  p50={timing['p50_us']:.1f}us  p99={timing['p99_us']:.1f}us")
+
+    candidates = candidate_sets(WORKLOADS + EXTRA_QUERIES)
+    searched = sum(row["candidates"] for row in candidates) / sum(row["catalog"] for row in candidates)
+    print(f"search space after the category filter: {searched:.0%} of the catalog")
+
+    tokens = [asyncio.run(prompt_tokens(WORKLOADS + EXTRA_QUERIES, prefilter, args.seed)) for prefilter in (False, True)]
+    for row in tokens:
+        print(f"prefilter={'on ' if row['prefilter'] else 'off'}  prompt_tokens={row['prompt_tokens']:.0f}  filtered_searches={row['filtered_searches']}")
+
+    path = save_results(
+        "requirements",
+        {"config": vars(args) | {"output": None}, "parser": timing, "candidates": candidates, "prompt_tokens": tokens},
+        args.output,
+    )
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Latency of intake conversations with every turn on the large model versus model routing.
+
+Each conversation opens with a vague request, answers a few clarifying questions
+and then asks for a recommendation. Without routing every turn runs on the
+agent's deployment with search; with routing the clarifying turns run on a
+smaller deployment (`--small-model-speed` times faster decoding in the fake
+service) without tools. Also reports the classifier's cost per turn.
+
+    python -m benchmarks.routing_benchmark --conversations 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from backend.model_router import ROUTE_INTAKE, ROUTE_RECOMMEND, ModelRouter, classify_turn, requirement_dimensions
+from backend.requirements_parser import parse_requirements
+from benchmarks.common import format_ms, percentile, save_results, summarize_latencies
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+CONVERSATIONS = [
+    [
+        "Hi, we need help modernizing our data platform.",
+        "Most of our data is in an on-prem SQL Server.",
+        "Roughly 3 TB, growing slowly.",
+        "Which architecture do you recommend for nightly loads into Power BI?",
+    ],
+    [
+        "Hello, I'm looking into options for our sensor data.",
+        "Thousands of devices send telemetry continuously.",
+        "About 20k events per second at peak.",
+        "What architecture would you suggest for real-time dashboards?",
+    ],
+    [
+        "We want to get out of our data center next year.",
+        "There is a Hadoop cluster and an Oracle database.",
+        "Around 300 TB in HDFS.",
+        "How should we plan the migration to Azure?",
+    ],
+]
+
+
+def time_classifier(iterations: int) -> Dict[str, float]:
+    """Microseconds per turn for parsing the requirements and classifying the turn."""
+    turns = [turn for conversation in CONVERSATIONS for turn in conversation]
+    timings: List[float] = []
+    for index in range(iterations):
+        text = turns[index % len(turns)]
+        started = time.perf_counter_ns()
+        classify_turn(text, requirement_dimensions(parse_requirements(text)))
+        timings.append((time.perf_counter_ns() - started) / 1000)
+    timings.sort()
+    return {"mean_us": sum(timings) / len(timings), "p50_us": percentile(timings, 50), "p99_us": percentile(timings, 99)}
+
+
+async def measure(routing: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    config = FakeServiceConfig(seed=args.seed, model_speed={args.small_model: args.small_model_speed})
+    client = FakeProjectClient(config)
+    agent = await IntakeAgent.create(client=client)
+    if routing:
+        os.environ["ROUTER_INTAKE_DEPLOYMENT"] = args.small_model
+        os.environ["MODEL_ROUTING"] = "true"
+        try:
+            agent.router = ModelRouter.from_env()
+        finally:
+            del os.environ["MODEL_ROUTING"], os.environ["ROUTER_INTAKE_DEPLOYMENT"]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: Dict[str, List[float]] = {"clarifying": [], "final": []}
+    conversation_latencies: List[float] = []
+    tokens_before = metrics.RUN_PROMPT_TOKENS.value
+
+    async def conversation(index: int) -> None:
+        turns = CONVERSATIONS[index % len(CONVERSATIONS)]
+        async with semaphore:
+            thread_id = None
+            conversation_started = time.perf_counter()
+            for position, turn in enumerate(turns):
+                started = time.perf_counter()
+                result = await agent.query(f"{turn} (conversation {index})" if position == 0 else turn, thread_id=thread_id)
+                assert result["status"] == "success", result
+                thread_id = result["thread_id"]
+                latencies["final" if position == len(turns) - 1 else "clarifying"].append(time.perf_counter() - started)
+            conversation_latencies.append(time.perf_counter() - conversation_started)
+
+    try:
+        await asyncio.gather(*(conversation(index) for index in range(args.conversations)))
+    finally:
+        await agent.cleanup()
+
+    return {
+        "routing": routing,
+        "clarifying_turn_s": summarize_latencies(latencies["clarifying"]),
+        "final_turn_s": summarize_latencies(latencies["final"]),
+        "conversation_s": summarize_latencies(conversation_latencies),
+        "searches": client.agents.stats["searches"],
+        "small_model_runs": client.agents.stats["runs_model_override"],
+        "prompt_tokens": int(metrics.RUN_PROMPT_TOKENS.value - tokens_before),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for routing in (False, True):
+        result = await measure(routing, args)
+        results.append(result)
+        clarifying, final, total = result["clarifying_turn_s"], result["final_turn_s"], result["conversation_s"]
+        print(
+            f"routing={'on ' if routing else 'off'}  clarifying p50={format_ms(clarifying['p50'])}  "
+            f"final p50={format_ms(final['p50'])}  conversation p50={format_ms(total['p50'])}  "
+            f"searches={result['searches']}  prompt tokens={result['prompt_tokens']}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--small-model", default="gpt-4o-mini")
+    parser.add_argument("--small-model-speed", type=float, default=3.0)
+    parser.add_argument("--iterations", type=int, default=20000, help="Classifier timing iterations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    timing = time_classifier(args.iterations)
+    print(f"router: mean={timing['mean_us']:.1f}us  p50={timing['p50_us']:.1f}us  p99={timing['p99_us']:.1f}us per turn")
+    results = asyncio.run(run_benchmark(args))
+    decisions = {route: metrics.ROUTE_DECISIONS.labels(route=route).value for route in (ROUTE_INTAKE, ROUTE_RECOMMEND)}
+    print(f"routes: {decisions}")
+
+    payload = {"config": vars(args) | {"output": None}, "router": timing, "routes": decisions, "results": results}
+    path = save_results("routing", payload, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
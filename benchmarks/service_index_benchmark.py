@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Latency of "which architectures use service X" lookups on a large synthetic catalog.
+
+Builds the bitset service index over synthetic architectures (each using a handful
+of services drawn with a skewed popularity, with aliases mixed in), then times AND
+and OR queries against a scan over per-architecture service sets. Also reports
+build and load time, serialized size and service canonicalization throughput.
+
+    python -m benchmarks.service_index_benchmark --architectures 100000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.service_index import SERVICE_ALIASES, ServiceIndex, canonical_service, canonical_services
+from benchmarks.common import percentile, save_results
+
+QUERIES = [
+    {"all_of": ["Event Hubs"]},
+    {"all_of": ["Azure Event Hubs", "Databricks"]},
+    {"all_of": ["ADLS Gen2", "Data Factory", "Synapse Analytics"]},
+    {"any_of": ["Power BI", "Fabric"]},
+    {"all_of": ["AKS"], "any_of": ["Cosmos DB", "PostgreSQL", "SQL DB"]},
+    {"all_of": ["Service 150", "Service 199"]},
+]
+
+
+def synthetic_catalog(architectures: int, extra_services: int, seed: int) -> List[List[str]]:
+    """Service lists as ingestion sees them: known services under any of their aliases plus a long tail."""
+    rng = random.Random(seed)
+    spellings = [[name, f"Azure {name}", *aliases] for name, aliases in SERVICE_ALIASES.items()]
+    spellings += [[f"Service {index}"] for index in range(extra_services)]
+    # Popularity falls off with rank, like real pattern catalogs
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(spellings))]
+    catalog = []
+    for _ in range(architectures):
+        picks = rng.choices(range(len(spellings)), weights=weights, k=rng.randint(4, 10))
+        catalog.append([rng.choice(spellings[pick]) for pick in picks])
+    return catalog
+
+
+def time_us(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        func()
+        timings.append((time.perf_counter_ns() - started) / 1000)
+    timings.sort()
+    return {"mean_us": sum(timings) / len(timings), "p50_us": percentile(timings, 50), "p99_us": percentile(timings, 99)}
+
+
+def scan_query(ids: Sequence[str], service_sets: Sequence[Set[str]], all_of: Sequence[str], any_of: Sequence[str],
+               limit: int) -> Dict[str, Any]:
+    """Baseline: test every architecture's service set."""
+    required = {canonical_service(name) for name in all_of}
+    optional = {canonical_service(name) for name in any_of}
+    matches = [
+        ids[position] for position, services in enumerate(service_sets)
+        if required <= services and (not optional or optional & services)
+    ]
+    return {"total": len(matches), "architecture_ids": matches[:limit]}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--architectures", type=int, default=100_000)
+    parser.add_argument("--extra-services", type=int, default=200, help="Long-tail services besides the known ones")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed repetitions per query")
+    parser.add_argument("--limit", type=int, default=50, help="Page size returned per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    catalog = synthetic_catalog(args.architectures, args.extra_services, args.seed)
+    ids = [f"arch-{index}" for index in range(len(catalog))]
+
+    started = time.perf_counter()
+    canonical = [canonical_services(services) for services in catalog]
+    canonicalize_seconds = time.perf_counter() - started
+    names = sum(len(services) for services in catalog)
+    print(f"canonicalization: {names / canonicalize_seconds:,.0f} names/s ({names:,} names)")
+
+    started = time.perf_counter()
+    index = ServiceIndex.build(zip(ids, canonical))
+    build_seconds = time.perf_counter() - started
+    serialized = json.dumps(index.to_dict())
+    started = time.perf_counter()
+    ServiceIndex.from_dict(json.loads(serialized))
+    load_seconds = time.perf_counter() - started
+    print(f"index: {len(index.bitsets)} services over {len(ids):,} architectures  build={build_seconds * 1000:.0f}ms  "
+          f"load={load_seconds * 1000:.0f}ms  size={len(serialized) / 1e6:.1f}MB")
+
+    service_sets = [set(services) for services in canonical]
+    rows = []
+    for query in QUERIES:
+        all_of, any_of = query.get("all_of", []), query.get("any_of", [])
+        indexed = index.query(all_of, any_of, limit=args.limit)
+        scanned = scan_query(ids, service_sets, all_of, any_of, args.limit)
+        assert indexed["total"] == scanned["total"] and indexed["architecture_ids"] == scanned["architecture_ids"], query
+        index_timing = time_us(lambda: index.query(all_of, any_of, limit=args.limit), args.repeat)
+        scan_timing = time_us(lambda: scan_query(ids, service_sets, all_of, any_of, args.limit), max(3, args.repeat // 10))
+        rows.append({"query": query, "matches": indexed["total"], "index": index_timing, "scan": scan_timing})
+        print(f"{json.dumps(query):70s} matches={indexed['total']:6d}  index p50={index_timing['p50_us']:8.1f}us  "
+              f"scan p50={scan_timing['p50_us']:10.1f}us  ({scan_timing['p50_us'] / index_timing['p50_us']:.0f}x)")
+
+    path = save_results(
+        "service_index",
+        {
+            "config": vars(args) | {"output": None},
+            "canonicalize_names_per_second": names / canonicalize_seconds,
+            "build_seconds": build_seconds,
+            "load_seconds": load_seconds,
+            "serialized_bytes": len(serialized),
+            "queries": rows,
+        },
+        args.output,
+    )
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
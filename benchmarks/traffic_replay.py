@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Replay a captured /query traffic recording (TRAFFIC_CAPTURE_PATH) against a server.
+
+Requests are sent open-loop at their recorded offsets divided by --speed, so
+the recorded mix of first turns, follow-ups and long threads arrives with its
+recorded burstiness. Turns of one recorded thread stay in order: a follow-up
+waits for the previous turn to finish and reuses the thread the server created
+for that conversation. Recordings hold no query text, so each request sends a
+stand-in query of the recorded length.
+
+By default the recording is replayed in-process against `backend.app:app` with
+the local fake agents service; pass --url to replay against a running server.
+
+    python -m benchmarks.traffic_replay capture.jsonl --speed 10 --time-scale 0.2
+    python -m benchmarks.traffic_replay worker-*.jsonl --url http://127.0.0.1:8000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend.intake_agent import IntakeAgent
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.load_test import FOLLOW_UPS, WORKLOADS
+
+
+@dataclass
+class Conversation:
+    """Recorded requests replayed in order on one server thread; `records` are sorted by time."""
+
+    key: str
+    records: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def load_recording(paths: List[Path]) -> List[Dict[str, Any]]:
+    """Records of one or more capture files (one per worker, say) merged in time order."""
+    records = []
+    for path in paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda record: record["t"])
+
+
+def group_conversations(records: List[Dict[str, Any]]) -> List[Conversation]:
+    """
+    Group records by thread hash. A request with no thread (a first turn that
+    failed before a thread existed) is a conversation of its own.
+    """
+    conversations: Dict[str, Conversation] = {}
+    for index, record in enumerate(records):
+        key = record.get("thread") or f"request-{index}"
+        conversations.setdefault(key, Conversation(key)).records.append(record)
+    return list(conversations.values())
+
+
+def stand_in_query(chars: int, follow_up: bool, seed: int) -> str:
+    """A realistic question cut or repeated to exactly `chars` characters."""
+    pool = FOLLOW_UPS if follow_up else WORKLOADS
+    text = pool[seed % len(pool)]
+    while len(text) < chars:
+        text = f"{text} {pool[(seed + len(text)) % len(pool)]}"
+    return text[:max(chars, 1)]
+
+
+async def replay(client: httpx.AsyncClient, records: List[Dict[str, Any]], speed: float, timeout: float) -> List[Dict[str, Any]]:
+    """Send every record at its scaled offset, one task per conversation; returns one result per request."""
+    if not records:
+        return []
+    first_t = records[0]["t"]
+    started = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+
+    async def play(conversation: Conversation, seed: int) -> None:
+        thread_id: Optional[str] = None
+        for turn, record in enumerate(conversation.records):
+            due = (record["t"] - first_t) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent = time.perf_counter() - started
+            query = stand_in_query(record.get("query_chars", 0), turn > 0, seed + turn)
+            try:
+                response = await client.post(
+                    record.get("path", "/query"), json={"query": query, "thread_id": thread_id}, timeout=timeout
+                )
+                status = response.status_code
+                if status == 200:
+                    thread_id = response.json().get("thread_id") or thread_id
+            except httpx.HTTPError:
+                status = 0
+            results.append({
+                "conversation": conversation.key,
+                "turn": turn,
+                "follow_up": turn > 0,
+                "recorded_status": record.get("status"),
+                "recorded_latency_s": record.get("latency_s"),
+                "status": status,
+                "sent_s": sent,
+                # How far behind its scaled schedule the request went out, usually waiting on its previous turn
+                "lag_s": max(0.0, sent - due),
+                "latency_s": time.perf_counter() - started - sent,
+            })
+
+    conversations = group_conversations(records)
+    await asyncio.gather(*(play(conversation, seed) for seed, conversation in enumerate(conversations)))
+    return results
+
+
+def summarize(records: List[Dict[str, Any]], results: List[Dict[str, Any]], duration: float, speed: float) -> Dict[str, Any]:
+    conversations = Counter(result["conversation"] for result in results)
+    recorded_span = records[-1]["t"] - records[0]["t"] if records else 0.0
+    ok = [result for result in results if result["status"] == 200]
+    return {
+        "requests": len(results),
+        "conversations": len(conversations),
+        "turns_per_conversation_max": max(conversations.values(), default=0),
+        "follow_up_ratio": sum(result["follow_up"] for result in results) / len(results) if results else 0.0,
+        "recorded_span_s": recorded_span,
+        "target_duration_s": recorded_span / speed,
+        "duration_s": duration,
+        "rps": len(results) / duration if duration else 0.0,
+        "status": dict(Counter(str(result["status"]) for result in results)),
+        "recorded_status": dict(Counter(str(result["recorded_status"]) for result in results)),
+        "latency_s": summarize_latencies([result["latency_s"] for result in ok]),
+        "first_turn_latency_s": summarize_latencies([result["latency_s"] for result in ok if not result["follow_up"]]),
+        "follow_up_latency_s": summarize_latencies([result["latency_s"] for result in ok if result["follow_up"]]),
+        "recorded_latency_s": summarize_latencies([record["latency_s"] for record in records if record.get("status") == 200]),
+        "lag_s": summarize_latencies([result["lag_s"] for result in results]),
+    }
+
+
+async def run_replay(args: argparse.Namespace) -> Dict[str, Any]:
+    records = load_recording(args.recording)
+    if args.limit:
+        records = records[:args.limit]
+    agent: Optional[IntakeAgent] = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url)
+    else:
+        config = FakeServiceConfig(seed=args.seed, time_scale=args.time_scale)
+        agent = await IntakeAgent.create(client=FakeProjectClient(config))
+        backend_app.agent = agent
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=backend_app.app), base_url="http://replay")
+
+    started = time.perf_counter()
+    try:
+        results = await replay(client, records, args.speed, args.timeout)
+    finally:
+        await client.aclose()
+        if agent is not None:
+            await agent.cleanup()
+            backend_app.agent = None
+    return summarize(records, results, time.perf_counter() - started, args.speed)
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(
+        f"{summary['requests']} requests in {summary['conversations']} conversations "
+        f"(follow-ups {summary['follow_up_ratio']:.0%}, longest {summary['turns_per_conversation_max']} turns)"
+    )
+    print(
+        f"recorded span {summary['recorded_span_s']:.1f} s -> target {summary['target_duration_s']:.1f} s, "
+        f"took {summary['duration_s']:.1f} s ({summary['rps']:.2f} req/s)"
+    )
+    print(f"status replayed {summary['status']}  recorded {summary['recorded_status']}")
+    for label, key in (("all", "latency_s"), ("first turns", "first_turn_latency_s"),
+                       ("follow-ups", "follow_up_latency_s"), ("recorded", "recorded_latency_s"),
+                       ("send lag", "lag_s")):
+        stats = summary[key]
+        print(
+            f"{label:12s} n={stats['count']:5d}  p50={format_ms(stats['p50'])}  p95={format_ms(stats['p95'])}  "
+            f"p99={format_ms(stats['p99'])}  max={format_ms(stats['max'])}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", type=Path, nargs="+", help="capture files written with TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay this many times faster than recorded")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--url", help="replay against a running server instead of the in-process fake")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplier for every fake service latency")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+    if args.speed < 1.0:
+        parser.error("--speed must be at least 1 (real time)")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Per-request INFO logs from httpx and the backend would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    summary = asyncio.run(run_replay(args))
+    print_report(summary)
+    config = {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()}
+    config["recording"] = [str(path) for path in args.recording]
+    path = save_results("traffic_replay", {"config": config, "summary": summary}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
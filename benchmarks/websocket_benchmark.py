@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Open WebSocket conversations per worker and their memory footprint.
+
+For each level a single uvicorn worker serving `benchmarks.fake_app:app` is
+started. The benchmark opens that many conversations on /ws/conversation,
+reads the worker's resident set size (Linux /proc) once they are idle, then
+sends one turn on every conversation at once and records the time to the
+first pushed event and to `completed`, sampling the peak RSS meanwhile.
+
+    python -m benchmarks.websocket_benchmark --connections 100 1000 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from websockets.asyncio.client import connect
+
+# Add the project root to the Python path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.common import format_ms, save_results, summarize_latencies
+from benchmarks.load_test import WORKLOADS
+from benchmarks.worker_scaling import wait_until_healthy
+
+
+def start_server(port: int, time_scale: float) -> subprocess.Popen:
+    env = dict(os.environ, FAKE_AGENTS_TIME_SCALE=str(time_scale))
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+            "--ws-max-queue", "32",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of a process in MB."""
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def open_conversation(url: str) -> Any:
+    socket = await connect(url, max_queue=64, open_timeout=60)
+    ready = json.loads(await socket.recv())
+    assert ready["type"] == "ready", ready
+    return socket
+
+
+async def run_turn(socket: Any, query: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    await socket.send(json.dumps({"query": query}))
+    first_event = None
+    while True:
+        event = json.loads(await socket.recv())
+        if first_event is None:
+            first_event = time.perf_counter() - started
+        if event["type"] in ("completed", "error"):
+            return {"first_event": first_event, "completed": time.perf_counter() - started, "ok": event["type"] == "completed"}
+
+
+async def measure(connections: int, args: argparse.Namespace) -> Dict[str, Any]:
+    server = start_server(args.port, args.time_scale)
+    url = f"ws://127.0.0.1:{args.port}/ws/conversation"
+    try:
+        await wait_until_healthy(f"http://127.0.0.1:{args.port}")
+        # One full turn first so code paths and the agent's executor threads exist before the baseline
+        warm = await open_conversation(url)
+        await run_turn(warm, WORKLOADS[0])
+        await warm.close()
+        await asyncio.sleep(0.5)
+        baseline_mb = rss_mb(server.pid)
+
+        semaphore = asyncio.Semaphore(args.open_concurrency)
+
+        async def opened() -> Any:
+            async with semaphore:
+                return await open_conversation(url)
+
+        started = time.perf_counter()
+        sockets = await asyncio.gather(*(opened() for _ in range(connections)))
+        open_s = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+        idle_mb = rss_mb(server.pid)
+
+        peak_mb = idle_mb
+        turns_done = asyncio.Event()
+
+        async def sample_rss() -> None:
+            nonlocal peak_mb
+            while not turns_done.is_set():
+                peak_mb = max(peak_mb, rss_mb(server.pid))
+                await asyncio.sleep(0.1)
+
+        sampler = asyncio.create_task(sample_rss())
+        started = time.perf_counter()
+        turns = await asyncio.gather(*(
+            run_turn(socket, f"{WORKLOADS[index % len(WORKLOADS)]} (conversation {index})")
+            for index, socket in enumerate(sockets)
+        ))
+        turns_s = time.perf_counter() - started
+        turns_done.set()
+        await sampler
+        await asyncio.gather(*(socket.close() for socket in sockets))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "connections": connections,
+        "open_s": open_s,
+        "baseline_rss_mb": baseline_mb,
+        "idle_rss_mb": idle_mb,
+        "idle_kb_per_connection": (idle_mb - baseline_mb) * 1024 / connections,
+        "peak_rss_mb": peak_mb,
+        "active_kb_per_connection": (peak_mb - baseline_mb) * 1024 / connections,
+        "turns_s": turns_s,
+        "turn_errors": sum(not turn["ok"] for turn in turns),
+        "first_event_s": summarize_latencies([turn["first_event"] for turn in turns]),
+        "completed_s": summarize_latencies([turn["completed"] for turn in turns]),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for connections in args.connections:
+        result = await measure(connections, args)
+        results.append(result)
+        print(
+            f"connections={connections:5d}  idle={result['idle_kb_per_connection']:6.1f} KB/conn  "
+            f"active={result['active_kb_per_connection']:6.1f} KB/conn  rss={result['idle_rss_mb']:.0f}/"
+            f"{result['peak_rss_mb']:.0f} MB  first event p50={format_ms(result['first_event_s']['p50'])}  "
+            f"completed p50={format_ms(result['completed_s']['p50'])}  errors={result['turn_errors']}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--open-concurrency", type=int, default=200, help="Connections opened at once")
+    parser.add_argument("--time-scale", type=float, default=0.25)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("websocket", {"config": vars(args) | {"output": None}, "levels": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Throughput of serve.py at 1, 2, 4 and 8 worker processes against the fake agents service.
+
+Each configuration starts `serve.py --app benchmarks.fake_app:app` with a fresh
+shared-state database and drives it over HTTP with the load generator.
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 8 --concurrency 32 --requests 200
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Add the project root to the Python path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.common import format_ms, save_results
+from benchmarks.load_test import build_requests, run_level
+
+
+def start_server(workers: int, port: int, state_path: str, time_scale: float) -> subprocess.Popen:
+    env = dict(os.environ, FAKE_AGENTS_TIME_SCALE=str(time_scale))
+    return subprocess.Popen(
+        [
+            sys.executable, str(ROOT / "serve.py"),
+            "--workers", str(workers),
+            "--port", str(port),
+            "--host", "127.0.0.1",
+            "--app", "benchmarks.fake_app:app",
+            "--state-path", state_path,
+            "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/health", timeout=2)
+                if response.status_code == 200 and response.json().get("status") == "healthy":
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError(f"Server at {base_url} did not become healthy")
+
+
+async def measure(workers: int, args: argparse.Namespace) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(workers, args.port, str(Path(tmp) / "state.db"), args.time_scale)
+        try:
+            await wait_until_healthy(base_url)
+            plan = build_requests(args.requests, args.follow_up_ratio, args.seed)
+            # No keep-alive: each request is a new connection, so the kernel spreads them across workers
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=0)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+                result = await run_level(client, args.concurrency, plan, args.timeout)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    result["workers"] = workers
+    return result
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for workers in args.workers:
+        result = await measure(workers, args)
+        results.append(result)
+        latency = result["latency_s"]
+        print(
+            f"workers={workers:2d}  rps={result['rps']:7.2f}  p50={format_ms(latency['p50'])}  "
+            f"p95={format_ms(latency['p95'])}  errors={result['error_rate']:.1%}"
+        )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--follow-up-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-scale", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmark(args))
+    path = save_results("worker_scaling", {"config": vars(args) | {"output": None}, "levels": results}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import os
+import sys
+import argparse
+import httpx
 from pathlib import Path
 from dotenv import load_dotenv
 from pdf2image import convert_from_path
@@ -7,13 +10,13 @@ from azure.core.credentials import AzureKeyCredential
 from azure.ai.documentintelligence import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import AnalyzeResult
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from openai import AzureOpenAI
 import json
 import base64
 import fitz  # PyMuPDF
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Tuple
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
@@ -31,11 +34,23 @@ from azure.search.documents.indexes.models import (
     SearchIndex
 )
 from azure.core.credentials import AzureKeyCredential, AccessToken
-import uuid
+from azure.core.exceptions import ResourceNotFoundError
+import hashlib
 from azure.identity import ClientSecretCredential
 from azure.identity import DefaultAzureCredential
 from azure.storage.blob import BlobServiceClient
 from msal import ConfidentialClientApplication
+from ingestion_trace import Tracer, SamplingProfiler, NullProfiler
+from dedup import find_duplicates, image_hash, merge_duplicates
+from ocr_stream import (PAGES_PER_REQUEST, iter_extraction_chunks, iter_figures, read_jsonl,
+                        stream_layout_to_jsonl, write_jsonl)
+from page_select import PageDecision, select_pages, selection_summary
+
+# The catalog snapshot format is shared with the backend that serves it
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.catalog import split_services, write_catalog
+from diagram_variants import write_variants
+from backend.service_index import ServiceIndex, canonical_services
 #import logging
 #logging.basicConfig(level=logging.DEBUG)
 
@@ -47,13 +62,18 @@ out_page_dir  = data_dir / "split_pages"      # …/data/split_pages
 out_page_dir.mkdir(parents=True, exist_ok=True)
 out_fig_dir = data_dir / "figures"
 out_fig_dir.mkdir(parents=True, exist_ok=True)
+out_ocr_dir = data_dir / "ocr"                # …/data/ocr: per-page JSONL of the streaming mode
 
 load_dotenv(Path(__file__).resolve().parents[1] / ".env")
 
+# Spans for every stage, PDF, page and remote call; the HTTP hooks count requests and retries
+tracer = Tracer()
+profiler = NullProfiler()
+
 #configure service connections
 endpoint = os.environ["Azure_Document_Intelligence_Endpoint"]#
 key       = os.environ["Azure_Document_Intelligence_Key"]#
-adi_client = DocumentIntelligenceClient(endpoint, AzureKeyCredential(key))
+adi_client = DocumentIntelligenceClient(endpoint, AzureKeyCredential(key), raw_request_hook=tracer.on_request_attempt)
 
 aoai_endpoint   = os.environ["Azure_OpenAI_Endpoint"]#
 aoai_key        = os.environ["Azure_OpenAI_Key"]#
@@ -64,6 +84,7 @@ aoai_client = AzureOpenAI(
     api_key=aoai_key,
     azure_endpoint=aoai_endpoint,
     api_version=api_version,
+    http_client=httpx.Client(event_hooks={"request": [tracer.on_request_attempt]}),
 )
 
 search_endpoint = os.environ["Azure_Search_Endpoint"]
@@ -74,7 +95,7 @@ vector_config = "arch-hnsw"
 azure_openai_embedding_dimensions = 3072
 
 cred          = AzureKeyCredential(search_admin_key)
-index_client  = SearchIndexClient(search_endpoint, cred)
+index_client  = SearchIndexClient(search_endpoint, cred, raw_request_hook=tracer.on_request_attempt)
 
 # Blob Service Principal credentials
 tenant_id = os.environ["Azure_Blob_SP_Tenant_Id"] 
@@ -111,7 +132,8 @@ storage_account_name = os.environ["Azure_Blob_Storage_Account_Name"]
 container_name = os.environ["Azure_Blob_Container_Name"]
 blob_service_client = BlobServiceClient(
     account_url=f"https://{storage_account_name}.blob.core.windows.net",
-    credential=credential
+    credential=credential,
+    raw_request_hook=tracer.on_request_attempt
 )
 
 architecture_extraction_system_prompt = """
@@ -159,61 +181,85 @@ class ArchitectureAISummaries(BaseModel):
     extracted_architecture_summaries: List[ArchitecutreImagesSchema]
 
 
+def search_index_fields() -> List[SearchField]:
+    return [
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+        SimpleField(name="name", type=SearchFieldDataType.String, searchable=True, filterable=True),
+        SimpleField(name="architecture_url", type=SearchFieldDataType.String, searchable=True, filterable=True),
+        # Pattern catalog of the source PDF
+        SimpleField(name="category", type=SearchFieldDataType.String, filterable=True, facetable=True),
+        # Catalogs of the PDFs the architecture and its merged duplicates came from; the backend
+        # filters on it (categories/any(c: c eq 'migration'))
+        SimpleField(name="categories", type=SearchFieldDataType.Collection(SearchFieldDataType.String),
+                    filterable=True, facetable=True),
+        SearchableField(name="content", type=SearchFieldDataType.String),
+        SearchField(
+        name="content_vector",
+        type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+        searchable=True,
+        vector_search_dimensions=3072,
+        vector_search_profile_name="myHnswProfile"
+    )]
+
+
 def create_or_update_search_index() -> None:
 
     try: 
-        index_client.get_index(index_name)
-        print(f"Index {index_name} already exists")
-    except:
-        print(f"Creating index {index_name}")
-
-        fields = [
-            SimpleField(name="id", type=SearchFieldDataType.String, key=True),
-            SimpleField(name="name", type=SearchFieldDataType.String, searchable=True, filterable=True),
-            SimpleField(name="architecture_url", type=SearchFieldDataType.String, searchable=True, filterable=True),
-            SearchableField(name="content", type=SearchFieldDataType.String),
-            SearchField(
-            name="content_vector",
-            type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
-            searchable=True,
-            vector_search_dimensions=3072,
-            vector_search_profile_name="myHnswProfile"
-        )]
-
-        vector_search = VectorSearch(
-        algorithms=[
-            HnswAlgorithmConfiguration(
-                name="myHnsw"
-            )
-        ],
-        profiles=[
-            VectorSearchProfile(
-                name="myHnswProfile",
-                algorithm_configuration_name="myHnsw",
-            )
-        ])
-        
-        semantic_config = SemanticConfiguration(
-        name="my-semantic-config",
-        prioritized_fields=SemanticPrioritizedFields(
-            title_field=SemanticField(field_name="name"),
-            content_fields=[SemanticField(field_name="content")]
-        ))
+        index = index_client.get_index(index_name)
+    except ResourceNotFoundError:
+        index = None
+
+    if index is not None:
+        # Fields added since the index was created (category, categories) are added in place: an
+        # index accepts new fields, and documents uploaded before them read as null
+        existing = {field.name for field in index.fields}
+        missing = [field for field in search_index_fields() if field.name not in existing]
+        if not missing:
+            print(f"Index {index_name} already exists")
+            return
+        print(f"Adding fields {', '.join(field.name for field in missing)} to index {index_name}")
+        index.fields.extend(missing)
+        index_client.create_or_update_index(index)
+        return
+
+    print(f"Creating index {index_name}")
+
+    vector_search = VectorSearch(
+    algorithms=[
+        HnswAlgorithmConfiguration(
+            name="myHnsw"
+        )
+    ],
+    profiles=[
+        VectorSearchProfile(
+            name="myHnswProfile",
+            algorithm_configuration_name="myHnsw",
+        )
+    ])
+    
+    semantic_config = SemanticConfiguration(
+    name="my-semantic-config",
+    prioritized_fields=SemanticPrioritizedFields(
+        title_field=SemanticField(field_name="name"),
+        content_fields=[SemanticField(field_name="content")]
+    ))
 
-        semantic_search = SemanticSearch(configurations=[semantic_config])
-        index = SearchIndex(name=index_name, fields=fields, vector_search=vector_search, semantic_search=semantic_search)
-        index_result = index_client.create_or_update_index(index)
-        print(f'{index_result.name} created')
+    semantic_search = SemanticSearch(configurations=[semantic_config])
+    index = SearchIndex(name=index_name, fields=search_index_fields(), vector_search=vector_search,
+                        semantic_search=semantic_search)
+    index_result = index_client.create_or_update_index(index)
+    print(f'{index_result.name} created')
 
 
 def get_ocr_from_adi(file_path: str):
     
-    with open(file_path, "rb") as f:
-        poller = adi_client.begin_analyze_document(
-       "prebuilt-layout",
-        body=f)
+    with tracer.span("adi_analyze", "remote", bytes=os.path.getsize(file_path)):
+        with open(file_path, "rb") as f:
+            poller = adi_client.begin_analyze_document(
+           "prebuilt-layout",
+            body=f)
 
-    result = poller.result()
+        result = poller.result()
 
     section_headings = []
     for paragraph in result.paragraphs:
@@ -233,6 +279,23 @@ def get_ocr_from_adi(file_path: str):
     return section_headings, fig_bounding_boxes, result
 
 
+def stream_ocr_from_adi(file_path: Path, pages_path: Path, pages_per_request: int = PAGES_PER_REQUEST) -> int:
+    """
+    Streaming mode: analyze a few pages per request and write the layout to `pages_path`
+    as one JSON line per page. Returns the number of pages written.
+    """
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+
+    def analyze(pages: str):
+        with tracer.span("adi_analyze", "remote", bytes=os.path.getsize(file_path), pages=pages):
+            with open(file_path, "rb") as f:
+                poller = adi_client.begin_analyze_document("prebuilt-layout", body=f, pages=pages)
+            return poller.result()
+
+    return stream_layout_to_jsonl(analyze, page_count, pages_path, pages_per_request)
+
+
 def _to_points(poly) -> list[fitz.Point]:
     """
     Accepts either a flat list [x1,y1,x2,y2,x3,y3,x4,y4] or
@@ -245,17 +308,19 @@ def _to_points(poly) -> list[fitz.Point]:
         raise ValueError("polygon must contain four points")
     return [fitz.Point(x * 72, y * 72) for x, y in poly]
 
-def pdf_to_figures(pdf_path: Path, out_fig_dir: Path, dpi: int = 300) -> None:
+def pdf_to_figures(pdf_path: Path, out_fig_dir: Path, figure_regions: Iterable[Tuple[int, Any]], dpi: int = 300) -> int:
     """
     Extract figures from each page of the pdf and save them in the specified directory.
+    `figure_regions` yields (page number, polygon) pairs; returns the number of figures.
     """
     doc  = fitz.open(pdf_path)
     zoom = dpi / 72.0                       
     mat  = fitz.Matrix(zoom, zoom)
 
-    for fig_idx,fig_bounding_box in enumerate(fig_bounding_boxes):
-        quad = _to_points(fig_bounding_box["polygon"])
-        page = doc[fig_bounding_box["pageNumber"]-1]
+    fig_idx = -1
+    for fig_idx, (page_number, polygon) in enumerate(figure_regions):
+        quad = _to_points(polygon)
+        page = doc[page_number-1]
         xs, ys = zip(*quad)
         bbox = fitz.Rect(min(xs), min(ys), max(xs), max(ys))
         zoom = dpi / 72.0
@@ -263,24 +328,45 @@ def pdf_to_figures(pdf_path: Path, out_fig_dir: Path, dpi: int = 300) -> None:
         pix  = page.get_pixmap(matrix=mat, clip=bbox, alpha=False)
         out_fig_path = out_fig_dir / f"{pdf_path.stem}_{fig_idx:03}.png"
         pix.save(out_fig_path)
-        
+    return fig_idx + 1
+
+
 
+def render_page(doc: "fitz.Document", pdf_path: Path, page_idx: int, out_page_dir: Path, dpi: int = 300) -> Path:
+    """Render one page (0-based) for the vision model as `<pdf stem>_<page>.png`."""
+    pix = doc.load_page(page_idx).get_pixmap(matrix=fitz.Matrix(dpi / 72.0, dpi / 72.0), alpha=False)
+    out_page_path = out_page_dir / f"{pdf_path.stem}_{page_idx:03}.png"
+    pix.save(out_page_path)
+    return out_page_path
 
-def pdf_to_pngs(pdf_path: Path, out_fig_dir: Path, out_page_dir: Path, dpi: int = 300) -> None:
 
+def pdf_to_pngs(pdf_path: Path, out_fig_dir: Path, out_page_dir: Path, figure_regions: Iterable[Tuple[int, Any]],
+                dpi: int = 300, select: bool = True) -> List[PageDecision]:
+    """
+    Render the pages chosen for the vision model and every figure.
+
+    With `select`, only pages with a Document Intelligence figure or a diagram-like
+    thumbnail are rendered (see page_select.py). Returns the decision for each page.
+    """
+    figure_regions = list(figure_regions)
     doc  = fitz.open(pdf_path)
-    zoom = dpi / 72.0                       
-    mat  = fitz.Matrix(zoom, zoom)
 
-    for page_idx in range(len(doc)):
-        page = doc[page_idx]
-        w, h = page.rect.width, page.rect.height
-        pix = doc.load_page(page_idx).get_pixmap(matrix=mat, alpha=False)
-        out_page_path = out_page_dir / f"{pdf_path.stem}_{page_idx:03}.png"
-        pix.save(out_page_path)
+    with tracer.span("page_selection", "cpu", pages=len(doc)) as span, profiler.sample("page_selection"):
+        if select:
+            decisions = select_pages(doc, (page_number for page_number, _ in figure_regions))
+        else:
+            decisions = [PageDecision(page_idx + 1, True, "all_pages") for page_idx in range(len(doc))]
+        span.attrs["selected"] = sum(decision.selected for decision in decisions)
+    selected_pages = [decision.page - 1 for decision in decisions if decision.selected]
+
+    with tracer.span("render_pages", "cpu", pages=len(selected_pages)) as span, profiler.sample("render_pages"):
+        for page_idx in selected_pages:
+            out_page_path = render_page(doc, pdf_path, page_idx, out_page_dir, dpi=dpi)
+            span.add_bytes(out_page_path.stat().st_size)
         
-    
-    pdf_to_figures(pdf_path, out_fig_dir, dpi=dpi)
+    with tracer.span("render_figures", "cpu") as span, profiler.sample("render_figures"):
+        span.attrs["figures"] = pdf_to_figures(pdf_path, out_fig_dir, figure_regions, dpi=dpi)
+    return decisions
 
 
 def architecture_extraction_with_ocr(ocr_content: str, section_headings: str, architecture_extraction_system_prompt: str):
@@ -296,52 +382,111 @@ def architecture_extraction_with_ocr(ocr_content: str, section_headings: str, ar
 
     extracted_architectures = []
 
-    response = aoai_client.beta.chat.completions.parse(
-    model=aoai_deployment,          # deployment‑level model name
-    messages=[
-        {"role": "system", "content": architecture_extraction_system_prompt},
-        {"role": "user",   "content": user_message},
-    ],
-    temperature=0.2,
-    max_tokens=2500,
-    response_format=ArchitectureExtraction
-)
+    with tracer.span("architecture_extraction", "remote", bytes=len(user_message.encode("utf-8"))):
+        response = aoai_client.beta.chat.completions.parse(
+        model=aoai_deployment,          # deployment‑level model name
+        messages=[
+            {"role": "system", "content": architecture_extraction_system_prompt},
+            {"role": "user",   "content": user_message},
+        ],
+        temperature=0.2,
+        max_tokens=2500,
+        response_format=ArchitectureExtraction
+    )
 
     response = json.loads(response.choices[0].message.content)
     extracted_architectures.extend(response["extracted_architectures"])
     return extracted_architectures
 
-def architecture_ai_summaries_with_images(pdf_path: Path, file_name: str, system_prompt_arch_summary: str):
-
-    doc  = fitz.open(pdf_path)
-
+def extract_architectures_streaming(file_path: Path, pages_per_request: int,
+                                    select: bool = True) -> Tuple[List[dict], List[PageDecision]]:
+    """
+    Streaming mode for one PDF: OCR to per-page JSONL, render from it, then extract
+    architectures chunk by chunk. Extracted architectures are appended to a JSONL
+    file as each chunk finishes and read back from it. Also returns the page decisions.
+    """
+    pages_path = out_ocr_dir / f"{file_path.stem}.pages.jsonl"
+    architectures_path = out_ocr_dir / f"{file_path.stem}.architectures.jsonl"
+    with tracer.span("ocr_stream", "stage") as span:
+        span.attrs["pages"] = stream_ocr_from_adi(file_path, pages_path, pages_per_request)
+    decisions = pdf_to_pngs(
+        file_path, out_fig_dir, out_page_dir,
+        ((figure["page"], figure["polygon"]) for figure in iter_figures(pages_path)), dpi=300, select=select,
+    )
+    write_jsonl(architectures_path, [])
+    for ocr_content, section_headings in iter_extraction_chunks(pages_path):
+        write_jsonl(
+            architectures_path,
+            architecture_extraction_with_ocr(
+                ocr_content=ocr_content,
+                section_headings="\n".join(section_headings),
+                architecture_extraction_system_prompt=architecture_extraction_system_prompt,
+            ),
+            append=True,
+        )
+    return list(read_jsonl(architectures_path)), decisions
+
+def extract_pdf(file_path: Path, streaming: bool, pages_per_request: int = PAGES_PER_REQUEST,
+                select: bool = True) -> Tuple[List[dict], List[PageDecision]]:
+    """OCR one PDF, render its selected pages and figures and extract its architectures, with the page decisions."""
+    if streaming:
+        return extract_architectures_streaming(file_path, pages_per_request, select=select)
+    section_headings, fig_bounding_boxes, result = get_ocr_from_adi(str(file_path))
+    page_decisions = pdf_to_pngs(
+        file_path, out_fig_dir, out_page_dir,
+        ((box["pageNumber"], box["polygon"]) for box in fig_bounding_boxes), dpi=300, select=select,
+    )
+    extracted_architectures = architecture_extraction_with_ocr(
+        ocr_content=result.content,
+        section_headings=section_headings,
+        architecture_extraction_system_prompt=architecture_extraction_system_prompt
+    )
+    del result
+    return extracted_architectures, page_decisions
+
+def architecture_ai_summaries_with_images(pdf_path: Path, file_name: str, system_prompt_arch_summary: str,
+                                          decisions: List[PageDecision]):
+    """Summarize the pages selected for the vision model, one call per page."""
     architecture_ai_summaries = []                                              
 
-    for page_idx in range(len(doc)):                        
+    for page_idx in (decision.page - 1 for decision in decisions if decision.selected):
         image_path = out_page_dir / f"{Path(file_name).stem}_{page_idx:03}.png"
         print("Image Path:", image_path)
         if not image_path.exists():
             print(f"File missing: {image_path}")
             continue
         
-        with open(image_path, "rb") as img_f:
-            #blob_client.upload_blob(img_f, overwrite=True)
-            image_base64 = base64.b64encode(img_f.read()).decode("utf-8")
+        with tracer.span("page", "page", page=page_idx):
+            architecture_ai_summaries.extend(
+                _summarize_page_image(image_path, system_prompt_arch_summary)
+            )
+    return architecture_ai_summaries
 
-        messages = [
-            {"role": "system", "content": system_prompt_arch_summary},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Here is the architecture diagram image:"},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{image_base64}"},
-                    },
-                ],
-            },
-        ]
 
+def _summarize_page_image(image_path: Path, system_prompt_arch_summary: str) -> List[dict]:
+    """Send one rendered page to the vision model and return its architecture summaries."""
+    with tracer.span("base64_encode", "cpu") as span, profiler.sample("base64_encode"):
+        with open(image_path, "rb") as img_f:
+            #blob_client.upload_blob(img_f, overwrite=True)
+            image_bytes = img_f.read()
+            image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+        span.add_bytes(len(image_bytes))
+
+    messages = [
+        {"role": "system", "content": system_prompt_arch_summary},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Here is the architecture diagram image:"},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/png;base64,{image_base64}"},
+                },
+            ],
+        },
+    ]
+
+    with tracer.span("vision_summary", "remote", bytes=len(image_base64)):
         response = aoai_client.beta.chat.completions.parse(
             model=aoai_deployment,
             messages=messages,
@@ -350,77 +495,238 @@ def architecture_ai_summaries_with_images(pdf_path: Path, file_name: str, system
             response_format=ArchitectureAISummaries
         )
 
-        reply = json.loads(response.choices[0].message.content)
-        architecture_ai_summaries.extend(reply["extracted_architecture_summaries"])
-    return architecture_ai_summaries
+    reply = json.loads(response.choices[0].message.content)
+    return reply["extracted_architecture_summaries"]
 
 
-def build_and_push_docs(arch_items: List[dict], summaries: List[dict], file_name: str) -> None:
-    summary_map = {s["name"]: s["summary"] for s in summaries}
-    docs = []
+def category_for_file(file_name: str) -> str:
+    """Catalog of a source PDF: "migration" or "analytics" from its title, "" if neither."""
+    lowered = file_name.lower()
+    if "migration" in lowered:
+        return "migration"
+    if "analytics" in lowered:
+        return "analytics"
+    return ""
 
+def collect_architectures(arch_items: List[dict], summaries: List[dict], file_name: str) -> List[dict]:
+    """Pair one PDF's extracted architectures with their summaries and figures; nothing is uploaded yet."""
+    category = category_for_file(file_name)
+    summary_map = {s["name"]: s["summary"] for s in summaries}
+    architectures = []
     for index, arch in enumerate(arch_items):
-        # Get a BlobClient
-        blob_name = f"{Path(file_name).stem}_{index:03}.png"
-        blob_path = str(out_fig_dir / blob_name)
-        #blob_client = blob_service_client.get_blob_client(container=container_name, blob=f"{blob_path}_{index:03}.png")
-        
-        container_client = blob_service_client.get_container_client(container=container_name)
+        # Canonical names, so "ADLS Gen2" and "Azure Data Lake Storage" index as one service
+        architectures.append(
+            {
+                "name": arch["name"],
+                "azure_services": canonical_services(split_services(arch["azure_services"])),
+                "non_azure_services": canonical_services(split_services(arch["non_azure_services"])),
+                "summary": summary_map.get(arch["name"], ""),
+                "category": category,
+                "source": file_name,
+                "figure": f"{Path(file_name).stem}_{index:03}.png",
+            }
+        )
+    return architectures
+
+def deduplicate_architectures(architectures: List[dict], report_path: Path) -> List[dict]:
+    """Merge near-identical architectures from all PDFs so each is embedded and uploaded once."""
+    with tracer.span("dedup", "cpu", architectures=len(architectures)), profiler.sample("dedup"):
+        hashes = [image_hash(out_fig_dir / arch["figure"]) for arch in architectures]
+        duplicates = find_duplicates(architectures, hashes)
+        unique, report = merge_duplicates(architectures, duplicates)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(
+        f"Deduplication: {report['architectures']} architectures, {report['duplicates']} duplicates "
+        f"in {len(report['clusters'])} groups; {report['unique']} to embed and upload. Report: {report_path}"
+    )
+    return unique
+
+def architecture_id(arch: dict) -> str:
+    """
+    Document key derived from where the architecture was extracted, so ingesting the
+    same PDFs again replaces the documents instead of adding copies.
+    """
+    origin = "|".join((arch["source"], arch["figure"], arch["name"]))
+    return hashlib.sha256(origin.encode("utf-8")).hexdigest()[:32]
 
-        with open(blob_path, "rb") as data:
-            container_client.upload_blob(name=blob_name, data=data, overwrite=True)
-            #blob_client.upload_blob(data, overwrite=True)
+def build_and_push_docs(architectures: List[dict]) -> List[dict]:
+    """Embed and upload architectures; returns the uploaded documents for the catalog snapshot."""
+    docs = []
+    container_client = blob_service_client.get_container_client(container=container_name)
+
+    for arch in architectures:
+        blob_name = arch["figure"]
+        blob_path = out_fig_dir / blob_name
+
+        # Thumbnail and preview WebP copies are uploaded next to the full PNG for the /diagrams endpoint
+        with tracer.span("diagram_variants", "cpu") as span, profiler.sample("diagram_variants"):
+            variant_paths = list(write_variants(blob_path).values())
+            span.add_bytes(sum(path.stat().st_size for path in variant_paths))
+        for path in [blob_path, *variant_paths]:
+            with tracer.span("blob_upload", "remote", bytes=path.stat().st_size):
+                with open(path, "rb") as data:
+                    container_client.upload_blob(name=path.name, data=data, overwrite=True)
+                    #blob_client.upload_blob(data, overwrite=True)
 
         blob_url = f"https://{storage_account_name}.blob.core.windows.net/{container_name}/{blob_name}"
         print(f"Blob uploaded successfully. URL: {blob_url}")
 
         text = (
             f"{arch['name']}. "
-            f"Azure services: {arch['azure_services']}. "
-            f"Non‑Azure services: {arch['non_azure_services']}. "
-            f"AI Summary: {summary_map.get(arch['name'], '')}"
+            f"Azure services: {', '.join(arch['azure_services'])}. "
+            f"Non‑Azure services: {', '.join(arch['non_azure_services'])}. "
+            f"AI Summary: {arch['summary']}"
         )
 
-        emb = aoai_client.embeddings.create(
-            model=embedding_deployment,
-            input=[text],
-        ).data[0].embedding
+        with tracer.span("embedding", "remote", bytes=len(text.encode("utf-8"))):
+            emb = aoai_client.embeddings.create(
+                model=embedding_deployment,
+                input=[text],
+            ).data[0].embedding
 
         docs.append(
             {
-                "id": str(uuid.uuid4()),
+                "id": architecture_id(arch),
                 "name": arch["name"],
                 "content": text,
                 "content_vector": emb,
                 "architecture_url": blob_url,
+                "category": arch["category"],
+                "categories": arch.get("categories") or ([arch["category"]] if arch["category"] else []),
+                # Catalog snapshot fields, not part of the index schema
+                "azure_services": arch["azure_services"],
+                "non_azure_services": arch["non_azure_services"],
+                "summary": arch["summary"],
+                # PDFs the architecture (and its merged duplicates) came from
+                "source": "; ".join(arch.get("sources") or [arch["source"]]),
             }
         )
     
-    search_client = SearchClient(search_endpoint, index_name, cred)
-    upload_result = search_client.upload_documents(docs)
-    print("Upload succeeded:", all(r.succeeded for r in upload_result))
+    search_client = SearchClient(search_endpoint, index_name, cred, raw_request_hook=tracer.on_request_attempt)
+    # All PDFs are uploaded together now; batches keep each request under the service's payload limit
+    succeeded = True
+    for start in range(0, len(docs), SEARCH_UPLOAD_BATCH_SIZE):
+        batch = [{key: doc[key] for key in INDEX_FIELDS} for doc in docs[start:start + SEARCH_UPLOAD_BATCH_SIZE]]
+        with tracer.span("search_upload", "remote", documents=len(batch)) as span:
+            span.add_bytes(len(json.dumps(batch).encode("utf-8")))
+            upload_result = search_client.upload_documents(batch)
+        succeeded = succeeded and all(r.succeeded for r in upload_result)
+    print("Upload succeeded:", succeeded)
+    return docs
+
+# Document fields defined in the search index schema
+INDEX_FIELDS = ("id", "name", "content", "content_vector", "architecture_url", "category", "categories")
+# Documents per upload request; with 3072-dim vectors each document is about 60 KB of JSON
+SEARCH_UPLOAD_BATCH_SIZE = 100
+
+def write_catalog_snapshot(docs: List[dict], path: Path) -> None:
+    """Write every uploaded architecture and the service index to the snapshot served by the backend."""
+    with tracer.span("catalog_snapshot", "stage", documents=len(docs)):
+        service_index = ServiceIndex.build((doc["id"], doc["azure_services"] + doc["non_azure_services"]) for doc in docs)
+        version = write_catalog(
+            path, docs, [doc["content_vector"] for doc in docs], metadata={"service_index": service_index.to_dict()}
+        )
+    print(f"Catalog snapshot {version} with {len(docs)} architectures written to {path}")
+
+def report_page_selection(selection: Dict[str, Any], report_path: Path,
+                          vision_calls: Optional[List[float]] = None) -> None:
+    """
+    Write the per-PDF page decisions and print the vision calls skipped and the time saved.
+    `vision_calls` are the call durations, taken from this process's trace when not given.
+    """
+    pages = sum(summary["pages"] for summary in selection.values())
+    skipped = sum(summary["skipped"] for summary in selection.values())
+    calls = vision_calls if vision_calls is not None else [span.duration for span in tracer.spans if span.name == "vision_summary"]
+    mean_call = sum(calls) / len(calls) if calls else 0.0
+    report = {
+        "pages": pages,
+        "vision_calls": len(calls),
+        "vision_calls_skipped": skipped,
+        "mean_vision_call_seconds": round(mean_call, 3),
+        "estimated_seconds_saved": round(skipped * mean_call, 1),
+        "pdfs": selection,
+    }
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(
+        f"Page selection: {pages - skipped} of {pages} pages sent to the vision model, {skipped} calls skipped "
+        f"(about {report['estimated_seconds_saved']}s at {mean_call:.1f}s per call). Report: {report_path}"
+    )
+
+def index_architectures(architectures: List[dict], dedup: bool, dedup_report: Path, catalog_out: Path) -> None:
+    """Deduplicate, embed and upload the architectures of every PDF and write the catalog snapshot."""
+    # Diagrams repeated across PDFs are merged before they cost embeddings, uploads and top-k slots
+    if dedup:
+        architectures = deduplicate_architectures(architectures, dedup_report)
+    with tracer.span("build_and_push_docs", "stage"):
+        catalog_docs = build_and_push_docs(architectures)
+    write_catalog_snapshot(catalog_docs, catalog_out)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract architectures from the PDFs in data/ and index them in Azure AI Search.")
+    parser.add_argument("--trace-out", type=Path, default=data_dir / "ingestion_trace.json",
+                        help="where to write the Chrome trace of the run")
+    parser.add_argument("--catalog-out", type=Path,
+                        default=Path(os.getenv("ARCHITECTURE_CATALOG_PATH") or data_dir / "architecture_catalog.bin"),
+                        help="where to write the catalog snapshot served by the backend")
+    parser.add_argument("--dedup-report", type=Path, default=data_dir / "dedup_report.json",
+                        help="where to write the report of near-duplicate architectures merged before embedding")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="embed and upload every extracted architecture, including near-duplicates")
+    parser.add_argument("--streaming", action="store_true",
+                        help="analyze PDFs a few pages at a time and pass the layout between stages as JSONL "
+                             "files in data/ocr, so memory does not grow with the page count")
+    parser.add_argument("--ocr-pages-per-request", type=int, default=PAGES_PER_REQUEST,
+                        help="pages per Document Intelligence request in streaming mode")
+    parser.add_argument("--page-selection-report", type=Path, default=data_dir / "page_selection.json",
+                        help="where to write which pages were sent to the vision model and why")
+    parser.add_argument("--vision-all-pages", action="store_true",
+                        help="send every page to the vision model instead of only pages with diagrams")
+    parser.add_argument("--profile", action="store_true",
+                        help="sample CPU-heavy stages (rendering, base64 encoding) with a sampling profiler")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile:
+        profiler = SamplingProfiler()
     print("Creating or updating search index...")
-    create_or_update_search_index()
+    with tracer.span("create_or_update_search_index", "remote"):
+        create_or_update_search_index()
     print("Beginning data pipeline...")
+    architectures = []
+    page_selection = {}
     for file_name in os.listdir(data_dir):
         if file_name.endswith(".pdf"):
             file_path = data_dir / file_name
-            section_headings, fig_bounding_boxes, result = get_ocr_from_adi(str(file_path))
-            pdf_to_pngs(file_path, out_fig_dir, out_page_dir, dpi=300)
-            extracted_architectures = architecture_extraction_with_ocr(
-            ocr_content=result.content,
-            section_headings=section_headings,
-            architecture_extraction_system_prompt=architecture_extraction_system_prompt
-            )
-            architecture_ai_summaries = architecture_ai_summaries_with_images(
-            pdf_path=file_path,
-            file_name=file_name,
-            system_prompt_arch_summary=system_prompt_arch_summary
-            )
-            build_and_push_docs(
-            arch_items=extracted_architectures,
-            summaries=architecture_ai_summaries, 
-            file_name=file_name
-            )
+            with tracer.span("pdf", "pdf", pdf=file_name):
+                extracted_architectures, page_decisions = extract_pdf(
+                    file_path, args.streaming, args.ocr_pages_per_request, select=not args.vision_all_pages
+                )
+                with tracer.span("vision_summaries", "stage"):
+                    architecture_ai_summaries = architecture_ai_summaries_with_images(
+                    pdf_path=file_path,
+                    file_name=file_name,
+                    system_prompt_arch_summary=system_prompt_arch_summary,
+                    decisions=page_decisions
+                    )
+                page_selection[file_name] = selection_summary(page_decisions)
+                architectures += collect_architectures(
+                arch_items=extracted_architectures,
+                summaries=architecture_ai_summaries,
+                file_name=file_name
+                )
+
+    report_page_selection(page_selection, args.page_selection_report)
+    index_architectures(architectures, not args.no_dedup, args.dedup_report, args.catalog_out)
+
+    tracer.write_chrome_trace(args.trace_out)
+    print(f"\nTrace written to {args.trace_out}")
+    print(tracer.summary_table())
+    if args.profile:
+        folded_path = args.trace_out.with_suffix(".folded")
+        profiler.write_folded(folded_path)
+        print(f"\nProfile samples written to {folded_path}")
+        print(profiler.top_functions())
@@ -0,0 +1,214 @@
+"""
+Near-duplicate detection for architectures extracted by create_and_upload_index.py.
+
+The analytics and migration pattern PDFs repeat some diagrams. Copies are found
+before anything is embedded or uploaded:
+
+- MinHash signatures over each architecture's services and name words, with LSH
+  banding to find candidate pairs without comparing every pair;
+- a 64-bit difference hash (dHash) of the figure image, split into bands so
+  figures a few bits apart land in a common bucket.
+
+Candidates are confirmed on exact Jaccard similarity and Hamming distance,
+grouped with union-find, and every group is merged into its first architecture.
+"""
+import hashlib
+import random
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Jaccard similarity of the service/name features above which two architectures are copies
+TEXT_THRESHOLD = 0.7
+# Figures at most this many bits apart are the same diagram; their services must still overlap this much
+IMAGE_MAX_DISTANCE = 6
+IMAGE_MIN_SERVICE_SIMILARITY = 0.5
+
+NUM_PERM = 128
+LSH_BANDS = 32  # 4 rows each: pairs above ~0.42 similarity are likely to become candidates
+IMAGE_BANDS = 8  # 8 bits each: hashes up to 7 bits apart always share a band
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def services(entry: Dict[str, Any]) -> Set[str]:
+    return {f"service:{service.lower()}" for service in entry.get("azure_services", []) + entry.get("non_azure_services", [])}
+
+
+def features(entry: Dict[str, Any]) -> Set[str]:
+    """Services plus name words and word pairs; the generated summaries vary too much between copies."""
+    words = _WORD.findall(entry.get("name", "").lower())
+    result = services(entry)
+    result.update(f"name:{word}" for word in words)
+    result.update(f"name:{first} {second}" for first, second in zip(words, words[1:]))
+    return result
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Exact similarity; two empty sets share nothing, so blank extractions never match each other."""
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class MinHasher:
+    """MinHash with NUM_PERM universal hash functions (a * x + b) mod p, seeded for reproducible runs."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, items: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little") for item in items]
+        if not hashes:
+            return tuple(_MERSENNE_PRIME for _ in self.permutations)
+        return tuple(min((a * x + b) % _MERSENNE_PRIME for x in hashes) for a, b in self.permutations)
+
+
+def lsh_candidates(signatures: Sequence[Tuple[int, ...]], bands: int = LSH_BANDS) -> Set[Tuple[int, int]]:
+    """Pairs of positions whose signatures agree on every row of at least one band."""
+    rows = len(signatures[0]) // bands if signatures else 0
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+    for position, signature in enumerate(signatures):
+        for band in range(bands):
+            buckets[band, signature[band * rows:(band + 1) * rows]].append(position)
+    return _pairs(buckets.values())
+
+
+def image_hash(path: Path) -> Optional[int]:
+    """64-bit dHash: brightness gradients of the image shrunk to 9x8 greyscale; None if it cannot be read."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            pixels = image.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+    except OSError:
+        return None
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+
+def image_candidates(hashes: Sequence[Optional[int]], bands: int = IMAGE_BANDS) -> Set[Tuple[int, int]]:
+    """Pairs of positions whose image hashes are identical in at least one 64 / bands bit band."""
+    width = 64 // bands
+    buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for position, value in enumerate(hashes):
+        if value is not None:
+            for band in range(bands):
+                buckets[band, (value >> (band * width)) & ((1 << width) - 1)].append(position)
+    return _pairs(buckets.values())
+
+
+def _pairs(groups: Iterable[List[int]]) -> Set[Tuple[int, int]]:
+    pairs = set()
+    for members in groups:
+        for index, first in enumerate(members):
+            for second in members[index + 1:]:
+                pairs.add((first, second))
+    return pairs
+
+
+def find_duplicates(
+    entries: Sequence[Dict[str, Any]],
+    image_hashes: Optional[Sequence[Optional[int]]] = None,
+    text_threshold: float = TEXT_THRESHOLD,
+    image_max_distance: int = IMAGE_MAX_DISTANCE,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Map each duplicate's position to its canonical architecture and the evidence.
+
+    The canonical architecture of a group is its first entry. Values have the
+    canonical position, the feature similarity and the image distance (None
+    when a figure is missing).
+    """
+    image_hashes = image_hashes or [None] * len(entries)
+    entry_features = [features(entry) for entry in entries]
+    entry_services = [services(entry) for entry in entries]
+    hasher = MinHasher()
+    # Entries without services or name words all get the same empty signature; leave them out
+    keyed = [position for position, items in enumerate(entry_features) if items]
+    candidates = {
+        (keyed[first], keyed[second])
+        for first, second in lsh_candidates([hasher.signature(entry_features[position]) for position in keyed])
+    }
+    candidates |= image_candidates(image_hashes)
+
+    parent = list(range(len(entries)))
+
+    def root(position: int) -> int:
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    evidence: Dict[Tuple[int, int], Tuple[float, Optional[int]]] = {}
+    for first, second in sorted(candidates):
+        similarity = jaccard(entry_features[first], entry_features[second])
+        distance = None
+        if image_hashes[first] is not None and image_hashes[second] is not None:
+            distance = (image_hashes[first] ^ image_hashes[second]).bit_count()
+        same_figure = (
+            distance is not None and distance <= image_max_distance
+            and jaccard(entry_services[first], entry_services[second]) >= IMAGE_MIN_SERVICE_SIMILARITY
+        )
+        if similarity >= text_threshold or same_figure:
+            evidence[first, second] = (similarity, distance)
+            low, high = sorted((root(first), root(second)))
+            parent[high] = low
+
+    duplicates: Dict[int, Dict[str, Any]] = {}
+    for (first, second), (similarity, distance) in evidence.items():
+        for position in (first, second):
+            canonical = root(position)
+            if position != canonical and position not in duplicates:
+                duplicates[position] = {"canonical": canonical, "similarity": round(similarity, 3), "image_distance": distance}
+    return duplicates
+
+
+def merge_duplicates(
+    entries: Sequence[Dict[str, Any]], duplicates: Dict[int, Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Fold each duplicate into its canonical architecture and build the report.
+
+    Canonical entries gain the services, sources (`sources`) and catalogs
+    (`categories`) of their copies, so a copy from the migration PDF is still
+    found by a migration-filtered search, and keep their own name, summary and
+    figure. Returns the canonical entries in input order and a JSON-serializable
+    report.
+    """
+    merged = {
+        position: dict(entry, sources=[entry["source"]], categories=[entry["category"]] if entry.get("category") else [])
+        for position, entry in enumerate(entries) if position not in duplicates
+    }
+    clusters: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for position in sorted(duplicates):
+        canonical = merged[duplicates[position]["canonical"]]
+        duplicate = entries[position]
+        for field in ("azure_services", "non_azure_services"):
+            canonical[field] = list(dict.fromkeys(canonical[field] + duplicate[field]))
+        if duplicate["source"] not in canonical["sources"]:
+            canonical["sources"].append(duplicate["source"])
+        if duplicate.get("category") and duplicate["category"] not in canonical["categories"]:
+            canonical["categories"].append(duplicate["category"])
+        if not canonical.get("summary"):
+            canonical["summary"] = duplicate.get("summary", "")
+        clusters[duplicates[position]["canonical"]].append(
+            {"name": duplicate["name"], "source": duplicate["source"], **{k: v for k, v in duplicates[position].items() if k != "canonical"}}
+        )
+
+    report = {
+        "architectures": len(entries),
+        "unique": len(merged),
+        "duplicates": len(duplicates),
+        "clusters": [
+            {"canonical": {"name": entries[position]["name"], "source": entries[position]["source"]}, "duplicates": copies}
+            for position, copies in sorted(clusters.items())
+        ],
+    }
+    return list(merged.values()), report
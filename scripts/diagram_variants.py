@@ -0,0 +1,32 @@
+"""
+Smaller WebP copies of the architecture figures for create_and_upload_index.py.
+
+The full figure is rendered at 300 DPI, often several MB of PNG. Next to it the
+ingestion writes a thumbnail (for result lists) and a preview (for a detail
+view), downscaled to the widths in backend.diagrams.VARIANT_WIDTHS and encoded
+as lossy WebP. Both are uploaded next to the PNG under the names from
+backend.diagrams.variant_name, where the /diagrams endpoint looks for them.
+"""
+from pathlib import Path
+from typing import Dict
+
+from backend.diagrams import VARIANT_WIDTHS, WEBP_QUALITY, variant_name
+
+
+def write_variants(figure_path: Path, quality: int = WEBP_QUALITY) -> Dict[str, Path]:
+    """Write every WebP variant next to `figure_path` and return variant -> path. Never upscales."""
+    from PIL import Image
+
+    figure_path = Path(figure_path)
+    written = {}
+    with Image.open(figure_path) as image:
+        image = image.convert("RGB")
+        for variant, max_width in VARIANT_WIDTHS.items():
+            resized = image
+            if image.width > max_width:
+                height = max(1, round(image.height * max_width / image.width))
+                resized = image.resize((max_width, height), Image.Resampling.LANCZOS)
+            path = figure_path.with_name(variant_name(figure_path.name, variant))
+            resized.save(path, "WEBP", quality=quality, method=4)
+            written[variant] = path
+    return written
@@ -0,0 +1,252 @@
+"""
+Distributed ingestion: create_and_upload_index.py split into queued jobs that
+any number of worker processes, on any number of hosts, work through.
+
+    python ingest_distributed.py enqueue --streaming       # coordinator: one "pdf" job per PDF under data/
+    python ingest_distributed.py serve --port 8700         # coordinator: dashboard on this host only
+    python ingest_distributed.py serve --host 0.0.0.0      # coordinator: queue for remote workers, with INGESTION_QUEUE_TOKEN
+    python ingest_distributed.py worker                    # on this host, sharing data/ingestion_queue.db
+    python ingest_distributed.py worker --queue http://coordinator:8700    # on another host
+    python ingest_distributed.py status
+    python ingest_distributed.py requeue-dead --kind pdf
+    python ingest_distributed.py finalize                  # dedup, embed, upload, catalog snapshot
+
+A "pdf" job runs OCR, page selection, rendering and architecture extraction
+for one PDF. It then fans out one "page" job per page selected for the vision
+model. "finalize" runs once every job is done. It pairs each PDF's
+architectures with its page summaries and runs the same deduplication,
+embedding, upload and catalog steps as the single-process script.
+
+Like that script, run it from scripts/. Workers on other hosts need the same
+.env and the data/ directory on shared storage: they read the PDFs from it, and
+finalize reads the figures they render into it. The server only listens beyond
+this host with a shared INGESTION_QUEUE_TOKEN, which remote workers send too.
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ingestion_queue import (LEASE_SECONDS, MAX_ATTEMPTS, HttpJobQueue, JobQueue, NewJob, PermanentJobError,
+                             create_app, run_worker)
+from ocr_stream import PAGES_PER_REQUEST
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+DEFAULT_QUEUE = DATA_DIR / "ingestion_queue.db"
+# Page jobs go first, so PDFs already started finish before new ones are opened
+PAGE_PRIORITY = 1
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def open_queue(spec: str, token: Optional[str] = None):
+    """The queue at a SQLite path, or the coordinator's server at an http(s) URL."""
+    if spec.startswith(("http://", "https://")):
+        return HttpJobQueue(spec, token=token)
+    return JobQueue(spec)
+
+
+def pdf_jobs(data_dir: Path, streaming: bool, pages_per_request: int, select: bool,
+             max_attempts: int = MAX_ATTEMPTS) -> List[NewJob]:
+    """
+    One job per PDF under `data_dir`, keyed by its relative path so enqueueing again only adds new PDFs.
+
+    Raises ValueError when two PDFs share a file name stem: OCR output, rendered pages
+    and figures are named after the stem, so their jobs would overwrite each other's files.
+    """
+    paths = sorted(data_dir.rglob("*.pdf"))
+    by_stem: Dict[str, List[str]] = {}
+    for path in paths:
+        by_stem.setdefault(path.stem, []).append(path.relative_to(data_dir).as_posix())
+    clashes = [", ".join(relatives) for relatives in by_stem.values() if len(relatives) > 1]
+    if clashes:
+        raise ValueError("PDFs must have distinct file names; rename one of: " + "; ".join(clashes))
+    jobs = []
+    for path in paths:
+        relative = path.relative_to(data_dir).as_posix()
+        payload = {"path": relative, "streaming": streaming, "pages_per_request": pages_per_request, "select": select}
+        jobs.append(NewJob("pdf", relative, payload, max_attempts=max_attempts))
+    return jobs
+
+
+def ingestion_handlers(data_dir: Path) -> Dict[str, Any]:
+    """Job handlers over the ingestion steps of create_and_upload_index.py."""
+    # Imported here: the module connects to Azure at import time, which the other commands do not need
+    import fitz  # PyMuPDF
+    import create_and_upload_index as ingest
+    from page_select import selection_summary
+
+    def pdf_job(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], List[NewJob]]:
+        file_path = data_dir / payload["path"]
+        if not file_path.is_file():
+            raise PermanentJobError(f"{file_path} does not exist")
+        try:
+            fitz.open(file_path).close()
+        except fitz.FileDataError as e:
+            raise PermanentJobError(f"{file_path} is not a readable PDF: {e}")
+        with ingest.tracer.span("pdf", "pdf", pdf=payload["path"]):
+            architectures, decisions = ingest.extract_pdf(
+                file_path, payload["streaming"], payload["pages_per_request"], select=payload["select"]
+            )
+        pages = [
+            NewJob("page", f"{payload['path']}#{decision.page - 1}", {"path": payload["path"], "page": decision.page - 1},
+                   priority=PAGE_PRIORITY)
+            for decision in decisions if decision.selected
+        ]
+        return {"file_name": file_path.name, "architectures": architectures,
+                "page_selection": selection_summary(decisions)}, pages
+
+    def page_job(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], List[NewJob]]:
+        file_path = data_dir / payload["path"]
+        image_path = ingest.out_page_dir / f"{file_path.stem}_{payload['page']:03}.png"
+        # The PDF job may have rendered the page on another host
+        if not image_path.exists():
+            with fitz.open(file_path) as doc:
+                ingest.render_page(doc, file_path, payload["page"], ingest.out_page_dir)
+        started = time.perf_counter()
+        with ingest.tracer.span("page", "page", page=payload["page"]):
+            summaries = ingest._summarize_page_image(image_path, ingest.system_prompt_arch_summary)
+        return {"page": payload["page"], "summaries": summaries, "seconds": time.perf_counter() - started}, []
+
+    return {"pdf": pdf_job, "page": page_job}
+
+
+def collect_results(queue: JobQueue) -> Tuple[List[Tuple[Dict[str, Any], List[dict]]], List[float]]:
+    """Each finished PDF's result with its page summaries in page order, and the vision call durations."""
+    pages: Dict[str, List[Dict[str, Any]]] = {}
+    for _, result, parent in queue.results("page"):
+        pages.setdefault(parent, []).append(result)
+    documents = []
+    for key, result, _ in queue.results("pdf"):
+        page_results = sorted(pages.get(key, []), key=lambda page: page["page"])
+        documents.append((result, [summary for page in page_results for summary in page["summaries"]]))
+    return documents, [page["seconds"] for results in pages.values() for page in results]
+
+
+def finalize(queue: JobQueue, args: argparse.Namespace) -> int:
+    stats = queue.stats()
+    if stats["totals"]["queued"] or stats["totals"]["leased"]:
+        print(f"{stats['totals']['queued'] + stats['totals']['leased']} jobs are not finished yet")
+        return 1
+    if stats["totals"]["dead"] and not args.skip_dead:
+        print(f"{stats['totals']['dead']} jobs are dead; fix and requeue them, or pass --skip-dead")
+        return 1
+
+    import create_and_upload_index as ingest
+
+    documents, vision_calls = collect_results(queue)
+    architectures, page_selection = [], {}
+    for result, summaries in documents:
+        page_selection[result["file_name"]] = result["page_selection"]
+        architectures += ingest.collect_architectures(result["architectures"], summaries, result["file_name"])
+    ingest.report_page_selection(page_selection, args.page_selection_report, vision_calls)
+    with ingest.tracer.span("create_or_update_search_index", "remote"):
+        ingest.create_or_update_search_index()
+    ingest.index_architectures(architectures, not args.no_dedup, args.dedup_report, args.catalog_out)
+    return 0
+
+
+def print_status(stats: Dict[str, Any]) -> None:
+    totals = stats["totals"]
+    eta = stats["eta_s"]
+    print(
+        f"{totals['done']} of {sum(totals.values())} jobs done ({stats['progress']:.1%}), {totals['leased']} running, "
+        f"{totals['dead']} dead; {stats['roots']['finished']} of {stats['roots']['total']} PDFs finished; "
+        f"{stats['throughput_jobs_per_s']:.2f} jobs/s; ETA {'-' if eta is None else f'{eta / 60:.1f} min'}"
+    )
+    for kind, counts in stats["jobs"].items():
+        mean = stats["mean_duration_s"].get(kind) or 0.0
+        print(f"  {kind:6s} " + "  ".join(f"{status}={count}" for status, count in counts.items()) + f"  mean={mean:.1f}s")
+    for worker in stats["workers"]:
+        if worker["alive"]:
+            print(f"  worker {worker['worker_id']}: {worker['job'] or 'idle'}, {worker['completed']} completed, "
+                  f"{worker['failed']} failed")
+    for job in stats["dead_jobs"]:
+        print(f"  dead {job['kind']} {job['key']} after {job['attempts']} attempts: {job['error']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queue", default=os.getenv("INGESTION_QUEUE") or str(DEFAULT_QUEUE),
+                        help="SQLite queue file, or the coordinator's URL for workers on other hosts")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="add a job for every PDF not queued yet")
+    enqueue.add_argument("--streaming", action="store_true", help="use the streaming OCR mode in the PDF jobs")
+    enqueue.add_argument("--ocr-pages-per-request", type=int, default=PAGES_PER_REQUEST)
+    enqueue.add_argument("--vision-all-pages", action="store_true",
+                         help="send every page to the vision model instead of only pages with diagrams")
+    enqueue.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+
+    serve = commands.add_parser("serve", help="serve the queue to remote workers, /status and the dashboard")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="interface to listen on; other than loopback needs INGESTION_QUEUE_TOKEN")
+    serve.add_argument("--port", type=int, default=8700)
+
+    worker = commands.add_parser("worker", help="lease and run jobs until stopped")
+    worker.add_argument("--kinds", nargs="+", choices=("pdf", "page"), default=["pdf", "page"])
+    worker.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    worker.add_argument("--exit-when-idle", action="store_true", help="stop once nothing is queued or running")
+    worker.add_argument("--trace-out", type=Path, help="Chrome trace of this worker's jobs")
+
+    commands.add_parser("status", help="print progress, throughput, workers and dead jobs")
+
+    requeue = commands.add_parser("requeue-dead", help="retry dead jobs with fresh attempts")
+    requeue.add_argument("--kind", choices=("pdf", "page"))
+
+    final = commands.add_parser("finalize", help="deduplicate, embed, upload and write the catalog snapshot")
+    final.add_argument("--catalog-out", type=Path,
+                       default=Path(os.getenv("ARCHITECTURE_CATALOG_PATH") or DATA_DIR / "architecture_catalog.bin"))
+    final.add_argument("--dedup-report", type=Path, default=DATA_DIR / "dedup_report.json")
+    final.add_argument("--no-dedup", action="store_true")
+    final.add_argument("--page-selection-report", type=Path, default=DATA_DIR / "page_selection.json")
+    final.add_argument("--skip-dead", action="store_true", help="index what finished and leave dead PDFs out")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    token = os.getenv("INGESTION_QUEUE_TOKEN") or None
+    queue = open_queue(args.queue, token)
+    remote = isinstance(queue, HttpJobQueue)
+    if remote and args.command not in ("worker", "status"):
+        print(f"'{args.command}' runs on the coordinator against the SQLite file, not {args.queue}")
+        return 2
+
+    if args.command == "enqueue":
+        try:
+            jobs = pdf_jobs(args.data_dir, args.streaming, args.ocr_pages_per_request, not args.vision_all_pages,
+                            args.max_attempts)
+        except ValueError as e:
+            print(e)
+            return 2
+        print(f"{queue.enqueue(jobs)} new PDF jobs ({len(jobs)} PDFs under {args.data_dir})")
+    elif args.command == "serve":
+        if args.host not in LOOPBACK_HOSTS and not token:
+            # Anyone who can reach the port could lease, complete and fail jobs
+            print(f"Set INGESTION_QUEUE_TOKEN before serving on {args.host}; remote workers send the same token")
+            return 2
+        import uvicorn
+        uvicorn.run(create_app(queue, token), host=args.host, port=args.port, log_level="warning")
+    elif args.command == "worker":
+        handlers = ingestion_handlers(args.data_dir)
+        try:
+            counts = run_worker(queue, {kind: handlers[kind] for kind in args.kinds},
+                                lease_seconds=args.lease_seconds, exit_when_idle=args.exit_when_idle)
+            print(f"Worker finished: {counts}")
+        finally:
+            if args.trace_out:
+                import create_and_upload_index as ingest
+                ingest.tracer.write_chrome_trace(args.trace_out)
+    elif args.command == "status":
+        print_status(queue.stats())
+    elif args.command == "requeue-dead":
+        print(f"{queue.requeue_dead(args.kind)} dead jobs queued again")
+    elif args.command == "finalize":
+        return finalize(queue, args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
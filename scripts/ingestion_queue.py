@@ -0,0 +1,626 @@
+"""
+Durable job queue for distributed ingestion (see ingest_distributed.py).
+
+Jobs live in one SQLite database in WAL mode. Workers on the coordinator's
+host open it directly; workers on other hosts talk to the same queue through
+the coordinator's HTTP server (`create_app`, `HttpJobQueue`), which also serves
+the progress dashboard.
+
+- **Leases:** `lease` hands a job to one worker until `lease_expires_at`. The
+  worker extends the lease while the job runs. If the worker dies, the job
+  becomes visible again once the lease expires, and the next worker retries it.
+- **Retries:** a failed job is queued again after a full-jitter exponential
+  backoff. A job gets `max_attempts` attempts, and an expired lease counts as
+  one.
+- **Poison jobs:** a job that uses up its attempts, or raises
+  `PermanentJobError`, is marked dead. It stays dead with its last error until
+  `requeue_dead` is called, and it never blocks the rest of the queue.
+- **Fan-out:** a handler can return child jobs. They are inserted in the same
+  transaction that completes the parent, so a crash cannot lose them or insert
+  them twice. `(kind, key)` is unique, so enqueueing the same work again does
+  nothing.
+
+The HTTP server can hand out, complete and fail jobs, so `create_app` takes a
+shared token that remote workers must send as `Authorization: Bearer <token>`.
+"""
+import hmac
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from html import escape
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Response
+from fastapi.responses import HTMLResponse
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from backend.resilience import backoff_delay
+
+# Seconds a leased job stays invisible to other workers; the worker renews it a few times per period
+LEASE_SECONDS = 300.0
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 300.0
+# A worker whose heartbeat is older than this is shown as gone on the dashboard; renewing a
+# lease counts as a heartbeat, so a worker busy with a long job stays alive
+WORKER_TIMEOUT = 60.0
+# Throughput on the dashboard is measured over this window
+THROUGHPUT_WINDOW = 300.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    parent_id INTEGER,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    worker TEXT,
+    lease_token TEXT,
+    leased_at REAL,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    duration REAL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, id);
+CREATE INDEX IF NOT EXISTS jobs_leases ON jobs (status, lease_expires_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    job TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+STATUSES = ("queued", "leased", "done", "dead")
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (an unreadable PDF, say); the job is marked dead at once."""
+
+
+@dataclass
+class NewJob:
+    """A job to enqueue, either by the coordinator or as the child of a finished job."""
+
+    kind: str
+    key: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    priority: int = 0
+    max_attempts: int = MAX_ATTEMPTS
+
+
+@dataclass
+class Job:
+    """A leased job. `lease_token` proves the lease when completing, failing or extending it."""
+
+    id: int
+    kind: str
+    key: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    lease_token: str
+    lease_expires_at: float
+
+
+class JobQueue:
+    """
+    The SQLite queue. Every operation is one short IMMEDIATE transaction, so any
+    number of worker processes can share the file.
+    """
+
+    def __init__(self, path: str, retry_base_delay: float = RETRY_BASE_DELAY, retry_max_delay: float = RETRY_MAX_DELAY):
+        self.path = path
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, func: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn, time.time())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # Producers
+    def enqueue(self, jobs: Sequence[NewJob], parent_id: Optional[int] = None) -> int:
+        """Add jobs that are not in the queue yet; returns how many were new."""
+        return self._transaction(lambda conn, now: self._insert(conn, now, jobs, parent_id))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, now: float, jobs: Sequence[NewJob], parent_id: Optional[int]) -> int:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (kind, key, payload, parent_id, priority, status, max_attempts, available_at, "
+            "created_at) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+            [(job.kind, job.key, json.dumps(job.payload), parent_id, job.priority, job.max_attempts, now, now)
+             for job in jobs],
+        )
+        return conn.total_changes - before
+
+    # Workers
+    def lease(self, worker_id: str, kinds: Optional[Sequence[str]] = None,
+              lease_seconds: float = LEASE_SECONDS) -> Optional[Job]:
+        """Lease the next available job of one of `kinds` (any kind when None); None when there is none."""
+
+        def take(conn: sqlite3.Connection, now: float) -> Optional[Job]:
+            self._reclaim_expired(conn, now)
+            kind_filter = f"AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+            row = conn.execute(
+                f"SELECT id, kind, key, payload, attempts, max_attempts FROM jobs "
+                f"WHERE status = 'queued' AND available_at <= ? {kind_filter} ORDER BY priority DESC, id LIMIT 1",
+                (now, *(kinds or ())),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kind, key, payload, attempts, max_attempts = row
+            token, expires = uuid.uuid4().hex, now + lease_seconds
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, worker = ?, lease_token = ?, "
+                "leased_at = ?, lease_expires_at = ? WHERE id = ?",
+                (worker_id, token, now, expires, job_id),
+            )
+            conn.execute("UPDATE workers SET job = ?, last_seen = ? WHERE worker_id = ?", (f"{kind}:{key}", now, worker_id))
+            return Job(job_id, kind, key, json.loads(payload), attempts + 1, max_attempts, token, expires)
+
+        return self._transaction(take)
+
+    @staticmethod
+    def _reclaim_expired(conn: sqlite3.Connection, now: float) -> None:
+        """Jobs whose worker stopped renewing the lease are retried, or marked dead when out of attempts."""
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END, "
+            "error = 'lease expired on ' || worker, lease_token = NULL, available_at = ?, "
+            "finished_at = CASE WHEN attempts >= max_attempts THEN ? END "
+            "WHERE status = 'leased' AND lease_expires_at <= ?",
+            (now, now, now),
+        )
+
+    def extend(self, job: Job, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """
+        Renew a lease; False when it was lost (it expired and the job went to another worker).
+
+        A renewal also counts as the worker's heartbeat.
+        """
+
+        def renew(conn: sqlite3.Connection, now: float) -> bool:
+            expires = now + lease_seconds
+            changed = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'leased' AND lease_token = ?",
+                (expires, job.id, job.lease_token),
+            ).rowcount
+            if changed:
+                job.lease_expires_at = expires
+                conn.execute(
+                    "UPDATE workers SET last_seen = ? WHERE worker_id = (SELECT worker FROM jobs WHERE id = ?)",
+                    (now, job.id),
+                )
+            return bool(changed)
+
+        return self._transaction(renew)
+
+    def complete(self, job: Job, result: Dict[str, Any], children: Sequence[NewJob] = ()) -> bool:
+        """Store the result and enqueue the children; False (and nothing written) when the lease was lost."""
+
+        def finish(conn: sqlite3.Connection, now: float) -> bool:
+            changed = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_token = NULL, finished_at = ?, "
+                "duration = ? - leased_at WHERE id = ? AND status = 'leased' AND lease_token = ?",
+                (json.dumps(result), now, now, job.id, job.lease_token),
+            ).rowcount
+            if not changed:
+                return False
+            self._insert(conn, now, children, job.id)
+            conn.execute(
+                "UPDATE workers SET completed = completed + 1, job = NULL, last_seen = ? "
+                "WHERE worker_id = (SELECT worker FROM jobs WHERE id = ?)",
+                (now, job.id),
+            )
+            return True
+
+        return self._transaction(finish)
+
+    def fail(self, job: Job, error: str, permanent: bool = False) -> str:
+        """Record a failed attempt; returns the job's new status ("queued", "dead", or "lost" for a lost lease)."""
+
+        def record(conn: sqlite3.Connection, now: float) -> str:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'leased' AND lease_token = ?",
+                (job.id, job.lease_token),
+            ).fetchone()
+            if row is None:
+                return "lost"
+            attempts, max_attempts = row
+            dead = permanent or attempts >= max_attempts
+            delay = 0.0 if dead else backoff_delay(attempts - 1, self.retry_base_delay, self.retry_max_delay)
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_token = NULL, available_at = ?, finished_at = ? WHERE id = ?",
+                ("dead" if dead else "queued", error[:2000], now + delay, now if dead else None, job.id),
+            )
+            conn.execute(
+                "UPDATE workers SET failed = failed + 1, job = NULL, last_seen = ? "
+                "WHERE worker_id = (SELECT worker FROM jobs WHERE id = ?)",
+                (now, job.id),
+            )
+            return "dead" if dead else "queued"
+
+        return self._transaction(record)
+
+    def release(self, job: Job) -> None:
+        """Give a job back without counting the attempt, for a worker that is shutting down."""
+        self._transaction(lambda conn, now: conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_token = NULL, available_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_token = ?",
+            (now, job.id, job.lease_token),
+        ))
+
+    def heartbeat(self, worker_id: str, host: str, pid: int) -> None:
+        self._transaction(lambda conn, now: conn.execute(
+            "INSERT INTO workers (worker_id, host, pid, started_at, last_seen) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+            (worker_id, host, pid, now, now),
+        ))
+
+    def pending(self) -> int:
+        """Jobs queued or leased; when 0 no job can appear any more except from a producer."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'leased')").fetchone()[0]
+
+    # Coordinator
+    def requeue_dead(self, kind: Optional[str] = None) -> int:
+        """Give dead jobs a fresh set of attempts, after the cause has been fixed."""
+        return self._transaction(lambda conn, now: conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, finished_at = NULL "
+            "WHERE status = 'dead' AND (? IS NULL OR kind = ?)",
+            (now, kind, kind),
+        ).rowcount)
+
+    def results(self, kind: str) -> List[Tuple[str, Dict[str, Any], Optional[str]]]:
+        """(key, result, parent key) of every finished job of `kind`, in enqueue order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job.key, job.result, parent.key FROM jobs AS job LEFT JOIN jobs AS parent "
+                "ON parent.id = job.parent_id WHERE job.kind = ? AND job.status = 'done' ORDER BY job.id",
+                (kind,),
+            ).fetchall()
+        return [(key, json.loads(result), parent) for key, result, parent in rows]
+
+    def stats(self, dead_limit: int = 20) -> Dict[str, Any]:
+        """Progress, throughput, workers and dead jobs for the dashboard."""
+        now = time.time()
+        with self._lock:
+            counts = self._conn.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+            durations = self._conn.execute(
+                "SELECT kind, AVG(duration) FROM jobs WHERE status = 'done' GROUP BY kind"
+            ).fetchall()
+            recent = self._conn.execute(
+                "SELECT COUNT(*), MIN(finished_at) FROM jobs WHERE status = 'done' AND finished_at >= ?",
+                (now - THROUGHPUT_WINDOW,),
+            ).fetchone()
+            # A root job is finished when it and every job it fanned out are done
+            roots = self._conn.execute(
+                "SELECT COUNT(*), SUM(status = 'done' AND NOT EXISTS (SELECT 1 FROM jobs AS child "
+                "WHERE child.parent_id = root.id AND child.status != 'done')) FROM jobs AS root WHERE parent_id IS NULL"
+            ).fetchone()
+            workers = self._conn.execute(
+                "SELECT worker_id, host, pid, last_seen, job, completed, failed FROM workers ORDER BY worker_id"
+            ).fetchall()
+            dead = self._conn.execute(
+                "SELECT id, kind, key, attempts, error FROM jobs WHERE status = 'dead' ORDER BY finished_at DESC LIMIT ?",
+                (dead_limit,),
+            ).fetchall()
+
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in counts:
+            by_kind.setdefault(kind, dict.fromkeys(STATUSES, 0))[status] = count
+        totals = {status: sum(kind_counts[status] for kind_counts in by_kind.values()) for status in STATUSES}
+        total = sum(totals.values())
+        done_recently, first_finish = recent
+        window = min(THROUGHPUT_WINDOW, now - first_finish) if first_finish else 0.0
+        rate = done_recently / window if window > 0 else 0.0
+        remaining = totals["queued"] + totals["leased"]
+        return {
+            "jobs": by_kind,
+            "totals": totals,
+            "progress": totals["done"] / total if total else 0.0,
+            "roots": {"total": roots[0], "finished": roots[1] or 0},
+            "throughput_jobs_per_s": rate,
+            # Children not enqueued yet are unknown, so the estimate grows while jobs fan out
+            "eta_s": remaining / rate if rate else None,
+            "mean_duration_s": {kind: mean for kind, mean in durations},
+            "workers": [
+                {"worker_id": worker_id, "host": host, "pid": pid, "seen_s_ago": now - last_seen,
+                 "alive": now - last_seen < WORKER_TIMEOUT, "job": job, "completed": completed, "failed": failed}
+                for worker_id, host, pid, last_seen, job, completed, failed in workers
+            ],
+            "dead_jobs": [
+                {"id": job_id, "kind": kind, "key": key, "attempts": attempts, "error": error}
+                for job_id, kind, key, attempts, error in dead
+            ],
+        }
+
+
+class HttpJobQueue:
+    """The worker side of `JobQueue` for workers on other hosts, through the coordinator's server."""
+
+    def __init__(self, base_url: str = "", client: Optional[httpx.Client] = None, timeout: float = 30.0,
+                 token: Optional[str] = None):
+        self._client = client or httpx.Client(base_url=base_url, timeout=timeout)
+        self._headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    def _post(self, path: str, body: Dict[str, Any]) -> httpx.Response:
+        response = self._client.post(path, json=body, headers=self._headers)
+        response.raise_for_status()
+        return response
+
+    def _get(self, path: str) -> Dict[str, Any]:
+        return self._client.get(path, headers=self._headers).raise_for_status().json()
+
+    def lease(self, worker_id: str, kinds: Optional[Sequence[str]] = None,
+              lease_seconds: float = LEASE_SECONDS) -> Optional[Job]:
+        response = self._post("/lease", {"worker_id": worker_id, "kinds": list(kinds or []), "lease_seconds": lease_seconds})
+        return Job(**response.json()) if response.status_code == 200 else None
+
+    def extend(self, job: Job, lease_seconds: float = LEASE_SECONDS) -> bool:
+        body = self._post(f"/jobs/{job.id}/extend", {"lease_token": job.lease_token, "lease_seconds": lease_seconds}).json()
+        if body["extended"]:
+            job.lease_expires_at = body["lease_expires_at"]
+        return body["extended"]
+
+    def complete(self, job: Job, result: Dict[str, Any], children: Sequence[NewJob] = ()) -> bool:
+        body = {"lease_token": job.lease_token, "result": result, "children": [asdict(child) for child in children]}
+        return self._post(f"/jobs/{job.id}/complete", body).json()["completed"]
+
+    def fail(self, job: Job, error: str, permanent: bool = False) -> str:
+        body = {"lease_token": job.lease_token, "error": error, "permanent": permanent}
+        return self._post(f"/jobs/{job.id}/fail", body).json()["status"]
+
+    def release(self, job: Job) -> None:
+        self._post(f"/jobs/{job.id}/release", {"lease_token": job.lease_token})
+
+    def heartbeat(self, worker_id: str, host: str, pid: int) -> None:
+        self._post("/workers/heartbeat", {"worker_id": worker_id, "host": host, "pid": pid})
+
+    def stats(self) -> Dict[str, Any]:
+        return self._get("/status")
+
+    def pending(self) -> int:
+        return self._get("/pending")["pending"]
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class LeaseRequest(BaseModel):
+    worker_id: str
+    kinds: List[str] = []
+    lease_seconds: float = LEASE_SECONDS
+
+class ExtendRequest(BaseModel):
+    lease_token: str
+    lease_seconds: float = LEASE_SECONDS
+
+class CompleteRequest(BaseModel):
+    lease_token: str
+    result: Dict[str, Any]
+    children: List[Dict[str, Any]] = []
+
+class FailRequest(BaseModel):
+    lease_token: str
+    error: str
+    permanent: bool = False
+
+class ReleaseRequest(BaseModel):
+    lease_token: str
+
+class HeartbeatRequest(BaseModel):
+    worker_id: str
+    host: str
+    pid: int
+
+
+def _job(job_id: int, lease_token: str) -> Job:
+    # Lease operations only need the job id and the token proving the lease
+    return Job(job_id, "", "", {}, 0, 0, lease_token, 0.0)
+
+
+def create_app(queue: JobQueue, token: Optional[str] = None) -> FastAPI:
+    """
+    The coordinator's HTTP server: the queue for remote workers, `/status` and the dashboard at `/`.
+
+    With a `token`, every route but the read-only dashboard needs it as a bearer token.
+    """
+    app = FastAPI(title="Ingestion queue")
+
+    def authorize(authorization: Optional[str] = Header(None)) -> None:
+        if token and not hmac.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+            raise HTTPException(status_code=401, detail="Missing or wrong queue token")
+
+    api = APIRouter(dependencies=[Depends(authorize)])
+
+    @api.post("/lease")
+    def lease(request: LeaseRequest):
+        job = queue.lease(request.worker_id, request.kinds or None, request.lease_seconds)
+        return asdict(job) if job else Response(status_code=204)
+
+    @api.post("/jobs/{job_id}/extend")
+    def extend(job_id: int, request: ExtendRequest):
+        job = _job(job_id, request.lease_token)
+        extended = queue.extend(job, request.lease_seconds)
+        return {"extended": extended, "lease_expires_at": job.lease_expires_at}
+
+    @api.post("/jobs/{job_id}/complete")
+    def complete(job_id: int, request: CompleteRequest):
+        try:
+            children = [NewJob(**child) for child in request.children]
+        except TypeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid child job: {e}")
+        return {"completed": queue.complete(_job(job_id, request.lease_token), request.result, children)}
+
+    @api.post("/jobs/{job_id}/fail")
+    def fail(job_id: int, request: FailRequest):
+        return {"status": queue.fail(_job(job_id, request.lease_token), request.error, request.permanent)}
+
+    @api.post("/jobs/{job_id}/release")
+    def release(job_id: int, request: ReleaseRequest):
+        queue.release(_job(job_id, request.lease_token))
+        return {"released": True}
+
+    @api.post("/workers/heartbeat")
+    def heartbeat(request: HeartbeatRequest):
+        queue.heartbeat(request.worker_id, request.host, request.pid)
+        return {"ok": True}
+
+    @api.get("/pending")
+    def pending():
+        return {"pending": queue.pending()}
+
+    @api.get("/status")
+    def status():
+        return queue.stats()
+
+    app.include_router(api)
+
+    @app.get("/", response_class=HTMLResponse)
+    def dashboard():
+        return render_dashboard(queue.stats())
+
+    return app
+
+
+def render_dashboard(stats: Dict[str, Any]) -> str:
+    """A self-refreshing HTML page of the queue's progress, throughput, workers and dead jobs."""
+    def table(headers: List[str], rows: List[List[Any]]) -> str:
+        head = "".join(f"<th>{escape(str(header))}</th>" for header in headers)
+        body = "".join("<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows)
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    eta = stats["eta_s"]
+    summary = (
+        f"<p>{stats['totals']['done']} of {sum(stats['totals'].values())} jobs done ({stats['progress']:.1%}), "
+        f"{stats['roots']['finished']} of {stats['roots']['total']} documents finished, "
+        f"{stats['throughput_jobs_per_s']:.2f} jobs/s, "
+        f"ETA {'-' if eta is None else f'{eta / 60:.1f} min'}</p>"
+    )
+    jobs = table(["kind", *STATUSES, "mean s"], [
+        [kind, *(counts[status] for status in STATUSES), f"{stats['mean_duration_s'].get(kind) or 0:.2f}"]
+        for kind, counts in stats["jobs"].items()
+    ])
+    workers = table(["worker", "host", "pid", "seen", "job", "completed", "failed"], [
+        [w["worker_id"], w["host"], w["pid"], f"{w['seen_s_ago']:.0f}s ago" + ("" if w["alive"] else " (gone)"),
+         w["job"] or "-", w["completed"], w["failed"]]
+        for w in stats["workers"]
+    ])
+    dead = table(["id", "kind", "key", "attempts", "error"], [
+        [job["id"], job["kind"], job["key"], job["attempts"], job["error"]] for job in stats["dead_jobs"]
+    ])
+    return (
+        "<!doctype html><html><head><meta http-equiv='refresh' content='5'><title>Ingestion</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left}</style></head><body>"
+        f"<h1>Ingestion</h1>{summary}<h2>Jobs</h2>{jobs}<h2>Workers</h2>{workers}<h2>Dead jobs</h2>{dead}"
+        "</body></html>"
+    )
+
+
+Handler = Callable[[Dict[str, Any]], Tuple[Dict[str, Any], List[NewJob]]]
+
+
+class _LeaseKeeper(threading.Thread):
+    """Renews a job's lease in the background while its handler runs."""
+
+    def __init__(self, queue: Any, job: Job, lease_seconds: float):
+        super().__init__(daemon=True)
+        self.queue, self.job, self.lease_seconds = queue, job, lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        # Renewals double as the worker's heartbeat while the handler runs
+        while not self.stopped.wait(min(self.lease_seconds, WORKER_TIMEOUT) / 3):
+            try:
+                if not self.queue.extend(self.job, self.lease_seconds):
+                    return
+            except Exception as e:  # the queue is briefly unreachable; the lease has time left
+                print(f"Could not renew the lease of job {self.job.id}: {e}")
+
+
+def run_worker(queue: Any, handlers: Dict[str, Handler], worker_id: Optional[str] = None,
+               lease_seconds: float = LEASE_SECONDS, poll_interval: float = 1.0,
+               exit_when_idle: bool = False, stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Lease and run jobs of the kinds in `handlers` until `stop` is set, or until
+    the queue has nothing queued or leased when `exit_when_idle`.
+
+    A handler gets the job payload and returns (result, child jobs).
+    `queue` is a `JobQueue` or an `HttpJobQueue`. Returns this worker's counts.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop = stop or threading.Event()
+    counts = {"completed": 0, "retried": 0, "dead": 0, "lost": 0}
+    queue.heartbeat(worker_id, socket.gethostname(), os.getpid())
+    last_heartbeat = time.monotonic()
+    while not stop.is_set():
+        if time.monotonic() - last_heartbeat > WORKER_TIMEOUT / 3:
+            queue.heartbeat(worker_id, socket.gethostname(), os.getpid())
+            last_heartbeat = time.monotonic()
+        job = queue.lease(worker_id, list(handlers), lease_seconds)
+        if job is None:
+            if exit_when_idle and queue.pending() == 0:
+                break
+            stop.wait(poll_interval)
+            continue
+
+        keeper = _LeaseKeeper(queue, job, lease_seconds)
+        keeper.start()
+        try:
+            result, children = handlers[job.kind](job.payload)
+        except KeyboardInterrupt:
+            queue.release(job)
+            raise
+        except PermanentJobError as e:
+            status = queue.fail(job, f"{type(e).__name__}: {e}", permanent=True)
+            counts["dead" if status == "dead" else "lost"] += 1
+        except Exception as e:
+            status = queue.fail(job, f"{type(e).__name__}: {e}")
+            counts[{"queued": "retried", "dead": "dead"}.get(status, "lost")] += 1
+        else:
+            counts["completed" if queue.complete(job, result, children) else "lost"] += 1
+        finally:
+            keeper.stopped.set()
+    return counts
@@ -0,0 +1,243 @@
+"""
+Structured tracing for the ingestion pipeline in create_and_upload_index.py.
+
+Spans are recorded for each stage, PDF, page and remote call and exported as a
+Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev) plus a
+plain-text summary table. An optional sampling profiler can wrap CPU-heavy
+stages and writes folded stacks that flamegraph tools understand.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Span:
+    """A timed unit of work with free-form attributes (pdf, page, bytes, ...)."""
+
+    __slots__ = ("name", "category", "depth", "start", "end", "attrs", "requests", "retries", "thread_id", "_seen_requests")
+
+    def __init__(self, name: str, category: str, attrs: Dict[str, Any], depth: int = 0):
+        self.name = name
+        self.depth = depth
+        self.category = category
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.requests = 0
+        self.retries = 0
+        self.thread_id = threading.get_ident()
+        # id -> request; the request is kept so its id cannot be reused while the span is open
+        self._seen_requests: Dict[int, Any] = {}
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def add_bytes(self, count: int) -> None:
+        self.attrs["bytes"] = self.attrs.get("bytes", 0) + int(count)
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Collects spans; nesting is tracked per thread and `pdf`/`page` attributes are inherited."""
+
+    INHERITED_ATTRS = ("pdf", "page")
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span(self) -> Optional[Span]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attrs: Any) -> Iterator[Span]:
+        """Time a block of work: `with tracer.span("adi_analyze", "remote", pdf=name) as span: ...`."""
+        stack = self._stack()
+        if stack:
+            for key in self.INHERITED_ATTRS:
+                if key in stack[-1].attrs and key not in attrs:
+                    attrs[key] = stack[-1].attrs[key]
+        span = Span(name, category, attrs, depth=len(stack))
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.attrs["error"] = type(exc).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            span._seen_requests.clear()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def on_request_attempt(self, request: Any) -> None:
+        """
+        HTTP hook counting requests and retries against the innermost open span.
+
+        Works as an azure-core `raw_request_hook` (the same request object is re-sent
+        on retry) and as an httpx request event hook (the OpenAI client marks retries
+        with the x-stainless-retry-count header).
+        """
+        span = self.current_span()
+        if span is None:
+            return
+        http_request = getattr(request, "http_request", request)
+        headers = getattr(http_request, "headers", None) or {}
+        retry_count = headers.get("x-stainless-retry-count")
+        if retry_count is not None:
+            is_retry = retry_count not in ("", "0")
+        else:
+            is_retry = id(http_request) in span._seen_requests
+            span._seen_requests[id(http_request)] = http_request
+        span.requests += 1
+        if is_retry:
+            span.retries += 1
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans as Chrome trace "complete" events (timestamps in microseconds)."""
+        pid = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            args = dict(span.attrs)
+            if span.requests:
+                args.update(requests=span.requests, retries=span.retries)
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self._origin) * 1e6, 1),
+                "dur": round(span.duration * 1e6, 1),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace(), default=str))
+
+    def summary_table(self) -> str:
+        """
+        Inclusive wall time per stage, with request, retry and byte counts, followed by
+        the split of each PDF's time across its direct child stages.
+        """
+        by_stage: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        by_pdf: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        pdf_depth = {span.attrs.get("pdf"): span.depth for span in self.spans if span.category == "pdf"}
+        for span in self.spans:
+            stage = by_stage[(span.category, span.name)]
+            stage["calls"] += 1
+            stage["seconds"] += span.duration
+            stage["requests"] += span.requests
+            stage["retries"] += span.retries
+            stage["bytes"] += span.attrs.get("bytes", 0)
+            pdf = span.attrs.get("pdf")
+            if span.category == "pdf":
+                by_pdf[pdf]["__total__"] += span.duration
+            elif pdf in pdf_depth and span.depth == pdf_depth[pdf] + 1:
+                by_pdf[pdf][span.name] += span.duration
+
+        lines = [
+            f"{'stage':<28}{'category':<10}{'calls':>7}{'total s':>10}{'mean ms':>10}{'requests':>10}{'retries':>9}{'MB':>9}",
+            "-" * 93,
+        ]
+        for (category, name), stage in sorted(by_stage.items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                f"{name:<28}{category:<10}{int(stage['calls']):>7}{stage['seconds']:>10.2f}"
+                f"{stage['seconds'] / stage['calls'] * 1000:>10.1f}{int(stage['requests']):>10}"
+                f"{int(stage['retries']):>9}{stage['bytes'] / 1e6:>9.2f}"
+            )
+        for pdf, stages in sorted(by_pdf.items()):
+            total = stages.pop("__total__", 0.0)
+            lines.append("")
+            lines.append(f"{pdf}: {total:.2f} s")
+            for name, seconds in sorted(stages.items(), key=lambda item: -item[1]):
+                share = seconds / total if total else 0.0
+                lines.append(f"    {name:<28}{seconds:>10.2f} s {share:>7.1%}")
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stack of one thread from a background thread.
+
+    Only active inside `sample(label)` blocks, so it can wrap CPU-heavy stages
+    (rendering, base64 encoding) without slowing down the network-bound ones.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Dict[str, Counter] = defaultdict(Counter)
+
+    @contextmanager
+    def sample(self, label: str) -> Iterator[None]:
+        target = threading.get_ident()
+        stop = threading.Event()
+        stacks = self.stacks[label]
+
+        def run() -> None:
+            while not stop.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if names:
+                    stacks[";".join(reversed(names))] += 1
+
+        sampler = threading.Thread(target=run, name=f"profiler-{label}", daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+
+    def write_folded(self, path: Path) -> None:
+        """Write collapsed stacks ("frame;frame;frame count") for flamegraph.pl or speedscope."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for label, stacks in self.stacks.items():
+                for stack, count in stacks.items():
+                    f.write(f"{label};{stack} {count}\n")
+
+    def top_functions(self, limit: int = 15) -> str:
+        """Leaf functions with the most samples across all profiled stages."""
+        leaves: Counter = Counter()
+        for stacks in self.stacks.values():
+            for stack, count in stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        lines = [f"{'samples':>8} {'share':>7}  function"]
+        for name, count in leaves.most_common(limit):
+            lines.append(f"{count:>8} {count / total:>7.1%}  {name}")
+        return "\n".join(lines)
+
+
+class NullProfiler:
+    """Drop-in replacement used when --profile is not given."""
+
+    @contextmanager
+    def sample(self, label: str) -> Iterator[None]:
+        yield
@@ -0,0 +1,125 @@
+"""
+Page-by-page handling of Document Intelligence layout results for create_and_upload_index.py.
+
+In streaming mode a PDF is analyzed a few pages per request. Each partial
+AnalyzeResult is flattened into one JSON line per page (text, section headings,
+figure captions and figure regions) and dropped before the next request, so
+memory no longer grows with the page count. Later stages read the JSONL file
+back through generators: figure regions for rendering, and page-aligned chunks
+of text and headings for architecture extraction.
+"""
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Pages per analyze request; also the most pages whose layout is in memory at once
+PAGES_PER_REQUEST = 50
+# Characters of OCR text sent to one architecture extraction call (about 15k tokens)
+EXTRACTION_CHUNK_CHARS = 60_000
+
+
+def _page_number(element: Any) -> int:
+    regions = element.get("boundingRegions") or [{}]
+    return regions[0].get("pageNumber", 0)
+
+
+def iter_layout_pages(result: Any) -> Iterator[Dict[str, Any]]:
+    """
+    One record per page of a layout result: {"page", "content", "headings", "figures"}.
+
+    Works on one request's page range, so only that range's layout is held.
+    """
+    paragraphs: Dict[int, List[Any]] = defaultdict(list)
+    for paragraph in result.get("paragraphs") or []:
+        paragraphs[_page_number(paragraph)].append(paragraph)
+    figures_by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for figure in result.get("figures") or []:
+        if figure.get("boundingRegions"):
+            figures_by_page[_page_number(figure)].append({
+                "page": _page_number(figure),
+                "polygon": list(figure["boundingRegions"][0]["polygon"]),
+                "caption": (figure.get("caption") or {}).get("content"),
+            })
+    pages = [page.get("pageNumber") for page in result.get("pages") or []]
+    for page in pages or sorted(paragraphs):
+        items = paragraphs.pop(page, [])
+        figures = figures_by_page.pop(page, [])
+        headings = [paragraph["content"] for paragraph in items if paragraph.get("role") == "sectionHeading"]
+        headings += [figure["caption"] for figure in figures if figure["caption"]]
+        yield {
+            "page": page,
+            "content": "\n".join(paragraph["content"] for paragraph in items),
+            "headings": headings,
+            "figures": figures,
+        }
+
+
+def page_ranges(page_count: int, pages_per_request: int = PAGES_PER_REQUEST) -> Iterator[str]:
+    """Document Intelligence `pages` arguments covering the document: "1-50", "51-100", ..."""
+    for first in range(1, page_count + 1, pages_per_request):
+        yield f"{first}-{min(first + pages_per_request - 1, page_count)}"
+
+
+def stream_layout_to_jsonl(analyze: Callable[[str], Any], page_count: int, path: Path,
+                           pages_per_request: int = PAGES_PER_REQUEST) -> int:
+    """
+    Analyze `pages_per_request` pages at a time and append one line per page to `path`.
+
+    `analyze(pages)` returns the layout result of a page range. Returns the number
+    of pages written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for pages in page_ranges(page_count, pages_per_request):
+            result = analyze(pages)
+            for record in iter_layout_pages(result):
+                f.write(json.dumps(record) + "\n")
+                written += 1
+    return written
+
+
+def read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_figures(path: Path) -> Iterator[Dict[str, Any]]:
+    """Figure regions ({"page", "polygon", "caption"}) in document order."""
+    for record in read_jsonl(path):
+        yield from record["figures"]
+
+
+def iter_extraction_chunks(path: Path, max_chars: int = EXTRACTION_CHUNK_CHARS) -> Iterator[Tuple[str, List[str]]]:
+    """
+    (OCR text, section headings) chunks cut at page boundaries.
+
+    A chunk holds whole pages up to `max_chars`, so a heading and the diagram that
+    follows it on the same page always land in the same chunk.
+    """
+    content: List[str] = []
+    headings: List[str] = []
+    size = 0
+    for record in read_jsonl(path):
+        if content and size + len(record["content"]) > max_chars:
+            yield "\n".join(content), headings
+            content, headings, size = [], [], 0
+        content.append(record["content"])
+        headings.extend(record["headings"])
+        size += len(record["content"])
+    if content:
+        yield "\n".join(content), headings
+
+
+def write_jsonl(path: Path, records: Iterable[Dict[str, Any]], append: bool = False) -> int:
+    """Write records one per line; returns how many were written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,83 @@
+"""
+Page selection for the vision summaries of create_and_upload_index.py.
+
+Only pages that carry a diagram are rendered at full resolution and sent to the
+vision model. A page is selected when Document Intelligence found a figure on
+it, or, as a fallback for figures it missed, when enough of the page is ink
+that is not text: the page is rendered as a small greyscale thumbnail, the
+blocks of the PDF's text layer are painted white, and the dark pixels left are
+counted. Text, title and appendix pages score close to zero; a diagram scores
+well above MIN_GRAPHICS_DENSITY. Scanned pages have no text layer, so all of
+their ink counts and they are always selected.
+"""
+import io
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+import fitz  # PyMuPDF
+
+# Share of a page's thumbnail that must be non-text ink for the page to count as a diagram
+MIN_GRAPHICS_DENSITY = 0.005
+# Resolution of the thumbnail the heuristic looks at (a letter page is 306 x 396 pixels)
+THUMBNAIL_DPI = 36
+# Grey level below which a thumbnail pixel is ink
+INK_LEVEL = 200
+
+
+@dataclass
+class PageDecision:
+    """Whether one page (1-based) goes to the vision model, and why."""
+
+    page: int
+    selected: bool
+    reason: str  # "figure", "graphics", "text_only", or "all_pages" when selection is off
+    graphics_density: Optional[float] = None
+
+
+def graphics_density(page: "fitz.Page", dpi: int = THUMBNAIL_DPI) -> float:
+    """Share of the page thumbnail that is dark and outside every block of the text layer."""
+    from PIL import Image, ImageDraw
+
+    scale = dpi / 72.0
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+    image = Image.open(io.BytesIO(pixmap.tobytes("png")))
+    draw = ImageDraw.Draw(image)
+    for x0, y0, x1, y1, *_ in page.get_text("blocks"):
+        draw.rectangle([x0 * scale - 1, y0 * scale - 1, x1 * scale + 1, y1 * scale + 1], fill=255)
+    pixels = image.tobytes()
+    return sum(1 for value in pixels if value < INK_LEVEL) / len(pixels)
+
+
+def select_pages(
+    doc: "fitz.Document", figure_pages: Iterable[int], min_density: float = MIN_GRAPHICS_DENSITY
+) -> List[PageDecision]:
+    """
+    One decision per page of `doc`.
+
+    Pages in `figure_pages` (1-based, from Document Intelligence) are selected
+    without rendering; the heuristic only runs on the others.
+    """
+    figure_pages = set(figure_pages)
+    decisions = []
+    for index in range(doc.page_count):
+        number = index + 1
+        if number in figure_pages:
+            decisions.append(PageDecision(number, True, "figure"))
+            continue
+        density = graphics_density(doc[index])
+        selected = density >= min_density
+        decisions.append(PageDecision(number, selected, "graphics" if selected else "text_only", round(density, 4)))
+    return decisions
+
+
+def selection_summary(decisions: List[PageDecision]) -> Dict[str, Any]:
+    """Counts by reason plus the decisions, JSON-serializable for the report."""
+    selected = sum(decision.selected for decision in decisions)
+    return {
+        "pages": len(decisions),
+        "selected": selected,
+        "skipped": len(decisions) - selected,
+        "by_reason": dict(Counter(decision.reason for decision in decisions)),
+        "decisions": [asdict(decision) for decision in decisions],
+    }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Production server entry point running several uvicorn worker processes.
+
+Workers share the agent definition, the thread registry and the response cache
+through a SQLite database (SHARED_STATE_PATH), so a follow-up question can land
+on any worker. Unlike start_server.py there is no auto-reload.
+
+    python serve.py --workers 4 --port 8000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+# Add the current directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent))
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("APP_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("APP_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("APP_PORT", "8000")))
+    parser.add_argument("--app", default="backend.app:app", help="ASGI application to serve")
+    parser.add_argument(
+        "--state-path",
+        default=os.getenv("SHARED_STATE_PATH") or str(Path(tempfile.gettempdir()) / "architecture-recommender-state.db"),
+        help="SQLite file holding the state shared by the workers",
+    )
+    parser.add_argument("--log-level", default=os.getenv("APP_LOG_LEVEL", "info"))
+    return parser.parse_args(argv)
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    # Worker processes inherit the environment, so they all open the same store
+    os.environ["SHARED_STATE_PATH"] = args.state_path
+    print(f"Starting {args.workers} worker(s) on {args.host}:{args.port} (shared state: {args.state_path})")
+    uvicorn.run(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Test per-client token buckets, weighted fair queuing and priority lanes of the admission scheduler."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import metrics
+from backend.admission import (LANE_BATCH, LANE_INTERACTIVE, AdmissionRejected, ClientPolicy, FairScheduler,
+                               TokenBucket, client_identity)
+from backend.intake_agent import IntakeAgent
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_and_client_identity():
+    """Bursts are allowed up to the bucket size, then requests wait for the refill."""
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_take() == 0.5
+    clock.now = 0.5
+    assert bucket.try_take() == 0.0
+    assert TokenBucket(rate=0, burst=1).try_take() == 0.0
+
+    assert client_identity("secret", "ignored").startswith("key-") and "secret" not in client_identity("secret", None)
+    assert client_identity(None, "nightly-sync") == "nightly-sync"
+    assert client_identity(None, None) == "anonymous"
+
+def test_fair_queuing_and_lanes():
+    """A flooding client does not delay others; batch never takes the last interactive slots."""
+    async def scenario():
+        scheduler = FairScheduler(max_concurrency=2, batch_share=0.5, policies={"sync": ClientPolicy(lane=LANE_BATCH)})
+        order = []
+        release = asyncio.Event()
+
+        async def query(client: str, lane: str, tag: str) -> None:
+            async with scheduler.slot(client, lane):
+                order.append(tag)
+                await release.wait()
+
+        # The noisy client fills both slots and queues eight more queries
+        noisy = [asyncio.create_task(query("noisy", LANE_INTERACTIVE, f"noisy-{i}")) for i in range(10)]
+        await asyncio.sleep(0)
+        user = asyncio.create_task(query("user", LANE_INTERACTIVE, "user"))
+        await asyncio.sleep(0)
+        depth = scheduler.queue_depth("noisy", LANE_INTERACTIVE)
+        release.set()
+        await asyncio.gather(*noisy, user)
+        fair_order = list(order)
+
+        # With one slot held by a batch query, the next batch query waits and an interactive one runs
+        order.clear()
+        release.clear()
+        batch = [asyncio.create_task(query("sync", scheduler.lane_for("sync", None), f"batch-{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(query("user", LANE_INTERACTIVE, "user"))
+        await asyncio.sleep(0)
+        lanes_order = list(order)
+        release.set()
+        await asyncio.gather(*batch, interactive)
+        return depth, fair_order, lanes_order
+
+    depth, fair_order, lanes_order = asyncio.run(scenario())
+
+    assert depth == 8
+    # The user's query shares the next turn with the noisy client's first queued query instead of
+    # waiting for all eight
+    assert fair_order.index("user") == 3
+    assert lanes_order == ["batch-0", "user"]
+
+def test_rejections_are_counted_per_client():
+    """Interactive queries over the rate and queries waiting past the queue timeout are rejected."""
+    async def scenario():
+        scheduler = FairScheduler(
+            max_concurrency=1, max_queue_per_client=1, queue_timeout=0.05,
+            policies={"limited": ClientPolicy(rate=1, burst=1)},
+        )
+        rejected = []
+        async with scheduler.slot("limited"):
+            for client in ("limited", "other", "other"):
+                try:
+                    async with scheduler.slot(client):
+                        pass
+                except AdmissionRejected as e:
+                    rejected.append((e.client, e.reason))
+        return rejected
+
+    rate_limited_before = metrics.ADMISSION_REJECTIONS.labels(client="limited", reason="rate_limited").value
+    rejected = asyncio.run(scenario())
+
+    assert ("limited", "rate_limited") in rejected
+    assert ("other", "queue_timeout") in rejected
+    assert metrics.ADMISSION_REJECTIONS.labels(client="limited", reason="rate_limited").value == rate_limited_before + 1
+
+def test_rotating_client_ids_are_bounded():
+    """New ids past max_clients share one bucket until an old bucket refills; finish times stay bounded."""
+    async def scenario():
+        scheduler = FairScheduler(max_concurrency=1, max_clients=3, default_policy=ClientPolicy(rate=20, burst=1))
+        admitted = []
+        for index in range(6):
+            try:
+                async with scheduler.slot(f"rotating-{index}"):
+                    admitted.append(index)
+            except AdmissionRejected:
+                pass
+        buckets = list(scheduler._buckets)
+        # Refilled buckets are forgotten to make room
+        await asyncio.sleep(0.1)
+        async with scheduler.slot("rotating-6"):
+            pass
+        refreshed = list(scheduler._buckets)
+
+        scheduler = FairScheduler(max_concurrency=1, max_clients=3)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("holder"):
+                await release.wait()
+
+        async def queued(client):
+            async with scheduler.slot(client):
+                pass
+
+        for round in range(5):
+            release.clear()
+            holder = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            waiters = [asyncio.create_task(queued(f"queued-{round}-{index}")) for index in range(4)]
+            await asyncio.sleep(0)
+            release.set()
+            await asyncio.gather(holder, *waiters)
+        return admitted, buckets, refreshed, len(scheduler._last_finish)
+
+    admitted, buckets, refreshed, finish_times = asyncio.run(scenario())
+
+    # Three own buckets, then the shared one admits one more and is empty
+    assert admitted == [0, 1, 2, 3] and buckets == ["rotating-0", "rotating-1", "rotating-2"]
+    assert refreshed == ["rotating-1", "rotating-2", "rotating-6"]
+    # Twenty clients queued once each: at most three kept, plus the last round's, queued when last trimmed
+    assert finish_times <= 3 + 4
+
+def test_query_endpoint_returns_429_over_the_rate():
+    """/query answers 429 with Retry-After once the client's bucket is empty."""
+    async def scenario():
+        agent = await IntakeAgent.create(client=FakeProjectClient(FakeServiceConfig(time_scale=0.01)))
+        transport = httpx.ASGITransport(app=backend_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            backend_app.agent = agent
+            backend_app.admission = FairScheduler(max_concurrency=4, default_policy=ClientPolicy(rate=0.1, burst=1))
+            try:
+                headers = {"X-Client-Id": "integration"}
+                first = await http.post("/query", json={"query": "Streaming IoT telemetry"}, headers=headers)
+                second = await http.post("/query", json={"query": "Batch loads"}, headers=headers)
+                other = await http.post("/query", json={"query": "Batch loads"}, headers={"X-Client-Id": "user"})
+            finally:
+                backend_app.agent = backend_app.admission = None
+                await agent.cleanup()
+        return first, second, other
+
+    first, second, other = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert second.status_code == 429 and int(second.headers["Retry-After"]) >= 1
+    assert other.status_code == 200
+    assert 'intake_agent_admission_wait_seconds_count{client="integration",lane="interactive"} ' in metrics.REGISTRY.render()
+
+def main():
+    """Run the admission control tests."""
+    print("Testing admission control...")
+    for test in (
+        test_token_bucket_and_client_identity,
+        test_fair_queuing_and_lanes,
+        test_rejections_are_counted_per_client,
+        test_rotating_client_ids_are_bounded,
+        test_query_endpoint_returns_429_over_the_rate,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Test batch queries: deduplication, the NDJSON stream and background jobs."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import batch
+from backend.intake_agent import IntakeAgent
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def _fake_client() -> FakeProjectClient:
+    return FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+
+def test_dedupe_groups_identical_queries():
+    """Whitespace differences collapse; a different thread_id keeps the query separate."""
+    groups = batch.dedupe([
+        ("Streaming IoT telemetry", None),
+        ("Streaming  IoT telemetry ", None),
+        ("Streaming IoT telemetry", "thread-1"),
+        ("Nightly CSV loads", None),
+    ])
+    assert list(groups.values()) == [[0, 1], [2], [3]]
+
+def test_run_batch_runs_each_unique_query_once():
+    """Duplicates reuse the first result and follow-ups on one thread run in order."""
+    async def scenario():
+        client = _fake_client()
+        agent = await IntakeAgent.create(client=client)
+        first = await agent.query("Recommend a lakehouse design.")
+        items = [
+            ("Recommend a lakehouse design for sales data.", None),
+            ("What are the main cost drivers?", first["thread_id"]),
+            ("Recommend a lakehouse design for sales data.", None),
+            ("How would this scale?", first["thread_id"]),
+        ]
+        records = [record async for record in batch.run_batch(agent, items, max_concurrency=4)]
+        await agent.cleanup()
+        return client, first, records
+
+    client, first, records = asyncio.run(scenario())
+    results = {record["index"]: record for record in records if record["type"] == "result"}
+    summary = records[-1]
+
+    assert sorted(results) == [0, 1, 2, 3]
+    assert results[2]["duplicate_of"] == 0
+    assert results[2]["assistant_response"] == results[0]["assistant_response"]
+    assert summary == {**summary, "type": "summary", "total": 4, "unique": 3, "succeeded": 4, "failed": 0}
+    # One run for the first turn plus one per unique batch item
+    assert client.agents.stats["runs_created"] == 4
+    # Follow-ups were posted to the thread in submission order
+    user_messages = [
+        message.content[0].text.value
+        for message in client.agents.messages.list(thread_id=first["thread_id"], order="asc")
+        if message.role == "user"
+    ]
+    assert user_messages[1:] == ["What are the main cost drivers?", "How would this scale?"]
+
+def test_batch_endpoints_stream_and_poll():
+    """/query/batch streams NDJSON, a batch job can be polled to completion, and jobs wait for startup."""
+    async def scenario():
+        agent = await IntakeAgent.create(client=_fake_client())
+        backend_app.agent = agent
+        body = {"queries": [{"query": "Nightly CSV loads"}, {"query": "Nightly CSV loads"}, {"query": "IoT telemetry"}]}
+        transport = httpx.ASGITransport(app=backend_app.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                not_ready = await client.post("/query/batch/jobs", json=body)
+                backend_app.batch_jobs = batch.BatchJobManager(agent, agent.state)
+                streamed = await client.post("/query/batch", json=body)
+                submitted = await client.post("/query/batch/jobs", json=body)
+                job = {"status": "running"}
+                while job["status"] == "running":
+                    await asyncio.sleep(0.05)
+                    job = (await client.get(submitted.json()["status_url"])).json()
+                missing = await client.get("/query/batch/jobs/unknown")
+                empty = await client.post("/query/batch", json={"queries": []})
+        finally:
+            if backend_app.batch_jobs:
+                await backend_app.batch_jobs.shutdown()
+            await agent.cleanup()
+            backend_app.agent = backend_app.batch_jobs = None
+        return not_ready, streamed, submitted, job, missing, empty
+
+    not_ready, streamed, submitted, job, missing, empty = asyncio.run(scenario())
+
+    assert not_ready.status_code == 503
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert [line["type"] for line in lines] == ["result", "result", "result", "summary"]
+    assert lines[-1]["unique"] == 2
+    assert submitted.status_code == 202
+    assert job["status"] == "completed"
+    assert job["completed"] == 3 and job["next_offset"] == 3
+    assert sorted(result["index"] for result in job["results"]) == [0, 1, 2]
+    assert job["summary"]["succeeded"] == 3
+    assert missing.status_code == 404
+    assert empty.status_code == 400
+
+def main():
+    """Run the batch query tests."""
+    print("Testing batch queries...")
+    for test in (
+        test_dedupe_groups_identical_queries,
+        test_run_batch_runs_each_unique_query_once,
+        test_batch_endpoints_stream_and_poll,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Test the architecture catalog snapshot: file format, hot reload and the /architectures endpoints."""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import catalog as backend_catalog
+from backend.catalog import FORMAT_VERSION, CatalogSnapshot, CatalogStore, split_services, write_catalog
+
+def _records(count: int):
+    records = [
+        {
+            "id": f"arch-{index}",
+            "name": f"Pattern {index} – Event Hubs ingestion",
+            "category": "analytics" if index % 2 else "migration",
+            "azure_services": split_services("Event Hubs, Databricks; Data Lake Storage"),
+            "non_azure_services": [],
+            "summary": f"Summary {index}",
+            "architecture_url": f"https://example.blob.core.windows.net/figures/arch-{index}.png",
+            "source": "Present Analytics Patterns on Azure.pdf",
+            "categories": ["analytics" if index % 2 else "migration"],
+        }
+        for index in range(count)
+    ]
+    # A migration pattern merged with its copy from the analytics PDF
+    records[0]["categories"].append("analytics")
+    embeddings = [[float(index), 0.5, -1.0] for index in range(count)]
+    return records, embeddings
+
+def test_snapshot_round_trip_without_copies():
+    """Records decode from the mapping and embeddings are float32 views of it."""
+    records, embeddings = _records(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.bin"
+        version = write_catalog(path, records, embeddings)
+        snapshot = CatalogSnapshot(path)
+
+        assert snapshot.version == version and len(snapshot) == 3
+        assert snapshot.get("arch-1") == records[1]
+        assert snapshot.get("missing") is None
+        embedding = snapshot.embedding(2)
+        assert isinstance(embedding, memoryview) and embedding.format == "f"
+        assert list(embedding) == [2.0, 0.5, -1.0]
+        assert snapshot.embedding_matrix().shape == (3, 3)
+        # Same contents, same version
+        assert write_catalog(path, records, embeddings) == version
+
+def test_store_hot_reloads_new_versions():
+    """A rewritten file is picked up on the next access; readers keep the old snapshot."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.bin"
+        store = CatalogStore(path, reload_interval=0)
+        assert store.current() is None
+
+        write_catalog(path, *_records(2))
+        old = store.current()
+        write_catalog(path, *_records(4))
+        new = store.current()
+
+        assert len(old) == 2 and old.get("arch-1")["summary"] == "Summary 1"
+        assert len(new) == 4 and new.version != old.version
+
+def test_store_keeps_serving_when_a_file_is_corrupt():
+    """A truncated or unknown-format file is skipped once; the previous snapshot stays current."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.bin"
+        path.write_bytes(b"ARCHCAT\x00trunc")
+        store = CatalogStore(path, reload_interval=0)
+        assert store.current() is None and not store.reload()
+
+        write_catalog(path, *_records(2))
+        good = store.current()
+        assert len(good) == 2
+
+        path.write_bytes(path.read_bytes()[:14])
+        attempts = []
+        original = backend_catalog.CatalogSnapshot
+        backend_catalog.CatalogSnapshot = lambda p: attempts.append(p) or original(p)
+        try:
+            assert store.current() is good and store.current() is good
+        finally:
+            backend_catalog.CatalogSnapshot = original
+        # The same bad file is parsed once, not on every check
+        assert len(attempts) == 1
+
+        write_catalog(path, *_records(3))
+        raw = bytearray(path.read_bytes())
+        raw[8:12] = (FORMAT_VERSION + 1).to_bytes(4, "little")
+        path.write_bytes(bytes(raw))
+        assert store.current() is good
+
+        write_catalog(path, *_records(3))
+        assert len(store.current()) == 3
+
+def test_architecture_endpoints():
+    """/architectures filters on every catalog of merged records; /architectures/{id} returns one record."""
+    async def scenario(store):
+        backend_app.catalog = store
+        transport = httpx.ASGITransport(app=backend_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            listed = await client.get("/architectures", params={"category": "analytics", "limit": 1})
+            found = await client.get("/architectures/arch-2")
+            missing = await client.get("/architectures/unknown")
+        return listed, found, missing
+
+    original = backend_app.catalog
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.bin"
+        write_catalog(path, *_records(4))
+        try:
+            listed, found, missing = asyncio.run(scenario(CatalogStore(path)))
+        finally:
+            backend_app.catalog = original
+
+    body = listed.json()
+    assert body["total"] == 3 and [item["id"] for item in body["items"]] == ["arch-0"]
+    assert "summary" not in body["items"][0]
+    assert found.json()["summary"] == "Summary 2"
+    assert found.json()["azure_services"] == ["Event Hubs", "Databricks", "Data Lake Storage"]
+    assert missing.status_code == 404
+
+def main():
+    """Run the catalog snapshot tests."""
+    print("Testing the architecture catalog snapshot...")
+    for test in (test_snapshot_round_trip_without_copies, test_store_hot_reloads_new_versions,
+                 test_store_keeps_serving_when_a_file_is_corrupt, test_architecture_endpoints):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Test compaction of long conversation threads."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.intake_agent import COMPACTION_SUMMARY_HEADER, IntakeAgent
+from backend.shared_state import SharedStateStore
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def test_thread_is_compacted_behind_the_same_thread_id():
+    """Past the turn budget the conversation moves to a summarized thread under the same thread_id."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        agent.compaction_max_turns = 3
+        first = await agent.query("Recommend a lakehouse design for 50 TB of sales data.")
+        thread_id = first["thread_id"]
+        results = [await agent.query(f"Follow-up question {turn}", thread_id=thread_id) for turn in range(2, 6)]
+        backing_thread = agent.state.get_thread(thread_id)
+        messages = list(client.agents.messages.list(thread_id=backing_thread, order="asc"))
+        await agent.cleanup()
+        return thread_id, results, backing_thread, messages
+
+    thread_id, results, backing_thread, messages = asyncio.run(scenario())
+
+    assert all(result["status"] == "success" for result in results)
+    assert {result["thread_id"] for result in results} == {thread_id}
+    assert backing_thread != thread_id
+    # Summary, the third turn verbatim, then turns 4 and 5
+    texts = [message.content[0].text.value for message in messages]
+    assert texts[0].startswith(COMPACTION_SUMMARY_HEADER)
+    assert texts[1] == "Follow-up question 3"
+    assert [text for text, message in zip(texts, messages) if message.role == "user"][1:] == [
+        "Follow-up question 4", "Follow-up question 5"
+    ]
+
+def test_failed_compaction_waits_before_retrying():
+    """A failed compaction is retried after COMPACTION_RETRY_TURNS turns, not on every turn over budget."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        agent.compaction_max_turns = 2
+        agent.compaction_retry_turns = 3
+        list_messages, attempts = client.agents.messages.list, []
+
+        def failing_history(**kwargs):
+            # Only the compaction reads the whole history oldest first
+            if kwargs.get("order") == "asc":
+                attempts.append(kwargs["thread_id"])
+                raise ValueError("history unavailable")
+            return list_messages(**kwargs)
+
+        client.agents.messages.list = failing_history
+        first = await agent.query("Recommend a lakehouse design for 50 TB of sales data.")
+        results = [await agent.query(f"Follow-up question {turn}", thread_id=first["thread_id"]) for turn in range(2, 8)]
+        await agent.cleanup()
+        return results, attempts
+
+    results, attempts = asyncio.run(scenario())
+
+    assert all(result["status"] == "success" for result in results)
+    # Over budget from turn 2 on: attempts at turns 2 and 5 only
+    assert len(attempts) == 2
+
+def test_replace_thread_skips_when_a_turn_landed_meanwhile():
+    """The swap only happens if no other worker added a turn during the summary."""
+    store = SharedStateStore()
+    store.put_thread("client", "old")
+    turns, _ = store.record_turn("client", 900)
+
+    store.record_turn("client", 1000)
+    assert not store.replace_thread("client", "old", "new", expected_turns=turns)
+    assert store.get_thread("client") == "old"
+
+    assert store.replace_thread("client", "old", "new", expected_turns=turns + 1)
+    assert store.get_thread("client") == "new"
+    assert store.record_turn("client", 200) == (1, 200)
+
+def main():
+    """Run the compaction tests."""
+    print("Testing thread compaction...")
+    for test in (
+        test_thread_is_compacted_behind_the_same_thread_id,
+        test_failed_compaction_waits_before_retrying,
+        test_replace_thread_skips_when_a_turn_landed_meanwhile,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Test WebSocket conversations: turns on one socket, pushed progress events and per-connection flow control."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import metrics
+from backend.conversation_ws import CLOSE_SLOW_CONSUMER, ConversationSession, text_chunks
+from backend.intake_agent import IntakeAgent
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+class StalledSocket:
+    """A client that sends turns but never reads what the server sends."""
+
+    def __init__(self, turns):
+        self.incoming = asyncio.Queue()
+        for turn in turns:
+            self.incoming.put_nowait(json.dumps({"query": turn}))
+        self.closed_with = None
+        self.sent = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        return await self.incoming.get()
+
+    async def send_json(self, event):
+        # The first event is written; every later send blocks like a full TCP window
+        if self.sent.is_set():
+            await asyncio.Event().wait()
+        self.sent.set()
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+        self.incoming.put_nowait(None)
+
+def _events_until(socket, last_type):
+    events = []
+    while not events or events[-1]["type"] not in (last_type, "error"):
+        events.append(socket.receive_json())
+    return events
+
+def test_turns_share_one_socket_and_thread():
+    """Each turn pushes run status changes and the answer in pieces; the second turn reuses the thread."""
+    backend_app.agent_client_factory = lambda: FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+    try:
+        with TestClient(backend_app.app) as client:
+            with client.websocket_connect("/ws/conversation") as socket:
+                ready = socket.receive_json()
+                socket.send_json({"query": "Recommend an architecture for streaming IoT telemetry."})
+                first = _events_until(socket, "completed")
+                socket.send_text("not json")
+                invalid = socket.receive_json()
+                socket.send_json({"query": "How would it change for 10x the event rate?"})
+                second = _events_until(socket, "completed")
+    finally:
+        backend_app.agent_client_factory = None
+        backend_app.agent = backend_app.batch_jobs = backend_app.health = None
+
+    assert ready == {"type": "ready", "thread_id": None}
+    assert first[0] == {"type": "turn_started", "turn": 1}
+    statuses = [event["status"] for event in first if event["type"] == "run_status"]
+    assert statuses[-1] == "completed" and len(statuses) == len(set(statuses))
+    deltas = [event["delta"] for event in first if event["type"] == "text_delta"]
+    assert len(deltas) > 1 and all(deltas)
+    assert invalid["type"] == "error" and invalid["status"] == "invalid"
+    assert second[0] == {"type": "turn_started", "turn": 2}
+    assert second[-1]["type"] == "completed" and second[-1]["thread_id"] == first[-1]["thread_id"]
+    assert metrics.WS_CONNECTIONS.value == 0
+
+def test_slow_clients_are_closed_and_extra_turns_rejected():
+    """Status events are dropped while the queue is full; answers wait for the send timeout, then the socket closes."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        socket = StalledSocket(["First question about data lakes.", "Second.", "Third.", "Fourth."])
+        session = ConversationSession(agent, socket, queue_size=2, max_pending_turns=1, send_timeout=0.2)
+        closes_before = metrics.WS_SLOW_CONSUMER_CLOSES.value
+        busy_before = metrics.WS_TURNS.labels(status="busy").value
+        await asyncio.wait_for(session.serve(), timeout=10)
+        await agent.cleanup()
+        return (
+            socket.closed_with,
+            metrics.WS_SLOW_CONSUMER_CLOSES.value - closes_before,
+            metrics.WS_TURNS.labels(status="busy").value - busy_before,
+        )
+
+    closed_with, slow_closes, busy = asyncio.run(scenario())
+
+    assert closed_with == CLOSE_SLOW_CONSUMER
+    assert slow_closes == 1
+    assert busy >= 1
+    assert metrics.WS_CONNECTIONS.value == 0
+
+def test_progress_events_never_block_the_run():
+    """A tool call event for a client whose queue is full is dropped instead of failing the agent's run."""
+    async def scenario():
+        session = ConversationSession(None, StalledSocket([]), queue_size=1, send_timeout=0.05)
+        dropped_before = metrics.WS_EVENTS_DROPPED.labels(type="tool_call").value
+        await session._push({"type": "turn_started", "turn": 1})
+        await session._push_progress({"type": "tool_call", "name": "find_architectures_by_service", "result": "ok"})
+        return session.outbox.qsize(), metrics.WS_EVENTS_DROPPED.labels(type="tool_call").value - dropped_before
+
+    queued, dropped = asyncio.run(scenario())
+
+    assert queued == 1 and dropped == 1
+
+def test_text_chunks_split_at_spaces():
+    text = "Use Event Hubs for ingestion and Stream Analytics for windowed aggregates. " * 5
+    chunks = text_chunks(text, 40)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert all(chunk.endswith(" ") for chunk in chunks[:-1])
+    assert text_chunks("", 40) == []
+
+def main():
+    """Run the WebSocket conversation tests."""
+    print("Testing WebSocket conversations...")
+    for test in (
+        test_turns_share_one_socket_and_thread,
+        test_slow_clients_are_closed_and_extra_turns_rejected,
+        test_progress_events_never_block_the_run,
+        test_text_chunks_split_at_spaces,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
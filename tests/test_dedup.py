@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Test near-duplicate detection of architectures used by scripts/create_and_upload_index.py."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# Add the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from dedup import MinHasher, features, find_duplicates, image_hash, jaccard, merge_duplicates
+
+def _architecture(name, services, source, summary=""):
+    return {"name": name, "azure_services": services, "non_azure_services": [], "summary": summary, "source": source,
+            "category": Path(source).stem}
+
+def _diagram(path: Path, boxes, scale=1.0) -> Path:
+    image = Image.new("RGB", (int(900 * scale), int(600 * scale)), "white")
+    draw = ImageDraw.Draw(image)
+    for x, y in boxes:
+        draw.rectangle([x * scale, y * scale, (x + 160) * scale, (y + 90) * scale], fill="steelblue", outline="black", width=4)
+    image.save(path)
+    return path
+
+def test_minhash_estimates_jaccard():
+    """Signature agreement tracks the exact Jaccard similarity of the feature sets."""
+    first = {f"feature-{index}" for index in range(40)}
+    second = {f"feature-{index}" for index in range(10, 50)}
+    hasher = MinHasher(num_perm=256)
+    a, b = hasher.signature(first), hasher.signature(second)
+    estimate = sum(x == y for x, y in zip(a, b)) / len(a)
+    assert abs(estimate - jaccard(first, second)) < 0.1
+
+def test_copies_across_pdfs_are_merged():
+    """Same services and name, or the same figure, make a duplicate; unrelated patterns stay apart."""
+    services = ["Event Hubs", "Databricks", "Data Lake Storage", "Power BI"]
+    entries = [
+        _architecture("Real-time analytics with Event Hubs", services, "analytics.pdf", "Streams events."),
+        _architecture("Lift and shift of VMs", ["Virtual Machines", "Site Recovery"], "migration.pdf"),
+        _architecture("Real time analytics with Event Hubs", services + ["Monitor"], "migration.pdf", "Events stream in."),
+        _architecture("Streaming ingestion", services[:3], "migration.pdf"),
+        _architecture("Batch ETL", ["Data Factory", "Synapse Analytics"], "analytics.pdf"),
+    ]
+    assert jaccard(features(entries[0]), features(entries[2])) >= 0.7
+
+    with tempfile.TemporaryDirectory() as tmp:
+        boxes = [(60, 80), (300, 80), (540, 80), (300, 360)]
+        figures = [
+            _diagram(Path(tmp) / "a.png", boxes),
+            _diagram(Path(tmp) / "b.png", [(100, 100), (500, 300)]),
+            _diagram(Path(tmp) / "c.png", boxes),
+            # Same diagram rendered at another resolution in the second PDF
+            _diagram(Path(tmp) / "d.png", boxes, scale=2 / 3),
+            _diagram(Path(tmp) / "e.png", [(60, 400), (700, 60)]),
+        ]
+        hashes = [image_hash(path) for path in figures]
+        assert image_hash(Path(tmp) / "missing.png") is None
+
+    duplicates = find_duplicates(entries, hashes)
+    assert set(duplicates) == {2, 3}
+    assert all(duplicate["canonical"] == 0 for duplicate in duplicates.values())
+    assert duplicates[3]["image_distance"] <= 6
+
+    unique, report = merge_duplicates(entries, duplicates)
+    assert [entry["name"] for entry in unique] == [entries[0]["name"], entries[1]["name"], entries[4]["name"]]
+    assert unique[0]["sources"] == ["analytics.pdf", "migration.pdf"]
+    # Still found by a migration-filtered search after merging into the analytics entry
+    assert unique[0]["category"] == "analytics" and unique[0]["categories"] == ["analytics", "migration"]
+    assert unique[1]["categories"] == ["migration"]
+    assert "Monitor" in unique[0]["azure_services"] and unique[0]["summary"] == "Streams events."
+    assert report["architectures"] == 5 and report["unique"] == 3 and report["duplicates"] == 2
+    assert len(report["clusters"]) == 1 and len(report["clusters"][0]["duplicates"]) == 2
+
+def test_blank_extractions_are_not_merged():
+    """Entries with no name words and no services have nothing in common, even though their features are equal."""
+    entries = [
+        _architecture("", [], "analytics.pdf"),
+        _architecture("–", [], "migration.pdf"),
+        _architecture("", [], "migration.pdf"),
+    ]
+    assert jaccard(features(entries[0]), features(entries[1])) == 0.0
+    assert find_duplicates(entries) == {}
+    assert find_duplicates([]) == {}
+
+def main():
+    """Run the deduplication tests."""
+    print("Testing architecture deduplication...")
+    for test in (test_minhash_estimates_jaccard, test_copies_across_pdfs_are_merged, test_blank_extractions_are_not_merged):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Test diagram delivery: WebP variants from ingestion, the LRU disk cache and the /diagrams endpoint."""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+from PIL import Image, ImageDraw
+
+# Add the project root and the scripts directory to the Python path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from backend import app as backend_app
+from backend import metrics
+from backend.catalog import CatalogStore, write_catalog
+from backend.diagrams import DiagramCache, DiagramStore, etag_matches, variant_url
+from diagram_variants import write_variants
+
+def _figure(path: Path) -> Path:
+    """A 2400 x 1500 diagram-like PNG, about the size of a 300 DPI figure."""
+    image = Image.new("RGB", (2400, 1500), "white")
+    draw = ImageDraw.Draw(image)
+    for column in range(4):
+        draw.rectangle([100 + column * 580, 500, 480 + column * 580, 900], outline="black", fill=(50, 100, 200), width=8)
+        draw.line([480 + column * 580, 700, 680 + column * 580, 700], fill="black", width=8)
+    image.save(path)
+    return path
+
+def test_variants_are_smaller_webp_next_to_the_figure():
+    """Thumbnail and preview are written next to the PNG under the names the backend derives from its URL."""
+    with tempfile.TemporaryDirectory() as tmp:
+        figure = _figure(Path(tmp) / "patterns_003.png")
+        variants = write_variants(figure)
+        sizes = {variant: Image.open(path).size for variant, path in variants.items()}
+        lengths = {variant: path.stat().st_size for variant, path in variants.items()}
+        full_length = figure.stat().st_size
+
+    assert sizes == {"thumbnail": (320, 200), "preview": (1024, 640)}
+    assert lengths["thumbnail"] < lengths["preview"] < full_length
+    assert [path.name for path in variants.values()] == ["patterns_003.thumbnail.webp", "patterns_003.preview.webp"]
+    url = "https://example.blob.core.windows.net/figures/patterns_003.png"
+    assert variant_url(url, "thumbnail") == "https://example.blob.core.windows.net/figures/patterns_003.thumbnail.webp"
+    assert variant_url(url, "full") == url
+
+def test_cache_evicts_least_recently_used_and_shares_fetches():
+    """Past the size cap the least recently used file goes; concurrent misses fetch once; restarts keep entries."""
+    fetches = []
+
+    async def fetch(url):
+        fetches.append(url)
+        await asyncio.sleep(0.01)
+        return b"x" * 400 if "missing" not in url else None
+
+    async def scenario(directory):
+        cache = DiagramCache(directory, max_bytes=1000, fetch=fetch)
+        shared = await asyncio.gather(*(cache.get("v1", "https://blob/a.png") for _ in range(5)))
+        await cache.get("v1", "https://blob/b.png")
+        await cache.get("v1", "https://blob/a.png")
+        await cache.get("v1", "https://blob/c.png")
+        try:
+            await cache.get("v1", "https://blob/missing.png")
+            missing = False
+        except Exception as e:
+            missing = type(e).__name__
+        return cache, shared, missing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, shared, missing = asyncio.run(scenario(Path(tmp)))
+        restarted = DiagramCache(Path(tmp), max_bytes=1000, fetch=fetch)
+        files = sorted(path.suffix for path in Path(tmp).iterdir())
+
+    assert fetches.count("https://blob/a.png") == 1
+    assert len({entry.etag for entry in shared}) == 1 and shared[0].etag.startswith('"')
+    # b was the least recently used when c arrived
+    assert "https://blob/b.png" in fetches and cache.bytes == 800
+    assert DiagramCache.key("v1", "https://blob/b.png") not in cache._entries
+    assert missing == "DiagramNotFound"
+    assert restarted.bytes == 800 and files == [".png", ".png"]
+
+def test_diagram_endpoint_serves_etag_304_and_ranges():
+    """/diagrams returns cached variants with a strong ETag, answers 304 on a match and 206 for a Range."""
+    async def scenario(store, diagrams):
+        backend_app.catalog, backend_app.diagrams = store, diagrams
+        transport = httpx.ASGITransport(app=backend_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            thumbnail = await client.get("/diagrams/arch-0", params={"size": "thumbnail"})
+            cached = await client.get("/diagrams/arch-0", params={"size": "thumbnail"},
+                                      headers={"If-None-Match": thumbnail.headers["etag"]})
+            ranged = await client.get("/diagrams/arch-0", headers={"Range": "bytes=0-99"})
+            invalid = await client.get("/diagrams/arch-0", params={"size": "huge"})
+            no_figure = await client.get("/diagrams/arch-1", params={"size": "preview"})
+            listed = await client.get("/architectures")
+        return thumbnail, cached, ranged, invalid, no_figure, listed
+
+    original = backend_app.catalog
+    with tempfile.TemporaryDirectory() as tmp:
+        figures = Path(tmp) / "figures"
+        figures.mkdir()
+        write_variants(_figure(figures / "arch-0.png"))
+        records = [
+            {"id": f"arch-{index}", "name": f"Pattern {index}", "category": "analytics",
+             # arch-1 has no figure
+             "architecture_url": "https://example.blob.core.windows.net/figures/arch-0.png" if index == 0 else ""}
+            for index in range(2)
+        ]
+        write_catalog(Path(tmp) / "catalog.bin", records, [[0.0], [1.0]])
+        diagrams = DiagramStore(cache_dir=Path(tmp) / "cache", source_dir=figures, max_age=3600)
+        not_modified_before = metrics.DIAGRAM_NOT_MODIFIED.value
+        try:
+            thumbnail, cached, ranged, invalid, no_figure, listed = asyncio.run(
+                scenario(CatalogStore(Path(tmp) / "catalog.bin"), diagrams)
+            )
+        finally:
+            backend_app.catalog, backend_app.diagrams = original, None
+            asyncio.run(diagrams.close())
+        full_length = (figures / "arch-0.png").stat().st_size
+
+    assert thumbnail.status_code == 200 and thumbnail.headers["content-type"] == "image/webp"
+    assert thumbnail.headers["cache-control"] == "public, max-age=3600"
+    assert not thumbnail.headers["etag"].startswith("W/") and thumbnail.headers["accept-ranges"] == "bytes"
+    assert cached.status_code == 304 and cached.content == b""
+    assert metrics.DIAGRAM_NOT_MODIFIED.value == not_modified_before + 1
+    assert ranged.status_code == 206 and len(ranged.content) == 100
+    assert ranged.headers["content-range"] == f"bytes 0-99/{full_length}"
+    assert ranged.content.startswith(b"\x89PNG")
+    assert invalid.status_code == 400
+    assert no_figure.status_code == 404
+    assert listed.json()["items"][0]["diagrams"]["thumbnail"] == "/diagrams/arch-0?size=thumbnail"
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+def main():
+    """Run the diagram delivery tests."""
+    print("Testing diagram delivery...")
+    for test in (
+        test_variants_are_smaller_webp_next_to_the_figure,
+        test_cache_evicts_least_recently_used_and_shares_fetches,
+        test_diagram_endpoint_serves_etag_304_and_ranges,
+        test_etag_matching,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Test the IntakeAgent end to end against the local fake agents service (no Azure needed)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def _fake_client(**overrides) -> FakeProjectClient:
+    return FakeProjectClient(FakeServiceConfig(time_scale=0.01, **overrides))
+
+async def _conversation(client: FakeProjectClient):
+    agent = await IntakeAgent.create(client=client)
+    first = await agent.query("I need a batch ingestion pipeline into a data lake with Databricks.")
+    follow_up = await agent.query("What would it cost?", thread_id=first["thread_id"])
+    await agent.cleanup()
+    return first, follow_up
+
+def test_query_and_follow_up_share_thread():
+    """A follow-up with the returned thread_id continues the same conversation."""
+    client = _fake_client()
+    requests_before = metrics.QUERY_REQUESTS.value
+
+    first, follow_up = asyncio.run(_conversation(client))
+
+    assert first["status"] == "success"
+    assert first["assistant_response"].startswith("Recommended architectures:")
+    assert follow_up["status"] == "success"
+    assert follow_up["thread_id"] == first["thread_id"]
+    assert client.agents.stats["threads_created"] == 1
+    assert client.agents.stats["runs_created"] == 2
+    assert metrics.QUERY_REQUESTS.value == requests_before + 2
+
+def test_injected_failures_surface_as_errors():
+    """API failures from the fake service produce an error status and count as errors."""
+    errors_before = metrics.QUERY_ERRORS.value
+
+    first, _ = asyncio.run(_conversation(_fake_client(error_rate=1.0)))
+
+    assert first["status"] == "error"
+    assert metrics.QUERY_ERRORS.value >= errors_before + 1
+
+def main():
+    """Run the fake agents service tests."""
+    print("Testing IntakeAgent against the fake agents service...")
+    for test in (test_query_and_follow_up_share_thread, test_injected_failures_surface_as_errors):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
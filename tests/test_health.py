@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Test the background dependency probes and the /health/live and /health/ready endpoints."""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import metrics
+from backend.health import HealthProber
+from backend.intake_agent import IntakeAgent
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def test_probes_cache_results_and_expire():
+    """A failing dependency and a stale result both make the worker not ready."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        prober = HealthProber(agent, interval=60, timeout=1, ttl=60)
+        before = prober.readiness()
+        await prober.probe_once()
+        healthy = prober.readiness()
+
+        def broken(agent_id, **kwargs):
+            raise ConnectionError("agents service unreachable")
+        client.agents.get_agent = broken
+        await prober.probe_once()
+        failing = prober.readiness()
+
+        prober.ttl = 0
+        time.sleep(0.01)
+        stale = prober.readiness()
+        await agent.cleanup()
+        return before, healthy, failing, stale
+
+    before, healthy, failing, stale = asyncio.run(scenario())
+
+    assert before["ready"] is False and before["checks"]["agents_api"]["detail"] == "not probed yet"
+    assert healthy["ready"] is True
+    assert healthy["checks"]["search_connection"]["detail"] == "connection found"
+    assert failing["ready"] is False
+    assert "agents service unreachable" in failing["checks"]["agents_api"]["detail"]
+    assert failing["checks"]["credential"]["ok"] is True
+    assert 'intake_agent_dependency_up{dependency="agents_api"} 0' in metrics.REGISTRY.render()
+    assert stale["ready"] is False and stale["checks"]["credential"]["detail"].startswith("stale")
+
+def test_endpoints_answer_from_the_cache():
+    """/health/live is always 200; /health/ready is 503 until probes pass and never calls Azure."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        transport = httpx.ASGITransport(app=backend_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            backend_app.agent = agent
+            backend_app.health = HealthProber(agent, interval=60)
+            try:
+                uninitialized = await http.get("/health/ready")
+                await backend_app.health.probe_once()
+                # The endpoints must not reach the service
+                client.agents.get_agent = client.connections.list = unreachable
+                ready = await http.get("/health/ready")
+                live = await http.get("/health/live")
+                legacy = await http.get("/health")
+            finally:
+                backend_app.agent = backend_app.health = None
+                await agent.cleanup()
+        return uninitialized, ready, live, legacy
+
+    def unreachable(*args, **kwargs):
+        raise AssertionError("health endpoint called Azure")
+
+    uninitialized, ready, live, legacy = asyncio.run(scenario())
+
+    assert uninitialized.status_code == 503
+    assert ready.status_code == 200 and ready.json()["ready"] is True
+    assert live.json() == {"status": "alive"}
+    assert legacy.json()["status"] == "healthy"
+
+def main():
+    """Run the health probe tests."""
+    print("Testing health and readiness...")
+    for test in (test_probes_cache_results_and_expire, test_endpoints_answer_from_the_cache):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
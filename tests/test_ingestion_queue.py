@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Test the distributed ingestion queue: leases, visibility timeouts, retries, poison jobs, fan-out and remote workers."""
+
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Add the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from ingest_distributed import collect_results, pdf_jobs
+from ingestion_queue import HttpJobQueue, JobQueue, NewJob, PermanentJobError, create_app, run_worker
+
+def _pdf(payload):
+    """A PDF job fanning out one page job per page, like ingest_distributed.py."""
+    return {"file_name": payload["path"]}, [
+        NewJob("page", f"{payload['path']}#{page}", {"page": page}, priority=1) for page in range(payload["pages"])
+    ]
+
+def _page(payload):
+    return {"page": payload["page"], "summaries": [f"summary {payload['page']}"]}, []
+
+HANDLERS = {"pdf": _pdf, "page": _page}
+
+def _enqueue_pdfs(queue, count, pages):
+    return queue.enqueue([NewJob("pdf", f"doc-{index}.pdf", {"path": f"doc-{index}.pdf", "pages": pages})
+                          for index in range(count)])
+
+def test_fan_out_and_idempotent_enqueue():
+    """Children are enqueued with their parent's completion, page jobs go first, and re-enqueueing adds nothing."""
+    queue = JobQueue(":memory:")
+    assert _enqueue_pdfs(queue, 2, pages=3) == 2
+    assert _enqueue_pdfs(queue, 3, pages=3) == 1
+
+    first = queue.lease("w1")
+    assert first.kind == "pdf" and first.attempts == 1
+    assert queue.complete(first, *_pdf(first.payload))
+    page = queue.lease("w1")
+    assert page.kind == "page" and queue.complete(page, *_page(page.payload))
+
+    counts = run_worker(queue, HANDLERS, worker_id="w2", exit_when_idle=True, poll_interval=0.01)
+    stats = queue.stats()
+    assert counts["completed"] == 2 + 8 and stats["totals"]["done"] == 12
+    assert stats["roots"] == {"total": 3, "finished": 3}
+    pages = queue.results("page")
+    assert len(pages) == 9 and {parent for _, _, parent in pages} == {"doc-0.pdf", "doc-1.pdf", "doc-2.pdf"}
+
+def test_coordinator_enqueues_every_pdf_and_collects_pages_in_order():
+    """PDFs in subdirectories get one job each; finalize pairs every PDF with its page summaries in page order."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        (data_dir / "analytics").mkdir()
+        for name in ("b.pdf", "analytics/a.pdf", "notes.txt"):
+            (data_dir / name).write_bytes(b"%PDF-1.7")
+        jobs = pdf_jobs(data_dir, streaming=True, pages_per_request=25, select=True)
+    assert [job.key for job in jobs] == ["analytics/a.pdf", "b.pdf"]
+    assert jobs[0].payload == {"path": "analytics/a.pdf", "streaming": True, "pages_per_request": 25, "select": True}
+
+    # Outputs are named after the file name stem, so two PDFs named b.pdf would overwrite each other's pages
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        (data_dir / "migration").mkdir()
+        for name in ("b.pdf", "migration/b.pdf"):
+            (data_dir / name).write_bytes(b"%PDF-1.7")
+        try:
+            pdf_jobs(data_dir, streaming=True, pages_per_request=25, select=True)
+            raise AssertionError("duplicate stems were enqueued")
+        except ValueError as e:
+            assert "b.pdf, migration/b.pdf" in str(e)
+
+    queue = JobQueue(":memory:")
+    queue.enqueue([NewJob("pdf", "a.pdf", {"path": "a.pdf", "pages": 3})])
+    pdf = queue.lease("w1")
+    queue.complete(pdf, *_pdf(pdf.payload))
+    for index in (2, 0, 1):
+        page = queue.lease("w1")
+        queue.complete(page, {"page": page.payload["page"], "summaries": [f"s{page.payload['page']}"], "seconds": index})
+    documents, vision_calls = collect_results(queue)
+    assert documents == [({"file_name": "a.pdf"}, ["s0", "s1", "s2"])]
+    assert sorted(vision_calls) == [0, 1, 2]
+
+def test_lease_expiry_retries_then_marks_poison():
+    """A job whose worker stops renewing becomes visible again; a stale lease cannot complete it."""
+    queue = JobQueue(":memory:")
+    queue.enqueue([NewJob("pdf", "crashy.pdf", {"path": "crashy.pdf", "pages": 0}, max_attempts=2)])
+
+    stale = queue.lease("w1", lease_seconds=0.05)
+    assert queue.lease("w2") is None
+    time.sleep(0.1)
+    retried = queue.lease("w2", lease_seconds=0.05)
+    assert retried.id == stale.id and retried.attempts == 2
+    assert not queue.complete(stale, {"file_name": "late"})
+    assert not queue.extend(stale)
+
+    time.sleep(0.1)
+    # Both attempts ended with a lost worker: the job is poison, not leased a third time
+    assert queue.lease("w3") is None
+    dead = queue.stats()["dead_jobs"]
+    assert [(job["key"], job["attempts"]) for job in dead] == [("crashy.pdf", 2)]
+    assert dead[0]["error"] == "lease expired on w2"
+    assert queue.requeue_dead() == 1 and queue.lease("w3").attempts == 1
+
+def test_lease_renewals_keep_a_busy_worker_alive():
+    """A worker running one long job is not shown as gone: renewing its lease refreshes its heartbeat."""
+    queue = JobQueue(":memory:")
+    queue.enqueue([NewJob("pdf", "large.pdf", {"path": "large.pdf", "pages": 0})])
+    queue.heartbeat("w1", "host-1", 1)
+    job = queue.lease("w1")
+    # Heartbeats are only sent between jobs; the last one was two minutes ago
+    queue._conn.execute("UPDATE workers SET last_seen = last_seen - 120")
+    assert not queue.stats()["workers"][0]["alive"]
+
+    assert queue.extend(job)
+    worker = queue.stats()["workers"][0]
+    assert worker["alive"] and worker["job"] == "pdf:large.pdf"
+
+def test_failures_are_retried_with_backoff_and_poison_jobs_die():
+    """Errors are retried up to max_attempts; PermanentJobError is dead at once; the rest of the queue still runs."""
+    queue = JobQueue(":memory:", retry_base_delay=0.0, retry_max_delay=0.0)
+    calls = {"flaky.pdf": 0, "broken.pdf": 0, "unreadable.pdf": 0, "fine.pdf": 0}
+
+    def handler(payload):
+        calls[payload["path"]] += 1
+        if payload["path"] == "flaky.pdf" and calls["flaky.pdf"] < 3:
+            raise TimeoutError("vision call timed out")
+        if payload["path"] == "broken.pdf":
+            raise ValueError("bad response")
+        if payload["path"] == "unreadable.pdf":
+            raise PermanentJobError("not a PDF")
+        return {"ok": True}, []
+
+    queue.enqueue([NewJob("pdf", path, {"path": path}) for path in calls])
+    counts = run_worker(queue, {"pdf": handler}, exit_when_idle=True, poll_interval=0.01)
+
+    assert calls == {"flaky.pdf": 3, "broken.pdf": 3, "unreadable.pdf": 1, "fine.pdf": 1}
+    assert counts == {"completed": 2, "retried": 4, "dead": 2, "lost": 0}
+    dead = {job["key"]: job for job in queue.stats()["dead_jobs"]}
+    assert dead["broken.pdf"]["error"] == "ValueError: bad response"
+    assert dead["unreadable.pdf"]["error"] == "PermanentJobError: not a PDF"
+
+def _work(path, counts):
+    counts.put(run_worker(JobQueue(path), HANDLERS, exit_when_idle=True, poll_interval=0.01))
+
+def test_worker_processes_share_the_queue():
+    """Four processes drain one SQLite queue; every job is completed exactly once."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "queue.db")
+        _enqueue_pdfs(JobQueue(path), 40, pages=5)
+        context = multiprocessing.get_context("fork")
+        counts = context.Queue()
+        workers = [context.Process(target=_work, args=(path, counts)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        results = [counts.get(timeout=60) for _ in workers]
+        for worker in workers:
+            worker.join(timeout=10)
+        stats = JobQueue(path).stats()
+
+    assert sum(result["completed"] for result in results) == 240
+    assert sum(result["lost"] + result["retried"] for result in results) == 0
+    assert stats["totals"] == {"queued": 0, "leased": 0, "done": 240, "dead": 0}
+    assert len(stats["workers"]) == 4 and sum(worker["completed"] for worker in stats["workers"]) == 240
+
+def test_remote_workers_and_dashboard():
+    """Workers on other hosts use the coordinator's HTTP server with its token; it also serves /status and the dashboard."""
+    queue = JobQueue(":memory:")
+    _enqueue_pdfs(queue, 3, pages=2)
+    with TestClient(create_app(queue, token="queue-secret")) as client:
+        unauthorized = client.post("/lease", json={"worker_id": "intruder"})
+        wrong_token = client.get("/status", headers={"Authorization": "Bearer guess"})
+        remote = HttpJobQueue(client=client, token="queue-secret")
+        counts = run_worker(remote, HANDLERS, worker_id="remote-1", exit_when_idle=True, poll_interval=0.01)
+        status = remote.stats()
+        dashboard = client.get("/")
+
+    assert unauthorized.status_code == wrong_token.status_code == 401
+    assert counts["completed"] == 9
+    assert status["totals"]["done"] == 9 and status["throughput_jobs_per_s"] > 0
+    assert status["workers"][0]["worker_id"] == "remote-1" and status["workers"][0]["completed"] == 9
+    assert dashboard.status_code == 200 and "3 of 3 documents finished" in dashboard.text
+
+def main():
+    """Run the ingestion queue tests."""
+    print("Testing the distributed ingestion queue...")
+    for test in (
+        test_fan_out_and_idempotent_enqueue,
+        test_coordinator_enqueues_every_pdf_and_collects_pages_in_order,
+        test_lease_expiry_retries_then_marks_poison,
+        test_lease_renewals_keep_a_busy_worker_alive,
+        test_failures_are_retried_with_backoff_and_poison_jobs_die,
+        test_worker_processes_share_the_queue,
+        test_remote_workers_and_dashboard,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
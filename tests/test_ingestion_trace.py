@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Test the ingestion tracing layer used by scripts/create_and_upload_index.py."""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from ingestion_trace import Tracer
+
+def test_spans_inherit_pdf_and_nest():
+    """Child spans inherit the pdf attribute and the summary splits PDF time by stage."""
+    tracer = Tracer()
+    with tracer.span("pdf", "pdf", pdf="patterns.pdf"):
+        with tracer.span("adi_analyze", "remote", bytes=2048):
+            pass
+        with tracer.span("vision_summaries"):
+            with tracer.span("page", "page", page=3):
+                with tracer.span("vision_summary", "remote"):
+                    pass
+
+    spans = {span.name: span for span in tracer.spans}
+    assert spans["vision_summary"].attrs == {"pdf": "patterns.pdf", "page": 3}
+    assert spans["adi_analyze"].depth == 1
+    assert spans["vision_summary"].depth == 3
+
+    summary = tracer.summary_table()
+    assert "patterns.pdf" in summary
+    pdf_section = summary.split("patterns.pdf")[1]
+    assert "adi_analyze" in pdf_section and "vision_summaries" in pdf_section
+    assert "vision_summary " not in pdf_section  # nested spans are not double counted
+
+def test_request_hook_counts_retries():
+    """Re-sent azure-core requests and OpenAI retry headers are counted as retries."""
+    tracer = Tracer()
+    azure_request = SimpleNamespace(http_request=SimpleNamespace(headers={}))
+    with tracer.span("blob_upload", "remote") as span:
+        tracer.on_request_attempt(azure_request)
+        tracer.on_request_attempt(azure_request)
+        tracer.on_request_attempt(SimpleNamespace(headers={"x-stainless-retry-count": "0"}))
+        tracer.on_request_attempt(SimpleNamespace(headers={"x-stainless-retry-count": "1"}))
+
+    assert span.requests == 4
+    assert span.retries == 2
+
+def test_chrome_trace_events():
+    """Spans export as Chrome trace complete events."""
+    tracer = Tracer()
+    with tracer.span("embedding", "remote", bytes=10):
+        pass
+
+    event = tracer.chrome_trace()["traceEvents"][0]
+    assert event["ph"] == "X"
+    assert event["name"] == "embedding"
+    assert event["args"]["bytes"] == 10
+
+def main():
+    """Run the ingestion tracing tests."""
+    print("Testing ingestion tracing...")
+    for test in (test_spans_inherit_pdf_and_nest, test_request_hook_counts_retries, test_chrome_trace_events):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
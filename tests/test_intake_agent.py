@@ -3,11 +3,10 @@ import os
 import asyncio
 from pathlib import Path
 
-# Add the backend directory to the Python path
-backend_path = Path(__file__).resolve().parents[1] / "backend"
-sys.path.insert(0, str(backend_path))
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from intake_agent import IntakeAgent
+from backend.intake_agent import IntakeAgent
 
 async def test_intake_agent():
     """Test the IntakeAgent with a sample architecture question."""
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Test the Prometheus-style metrics registry used by the /metrics endpoint."""
+
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.metrics import MetricsRegistry
+
+def test_counter_and_gauge_render():
+    """Counters and gauges render one sample per label set."""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", labelnames=("status",))
+    in_flight = registry.gauge("in_flight", "In flight.")
+
+    requests.labels(status="success").inc()
+    requests.labels(status="success").inc(2)
+    requests.labels(status="error").inc()
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="success"} 3' in text
+    assert 'requests_total{status="error"} 1' in text
+    assert "in_flight 1" in text
+
+def test_histogram_buckets_are_cumulative():
+    """Histogram buckets are pre-aggregated and rendered cumulatively."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", labelnames=("stage",), buckets=(0.1, 1.0))
+    stage = latency.labels(stage="run")
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        stage.observe(value)
+
+    assert stage.counts == [2, 1, 1]
+    text = registry.render()
+    assert 'latency_seconds_bucket{stage="run",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{stage="run",le="1"} 3' in text
+    assert 'latency_seconds_bucket{stage="run",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{stage="run"} 4' in text
+    assert 'latency_seconds_sum{stage="run"} 2.65' in text
+
+def test_histogram_timer_observes_once():
+    """The timer context manager records exactly one observation."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("block_seconds", "Block latency.")
+
+    with latency.time():
+        pass
+
+    assert latency.count == 1
+    assert latency.counts[0] == 1
+
+def main():
+    """Run the metrics tests."""
+    print("Testing metrics registry...")
+    for test in (test_counter_and_gauge_render, test_histogram_buckets_are_cumulative, test_histogram_timer_observes_once):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Test the turn classifier and the routing of runs between the intake and recommendation routes."""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from backend.model_router import ROUTE_INTAKE, ROUTE_RECOMMEND, ModelRouter, classify_turn, requirement_dimensions
+from backend.requirements_parser import parse_requirements
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def test_classifier_routes_on_requests_and_known_requirements():
+    """Requests for an answer, or enough known requirements, get the recommendation route."""
+    assert classify_turn("Hi, we need help planning a new data platform.", set()) == ROUTE_INTAKE
+    assert classify_turn("Which architecture would you recommend for IoT telemetry?", set()) == ROUTE_RECOMMEND
+    assert classify_turn("What are the trade-offs of a lakehouse?", set()) == ROUTE_RECOMMEND
+
+    known = set()
+    routes = []
+    for answer in ("Our data sits in Oracle.", "Around 5 TB today.", "Nightly batch loads into dashboards."):
+        known |= requirement_dimensions(parse_requirements(answer))
+        routes.append(classify_turn(answer, known))
+    assert routes == [ROUTE_INTAKE, ROUTE_INTAKE, ROUTE_RECOMMEND]
+
+    text = "We have a SQL Server database and about 2 TB of data, what now?"
+    iterations = 2000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        classify_turn(text, requirement_dimensions(parse_requirements(text)))
+    assert (time.perf_counter() - started) / iterations < 0.001
+
+def test_intake_turns_run_on_the_small_model_without_search():
+    """A clarifying turn overrides the model and drops the tools; a recommendation turn searches."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        os.environ["MODEL_ROUTING"] = "true"
+        try:
+            agent.router = ModelRouter.from_env()
+        finally:
+            del os.environ["MODEL_ROUTING"]
+        intake_before = metrics.ROUTE_DECISIONS.labels(route=ROUTE_INTAKE).value
+        first = await agent.query("Hi, I need help planning a data platform.")
+        after_intake = dict(client.agents.stats)
+        await agent.query(
+            "Which architecture do you recommend for nightly batch loads from Oracle?", thread_id=first["thread_id"]
+        )
+        await agent.cleanup()
+        return first, after_intake, client.agents.stats, metrics.ROUTE_DECISIONS.labels(route=ROUTE_INTAKE).value - intake_before
+
+    first, after_intake, stats, intake_turns = asyncio.run(scenario())
+
+    assert first["status"] == "success"
+    assert after_intake["runs_model_override"] == 1 and after_intake["searches"] == 0
+    assert stats["runs_model_override"] == 1 and stats["searches"] == 1
+    assert intake_turns == 1
+    assert 'intake_agent_route_query_duration_seconds_count{route="recommend"} ' in metrics.REGISTRY.render()
+
+def main():
+    """Run the model routing tests."""
+    print("Testing model routing...")
+    for test in (
+        test_classifier_routes_on_requests_and_known_requirements,
+        test_intake_turns_run_on_the_small_model_without_search,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
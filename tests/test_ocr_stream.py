@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Test the page-by-page OCR handling used by the streaming mode of scripts/create_and_upload_index.py."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from azure.ai.documentintelligence.models import AnalyzeResult
+
+# Add the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from ocr_stream import iter_extraction_chunks, iter_figures, iter_layout_pages, page_ranges, stream_layout_to_jsonl
+
+def _layout(first: int, last: int) -> AnalyzeResult:
+    paragraphs, figures = [], []
+    for page in range(first, last + 1):
+        region = [{"pageNumber": page, "polygon": [1, 1, 2, 1, 2, 2, 1, 2]}]
+        paragraphs.append({"role": "sectionHeading", "content": f"Pattern {page}", "boundingRegions": region, "spans": []})
+        paragraphs.append({"content": f"Body text of page {page}.", "boundingRegions": region, "spans": []})
+        if page % 2 == 0:
+            figures.append({"boundingRegions": region, "caption": {"content": f"Figure {page}"}, "spans": []})
+    return AnalyzeResult({
+        "apiVersion": "2024-11-30", "modelId": "prebuilt-layout", "content": "",
+        "pages": [{"pageNumber": page, "spans": []} for page in range(first, last + 1)],
+        "paragraphs": paragraphs, "figures": figures,
+    })
+
+def test_layout_is_split_into_pages():
+    """Each page gets its text, headings (including figure captions) and figure regions."""
+    pages = list(iter_layout_pages(_layout(1, 2)))
+    assert [page["page"] for page in pages] == [1, 2]
+    assert pages[0]["content"] == "Pattern 1\nBody text of page 1."
+    assert pages[0]["figures"] == []
+    assert pages[1]["headings"] == ["Pattern 2", "Figure 2"]
+    assert pages[1]["figures"][0]["polygon"] == [1, 1, 2, 1, 2, 2, 1, 2]
+
+def test_streaming_requests_page_ranges_and_reads_back_incrementally():
+    """Ranges cover the document; figures and page-aligned chunks are read back from the JSONL file."""
+    assert list(page_ranges(7, 3)) == ["1-3", "4-6", "7-7"]
+    requested = []
+
+    def analyze(pages):
+        requested.append(pages)
+        return _layout(*map(int, pages.split("-")))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "doc.pages.jsonl"
+        assert stream_layout_to_jsonl(analyze, 7, path, pages_per_request=3) == 7
+        figures = [figure["page"] for figure in iter_figures(path)]
+        chunks = list(iter_extraction_chunks(path, max_chars=70))
+
+    assert requested == ["1-3", "4-6", "7-7"]
+    assert figures == [2, 4, 6]
+    assert len(chunks) == 4
+    assert chunks[0][0].startswith("Pattern 1") and "Pattern 2" in chunks[0][0] and "Pattern 3" not in chunks[0][0]
+    assert chunks[0][1] == ["Pattern 1", "Pattern 2", "Figure 2"]
+
+def main():
+    """Run the streaming OCR tests."""
+    print("Testing streaming OCR handling...")
+    for test in (test_layout_is_split_into_pages, test_streaming_requests_page_ranges_and_reads_back_incrementally):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
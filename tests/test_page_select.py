@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Test the selection of pages for vision summaries in scripts/create_and_upload_index.py."""
+
+import sys
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+# Add the scripts directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from page_select import MIN_GRAPHICS_DENSITY, graphics_density, select_pages, selection_summary
+
+TEXT = (
+    "Organizations migrating analytics workloads weigh cost, latency and operational effort. "
+    "This section lists the considerations that apply to every pattern in the document."
+)
+
+def _text_page(doc: "fitz.Document") -> None:
+    page = doc.new_page()
+    page.insert_text((72, 72), "Considerations", fontsize=18)
+    page.insert_textbox(fitz.Rect(72, 100, 540, 400), TEXT * 3, fontsize=10)
+
+def _diagram_page(doc: "fitz.Document") -> None:
+    page = doc.new_page()
+    page.insert_text((72, 72), "Streaming analytics", fontsize=18)
+    for column in range(3):
+        box = fitz.Rect(80 + column * 160, 200, 200 + column * 160, 280)
+        page.draw_rect(box, color=(0, 0, 0), fill=(0.2, 0.4, 0.8), width=2)
+        if column:
+            page.draw_line((box.x0 - 40, 240), (box.x0, 240), color=(0, 0, 0), width=2)
+
+def _document() -> "fitz.Document":
+    doc = fitz.open()
+    _text_page(doc)
+    _diagram_page(doc)
+    _text_page(doc)
+    return doc
+
+def test_heuristic_separates_diagrams_from_text():
+    """Text outside the text layer's blocks is ignored; drawn shapes count as graphics."""
+    doc = _document()
+    assert graphics_density(doc[0]) < MIN_GRAPHICS_DENSITY
+    assert graphics_density(doc[1]) > MIN_GRAPHICS_DENSITY
+
+def test_text_only_pages_are_skipped_unless_they_have_a_figure():
+    """Document Intelligence figures select a page without rendering it; other pages fall back to the heuristic."""
+    decisions = select_pages(_document(), figure_pages=[3])
+
+    assert [(decision.page, decision.selected, decision.reason) for decision in decisions] == [
+        (1, False, "text_only"), (2, True, "graphics"), (3, True, "figure"),
+    ]
+    assert decisions[2].graphics_density is None
+    summary = selection_summary(decisions)
+    assert (summary["pages"], summary["selected"], summary["skipped"]) == (3, 2, 1)
+    assert summary["by_reason"] == {"text_only": 1, "graphics": 1, "figure": 1}
+
+def main():
+    """Run the page selection tests."""
+    print("Testing page selection...")
+    for test in (test_heuristic_separates_diagrams_from_text, test_text_only_pages_are_skipped_unless_they_have_a_figure):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
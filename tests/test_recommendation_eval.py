@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Test the recommendation regression suite: golden set, scoring, fake and replay backends and regression checks."""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.recommendation_eval import (ReplayBackend, check_baseline, check_thresholds, create_backend,
+                                            load_golden, ranked_architectures, recall_at_k, reciprocal_rank,
+                                            run_eval)
+
+def test_golden_set_and_scoring():
+    """Every golden query expects known architectures; answers are ranked by first mention of a name or alias."""
+    architectures, queries = load_golden()
+    assert len(architectures) == 11 and len(queries) >= 20
+    assert {architecture.category for architecture in architectures} == {"analytics", "migration"}
+
+    answer = (
+        "For IBM i workloads use Skytap. Alternatively, see Stream   processing with azure-databricks "
+        "or the Database Migration from On-Premises to Azure Cloud pattern."
+    )
+    ranked = ranked_architectures(answer, architectures)
+    assert ranked == ["migration-ibm-i-skytap", "analytics-databricks-streaming", "migration-database"]
+    assert recall_at_k(ranked, ["migration-database"], 1) == 0.0
+    assert recall_at_k(ranked, ["migration-database"], 3) == 1.0
+    assert recall_at_k(ranked, ["migration-database", "migration-sage"], 5) == 0.5
+    assert reciprocal_rank(ranked, ["analytics-databricks-streaming"]) == 0.5
+    assert reciprocal_rank([], ["migration-sage"]) == 0.0
+
+def test_fake_backend_meets_quality_floors_and_replays():
+    """The fake service's retrieval over the golden architectures passes the floors; a recording replays the same scores."""
+    async def scenario(recording):
+        architectures, queries = load_golden()
+        args = argparse.Namespace(backend="fake", recording=None, seed=0, time_scale=0.01)
+        backend = await create_backend(args, architectures)
+        try:
+            live = await run_eval(backend, architectures, queries, record=recording)
+        finally:
+            await backend.close()
+        replayed = await run_eval(ReplayBackend(recording), architectures, queries)
+        missing = await run_eval(ReplayBackend(recording), architectures, queries[:1] + [
+            type(queries[0])(id="new", query="A question nobody recorded", expected=queries[0].expected)
+        ])
+        return live, replayed, missing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        live, replayed, missing = asyncio.run(scenario(Path(tmp) / "answers.jsonl"))
+
+    summary = live["summary"]
+    assert not check_thresholds(summary, {"min": {"recall@3": 0.95, "mrr": 0.9}, "max": {"errors": 0}})
+    assert summary["prompt_tokens_mean"] > 0 and summary["completion_tokens_mean"] > 0
+    assert replayed["summary"] == summary
+    assert missing["summary"]["errors"] == 1 and missing["queries"][1]["status"] == "not_recorded"
+
+def test_regressions_fail_the_run():
+    """Quality drops, latency and token growth beyond the tolerances are reported against a baseline."""
+    baseline = {"recall@1": 0.9, "recall@3": 1.0, "recall@5": 1.0, "mrr": 0.95, "latency_p50_s": 0.30,
+                "latency_p95_s": 0.40, "prompt_tokens_mean": 700.0, "completion_tokens_mean": 250.0, "errors": 0}
+    within = dict(baseline, **{"recall@3": 0.97, "latency_p95_s": 0.45, "prompt_tokens_mean": 750.0})
+    worse = dict(baseline, **{"recall@3": 0.85, "latency_p95_s": 0.60, "prompt_tokens_mean": 900.0, "errors": 2})
+
+    assert check_baseline(within, baseline, 0.05, 0.25, 0.10) == []
+    failures = check_baseline(worse, baseline, 0.05, 0.25, 0.10)
+    assert len(failures) == 4
+    assert any(failure.startswith("recall@3 dropped") for failure in failures)
+    assert any(failure.startswith("latency_p95_s grew +50%") for failure in failures)
+    assert any(failure.startswith("prompt_tokens_mean grew") for failure in failures)
+    assert check_thresholds(worse, {"min": {"recall@3": 0.9}, "max": {"latency_p95_s": 0.5}}) == [
+        "recall@3 0.850 is below the floor 0.900",
+        "latency_p95_s 0.600 is above the ceiling 0.500",
+    ]
+
+def main():
+    """Run the recommendation regression suite tests."""
+    print("Testing the recommendation regression suite...")
+    for test in (
+        test_golden_set_and_scoring,
+        test_fake_backend_meets_quality_floors_and_replays,
+        test_regressions_fail_the_run,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
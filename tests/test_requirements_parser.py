@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Test the local requirements parser and the search pre-filter it drives."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.intake_agent import IntakeAgent
+from backend.requirements_parser import parse_requirements
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def test_parser_extracts_category_workload_stores_and_scale():
+    """Keywords, data stores and numeric scale hints are picked up."""
+    migration = parse_requirements("We are moving a Hadoop cluster (300 TB) to the cloud with nightly ETL.")
+    assert migration.category == "migration"
+    assert migration.workloads == ["batch"]
+    assert migration.data_stores == ["hadoop"]
+    assert migration.data_volume_tb == 300.0 and migration.scale == "large"
+    assert migration.search_filter() == "categories/any(c: c eq 'migration')"
+
+    streaming = parse_requirements("Real-time dashboards over 20k events per second of IoT telemetry")
+    assert streaming.category == "analytics"
+    assert streaming.workloads == ["streaming"]
+    assert streaming.events_per_second == 20000.0 and streaming.scale == "medium"
+
+    follow_up = parse_requirements("What are the main cost drivers?")
+    assert follow_up.is_empty() and follow_up.search_filter() is None
+
+def test_runs_are_filtered_to_the_detected_catalog():
+    """The first turn sets the catalog; a follow-up without keywords keeps it."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        first = await agent.query("Our Oracle OLTP database must move to a managed PostgreSQL service.")
+        await agent.query("What are the main cost drivers?", thread_id=first["thread_id"])
+        await agent.query("Hello")
+        await agent.cleanup()
+        return client.agents.stats
+
+    stats = asyncio.run(scenario())
+
+    assert stats["searches"] == 3
+    assert stats["searches_filtered"] == 2
+
+def main():
+    """Run the requirements parser tests."""
+    print("Testing requirements parsing...")
+    for test in (test_parser_extracts_category_workload_stores_and_scale, test_runs_are_filtered_to_the_detected_catalog):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Test the circuit breaker, retries and hedged reads around the agents SDK calls."""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from backend.resilience import CircuitBreaker, CircuitOpenError, hedged, retry
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+def test_breaker_opens_fails_fast_and_recovers():
+    """Transient failures open the circuit; a successful trial after the reset timeout closes it."""
+    breaker = CircuitBreaker("test_breaker", failure_threshold=2, reset_timeout=0.05)
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        raise HttpResponseError(message="503 from service")
+
+    async def not_found():
+        calls.append("404")
+        raise ResourceNotFoundError("no such thread")
+
+    async def ok():
+        calls.append("ok")
+        return "ok"
+
+    async def scenario():
+        outcomes = []
+        for func in (not_found, failing, failing, ok):
+            try:
+                outcomes.append(await breaker.call(func))
+            except CircuitOpenError:
+                outcomes.append("rejected")
+            except Exception as e:
+                outcomes.append(type(e).__name__)
+        state_while_open = breaker.state
+        await asyncio.sleep(0.06)
+        outcomes.append(await breaker.call(ok))
+        return outcomes, state_while_open
+
+    outcomes, state_while_open = asyncio.run(scenario())
+
+    # 404s are answers from a working service and do not count as failures
+    assert outcomes == ["ResourceNotFoundError", "HttpResponseError", "HttpResponseError", "rejected", "ok"]
+    assert calls == ["404", "fail", "fail", "ok"]
+    assert state_while_open == "open" and breaker.state == "closed"
+    rendered = metrics.REGISTRY.render()
+    assert 'intake_agent_circuit_state{breaker="test_breaker"} 0' in rendered
+    assert 'intake_agent_circuit_rejections_total{breaker="test_breaker"} 1' in rendered
+
+def test_retries_and_hedged_reads():
+    """Transient errors are retried, other errors are not; a slow read is overtaken by its hedge."""
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset by peer")
+        return "done"
+
+    async def not_found():
+        attempts.append(1)
+        raise ResourceNotFoundError("no such thread")
+
+    reads = []
+
+    async def read():
+        reads.append(1)
+        await asyncio.sleep(0.5 if len(reads) == 1 else 0.01)
+        return len(reads)
+
+    async def scenario():
+        result = await retry("test_flaky", flaky, attempts=3, base_delay=0.001)
+        attempts.clear()
+        try:
+            await retry("test_not_found", not_found, attempts=3, base_delay=0.001)
+        except ResourceNotFoundError:
+            pass
+        not_found_attempts = len(attempts)
+        started = time.perf_counter()
+        winner = await hedged("test_read", read, delay=0.02)
+        return result, not_found_attempts, winner, time.perf_counter() - started
+
+    result, not_found_attempts, winner, elapsed = asyncio.run(scenario())
+
+    assert result == "done"
+    assert not_found_attempts == 1
+    assert winner == 2 and elapsed < 0.3
+    rendered = metrics.REGISTRY.render()
+    assert 'intake_agent_sdk_retries_total{operation="test_flaky"} 2' in rendered
+    assert 'intake_agent_hedged_requests_total{operation="test_read",result="hedge_won"} 1' in rendered
+
+def test_outage_fails_fast_with_503():
+    """A failure before a thread exists is a 500; once the breaker opens, /query answers 503 without calling the service."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        agent.breaker = CircuitBreaker("test_outage", failure_threshold=3, reset_timeout=60)
+        agent.retry_base_delay = 0.001
+        client.agents.config.error_rate = 1.0
+        transport = httpx.ASGITransport(app=backend_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            backend_app.agent = agent
+            try:
+                first = await http.post("/query", json={"query": "Recommend a streaming analytics architecture."})
+                failures = client.agents.stats["errors_injected"]
+                started = time.perf_counter()
+                response = await http.post("/query", json={"query": "Recommend a data lake architecture."})
+                elapsed = time.perf_counter() - started
+            finally:
+                backend_app.agent = None
+                await agent.cleanup()
+        return first, failures, response, elapsed, client.agents.stats["errors_injected"]
+
+    first, failures, response, elapsed, failures_after = asyncio.run(scenario())
+
+    # Thread creation is retried until the breaker opens
+    assert first.status_code == 500 and failures == 3
+    assert first.json()["detail"].startswith("Error processing query: An error occurred")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    assert failures_after == failures and elapsed < 0.5
+
+def main():
+    """Run the resilience tests."""
+    print("Testing circuit breaker, retries and hedging...")
+    for test in (
+        test_breaker_opens_fails_fast_and_recovers,
+        test_retries_and_hedged_reads,
+        test_outage_fails_fast_with_503,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
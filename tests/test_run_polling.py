@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Test the adaptive run polling and per-request deadline of the IntakeAgent."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+async def _query(client: FakeProjectClient, **settings):
+    agent = await IntakeAgent.create(client=client)
+    for name, value in settings.items():
+        setattr(agent, name, value)
+    result = await agent.query("Recommend an architecture for streaming IoT telemetry.")
+    await agent.cleanup()
+    return result
+
+def test_stuck_run_is_cancelled_at_deadline():
+    """A run that outlives the deadline is cancelled and reported as an error."""
+    client = FakeProjectClient(FakeServiceConfig(time_scale=0.01, run_per_output_token=10.0))
+    timeouts_before = metrics.RUN_TIMEOUTS.value
+
+    result = asyncio.run(_query(client, run_timeout=0.2))
+
+    assert result["status"] == "error"
+    assert "cancelled" in result["assistant_response"]
+    assert client.agents.stats["runs_cancelled"] == 1
+    assert metrics.RUN_TIMEOUTS.value == timeouts_before + 1
+
+def test_polling_backs_off_after_fast_polls():
+    """Fast polls come first, then the interval grows up to the maximum."""
+    client = FakeProjectClient(FakeServiceConfig(time_scale=0.01, run_per_output_token=0.2))
+
+    result = asyncio.run(_query(
+        client,
+        run_poll_initial_interval=0.01,
+        run_poll_fast_polls=2,
+        run_poll_backoff=2.0,
+        run_poll_max_interval=0.08,
+    ))
+
+    assert result["status"] == "success"
+    polls = client.agents.stats["run_polls"]
+    # Runs take between 0.06s and 0.8s here: far fewer polls than a fixed 10ms interval would need
+    assert 2 <= polls <= 14
+
+def main():
+    """Run the run polling tests."""
+    print("Testing adaptive run polling...")
+    for test in (test_stuck_run_is_cancelled_at_deadline, test_polling_backs_off_after_fast_polls):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
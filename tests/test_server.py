@@ -6,13 +6,13 @@ import sys
 import os
 from pathlib import Path
 
-# Add the backend directory to the Python path
-sys.path.append(str(Path(__file__).resolve().parent / "backend"))
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 async def test_agent():
     """Test the IntakeAgent functionality."""
     try:
-        from intake_agent import IntakeAgent
+        from backend.intake_agent import IntakeAgent
         
         print("Creating IntakeAgent...")
         agent = await IntakeAgent.create()
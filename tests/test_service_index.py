@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Test service name canonicalization, the service -> architectures index and its endpoint and agent tool."""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend.catalog import CatalogStore, write_catalog
+from backend.intake_agent import IntakeAgent
+from backend.service_index import ServiceIndex, canonical_service, canonical_services
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+SERVICES = [
+    ["Azure Event Hubs", "Azure Databricks", "ADLS Gen2"],
+    ["EventHub", "Stream Analytics", "Power BI"],
+    ["Azure Data Factory", "Azure Databricks", "Azure Data Lake Storage Gen2"],
+    ["Azure Kubernetes Service (AKS)", "Cosmos DB"],
+]
+
+def _write_catalog(path: Path) -> None:
+    records = [
+        {
+            "id": f"arch-{index}",
+            "name": f"Pattern {index}",
+            "category": "analytics",
+            "azure_services": canonical_services(services),
+            "non_azure_services": ["Kafka"] if index == 3 else [],
+        }
+        for index, services in enumerate(SERVICES)
+    ]
+    index = ServiceIndex.build((record["id"], record["azure_services"] + record["non_azure_services"]) for record in records)
+    write_catalog(path, records, [[0.0]] * len(records), metadata={"service_index": index.to_dict()})
+
+def test_canonicalization_and_queries():
+    """Aliases resolve to one name; AND/OR queries and unknown services behave like set operations."""
+    assert canonical_service("Azure Event Hubs") == canonical_service("eventhub") == "Event Hubs"
+    assert canonical_service("ADLS Gen2") == canonical_service("Azure Data Lake Storage Gen2") == "Data Lake Storage"
+    assert canonical_service("Azure Kubernetes Service (AKS)") == "Kubernetes Service"
+    assert canonical_service("Azure Foo Service") == "Foo Service"
+
+    index = ServiceIndex.build((f"arch-{i}", services) for i, services in enumerate(SERVICES))
+    index = ServiceIndex.from_dict(index.to_dict())
+
+    both = index.query(all_of=["event hubs", "Databricks"])
+    assert both["all_of"] == ["Event Hubs", "Databricks"] and both["architecture_ids"] == ["arch-0"]
+    either = index.query(any_of=["Power BI", "Data Factory"])
+    assert either["total"] == 2 and either["architecture_ids"] == ["arch-1", "arch-2"]
+    lake = index.query(all_of=["Data Lake Storage"], any_of=["Event Hubs", "ADF"], offset=1)
+    assert lake["total"] == 2 and lake["architecture_ids"] == ["arch-2"]
+    unknown = index.query(all_of=["Databricks", "Mainframe"])
+    assert unknown["total"] == 0 and unknown["unknown_services"] == ["Mainframe"]
+    assert index.service_counts()["Databricks"] == 2
+
+def test_service_endpoints():
+    """/services counts architectures per service and /services/architectures answers AND/OR lookups."""
+    async def scenario(store):
+        backend_app.catalog = store
+        transport = httpx.ASGITransport(app=backend_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            services = await client.get("/services")
+            found = await client.get("/services/architectures", params={"all_of": ["Event Hubs"], "any_of": ["ADB", "Power BI"]})
+            empty = await client.get("/services/architectures")
+        return services, found, empty
+
+    original = backend_app.catalog
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.bin"
+        _write_catalog(path)
+        try:
+            services, found, empty = asyncio.run(scenario(CatalogStore(path)))
+        finally:
+            backend_app.catalog = original
+
+    assert services.json()["services"]["Event Hubs"] == 2 and services.json()["services"]["Kafka"] == 1
+    body = found.json()
+    assert body["total"] == 2 and [item["id"] for item in body["items"]] == ["arch-0", "arch-1"]
+    assert body["any_of"] == ["Databricks", "Power BI"]
+    assert empty.status_code == 400
+
+def test_agent_answers_service_questions_with_the_lookup_tool():
+    """The run's function call is executed against the catalog and its output submitted."""
+    async def scenario(store):
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client, catalog=store)
+        result = await agent.query("Which architectures use Azure Databricks and Data Factory?")
+        await agent.cleanup()
+        return result, client.agents.stats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.bin"
+        _write_catalog(path)
+        result, stats = asyncio.run(scenario(CatalogStore(path)))
+
+    assert result["status"] == "success"
+    assert "Pattern 2" in result["assistant_response"] and "Pattern 0" not in result["assistant_response"]
+    assert stats["tool_outputs_submitted"] == 1 and stats["searches"] == 0
+
+def main():
+    """Run the service index tests."""
+    print("Testing the service index...")
+    for test in (test_canonicalization_and_queries, test_service_endpoints, test_agent_answers_service_questions_with_the_lookup_tool):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
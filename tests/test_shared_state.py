@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Test state sharing between IntakeAgent workers (agent id, thread registry, response cache)."""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.intake_agent import IntakeAgent
+from backend.shared_state import SharedStateStore
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+async def _two_workers(state_path: str):
+    client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+    worker_a = await IntakeAgent.create(client=client, state=SharedStateStore(state_path))
+    worker_b = await IntakeAgent.create(client=client, state=SharedStateStore(state_path))
+
+    first = await worker_a.query("We need a lakehouse on Databricks.")
+    follow_up = await worker_b.query("How does it scale?", thread_id=first["thread_id"])
+
+    agent_ids = (worker_a.agent_id, worker_b.agent_id)
+    await worker_a.cleanup()
+    agents_after_first_cleanup = len(client.agents._agents)
+    await worker_b.cleanup()
+    return client, agent_ids, first, follow_up, agents_after_first_cleanup
+
+def test_workers_share_agent_and_threads():
+    """Two workers reuse one agent definition and resolve each other's threads."""
+    with tempfile.TemporaryDirectory() as tmp:
+        client, agent_ids, first, follow_up, agents_after_first_cleanup = asyncio.run(
+            _two_workers(os.path.join(tmp, "state.db"))
+        )
+
+    assert agent_ids[0] == agent_ids[1]
+    assert follow_up["thread_id"] == first["thread_id"]
+    assert client.agents.stats["threads_created"] == 1
+    # The agent survives until the last worker shuts down
+    assert agents_after_first_cleanup == 1
+    assert len(client.agents._agents) == 0
+
+async def _cached_questions():
+    client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+    agent = await IntakeAgent.create(client=client)
+    agent.response_cache_ttl = 60
+    first = await agent.query("Which architecture fits IoT telemetry analytics?")
+    second = await agent.query("which architecture fits   IoT telemetry analytics?")
+    await agent.cleanup()
+    return client, first, second
+
+def test_response_cache_skips_run_for_identical_first_turn():
+    """An identical first-turn question is answered from the cache on a fresh thread."""
+    client, first, second = asyncio.run(_cached_questions())
+
+    assert second["assistant_response"] == first["assistant_response"]
+    assert second["thread_id"] != first["thread_id"]
+    assert client.agents.stats["runs_created"] == 1
+
+def test_store_increment_and_expiry():
+    """Counters are atomic read-modify-writes; expired cache entries and thread values are not returned."""
+    store = SharedStateStore()
+    assert store.increment("refs") == 1
+    assert store.increment("refs") == 2
+    assert store.increment("refs", -2) == 0
+    assert store.set_if_absent("agent", "a") == "a"
+    assert store.set_if_absent("agent", "b") == "a"
+    store.cache_set("key", "value", ttl_seconds=-1)
+    assert store.cache_get("key") is None
+    # Per-conversation values expire and are removed with the thread registry
+    store.set_thread_value("t1", "requirements_category", "analytics", ttl_seconds=-1)
+    store.set_thread_value("t2", "requirements_category", "migration", ttl_seconds=60)
+    assert store.get_thread_value("t1", "requirements_category") is None
+    assert store._conn.execute("SELECT COUNT(*) FROM thread_state").fetchone()[0] == 1
+    store.clear_threads()
+    assert store.get_thread_value("t2", "requirements_category") is None
+
+def main():
+    """Run the shared state tests."""
+    print("Testing shared worker state...")
+    for test in (test_workers_share_agent_and_threads, test_response_cache_skips_run_for_identical_first_turn, test_store_increment_and_expiry):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test the pre-warmed thread pool used for new conversations."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import metrics
+from backend.intake_agent import IntakeAgent
+from backend.thread_prewarm import ThreadPrewarmer
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+
+async def _wait_for(condition, timeout: float = 2.0) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+def test_pool_refills_and_reaps_expired_threads():
+    """Taken threads are replaced in the background; threads past the TTL are deleted unused."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        prewarmer = ThreadPrewarmer(agent, size=3, ttl=60)
+        prewarmer.start()
+        await _wait_for(lambda: len(prewarmer) == 3)
+        created_before = client.agents.stats["threads_created"]
+        taken = prewarmer.take()
+        created_at_take = client.agents.stats["threads_created"] - created_before
+        await _wait_for(lambda: len(prewarmer) == 3)
+        refilled = client.agents.stats["threads_created"] - created_before
+        await prewarmer.stop()
+        deleted_at_stop = client.agents.stats["threads_deleted"]
+
+        expiring = ThreadPrewarmer(agent, size=2, ttl=0)
+        await expiring.fill()
+        expired_before = metrics.THREAD_POOL_EXPIRED.value
+        empty = expiring.take()
+        await expiring.stop()
+        expired = metrics.THREAD_POOL_EXPIRED.value - expired_before
+        await agent.cleanup()
+        return taken, created_at_take, refilled, deleted_at_stop, empty, expired, client
+
+    taken, created_at_take, refilled, deleted_at_stop, empty, expired, client = asyncio.run(scenario())
+
+    assert taken and created_at_take == 0
+    assert refilled == 1
+    assert deleted_at_stop == 3
+    assert empty is None and expired == 2
+    assert client.agents.stats["threads_deleted"] == 5
+
+def test_new_conversations_use_pooled_threads():
+    """A first turn runs on a pooled thread, and cleanup deletes the threads left in the pool."""
+    async def scenario():
+        client = FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        agent = await IntakeAgent.create(client=client)
+        agent.prewarmer = ThreadPrewarmer(agent, size=2)
+        await agent.prewarmer.fill()
+        pooled = [thread_id for thread_id, _ in agent.prewarmer._pool]
+        result = await agent.query("Recommend an architecture for streaming IoT telemetry.")
+        await agent.cleanup()
+        return pooled, result, client
+
+    pooled, result, client = asyncio.run(scenario())
+
+    assert result["status"] == "success"
+    assert result["thread_id"] == pooled[0]
+    # The other pooled thread and the refill of the taken one are deleted at cleanup
+    assert client.agents.stats["threads_deleted"] >= 1
+
+def main():
+    """Run the thread pre-warm tests."""
+    print("Testing the pre-warmed thread pool...")
+    for test in (test_pool_refills_and_reaps_expired_threads, test_new_conversations_use_pooled_threads):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
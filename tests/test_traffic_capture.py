@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Test /query traffic capture: anonymized records from the middleware and their in-order, time-scaled replay."""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import app as backend_app
+from backend.intake_agent import IntakeAgent
+from backend.traffic_capture import TrafficRecorder
+from benchmarks.fake_azure import FakeProjectClient, FakeServiceConfig
+from benchmarks.traffic_replay import load_recording, replay, stand_in_query, summarize
+
+def test_capture_records_anonymized_metadata():
+    """A first turn and its follow-up share a thread hash; no query text or raw thread id is written."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "capture.jsonl"
+        os.environ.update(TRAFFIC_CAPTURE_PATH=str(path), TRAFFIC_CAPTURE_SALT="test-salt")
+        backend_app.agent_client_factory = lambda: FakeProjectClient(FakeServiceConfig(time_scale=0.01))
+        try:
+            with TestClient(backend_app.app) as client:
+                first = client.post("/query", json={"query": "Streaming analytics over IoT telemetry"})
+                follow_up = client.post("/query", json={"query": "Which services?", "thread_id": first.json()["thread_id"]})
+                client.get("/health/live")
+        finally:
+            del os.environ["TRAFFIC_CAPTURE_PATH"], os.environ["TRAFFIC_CAPTURE_SALT"]
+            backend_app.agent_client_factory = None
+            backend_app.agent = backend_app.batch_jobs = backend_app.health = backend_app.traffic_capture = None
+        text = path.read_text()
+        records = load_recording([path])
+
+    assert first.status_code == follow_up.status_code == 200
+    assert len(records) == 2
+    assert records[0]["thread"] == records[1]["thread"] == TrafficRecorder(
+        Path(tmp) / "other.jsonl", b"test-salt").thread_hash(first.json()["thread_id"])
+    assert [record["follow_up"] for record in records] == [False, True]
+    assert [record["query_chars"] for record in records] == [38, 15]
+    assert records[0]["response_bytes"] == len(first.content) and records[0]["status"] == 200
+    assert records[0]["t"] <= records[1]["t"] and records[1]["latency_s"] > 0
+    assert "IoT" not in text and first.json()["thread_id"] not in text
+
+def test_replay_keeps_thread_order_and_scales_time():
+    """Turns of a thread run one after another on one server thread; independent threads overlap at --speed."""
+    records = [
+        {"t": 100.0, "thread": "a", "follow_up": False, "query_chars": 80, "status": 200, "latency_s": 0.5},
+        {"t": 100.1, "thread": "a", "follow_up": True, "query_chars": 30, "status": 200, "latency_s": 0.4},
+        {"t": 100.2, "thread": "a", "follow_up": True, "query_chars": 30, "status": 200, "latency_s": 0.4},
+        {"t": 101.0, "thread": "b", "follow_up": False, "query_chars": 120, "status": 200, "latency_s": 0.5},
+        {"t": 102.0, "thread": None, "follow_up": False, "query_chars": 60, "status": 500, "latency_s": 0.1},
+    ]
+
+    async def scenario():
+        agent = await IntakeAgent.create(client=FakeProjectClient(FakeServiceConfig(time_scale=0.01)))
+        backend_app.agent = agent
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=backend_app.app), base_url="http://replay")
+        started = time.perf_counter()
+        try:
+            results = await replay(client, records, speed=10.0, timeout=30)
+        finally:
+            await client.aclose()
+            await agent.cleanup()
+            backend_app.agent = None
+        return results, time.perf_counter() - started
+
+    results, duration = asyncio.run(scenario())
+
+    thread_a = sorted((result for result in results if result["conversation"] == "a"), key=lambda r: r["turn"])
+    assert [result["status"] for result in results] == [200] * 5
+    for previous, turn in zip(thread_a, thread_a[1:]):
+        assert turn["sent_s"] >= previous["sent_s"] + previous["latency_s"]
+    assert 0.2 <= duration < 2.0
+    summary = summarize(records, results, duration, 10.0)
+    assert summary["conversations"] == 3 and summary["turns_per_conversation_max"] == 3
+    assert summary["recorded_status"] == {"200": 4, "500": 1}
+    assert summary["follow_up_latency_s"]["count"] == 2
+    assert len(stand_in_query(200, False, 3)) == 200 and len(stand_in_query(10, True, 0)) == 10
+
+def main():
+    """Run the traffic capture and replay tests."""
+    print("Testing traffic capture and replay...")
+    for test in (
+        test_capture_records_anonymized_metadata,
+        test_replay_keeps_thread_order_and_scales_time,
+    ):
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()